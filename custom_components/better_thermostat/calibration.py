@@ -1,6 +1,7 @@
 """Helper functions for the Better Thermostat component."""
 
 import logging
+from time import monotonic
 
 from homeassistant.components.climate.const import HVACAction, HVACMode
 
@@ -8,11 +9,19 @@ from custom_components.better_thermostat.model_fixes.model_quirks import (
     fix_local_calibration,
     fix_target_temperature_calibration,
 )
+from custom_components.better_thermostat.utils.calibration.executor import (
+    CONTROLLER_EXECUTOR,
+    PREFETCH_SLOT,
+    ControllerRequest,
+)
 from custom_components.better_thermostat.utils.calibration.mpc import (
+    MPC_HORIZON_STEPS,
     MpcInput,
     MpcParams,
     build_mpc_key,
+    build_mpc_room_key,
     compute_mpc,
+    compute_mpc_room,
 )
 from custom_components.better_thermostat.utils.calibration.pid import (
     DEFAULT_PID_AUTO_TUNE,
@@ -29,11 +38,28 @@ from custom_components.better_thermostat.utils.calibration.tpi import (
     TpiParams,
     build_tpi_key,
     compute_tpi,
+    tpi_params_for,
+    tpi_uid,
 )
 from custom_components.better_thermostat.utils.const import (
+    CONF_MPC_ESTIMATOR,
+    CONF_MPC_EXACT_DISCRETIZATION,
+    CONF_MPC_HORIZON_STEPS,
+    CONF_MPC_MOVE_BLOCKS,
+    CONF_MPC_ROOM_SOLVE,
+    CONF_MPC_SOLVER,
+    CONF_MPC_WARM_START,
+    CONF_MPC_WARM_START_MAX_RADIUS,
+    CONF_MPC_WARM_START_RADIUS,
+    CONF_PID_GAIN_SCHEDULE,
     CONF_PROTECT_OVERHEATING,
+    CONF_TPI_CYCLE,
+    CONF_TPI_MIN_SWITCH,
     CalibrationMode,
     CalibrationType,
+    MpcEstimator,
+    MpcSolver,
+    PidGainSchedule,
 )
 from custom_components.better_thermostat.utils.helpers import (
     convert_to_float,
@@ -41,6 +67,7 @@ from custom_components.better_thermostat.utils.helpers import (
     normalize_calibration_mode,
     round_by_step,
 )
+from custom_components.better_thermostat.utils.weather import get_forecast_window
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -167,6 +194,73 @@ def _supports_direct_valve_control(self, entity_id: str) -> bool:
     return False
 
 
+def _run_controller(
+    self, entity_id: str, key: str, func, *args, heavy=False, reuse_last=True, **kwargs
+):
+    """Run a controller call through the shared controller executor.
+
+    Returns the result prefetched by ``async_prefetch_calibration`` if there
+    is a current one, otherwise runs the call inline. While a worker thread
+    holds the controller lock the last result of the key is returned (None
+    with reuse_last off).
+    """
+
+    return CONTROLLER_EXECUTOR.take_or_run(
+        self.real_trvs[entity_id],
+        ControllerRequest(key, func, args, kwargs, heavy=heavy),
+        reuse_last=reuse_last,
+    )
+
+
+def _option_int(advanced: dict, key: str, default: int, lo: int, hi: int) -> int:
+    """Return an integer advanced option clamped to [lo, hi]."""
+
+    try:
+        value = int(advanced.get(key, default))
+    except (TypeError, ValueError):
+        return default
+    return max(lo, min(hi, value))
+
+
+def mpc_params_for(self, entity_id: str) -> MpcParams:
+    """Return the MPC params of a TRV with its advanced options applied."""
+
+    defaults = MpcParams()
+    advanced = (self.real_trvs.get(entity_id) or {}).get("advanced") or {}
+    solver = str(advanced.get(CONF_MPC_SOLVER, MpcSolver.GRID)).lower()
+    if solver not in tuple(MpcSolver):
+        solver = MpcSolver.GRID
+    estimator = str(advanced.get(CONF_MPC_ESTIMATOR, MpcEstimator.EMA)).lower()
+    if estimator not in tuple(MpcEstimator):
+        estimator = MpcEstimator.EMA
+    radius = _option_int(
+        advanced, CONF_MPC_WARM_START_RADIUS, defaults.mpc_warm_start_radius_pct, 1, 100
+    )
+    return MpcParams(
+        mpc_solver=str(solver),
+        mpc_warm_start=bool(advanced.get(CONF_MPC_WARM_START, False)),
+        mpc_warm_start_radius_pct=radius,
+        mpc_warm_start_max_radius_pct=_option_int(
+            advanced,
+            CONF_MPC_WARM_START_MAX_RADIUS,
+            defaults.mpc_warm_start_max_radius_pct,
+            radius,
+            100,
+        ),
+        mpc_horizon_steps=_option_int(
+            advanced, CONF_MPC_HORIZON_STEPS, MPC_HORIZON_STEPS, MPC_HORIZON_STEPS, 72
+        ),
+        mpc_move_blocks=_option_int(
+            advanced, CONF_MPC_MOVE_BLOCKS, defaults.mpc_move_blocks, 0, 12
+        ),
+        mpc_estimator=str(estimator),
+        mpc_exact_discretization=bool(
+            advanced.get(CONF_MPC_EXACT_DISCRETIZATION, False)
+        ),
+        mpc_room_solve=bool(advanced.get(CONF_MPC_ROOM_SOLVE, False)),
+    )
+
+
 def _compute_mpc_balance(self, entity_id: str):
     """Run the MPC balance algorithm for calibration purposes."""
 
@@ -183,7 +277,7 @@ def _compute_mpc_balance(self, entity_id: str):
         trv_state["calibration_balance"] = None
         return None, False
 
-    params = MpcParams()
+    params = mpc_params_for(self, entity_id)
 
     # Optional: use filtered external temperature for MPC cost evaluation to reduce jitter.
     # `cur_temp_filtered` is maintained by events/temperature.py (EMA) and passed separately.
@@ -200,26 +294,48 @@ def _compute_mpc_balance(self, entity_id: str):
     if _is_day:
         _solar_intensity = _get_current_solar_intensity(self)
 
+    # Shared per-weather-entity forecast (refreshed with the weather check).
+    _forecast = get_forecast_window(self.weather_entity, params.mpc_horizon_steps)
+
+    room_inputs = {
+        "target_temp_C": self.bt_target_temp,
+        "current_temp_C": mpc_current_temp,
+        "filtered_temp_C": mpc_filtered_temp,
+        "tolerance_K": float(self.tolerance or 0.0),
+        "temp_slope_K_per_min": self.temp_slope,
+        "window_open": self.window_open or False,
+        "heating_allowed": True,
+        "bt_name": self.device_name,
+        "outdoor_temp_C": _get_current_outdoor_temp(self),
+        "is_day": _is_day,
+        "solar_intensity": _solar_intensity,
+        "outdoor_temp_forecast_C": _forecast[0] if _forecast else None,
+        "solar_intensity_forecast": _forecast[1] if _forecast else None,
+        "debug_level": getattr(self, "calibration_debug_level", "summary"),
+    }
+    room_entities = _mpc_room_entities(self) if params.mpc_room_solve else []
+
     try:
-        mpc_output = compute_mpc(
-            MpcInput(
+        if len(room_entities) > 1 and entity_id in room_entities:
+            mpc_output = _compute_mpc_room_share(
+                self, entity_id, room_entities, room_inputs, params
+            )
+        else:
+            mpc_input = MpcInput(
                 key=build_mpc_key(self, entity_id),
-                target_temp_C=self.bt_target_temp,
-                current_temp_C=mpc_current_temp,
-                filtered_temp_C=mpc_filtered_temp,
                 trv_temp_C=trv_state.get("current_temperature"),
-                tolerance_K=float(self.tolerance or 0.0),
-                temp_slope_K_per_min=self.temp_slope,
-                window_open=self.window_open or False,
-                heating_allowed=True,
-                bt_name=self.device_name,
                 entity_id=entity_id,
-                outdoor_temp_C=_get_current_outdoor_temp(self),
-                is_day=_is_day,
-                solar_intensity=_solar_intensity,
-            ),
-            params,
-        )
+                **room_inputs,
+            )
+            mpc_output = _run_controller(
+                self,
+                entity_id,
+                mpc_input.key,
+                compute_mpc,
+                mpc_input,
+                params,
+                heavy=params.mpc_horizon_steps > MPC_HORIZON_STEPS,
+            )
     except (ValueError, TypeError, ZeroDivisionError) as err:
         _LOGGER.debug(
             "better_thermostat %s: MPC calibration compute failed for %s: %s",
@@ -248,6 +364,85 @@ def _compute_mpc_balance(self, entity_id: str):
     return mpc_output, supports_valve
 
 
+def _mpc_room_entities(self) -> list[str]:
+    """Return the TRVs of this entity that share the room-level MPC solve."""
+
+    entities = []
+    for entity_id, trv_state in self.real_trvs.items():
+        advanced = trv_state.get("advanced") or {}
+        mode = normalize_calibration_mode(
+            advanced.get("calibration_mode", CalibrationMode.MPC_CALIBRATION)
+        )
+        if mode in (None, CalibrationMode.MPC_CALIBRATION) and bool(
+            advanced.get(CONF_MPC_ROOM_SOLVE, False)
+        ):
+            entities.append(entity_id)
+    return entities
+
+
+def _compute_mpc_room_share(
+    self, entity_id: str, room_entities: list[str], room_inputs: dict, params: MpcParams
+):
+    """Return this TRV's share of the room-level MPC solve.
+
+    The lanes of a control cycle share one room solve: their prefetches
+    join the solve in flight for the room key. The first TRV to take the
+    result stores the shares of the others, which pick them up as long as
+    the room inputs are unchanged and the solve is younger than
+    min_update_interval_s. A TRV asking again starts the next cycle. Only
+    the output of an actual solve is stored, never the last result reused
+    while the controller is busy.
+    """
+
+    signature = (
+        tuple(room_entities),
+        room_inputs["target_temp_C"],
+        room_inputs["current_temp_C"],
+        room_inputs["filtered_temp_C"],
+        room_inputs["window_open"],
+    )
+    now = monotonic()
+    pending = getattr(self, "_mpc_room_shares", None)
+    if (
+        pending is not None
+        and pending[0] == signature
+        and now - pending[2] < float(params.min_update_interval_s)
+        and entity_id in pending[1]
+    ):
+        CONTROLLER_EXECUTOR.abort_capture()
+        # The prefetch of this TRV joined the same solve: drop it
+        self.real_trvs[entity_id].pop(PREFETCH_SLOT, None)
+        return pending[1].pop(entity_id)
+
+    trv_inputs = [
+        MpcInput(
+            key=build_mpc_key(self, trv_id),
+            trv_temp_C=self.real_trvs[trv_id].get("current_temperature"),
+            entity_id=trv_id,
+            **room_inputs,
+        )
+        for trv_id in room_entities
+    ]
+    room_key = build_mpc_room_key(self)
+    outputs = _run_controller(
+        self,
+        entity_id,
+        room_key,
+        compute_mpc_room,
+        MpcInput(key=room_key, **room_inputs),
+        trv_inputs,
+        params,
+        heavy=True,
+        reuse_last=False,
+    )
+    if outputs is None:
+        return None
+    shares = dict(zip(room_entities, outputs))
+    output = shares.pop(entity_id)
+    self._mpc_room_shares = (signature, shares, now)
+    return output
+
+
 def _compute_tpi_balance(self, entity_id: str):
     """Run the TPI balance algorithm for calibration purposes."""
 
@@ -264,22 +459,38 @@ def _compute_tpi_balance(self, entity_id: str):
         trv_state["calibration_balance"] = None
         return None, False
 
-    # Use default TPI params
-    params = TpiParams()
+    # Cycle timing from the TRV's options, with the coefficients learned for
+    # this room, if any
+    advanced = trv_state.get("advanced") or {}
+    defaults = TpiParams()
+    params = tpi_params_for(
+        tpi_uid(self),
+        TpiParams(
+            cycle_s=float(
+                _option_int(advanced, CONF_TPI_CYCLE, int(defaults.cycle_s), 60, 3600)
+            ),
+            min_switch_s=float(
+                _option_int(
+                    advanced, CONF_TPI_MIN_SWITCH, int(defaults.min_switch_s), 0, 600
+                )
+            ),
+        ),
+    )
 
     try:
-        tpi_output = compute_tpi(
-            TpiInput(
-                key=build_tpi_key(self, entity_id),
-                current_temp_C=self.cur_temp,
-                target_temp_C=self.bt_target_temp,
-                outdoor_temp_C=_get_current_outdoor_temp(self),
-                window_open=self.window_open or False,
-                heating_allowed=True,
-                bt_name=self.device_name,
-                entity_id=entity_id,
-            ),
-            params,
+        tpi_input = TpiInput(
+            key=build_tpi_key(self, entity_id),
+            current_temp_C=self.cur_temp,
+            target_temp_C=self.bt_target_temp,
+            outdoor_temp_C=_get_current_outdoor_temp(self),
+            window_open=self.window_open or False,
+            heating_allowed=True,
+            bt_name=self.device_name,
+            entity_id=entity_id,
+            debug_level=getattr(self, "calibration_debug_level", "summary"),
+        )
+        tpi_output = _run_controller(
+            self, entity_id, tpi_input.key, compute_tpi, tpi_input, params
         )
     except (ValueError, TypeError, ZeroDivisionError) as err:
         _LOGGER.debug(
@@ -299,6 +510,8 @@ def _compute_tpi_balance(self, entity_id: str):
     trv_state["calibration_balance"] = {
         "valve_percent": tpi_output.duty_cycle_pct,
         "apply_valve": supports_valve,
+        "cycle_s": params.cycle_s,
+        "min_switch_s": params.min_switch_s,
         "debug": getattr(tpi_output, "debug", None),
     }
 
@@ -309,32 +522,17 @@ def _compute_tpi_balance(self, entity_id: str):
     return tpi_output, supports_valve
 
 
-def _compute_pid_balance(self, entity_id: str):
-    """Run the PID balance algorithm for calibration purposes."""
-
-    trv_state = self.real_trvs.get(entity_id)
-    if trv_state is None:
-        return None, False
+def pid_params_for(self, entity_id: str) -> PIDParams:
+    """Return the PID params of a TRV from its learned state and advanced options."""
 
-    if self.bt_target_temp is None or self.cur_temp is None:
-        trv_state["calibration_balance"] = None
-        return None, False
-
-    if self.window_open is True:
-        trv_state["calibration_balance"] = None
-        return None, False
-
-    hvac_mode = self.bt_hvac_mode
-    if hvac_mode == HVACMode.OFF:
-        trv_state["calibration_balance"] = None
-        return None, False
-
-    # Build PID params from config and learned values
-    key = build_pid_key(self, entity_id)
-    pid_state = get_pid_state(key)
+    pid_state = get_pid_state(build_pid_key(self, entity_id))
+    advanced = (self.real_trvs.get(entity_id) or {}).get("advanced") or {}
+    schedule_var = str(advanced.get(CONF_PID_GAIN_SCHEDULE, PidGainSchedule.TARGET))
+    if schedule_var not in tuple(PidGainSchedule):
+        schedule_var = PidGainSchedule.TARGET
 
     # Use learned gains if available, otherwise from config, otherwise defaults
-    params = PIDParams(
+    return PIDParams(
         kp=(
             pid_state.pid_kp
             if pid_state and pid_state.pid_kp is not None
@@ -355,8 +553,33 @@ def _compute_pid_balance(self, entity_id: str):
             if pid_state and pid_state.auto_tune is not None
             else DEFAULT_PID_AUTO_TUNE
         ),
+        gain_schedule_var=str(schedule_var),
     )
 
+
+def _compute_pid_balance(self, entity_id: str):
+    """Run the PID balance algorithm for calibration purposes."""
+
+    trv_state = self.real_trvs.get(entity_id)
+    if trv_state is None:
+        return None, False
+
+    if self.bt_target_temp is None or self.cur_temp is None:
+        trv_state["calibration_balance"] = None
+        return None, False
+
+    if self.window_open is True:
+        trv_state["calibration_balance"] = None
+        return None, False
+
+    hvac_mode = self.bt_hvac_mode
+    if hvac_mode == HVACMode.OFF:
+        trv_state["calibration_balance"] = None
+        return None, False
+
+    key = build_pid_key(self, entity_id)
+    params = pid_params_for(self, entity_id)
+
     _LOGGER.debug(
         "better_thermostat %s: Running PID calibration for %s",
         self.device_name,
@@ -364,7 +587,11 @@ def _compute_pid_balance(self, entity_id: str):
     )
 
     try:
-        percent, debug = compute_pid(
+        pid_result = _run_controller(
+            self,
+            entity_id,
+            key,
+            compute_pid,
             params,
             self.bt_target_temp,
             self.cur_temp,
@@ -372,7 +599,10 @@ def _compute_pid_balance(self, entity_id: str):
             self.temp_slope,
             key,
             inp_current_temp_ema_C=self.cur_temp_filtered,
+            debug_level=getattr(self, "calibration_debug_level", "summary"),
+            inp_outdoor_temp_C=_get_current_outdoor_temp(self),
         )
+        percent, debug = pid_result if pid_result is not None else (None, None)
         # Schedule saving of updated PID states
         self.schedule_save_pid_state()
     except (ValueError, TypeError, ZeroDivisionError) as err:
@@ -408,6 +638,59 @@ def _compute_pid_balance(self, entity_id: str):
     return percent, supports_valve
 
 
+_BALANCE_BY_MODE = {
+    CalibrationMode.MPC_CALIBRATION: _compute_mpc_balance,
+    CalibrationMode.TPI_CALIBRATION: _compute_tpi_balance,
+    CalibrationMode.PID_CALIBRATION: _compute_pid_balance,
+}
+
+
+async def async_prefetch_calibration(self, entity_id: str) -> None:
+    """Solve the TRV's controller ahead of ``convert_outbound_states``.
+
+    The balance path is captured up to its controller call, which then runs
+    inline or in a worker thread (see utils/calibration/executor.py). The
+    result is parked on the TRV and picked up by the synchronous calibration
+    that follows, so heavy solves never run on the event loop.
+    """
+
+    trv_state = self.real_trvs.get(entity_id)
+    if trv_state is None:
+        return
+    advanced = trv_state.get("advanced") or {}
+    if advanced.get("calibration") not in (
+        CalibrationType.LOCAL_BASED,
+        CalibrationType.TARGET_TEMP_BASED,
+        CalibrationType.DIRECT_VALVE_BASED,
+    ):
+        return
+    mode = normalize_calibration_mode(
+        advanced.get("calibration_mode", CalibrationMode.MPC_CALIBRATION)
+    )
+    compute_balance = _BALANCE_BY_MODE.get(
+        mode if mode is not None else CalibrationMode.MPC_CALIBRATION
+    )
+    if compute_balance is None:
+        return
+
+    request = CONTROLLER_EXECUTOR.capture(compute_balance, self, entity_id)
+    if request is None:
+        return
+    try:
+        result = await CONTROLLER_EXECUTOR.async_run(self.hass, request)
+    except (ValueError, TypeError, ZeroDivisionError) as err:
+        # The synchronous path recomputes and reports the failure.
+        _LOGGER.debug(
+            "better_thermostat %s: controller prefetch failed for %s: %s",
+            self.device_name,
+            entity_id,
+            err,
+        )
+        return
+    if entity_id in self.real_trvs:
+        self.real_trvs[entity_id][PREFETCH_SLOT] = result
+
+
 def calculate_calibration_local(self, entity_id) -> float | None:
     """Calculate local delta to adjust the setpoint of the TRV based on the air temperature of the external sensor.
 
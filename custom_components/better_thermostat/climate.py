@@ -4,6 +4,7 @@ from abc import ABC
 import asyncio
 from collections import deque
 from datetime import datetime, timedelta
+from functools import partial
 import json
 import logging
 from random import randint
@@ -33,6 +34,7 @@ from homeassistant.components.climate.const import (
     HVACMode,
 )
 from homeassistant.components.group.util import reduce_attribute
+from homeassistant.components.recorder import history
 from homeassistant.const import (
     ATTR_TEMPERATURE,
     CONF_NAME,
@@ -47,6 +49,7 @@ from homeassistant.helpers.event import (
     async_track_time_change,
     async_track_time_interval,
 )
+from homeassistant.helpers.recorder import get_instance
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.helpers.storage import Store
 
@@ -64,21 +67,52 @@ from .adapters.delegate import (
     set_hvac_mode as adapter_set_hvac_mode,
     set_temperature as adapter_set_temperature,
 )
+from .calibration import mpc_params_for, pid_params_for
 from .events.cooler import trigger_cooler_change
 from .events.temperature import trigger_temperature_change
 from .events.trv import trigger_trv_change
 from .events.window import trigger_window_change, window_queue
 from .model_fixes.model_quirks import inital_tweak, load_model_quirks
+from .utils.ack_tracker import AckTracker
+from .utils.calibration.executor import CONTROLLER_EXECUTOR
 from .utils.calibration.mpc import export_mpc_state_map, import_mpc_state_map
 from .utils.calibration.pid import (
+    PIDParams,
+    build_pid_key,
     export_pid_states as pid_export_states,
+    get_pid_state,
     import_pid_states as pid_import_states,
-    reset_pid_state as pid_reset_state,
+    reset_pid_states as pid_reset_states,
+    seed_pid_gains_for_trv,
 )
-from .utils.calibration.tpi import export_tpi_state_map, import_tpi_state_map
+from .utils.calibration.pid_tuning import (
+    SERIES_OUTDOOR,
+    SERIES_TARGET,
+    SERIES_TEMP,
+    SERIES_VALVE,
+    PidTuningParams,
+    ReplayTrace,
+    fit_plant,
+    mean_series,
+    resample_history,
+    tune_pid_gains,
+    tuning_summary,
+)
+from .utils.calibration.tpi import (
+    export_tpi_state_map,
+    import_tpi_state_map,
+    set_tpi_coefficients,
+    tpi_params_for,
+    tpi_uid,
+)
+from .utils.calibration.tpi_learning import learn_tpi_coefficients
 from .utils.const import (
+    ATTR_STATE_ACK_LATENCY,
     ATTR_STATE_BATTERIES,
+    ATTR_STATE_CALIBRATION_DEBUG_LEVEL,
     ATTR_STATE_CALL_FOR_HEAT,
+    ATTR_STATE_CONTROL_LANES,
+    ATTR_STATE_CONTROL_QUEUE,
     ATTR_STATE_ERRORS,
     ATTR_STATE_HEAT_LOSS,
     ATTR_STATE_HEAT_LOSS_STATS,
@@ -87,11 +121,14 @@ from .utils.const import (
     ATTR_STATE_LAST_CHANGE,
     ATTR_STATE_MAIN_MODE,
     ATTR_STATE_OFF_TEMPERATURE,
+    ATTR_STATE_PID_TUNING,
     ATTR_STATE_PRESET_TEMPERATURE,
     ATTR_STATE_SAVED_TEMPERATURE,
     ATTR_STATE_WINDOW_OPEN,
     BETTERTHERMOSTAT_RESET_PID_SCHEMA,
+    BETTERTHERMOSTAT_SET_DEBUG_LEVEL_SCHEMA,
     BETTERTHERMOSTAT_SET_TEMPERATURE_SCHEMA,
+    BETTERTHERMOSTAT_TUNE_PID_SCHEMA,
     CONF_COOLER,
     CONF_HEATER,
     CONF_HUMIDITY,
@@ -114,13 +151,18 @@ from .utils.const import (
     SERVICE_RESET_HEATING_POWER,
     SERVICE_RESET_PID_LEARNINGS,
     SERVICE_RESTORE_SAVED_TARGET_TEMPERATURE,
+    SERVICE_SET_CALIBRATION_DEBUG_LEVEL,
     SERVICE_SET_TEMP_TARGET_TEMPERATURE,
+    SERVICE_TUNE_PID_FROM_HISTORY,
     SUPPORT_FLAGS,
     VERSION,
+    CalibrationDebugLevel,
     CalibrationMode,
     CalibrationType,
 )
-from .utils.controlling import control_queue, control_trv
+from .utils.control_lanes import ControlLanes
+from .utils.control_mailbox import REASON_PERIODIC, REASON_SETPOINT, ControlMailbox
+from .utils.controlling import ControlGate, GateFlag, control_queue, control_trv
 from .utils.helpers import (
     convert_to_float,
     find_battery_entity,
@@ -128,12 +170,17 @@ from .utils.helpers import (
     get_hvac_bt_mode,
     normalize_hvac_mode,
 )
+from .utils.tpi_actuation import TPI_CYCLES
 from .utils.watcher import (
     check_and_update_degraded_mode,
     check_critical_entities,
     is_entity_available,
 )
-from .utils.weather import check_ambient_air_temperature, check_weather
+from .utils.weather import (
+    async_update_forecast_trajectory,
+    check_ambient_air_temperature,
+    check_weather,
+)
 
 _LOGGER = logging.getLogger(__name__)
 DOMAIN = "better_thermostat"
@@ -207,6 +254,16 @@ async def async_setup_entry(hass, entry, async_add_entities):
         BETTERTHERMOSTAT_RESET_PID_SCHEMA,
         "reset_pid_learnings_service",
     )
+    platform.async_register_entity_service(
+        SERVICE_SET_CALIBRATION_DEBUG_LEVEL,
+        BETTERTHERMOSTAT_SET_DEBUG_LEVEL_SCHEMA,
+        "set_calibration_debug_level_service",
+    )
+    platform.async_register_entity_service(
+        SERVICE_TUNE_PID_FROM_HISTORY,
+        BETTERTHERMOSTAT_TUNE_PID_SCHEMA,
+        "tune_pid_from_history_service",
+    )
 
     bt_entity = BetterThermostat(
         entry.data.get(CONF_NAME),
@@ -244,6 +301,11 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
     _attr_name = None
     _enable_turn_on_off_backwards_compatibility = False
 
+    # Flags that hold back the control queue; writes re-evaluate control_gate
+    ignore_states = GateFlag()
+    startup_running = GateFlag()
+    in_maintenance = GateFlag()
+
     async def set_temp_temperature(self, temperature):
         """Set temporary target temperature."""
         self.bt_update_lock = True
@@ -257,7 +319,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
                 if getattr(self, "in_maintenance", False):
                     self._control_needed_after_maintenance = True
                     return
-                await self.control_queue_task.put(self)
+                self.control_queue_task.submit(REASON_SETPOINT)
             else:
                 self.bt_target_temp = convert_to_float(
                     temperature, self.device_name, "service.set_temp_temperature()"
@@ -266,7 +328,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
                 if getattr(self, "in_maintenance", False):
                     self._control_needed_after_maintenance = True
                     return
-                await self.control_queue_task.put(self)
+                self.control_queue_task.submit(REASON_SETPOINT)
         finally:
             self.bt_update_lock = False
 
@@ -285,7 +347,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
                 if getattr(self, "in_maintenance", False):
                     self._control_needed_after_maintenance = True
                     return
-                await self.control_queue_task.put(self)
+                self.control_queue_task.submit(REASON_SETPOINT)
         finally:
             self.bt_update_lock = False
 
@@ -296,6 +358,11 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
         self.heating_power = 0.01
         self.async_write_ha_state()
 
+    async def set_calibration_debug_level_service(self, level: str) -> None:
+        """Entity service: select how much controller debug data is kept."""
+        self.calibration_debug_level = CalibrationDebugLevel(level)
+        self.async_write_ha_state()
+
     @property
     def device_info(self):
         """Return device info."""
@@ -487,7 +554,13 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
         # Degraded mode: thermostat continues operating with some sensors unavailable
         self.degraded_mode = False
         self.unavailable_sensors = []
-        self.control_queue_task = asyncio.Queue(maxsize=1)
+        self.control_queue_task = ControlMailbox()
+        self.control_lanes = ControlLanes(
+            partial(control_trv, self), self.control_queue_task.complete
+        )
+        self.control_gate = ControlGate()
+        self.control_gate.update(self)
+        self.ack_tracker = AckTracker()
         if self.window_id is not None:
             self.window_queue_task = asyncio.Queue(maxsize=1)
         self._control_task = asyncio.create_task(control_queue(self))
@@ -497,6 +570,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
         self.heating_power = 0.01
         # Short bounded history of recent heating power evaluations
         self.last_heating_power_stats = deque(maxlen=10)
+        self.heating_cycles = deque(maxlen=50)
         self.is_removed = False
         # Valve maintenance control
         self.in_maintenance = False
@@ -513,6 +587,10 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
         self.external_temp_ema = None
         self._external_temp_ema_ts = None
         self.cur_temp_filtered = None
+        # Controller debug payload: off / summary (sensor fields) / full
+        self.calibration_debug_level = CalibrationDebugLevel.SUMMARY
+        # Offline PID tuning job status (progress/result), None until first run
+        self.pid_tuning = None
         # Persistence for balance (hydraulic) states
         self._pid_store = None
         self._pid_save_scheduled = False
@@ -522,6 +600,9 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
         # TPI adaptive state persistence
         self._tpi_store = None
         self._tpi_save_scheduled = False
+        # TPI coefficient refit running off the loop, and the last cycles fitted
+        self._tpi_learn_task = None
+        self._tpi_learned_cycles = None
         # Thermal stats persistence (heating_power / heat_loss)
         self._thermal_store = None
         self._thermal_save_scheduled = False
@@ -737,12 +818,15 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
             return
         await check_and_update_degraded_mode(self)
         await check_weather(self)
+        if self.weather_entity is not None:
+            # Feeds the MPC horizon; one fetch per weather entity and TTL.
+            await async_update_forecast_trajectory(self.hass, self.weather_entity)
         if self._last_call_for_heat != self.call_for_heat:
             self._last_call_for_heat = self.call_for_heat
             await self.async_update_ha_state(force_refresh=True)
             self.async_write_ha_state()
             if event is not None:
-                await self.control_queue_task.put(self)
+                self.control_queue_task.submit(REASON_PERIODIC)
 
     async def _trigger_time(self, event=None):
         _check = await check_critical_entities(self)
@@ -761,7 +845,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
         await check_ambient_air_temperature(self)
         self.async_write_ha_state()
         if event is not None:
-            await self.control_queue_task.put(self)
+            self.control_queue_task.submit(REASON_PERIODIC)
 
     async def _trigger_temperature_change(self, event):
         _check = await check_critical_entities(self)
@@ -1368,6 +1452,15 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
                     self.last_main_hvac_mode = old_state.attributes.get(
                         ATTR_STATE_MAIN_MODE
                     )
+                try:
+                    self.calibration_debug_level = CalibrationDebugLevel(
+                        old_state.attributes.get(
+                            ATTR_STATE_CALIBRATION_DEBUG_LEVEL,
+                            CalibrationDebugLevel.SUMMARY,
+                        )
+                    )
+                except ValueError:
+                    self.calibration_debug_level = CalibrationDebugLevel.SUMMARY
                 if old_state.attributes.get(ATTR_STATE_HEATING_POWER, None) is not None:
                     loaded_power = float(
                         old_state.attributes.get(ATTR_STATE_HEATING_POWER)
@@ -2170,11 +2263,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
             # Trigger one control cycle after maintenance so BT immediately resumes
             # with the latest window/temp/target states.
             if self.bt_hvac_mode != HVACMode.OFF:
-                try:
-                    self.control_queue_task.put_nowait(self)
-                except Exception:
-                    # Queue full or not ready; periodic tick will eventually catch up.
-                    pass
+                self.control_queue_task.submit(REASON_PERIODIC)
 
     async def _load_pid_state(self) -> None:
         """Load persisted PID states and hydrate module-level cache."""
@@ -2185,7 +2274,15 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
             return
         prefix = f"{self._unique_id}:"
         try:
-            imported = pid_import_states(data, prefix_filter=prefix)
+            policies = {
+                trv: pid_params_for(self, trv).bucket_eviction for trv in self.real_trvs
+            }
+            imported = await CONTROLLER_EXECUTOR.async_locked(
+                self.hass,
+                prefix,
+                partial(pid_import_states, prefix_filter=prefix, policies=policies),
+                data,
+            )
             _LOGGER.debug(
                 "better_thermostat %s: loaded %s PID state(s) with prefix %s",
                 self.device_name,
@@ -2205,7 +2302,9 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
             return
         try:
             prefix = f"{self._unique_id}:"
-            current = pid_export_states(prefix=prefix)
+            current = await CONTROLLER_EXECUTOR.async_locked(
+                self.hass, prefix, pid_export_states, prefix
+            )
             # Merge with existing store to avoid overwriting other entities' data
             existing = await self._pid_store.async_load()
             if not isinstance(existing, dict):
@@ -2264,7 +2363,15 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
             if isinstance(payload, dict):
                 scoped[key] = payload
         if scoped:
-            import_mpc_state_map(scoped)
+            policies = {
+                trv: mpc_params_for(self, trv).bucket_eviction for trv in self.real_trvs
+            }
+            await CONTROLLER_EXECUTOR.async_locked(
+                self.hass,
+                prefix,
+                partial(import_mpc_state_map, policies=policies),
+                scoped,
+            )
 
     async def _save_mpc_states(self) -> None:
         """Persist MPC adaptive controller states for this entity."""
@@ -2279,7 +2386,9 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
             for key in list(existing.keys()):
                 if isinstance(key, str) and key.startswith(prefix):
                     del existing[key]
-            exported = export_mpc_state_map(prefix)
+            exported = await CONTROLLER_EXECUTOR.async_locked(
+                self.hass, prefix, export_mpc_state_map, prefix
+            )
             if exported:
                 existing.update(exported)
             await self._mpc_store.async_save(existing)
@@ -2322,7 +2431,15 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
             if isinstance(payload, dict):
                 scoped[key] = payload
         if scoped:
-            import_tpi_state_map(scoped)
+            policy = tpi_params_for(tpi_uid(self)).bucket_eviction
+            await CONTROLLER_EXECUTOR.async_locked(
+                self.hass,
+                prefix,
+                partial(
+                    import_tpi_state_map, policies=dict.fromkeys(self.real_trvs, policy)
+                ),
+                scoped,
+            )
 
     async def _save_tpi_states(self) -> None:
         """Persist TPI adaptive controller states for this entity."""
@@ -2337,7 +2454,9 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
             for key in list(existing.keys()):
                 if isinstance(key, str) and key.startswith(prefix):
                     del existing[key]
-            exported = export_tpi_state_map(prefix)
+            exported = await CONTROLLER_EXECUTOR.async_locked(
+                self.hass, prefix, export_tpi_state_map, prefix
+            )
             if exported:
                 existing.update(exported)
             await self._tpi_store.async_save(existing)
@@ -2348,6 +2467,79 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
                 e,
             )
 
+    def _learn_tpi_coefficients(self) -> None:
+        """Start a refit of the TPI coefficients once new cycles were recorded.
+
+        The grid and compass search takes tens of milliseconds, so it runs in
+        an executor job. A fit already in flight picks up newer cycles when
+        it ends.
+        """
+
+        uses_tpi = any(
+            getattr(
+                trv.get("advanced", {}).get("calibration_mode"),
+                "value",
+                trv.get("advanced", {}).get("calibration_mode"),
+            )
+            == CalibrationMode.TPI_CALIBRATION.value
+            for trv in self.real_trvs.values()
+        )
+        if not uses_tpi:
+            return
+        if self._tpi_learn_task is not None and not self._tpi_learn_task.done():
+            return
+        if self._tpi_cycles_seen() == self._tpi_learned_cycles:
+            return
+        self._tpi_learn_task = self.hass.async_create_task(
+            self._async_learn_tpi_coefficients()
+        )
+
+    def _tpi_cycles_seen(self) -> tuple:
+        """Return the latest heating and loss cycle (the cycle deques are bounded)."""
+
+        return (
+            self.heating_cycles[-1] if self.heating_cycles else None,
+            self.loss_cycles[-1] if self.loss_cycles else None,
+        )
+
+    async def _async_learn_tpi_coefficients(self) -> None:
+        """Refit the TPI coefficients of this room from its recorded cycles."""
+
+        uid = tpi_uid(self)
+        while (seen := self._tpi_cycles_seen()) != self._tpi_learned_cycles:
+            self._tpi_learned_cycles = seen
+            try:
+                result = await self.hass.async_add_executor_job(
+                    learn_tpi_coefficients,
+                    list(self.heating_cycles),
+                    list(self.loss_cycles),
+                    tpi_params_for(uid),
+                )
+            except (ValueError, TypeError, ZeroDivisionError) as err:
+                _LOGGER.debug(
+                    "better_thermostat %s: TPI coefficient learning failed: %s",
+                    self.device_name,
+                    err,
+                )
+                return
+            if result is None or not result.improved:
+                continue
+            _LOGGER.debug(
+                "better_thermostat %s: learned TPI coefficients %s",
+                self.device_name,
+                result.as_dict(),
+            )
+            await CONTROLLER_EXECUTOR.async_locked(
+                self.hass,
+                uid,
+                set_tpi_coefficients,
+                uid,
+                result.coef_int,
+                result.coef_ext,
+                result.as_dict(),
+            )
+            self._schedule_save_tpi_states()
+
     def _schedule_save_tpi_states(self, delay_s: float = 15.0) -> None:
         """Debounced scheduling for persisting TPI adaptive states."""
 
@@ -2641,6 +2833,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
                     _LOGGER.exception(
                         "Error appending heating cycle telemetry snapshot"
                     )
+                self._learn_tpi_coefficients()
 
                 _LOGGER.debug(
                     "better_thermostat %s: heating cycle evaluated: ΔT=%.3f°C, t=%.2fmin, rate=%.4f°C/min, hp(old/new)=%.4f/%.4f, alpha=%.3f, env_factor=%.3f, norm=%s",
@@ -2799,6 +2992,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
                             "better_thermostat %s: Error while storing heat loss cycle",
                             self.device_name,
                         )
+                    self._learn_tpi_coefficients()
 
                     self.async_write_ha_state()
                     if loss_changed:
@@ -2830,6 +3024,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
             ATTR_STATE_HUMIDIY: self._current_humidity,
             ATTR_STATE_MAIN_MODE: self.last_main_hvac_mode,
             ATTR_STATE_OFF_TEMPERATURE: self.off_temperature,
+            ATTR_STATE_CALIBRATION_DEBUG_LEVEL: self.calibration_debug_level,
             CONF_TOLERANCE: self.tolerance,
             CONF_TARGET_TEMP_STEP: self.bt_target_temp_step,
             ATTR_STATE_HEATING_POWER: self.heating_power,
@@ -2909,6 +3104,26 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
         except Exception:
             pass
 
+        # Control request coalescing and enqueue-to-actuation latency
+        if isinstance(self.control_queue_task, ControlMailbox):
+            dev_specific[ATTR_STATE_CONTROL_QUEUE] = json.dumps(
+                self.control_queue_task.metrics()
+            )
+        # Per-TRV lane latency (desired state set -> pushed to the device)
+        if isinstance(getattr(self, "control_lanes", None), ControlLanes):
+            lane_metrics = self.control_lanes.metrics()
+            if lane_metrics:
+                dev_specific[ATTR_STATE_CONTROL_LANES] = json.dumps(lane_metrics)
+        # Write -> TRV confirmation latency per device
+        if isinstance(getattr(self, "ack_tracker", None), AckTracker):
+            ack_metrics = self.ack_tracker.metrics()
+            if ack_metrics:
+                dev_specific[ATTR_STATE_ACK_LATENCY] = json.dumps(ack_metrics)
+
+        # Offline PID tuning job (progress while running, result afterwards)
+        if self.pid_tuning is not None:
+            dev_specific[ATTR_STATE_PID_TUNING] = json.dumps(self.pid_tuning)
+
         # PID/Regler-Debug als flache Attribute für Graphen (nur von repräsentativem TRV)
         try:
             rep_trv = None
@@ -3308,7 +3523,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
             self._control_needed_after_maintenance = True
             return
 
-        await self.control_queue_task.put(self)
+        self.control_queue_task.submit(REASON_SETPOINT)
 
     async def async_set_temperature(self, **kwargs) -> None:
         """Set new target temperature."""
@@ -3550,7 +3765,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
                 if getattr(self, "in_maintenance", False):
                     self._control_needed_after_maintenance = True
                     return
-                await self.control_queue_task.put(self)
+                self.control_queue_task.submit(REASON_SETPOINT)
 
     async def async_turn_off(self) -> None:
         """Turn the entity off."""
@@ -3763,7 +3978,7 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
                 hasattr(self, "control_queue_task")
                 and self.control_queue_task is not None
             ):
-                await self.control_queue_task.put(self)
+                self.control_queue_task.submit(REASON_SETPOINT)
         finally:
             self.bt_update_lock = False
 
@@ -3787,6 +4002,19 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
         """Return the available preset modes."""
         return [PRESET_NONE] + self._enabled_presets
 
+    def _seed_pid_gains(self, kp: float, ki: float, kd: float) -> int:
+        """Seed the gain schedule of every TRV; return how many were seeded."""
+        uid = self.unique_id or self._unique_id or "bt"
+        seeded = 0
+        for trv_id in self.real_trvs:
+            try:
+                seeded += seed_pid_gains_for_trv(
+                    uid, trv_id, kp, ki, kd, params=pid_params_for(self, trv_id)
+                )
+            except Exception:
+                pass
+        return seeded
+
     async def reset_pid_learnings_service(
         self,
         apply_pid_defaults: bool = False,
@@ -3801,15 +4029,9 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
         """
         try:
             prefix = f"{self._unique_id}:"
-            # Collect keys to reset from balance module
-            current = pid_export_states(prefix=prefix) or {}
-            count = 0
-            for key in list(current.keys()):
-                try:
-                    pid_reset_state(key)
-                    count += 1
-                except Exception:
-                    pass
+            count = await CONTROLLER_EXECUTOR.async_locked(
+                self.hass, prefix, pid_reset_states, prefix
+            )
             _LOGGER.info(
                 "better_thermostat %s: reset %d PID learning state entries (prefix=%s)",
                 self.device_name,
@@ -3822,75 +4044,38 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
             except Exception:
                 pass
 
-            # Optionally seed PID defaults for the CURRENT target bucket(s)
+            # Optionally seed PID defaults into the TRVs' gain schedules
             if apply_pid_defaults:
                 try:
-                    from .utils.calibration.pid import PIDParams, seed_pid_gains
-
                     # Use provided overrides or PIDParams defaults
                     _defs = PIDParams()
                     kp = float(defaults_kp) if defaults_kp is not None else _defs.kp
                     ki = float(defaults_ki) if defaults_ki is not None else _defs.ki
                     kd = float(defaults_kd) if defaults_kd is not None else _defs.kd
 
-                    # Build current bucket tag based on current heat target
-                    def _bucket(temp):
-                        try:
-                            return f"t{round(float(temp) * 2.0) / 2.0:.1f}"
-                        except Exception:
-                            return None
-
-                    # Build list of candidate buckets: current and ±0.5°C neighbors
-                    bucket_tag = _bucket(self.bt_target_temp)
-                    buckets: list[str] = []
-                    try:
-                        if isinstance(self.bt_target_temp, (int, float)):
-                            base = round(float(self.bt_target_temp) * 2.0) / 2.0
-                            buckets = [
-                                f"t{base:.1f}",
-                                f"t{base + 0.5:.1f}",
-                                f"t{base - 0.5:.1f}",
-                            ]
-                        elif bucket_tag:
-                            buckets = [bucket_tag]
-                    except Exception:
-                        if bucket_tag:
-                            buckets = [bucket_tag]
-                    uid = self.unique_id or self._unique_id or "bt"
-                    seeded = 0
-                    for trv_id in self.real_trvs.keys():
-                        for b in buckets or []:
-                            key = f"{uid}:{trv_id}:{b}"
-                            try:
-                                if seed_pid_gains(key, kp=kp, ki=ki, kd=kd):
-                                    seeded += 1
-                            except Exception:
-                                pass
+                    # One gain schedule per TRV: seed it uniformly
+                    seeded = await CONTROLLER_EXECUTOR.async_locked(
+                        self.hass, prefix, self._seed_pid_gains, kp, ki, kd
+                    )
                     if seeded > 0:
                         _LOGGER.info(
-                            "better_thermostat %s: applied PID defaults (kp=%.3f ki=%.3f kd=%.3f) to %d bucket state(s) across %d TRV(s)",
+                            "better_thermostat %s: applied PID defaults (kp=%.3f ki=%.3f kd=%.3f) to %d TRV(s)",
                             self.device_name,
                             kp,
                             ki,
                             kd,
                             seeded,
-                            len(list(self.real_trvs.keys()) or []),
                         )
                         try:
                             self.schedule_save_pid_state()
                         except Exception:
                             pass
                         # Kick the control loop so the new gains are used promptly
-                        try:
-                            await self.control_queue_task.put(self)
-                        except Exception:
-                            pass
+                        self.control_queue_task.submit(REASON_SETPOINT)
                     else:
                         _LOGGER.debug(
-                            "better_thermostat %s: apply_pid_defaults did not seed any bucket (bt_target_temp=%s, buckets=%s)",
+                            "better_thermostat %s: apply_pid_defaults did not seed any TRV",
                             self.device_name,
-                            self.bt_target_temp,
-                            buckets,
                         )
                 except Exception as e:
                     _LOGGER.debug(
@@ -3905,6 +4090,198 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
                 e,
             )
 
+    @callback
+    def _set_pid_tuning(self, status: dict[str, Any]) -> None:
+        """Publish the offline PID tuning status as a state attribute."""
+        self.pid_tuning = status
+        self.async_write_ha_state()
+
+    async def _async_load_pid_replay_trace(
+        self, hours: int, step_s: float
+    ) -> ReplayTrace | None:
+        """Read room temperature, valve, target and outdoor history for tuning.
+
+        The valve series is the mean over all TRVs: the position entity if
+        one is known, otherwise 100 % while the TRV reports hvac_action
+        "heating" and 0 % otherwise.
+        """
+        end = dt_util.utcnow()
+        start = end - timedelta(hours=hours)
+        valve_sources = {
+            trv_id: info.get("valve_position_entity") or trv_id
+            for trv_id, info in self.real_trvs.items()
+        }
+        entity_ids = [self.sensor_entity_id, self.entity_id]
+        if self.outdoor_sensor is not None:
+            entity_ids.append(self.outdoor_sensor)
+        entity_ids.extend(valve_sources.values())
+        entity_ids = list(dict.fromkeys(e for e in entity_ids if e))
+
+        states = await get_instance(self.hass).async_add_executor_job(
+            partial(
+                history.get_significant_states,
+                self.hass,
+                start,
+                end,
+                entity_ids,
+                significant_changes_only=False,
+            )
+        )
+
+        def _points(entity_id, read):
+            points = []
+            for item in states.get(entity_id) or []:
+                try:
+                    value = read(item)
+                except (TypeError, ValueError):
+                    continue
+                if value is not None:
+                    points.append((item.last_updated.timestamp(), value))
+            return points
+
+        def _read_state(item):
+            if item.state in ("unknown", "unavailable", None):
+                return None
+            return float(item.state)
+
+        def _read_target(item):
+            target = item.attributes.get(ATTR_TEMPERATURE)
+            return float(target) if target is not None else None
+
+        def _read_heating(item):
+            action = item.attributes.get("hvac_action")
+            if action is None:
+                return None
+            return 100.0 if action == HVACAction.HEATING else 0.0
+
+        valves = []
+        for trv_id, source in valve_sources.items():
+            if source != trv_id:
+                points = _points(source, _read_state)
+                # Position entities report either 0..1 or 0..100
+                if points and max(v for _, v in points) <= 1.0:
+                    points = [(ts, v * 100.0) for ts, v in points]
+            else:
+                points = _points(trv_id, _read_heating)
+            if points:
+                valves.append(points)
+
+        series = {
+            SERIES_TEMP: _points(self.sensor_entity_id, _read_state),
+            SERIES_TARGET: _points(self.entity_id, _read_target),
+            SERIES_VALVE: mean_series(valves),
+        }
+        if self.outdoor_sensor is not None:
+            series[SERIES_OUTDOOR] = _points(self.outdoor_sensor, _read_state)
+        return resample_history(series, start.timestamp(), end.timestamp(), step_s)
+
+    async def tune_pid_from_history_service(
+        self, hours: int = 72, max_workers: int = 1, apply_gains: bool = True
+    ) -> None:
+        """Entity service: tune PID gains offline from recorded history.
+
+        - Fits a room model to the recorded history and replays the recorded
+          targets through it to search kp/ki/kd in an executor thread (or
+          in worker processes if max_workers > 1)
+        - Reports progress and the result in the pid_tuning attribute
+        - Optionally replaces the gain schedule of every TRV by the tuned gains
+        """
+        if (self.pid_tuning or {}).get("status") == "running":
+            _LOGGER.info(
+                "better_thermostat %s: PID tuning already running", self.device_name
+            )
+            return
+        self._set_pid_tuning({"status": "running", "progress": 0})
+        try:
+            tuning = PidTuningParams(max_workers=max_workers)
+            trace = await self._async_load_pid_replay_trace(hours, tuning.step_s)
+            plant = None
+            if trace is not None:
+                plant = await self.hass.async_add_executor_job(fit_plant, trace, tuning)
+            if plant is None:
+                _LOGGER.info(
+                    "better_thermostat %s: PID tuning skipped, %dh of history are not enough to fit a room model",
+                    self.device_name,
+                    hours,
+                )
+                self._set_pid_tuning(
+                    {"status": "failed", "reason": "insufficient_history"}
+                )
+                return
+
+            initial = None
+            first_trv = next(iter(self.real_trvs), None)
+            pid_params = pid_params_for(self, first_trv) if first_trv else PIDParams()
+            learned = (
+                get_pid_state(build_pid_key(self, first_trv)) if first_trv else None
+            )
+            if learned is not None and None not in (
+                learned.pid_kp,
+                learned.pid_ki,
+                learned.pid_kd,
+            ):
+                initial = (learned.pid_kp, learned.pid_ki, learned.pid_kd)
+
+            loop = self.hass.loop
+
+            def _progress(fraction: float, best_cost: float) -> None:
+                loop.call_soon_threadsafe(
+                    self._set_pid_tuning,
+                    {
+                        "status": "running",
+                        "progress": int(fraction * 100),
+                        "best_cost": round(best_cost, 4),
+                    },
+                )
+
+            result = await self.hass.async_add_executor_job(
+                tune_pid_gains, trace, plant, pid_params, tuning, initial, _progress
+            )
+
+            seeded = 0
+            if apply_gains:
+                seeded = await CONTROLLER_EXECUTOR.async_locked(
+                    self.hass,
+                    f"{self._unique_id}:",
+                    self._seed_pid_gains,
+                    result.kp,
+                    result.ki,
+                    result.kd,
+                )
+            status = tuning_summary(result)
+            status.update(
+                status="done",
+                progress=100,
+                hours=hours,
+                applied=seeded > 0,
+                finished=dt_util.utcnow().isoformat(),
+            )
+            self._set_pid_tuning(status)
+            _LOGGER.info(
+                "better_thermostat %s: PID tuning finished (kp=%.3f ki=%.5f kd=%.1f, cost %.4f vs %.4f), seeded %d TRV(s)",
+                self.device_name,
+                result.kp,
+                result.ki,
+                result.kd,
+                result.cost,
+                result.baseline_cost,
+                seeded,
+            )
+            if seeded > 0:
+                try:
+                    self.schedule_save_pid_state()
+                except Exception:
+                    pass
+                self.control_queue_task.submit(REASON_SETPOINT)
+        except asyncio.CancelledError:
+            self._set_pid_tuning({"status": "cancelled"})
+            raise
+        except Exception as e:
+            _LOGGER.warning(
+                "better_thermostat %s: PID tuning failed: %s", self.device_name, e
+            )
+            self._set_pid_tuning({"status": "failed", "reason": str(e)})
+
     async def _async_update_ema_periodic(self, now=None):
         """Periodically update the EMA filter to ensure it converges even if sensor is silent."""
         # Skip if startup is still running to avoid race conditions or confusing logs
@@ -3978,6 +4355,12 @@ class BetterThermostat(ClimateEntity, RestoreEntity, ABC):
 
     async def async_will_remove_from_hass(self):
         """Run when entity will be removed from hass."""
+        TPI_CYCLES.stop_prefix(f"{self.unique_id}:", switch_off=False)
+        self.control_queue_task.close()
+        self.control_lanes.close()
+        self.ack_tracker.close()
+        if self._tpi_learn_task is not None:
+            self._tpi_learn_task.cancel()
         if self._control_task:
             self._control_task.cancel()
             try:
@@ -34,21 +34,37 @@ from .utils.const import (
     CONF_HOMEMATICIP,
     CONF_HUMIDITY,
     CONF_MODEL,
+    CONF_MPC_ESTIMATOR,
+    CONF_MPC_EXACT_DISCRETIZATION,
+    CONF_MPC_HORIZON_STEPS,
+    CONF_MPC_MOVE_BLOCKS,
+    CONF_MPC_ROOM_SOLVE,
+    CONF_MPC_SOLVER,
+    CONF_MPC_WARM_START,
+    CONF_MPC_WARM_START_MAX_RADIUS,
+    CONF_MPC_WARM_START_RADIUS,
     CONF_NO_SYSTEM_MODE_OFF,
     CONF_OFF_TEMPERATURE,
     CONF_OUTDOOR_SENSOR,
+    CONF_PID_GAIN_SCHEDULE,
     CONF_PRESETS,
     CONF_PROTECT_OVERHEATING,
     CONF_SENSOR,
     CONF_SENSOR_WINDOW,
     CONF_TARGET_TEMP_STEP,
     CONF_TOLERANCE,
+    CONF_TPI_CYCLE,
+    CONF_TPI_MIN_SWITCH,
+    CONF_TPI_TIME_PROPORTIONAL,
     CONF_VALVE_MAINTENANCE,
     CONF_WEATHER,
     CONF_WINDOW_TIMEOUT,
     CONF_WINDOW_TIMEOUT_AFTER,
     CalibrationMode,
     CalibrationType,
+    MpcEstimator,
+    MpcSolver,
+    PidGainSchedule,
 )
 from .utils.helpers import get_device_model, get_trv_intigration
 
@@ -100,6 +116,45 @@ CALIBRATION_MODE_SELECTOR = selector.SelectSelector(
     )
 )
 
+MPC_SOLVER_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=[
+            selector.SelectOptionDict(value=MpcSolver.GRID, label="Grid search"),
+            selector.SelectOptionDict(
+                value=MpcSolver.ANALYTIC, label="Analytic (exact minimum)"
+            ),
+        ],
+        mode=selector.SelectSelectorMode.DROPDOWN,
+    )
+)
+
+MPC_ESTIMATOR_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=[
+            selector.SelectOptionDict(value=MpcEstimator.EMA, label="Moving average"),
+            selector.SelectOptionDict(
+                value=MpcEstimator.RLS, label="Recursive least squares"
+            ),
+        ],
+        mode=selector.SelectSelectorMode.DROPDOWN,
+    )
+)
+
+PID_GAIN_SCHEDULE_SELECTOR = selector.SelectSelector(
+    selector.SelectSelectorConfig(
+        options=[
+            selector.SelectOptionDict(
+                value=PidGainSchedule.TARGET, label="Target temperature"
+            ),
+            selector.SelectOptionDict(
+                value=PidGainSchedule.OUTDOOR_DELTA,
+                label="Target minus outdoor temperature",
+            ),
+        ],
+        mode=selector.SelectSelectorMode.DROPDOWN,
+    )
+)
+
 
 PRESET_SELECTOR = selector.SelectSelector(
     selector.SelectSelectorConfig(
@@ -140,6 +195,13 @@ def _as_bool(value: Any, default: bool = False) -> bool:
     return bool(value)
 
 
+def _as_int(value: Any, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
 async def _load_adapter_info(
     flow: config_entries.ConfigFlow,
     integration: str | None,
@@ -290,6 +352,73 @@ def _build_advanced_fields(
     ordered[vol.Optional(CONF_CHILD_LOCK, default=get_bool(CONF_CHILD_LOCK, False))] = (
         bool
     )
+    ordered[
+        vol.Optional(
+            CONF_TPI_TIME_PROPORTIONAL,
+            default=get_bool(CONF_TPI_TIME_PROPORTIONAL, False),
+        )
+    ] = bool
+    ordered[
+        vol.Optional(
+            CONF_TPI_CYCLE, default=_as_int(get_value(CONF_TPI_CYCLE, 600), 600)
+        )
+    ] = vol.All(vol.Coerce(int), vol.Range(min=60, max=3600))
+    ordered[
+        vol.Optional(
+            CONF_TPI_MIN_SWITCH, default=_as_int(get_value(CONF_TPI_MIN_SWITCH, 60), 60)
+        )
+    ] = vol.All(vol.Coerce(int), vol.Range(min=0, max=600))
+    ordered[
+        vol.Optional(
+            CONF_MPC_SOLVER, default=get_value(CONF_MPC_SOLVER, MpcSolver.GRID)
+        )
+    ] = MPC_SOLVER_SELECTOR
+    ordered[
+        vol.Optional(CONF_MPC_WARM_START, default=get_bool(CONF_MPC_WARM_START, False))
+    ] = bool
+    ordered[
+        vol.Optional(
+            CONF_MPC_WARM_START_RADIUS,
+            default=_as_int(get_value(CONF_MPC_WARM_START_RADIUS, 3), 3),
+        )
+    ] = vol.All(vol.Coerce(int), vol.Range(min=1, max=100))
+    ordered[
+        vol.Optional(
+            CONF_MPC_WARM_START_MAX_RADIUS,
+            default=_as_int(get_value(CONF_MPC_WARM_START_MAX_RADIUS, 24), 24),
+        )
+    ] = vol.All(vol.Coerce(int), vol.Range(min=1, max=100))
+    ordered[
+        vol.Optional(
+            CONF_MPC_HORIZON_STEPS,
+            default=_as_int(get_value(CONF_MPC_HORIZON_STEPS, 6), 6),
+        )
+    ] = vol.All(vol.Coerce(int), vol.Range(min=6, max=72))
+    ordered[
+        vol.Optional(
+            CONF_MPC_MOVE_BLOCKS, default=_as_int(get_value(CONF_MPC_MOVE_BLOCKS, 0), 0)
+        )
+    ] = vol.All(vol.Coerce(int), vol.Range(min=0, max=12))
+    ordered[
+        vol.Optional(
+            CONF_MPC_ESTIMATOR, default=get_value(CONF_MPC_ESTIMATOR, MpcEstimator.EMA)
+        )
+    ] = MPC_ESTIMATOR_SELECTOR
+    ordered[
+        vol.Optional(
+            CONF_MPC_EXACT_DISCRETIZATION,
+            default=get_bool(CONF_MPC_EXACT_DISCRETIZATION, False),
+        )
+    ] = bool
+    ordered[
+        vol.Optional(CONF_MPC_ROOM_SOLVE, default=get_bool(CONF_MPC_ROOM_SOLVE, False))
+    ] = bool
+    ordered[
+        vol.Optional(
+            CONF_PID_GAIN_SCHEDULE,
+            default=get_value(CONF_PID_GAIN_SCHEDULE, PidGainSchedule.TARGET),
+        )
+    ] = PID_GAIN_SCHEDULE_SELECTOR
     ordered[
         vol.Optional(CONF_HOMEMATICIP, default=get_bool(CONF_HOMEMATICIP, homematic))
     ] = bool
@@ -318,6 +447,37 @@ def _normalize_advanced_submission(
         normalized.get(CONF_VALVE_MAINTENANCE), False
     )
     normalized[CONF_CHILD_LOCK] = _as_bool(normalized.get(CONF_CHILD_LOCK), False)
+    normalized[CONF_TPI_TIME_PROPORTIONAL] = _as_bool(
+        normalized.get(CONF_TPI_TIME_PROPORTIONAL), False
+    )
+    normalized[CONF_TPI_CYCLE] = _as_int(normalized.get(CONF_TPI_CYCLE), 600)
+    normalized[CONF_TPI_MIN_SWITCH] = _as_int(normalized.get(CONF_TPI_MIN_SWITCH), 60)
+    normalized[CONF_MPC_SOLVER] = normalized.get(CONF_MPC_SOLVER, MpcSolver.GRID)
+    normalized[CONF_MPC_WARM_START] = _as_bool(
+        normalized.get(CONF_MPC_WARM_START), False
+    )
+    normalized[CONF_MPC_WARM_START_RADIUS] = _as_int(
+        normalized.get(CONF_MPC_WARM_START_RADIUS), 3
+    )
+    normalized[CONF_MPC_WARM_START_MAX_RADIUS] = _as_int(
+        normalized.get(CONF_MPC_WARM_START_MAX_RADIUS), 24
+    )
+    normalized[CONF_MPC_HORIZON_STEPS] = _as_int(
+        normalized.get(CONF_MPC_HORIZON_STEPS), 6
+    )
+    normalized[CONF_MPC_MOVE_BLOCKS] = _as_int(normalized.get(CONF_MPC_MOVE_BLOCKS), 0)
+    normalized[CONF_MPC_ESTIMATOR] = normalized.get(
+        CONF_MPC_ESTIMATOR, MpcEstimator.EMA
+    )
+    normalized[CONF_MPC_EXACT_DISCRETIZATION] = _as_bool(
+        normalized.get(CONF_MPC_EXACT_DISCRETIZATION), False
+    )
+    normalized[CONF_MPC_ROOM_SOLVE] = _as_bool(
+        normalized.get(CONF_MPC_ROOM_SOLVE), False
+    )
+    normalized[CONF_PID_GAIN_SCHEDULE] = normalized.get(
+        CONF_PID_GAIN_SCHEDULE, PidGainSchedule.TARGET
+    )
     normalized[CONF_HOMEMATICIP] = _as_bool(normalized.get(CONF_HOMEMATICIP), homematic)
 
     _LOGGER.debug("Normalized advanced submission: %s", normalized)
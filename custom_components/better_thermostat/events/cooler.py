@@ -9,6 +9,7 @@ import logging
 from homeassistant.components.climate.const import HVACMode
 from homeassistant.core import State, callback
 
+from custom_components.better_thermostat.utils.control_mailbox import REASON_SETPOINT
 from custom_components.better_thermostat.utils.helpers import convert_to_float
 
 _LOGGER = logging.getLogger(__name__)
@@ -89,6 +90,7 @@ async def trigger_cooler_change(self, event):
 
     if _main_change is True:
         self.async_write_ha_state()
-        return await self.control_queue_task.put(self)
+        self.control_queue_task.submit(REASON_SETPOINT)
+        return
     self.async_write_ha_state()
     return
@@ -17,6 +17,7 @@ from homeassistant.helpers import issue_registry as ir
 from homeassistant.helpers.event import async_call_later
 
 from custom_components.better_thermostat.utils.const import CONF_HOMEMATICIP
+from custom_components.better_thermostat.utils.control_mailbox import REASON_SENSOR
 from custom_components.better_thermostat.utils.helpers import convert_to_float
 
 _LOGGER = logging.getLogger(__name__)
@@ -150,7 +151,7 @@ async def _apply_temperature_update(self, new_temp):
         if getattr(self, "in_maintenance", False):
             self._control_needed_after_maintenance = True
         else:
-            await self.control_queue_task.put(self)
+            self.control_queue_task.submit(REASON_SENSOR)
     _LOGGER.debug(
         "better_thermostat %s: _apply_temperature_update finished", self.device_name
     )
@@ -350,7 +351,7 @@ async def trigger_temperature_change(self, event):
                                     self.device_name,
                                 )
                             if self.control_queue_task is not None:
-                                await self.control_queue_task.put(self)
+                                self.control_queue_task.submit(REASON_SENSOR)
                 finally:
                     # Aufräumen
                     self.flicker_unignore_cancel = None
@@ -19,11 +19,17 @@ from custom_components.better_thermostat.calibration import (
 from custom_components.better_thermostat.model_fixes.model_quirks import (
     load_model_quirks,
 )
+from custom_components.better_thermostat.utils.ack_tracker import (
+    ACK_HVAC_MODE,
+    ACK_TEMPERATURE,
+    AckTracker,
+)
 from custom_components.better_thermostat.utils.const import (
     CONF_HOMEMATICIP,
     CalibrationMode,
     CalibrationType,
 )
+from custom_components.better_thermostat.utils.control_mailbox import REASON_SETPOINT
 from custom_components.better_thermostat.utils.helpers import (
     convert_to_float,
     get_device_model,
@@ -33,9 +39,32 @@ from custom_components.better_thermostat.utils.helpers import (
 _LOGGER = logging.getLogger(__name__)
 
 
+def observe_trv_acks(self, entity_id, state):
+    """Resolve pending write acknowledgements of a TRV from its state."""
+    tracker = getattr(self, "ack_tracker", None)
+    if not isinstance(tracker, AckTracker):
+        return
+    if tracker.pending(entity_id, ACK_HVAC_MODE):
+        tracker.observe(entity_id, ACK_HVAC_MODE, state.state)
+    if tracker.pending(entity_id, ACK_TEMPERATURE):
+        tracker.observe(
+            entity_id,
+            ACK_TEMPERATURE,
+            convert_to_float(
+                str(state.attributes.get("temperature", None)),
+                self.device_name,
+                "observe_trv_acks()",
+            ),
+        )
+
+
 @callback
 async def trigger_trv_change(self, event):
     """Trigger a change in the trv state."""
+    # Writes are confirmed by every state, including those caused by BT itself
+    _ack_state = event.data.get("new_state")
+    if isinstance(_ack_state, State):
+        observe_trv_acks(self, event.data.get("entity_id"), _ack_state)
     if self.startup_running:
         return
     if self.control_queue_task is None:
@@ -159,7 +188,9 @@ async def trigger_trv_change(self, event):
                     "last_calibration"
                 ] = await get_current_offset(self, entity_id)
 
-    if self.ignore_states:
+    # The whole entity is being controlled, or this TRV is being written to
+    # (its lane push or a TPI cycle switch)
+    if self.ignore_states or self.real_trvs[entity_id].get("ignore_trv_states"):
         return
 
     try:
@@ -321,7 +352,8 @@ async def trigger_trv_change(self, event):
 
     if _main_change is True:
         self.async_write_ha_state()
-        return await self.control_queue_task.put(self)
+        self.control_queue_task.submit(REASON_SETPOINT)
+        return
 
     self.async_write_ha_state()
     return
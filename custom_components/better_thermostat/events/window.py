@@ -12,6 +12,7 @@ from homeassistant.core import callback
 from homeassistant.helpers import issue_registry as ir
 
 from custom_components.better_thermostat import DOMAIN
+from custom_components.better_thermostat.utils.control_mailbox import REASON_WINDOW
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -118,9 +119,7 @@ async def window_queue(self):
                             # until maintenance ends.
                             self._control_needed_after_maintenance = True
                         else:
-                            if not self.control_queue_task.empty():
-                                empty_queue(self.control_queue_task)
-                            await self.control_queue_task.put(self)
+                            self.control_queue_task.submit(REASON_WINDOW)
             except asyncio.CancelledError:
                 raise
             finally:
@@ -130,13 +129,3 @@ async def window_queue(self):
             f"better_thermostat {self.device_name}: Window queue task cancelled"
         )
         raise
-
-
-def empty_queue(q: asyncio.Queue):
-    """Empty out a Queue of pending items.
-
-    Consumes all pending items from the queue and marks them as done.
-    """
-    for _ in range(q.qsize()):
-        q.get_nowait()
-        q.task_done()
@@ -1,5 +1,6 @@
 """Better Thermostat Number Platform."""
 
+from functools import partial
 import logging
 
 from homeassistant.components.climate.const import PRESET_NONE
@@ -10,13 +11,15 @@ from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.restore_state import RestoreEntity
 
+from .calibration import pid_params_for
+from .utils.calibration.executor import CONTROLLER_EXECUTOR
 from .utils.calibration.pid import (
-    _PID_STATES,
     DEFAULT_PID_KD,
     DEFAULT_PID_KI,
     DEFAULT_PID_KP,
-    PIDState,
     build_pid_key,
+    get_pid_state,
+    seed_pid_gains,
 )
 from .utils.const import CONF_CALIBRATION_MODE, CalibrationMode
 
@@ -186,7 +189,7 @@ class BetterThermostatPIDNumber(NumberEntity, RestoreEntity):
         """Return the value of the number."""
         # Try to get the value from the current active PID state
         key = build_pid_key(self._bt_climate, self._trv_entity_id)
-        pid_state = _PID_STATES.get(key)
+        pid_state = get_pid_state(key)
 
         if pid_state is not None:
             val = getattr(pid_state, f"pid_{self._parameter}")
@@ -204,22 +207,44 @@ class BetterThermostatPIDNumber(NumberEntity, RestoreEntity):
 
     async def async_set_native_value(self, value: float) -> None:
         """Update the current value."""
-        # Update ONLY the current PID state to avoid overwriting learned values for other temperatures
+        # Set the gain at the current operating point of the schedule only, so
+        # learned values for other temperatures are bent towards it, not
+        # overwritten. Without an operating point yet (delta schedule and no
+        # outdoor temperature) the controller runs the base gains: set those.
         key = build_pid_key(self._bt_climate, self._trv_entity_id)
-
-        # Ensure state exists
-        if key not in _PID_STATES:
-            _PID_STATES[key] = PIDState()
-
-        pid_state = _PID_STATES[key]
+        pid_state = get_pid_state(key)
+        gains = {"kp": DEFAULT_PID_KP, "ki": DEFAULT_PID_KI, "kd": DEFAULT_PID_KD}
+        at = None
+        if pid_state is not None:
+            for name in gains:
+                current = getattr(pid_state, f"pid_{name}")
+                if current is not None:
+                    gains[name] = current
+            at = pid_state.schedule_x
 
         _LOGGER.debug(
-            "Updating PID state key %s: %s -> %s",
+            "Updating PID gain %s for key %s at %s: %s -> %s",
+            self._parameter,
             key,
-            getattr(pid_state, f"pid_{self._parameter}"),
+            at,
+            gains[self._parameter],
             value,
         )
-        setattr(pid_state, f"pid_{self._parameter}", value)
+        gains[self._parameter] = float(value)
+        await CONTROLLER_EXECUTOR.async_locked(
+            self.hass,
+            key,
+            partial(
+                seed_pid_gains,
+                at=at,
+                params=pid_params_for(self._bt_climate, self._trv_entity_id),
+                keep_anchors=True,
+            ),
+            key,
+            gains["kp"],
+            gains["ki"],
+            gains["kd"],
+        )
 
         self._bt_climate.schedule_save_pid_state()
         self.async_write_ha_state()
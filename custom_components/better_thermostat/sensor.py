@@ -645,6 +645,7 @@ class BetterThermostatMpcStatusSensor(SensorEntity):
         gain = None
         loss = None
         confidence = None
+        model_confidence = None
 
         if hasattr(self._bt_climate, "real_trvs"):
             for trv_id, trv_data in self._bt_climate.real_trvs.items():
@@ -659,6 +660,8 @@ class BetterThermostatMpcStatusSensor(SensorEntity):
                         loss = debug["mpc_loss"]
                     if "trv_profile_conf" in debug:
                         confidence = debug["trv_profile_conf"]
+                    if debug.get("mpc_model_conf") is not None:
+                        model_confidence = debug["mpc_model_conf"]
 
                     if created_ts is not None:
                         break
@@ -668,9 +671,14 @@ class BetterThermostatMpcStatusSensor(SensorEntity):
             days = age_seconds / 86400.0
             confidence_val = float(confidence) if confidence is not None else 0.0
 
-            if days < 1.0:
-                self._attr_native_value = "training"
-            elif confidence_val >= 0.7:
+            if model_confidence is not None:
+                # The RLS covariance measures identification progress
+                # directly, so no minimum training time is needed.
+                confidence_val = float(model_confidence)
+            elif days < 1.0:
+                confidence_val = 0.0
+
+            if confidence_val >= 0.7:
                 self._attr_native_value = "trained"
             elif confidence_val >= 0.4:
                 self._attr_native_value = "optimizing"
@@ -683,6 +691,7 @@ class BetterThermostatMpcStatusSensor(SensorEntity):
                 "mpc_gain": gain,
                 "mpc_loss": loss,
                 "profile_confidence": confidence,
+                "model_confidence": model_confidence,
             }
         else:
             self._attr_native_value = "unknown"
@@ -10,7 +10,12 @@ from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.restore_state import RestoreEntity
 
-from .utils.calibration.pid import _PID_STATES, DEFAULT_PID_AUTO_TUNE, build_pid_key
+from .utils.calibration.pid import (
+    _PID_STATES,
+    DEFAULT_PID_AUTO_TUNE,
+    build_pid_key,
+    get_pid_state,
+)
 from .utils.const import CalibrationMode
 
 _LOGGER = logging.getLogger(__name__)
@@ -75,7 +80,7 @@ class BetterThermostatPIDAutoTuneSwitch(SwitchEntity, RestoreEntity):
         """Return true if switch is on."""
         # Try to get the value from the current active PID state
         key = build_pid_key(self._bt_climate, self._trv_entity_id)
-        pid_state = _PID_STATES.get(key)
+        pid_state = get_pid_state(key)
 
         if pid_state is not None and pid_state.auto_tune is not None:
             return pid_state.auto_tune
@@ -95,11 +100,8 @@ class BetterThermostatPIDAutoTuneSwitch(SwitchEntity, RestoreEntity):
         # Update persistent PID states (if any exist for this TRV)
         # Use the same unique_id logic as build_pid_key to ensure matching
         uid = self._bt_climate.unique_id or "bt"
-        prefix = f"{uid}:{self._trv_entity_id}:"
-
-        for key, pid_state in _PID_STATES.items():
-            if key.startswith(prefix):
-                pid_state.auto_tune = state
+        for _key, pid_state in _PID_STATES.items_for_entity(uid, self._trv_entity_id):
+            pid_state.auto_tune = state
 
         self._bt_climate.schedule_save_pid_state()
         self.async_write_ha_state()
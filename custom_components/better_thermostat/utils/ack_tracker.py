@@ -0,0 +1,198 @@
+"""Acknowledgement tracking for writes to the real TRVs.
+
+After a setpoint or system mode write, Better Thermostat ignores TRV target
+changes until the device has reported the written value back (otherwise
+the device's echo of an older value would be taken as a user change). This
+used to be a polling task per write that read the state once per second for
+up to six minutes.
+
+Instead every outbound write registers the value it expects with
+``expect``. ``trigger_trv_change`` feeds each new TRV state into ``observe``,
+which resolves a matching expectation. The timeout of every expectation is
+a deadline on the shared timer wheel, so the number of pending writes costs
+no coroutines and no loop timers. Once acknowledged, ``on_done`` runs after
+a short settle delay (the device may still send intermediate states).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+import logging
+import math
+from typing import Any
+
+from .timer_wheel import TIMER_WHEEL, TimerWheel, WheelTimer
+
+_LOGGER = logging.getLogger(__name__)
+
+ACK_TEMPERATURE = "temperature"
+ACK_HVAC_MODE = "hvac_mode"
+
+# Smoothing factor of the latency average
+_LATENCY_ALPHA = 0.2
+
+# Numeric values within this distance count as equal (float round trips)
+_NUMERIC_TOLERANCE = 0.01
+
+
+@dataclass(slots=True, eq=False)
+class _Expectation:
+    value: Any
+    on_done: Callable[[bool], None]
+    since: float
+    timer: WheelTimer | None = None
+    acked: bool = False
+
+
+@dataclass(slots=True)
+class _DeviceStats:
+    acks: int = 0
+    timeouts: int = 0
+    superseded: int = 0
+    last_s: float | None = None
+    avg_s: float | None = None
+    max_s: float = 0.0
+
+    def record(self, latency: float) -> None:
+        self.acks += 1
+        self.last_s = latency
+        self.max_s = max(self.max_s, latency)
+        self.avg_s = (
+            latency
+            if self.avg_s is None
+            else self.avg_s + _LATENCY_ALPHA * (latency - self.avg_s)
+        )
+
+
+def _matches(expected: Any, observed: Any) -> bool:
+    # A device that does not report the attribute cannot confirm it
+    if observed is None:
+        return True
+    if isinstance(expected, (int, float)) and isinstance(observed, (int, float)):
+        return math.isclose(expected, observed, abs_tol=_NUMERIC_TOLERANCE)
+    return expected == observed
+
+
+class AckTracker:
+    """Expected device attribute values with deadlines on the timer wheel."""
+
+    def __init__(
+        self,
+        timeout_s: float = 360.0,
+        settle_s: float = 2.0,
+        wheel: TimerWheel = TIMER_WHEEL,
+    ) -> None:
+        """Initialise without pending expectations."""
+        self.timeout_s = timeout_s
+        self.settle_s = settle_s
+        self._wheel = wheel
+        self._pending: dict[tuple[str, str], _Expectation] = {}
+        self._stats: dict[str, _DeviceStats] = {}
+
+    def __len__(self) -> int:
+        """Return the number of writes not yet acknowledged or settled."""
+        return len(self._pending)
+
+    def pending(self, device: str, attribute: str) -> bool:
+        """Return True while a write of attribute waits for its acknowledgement."""
+        expectation = self._pending.get((device, attribute))
+        return expectation is not None and not expectation.acked
+
+    def expect(
+        self, device: str, attribute: str, value: Any, on_done: Callable[[bool], None]
+    ) -> None:
+        """Register a write of value; on_done(acked) runs once it settles or times out.
+
+        A newer write of the same attribute supersedes the pending one; its
+        callback is dropped and the new callback takes over.
+        """
+        key = (device, attribute)
+        stats = self._device_stats(device)
+        previous = self._pending.pop(key, None)
+        if previous is not None:
+            self._cancel(previous)
+            stats.superseded += 1
+        expectation = _Expectation(value, on_done, self._wheel.time())
+        expectation.timer = self._wheel.call_later(
+            self.timeout_s, self._timeout, key, expectation
+        )
+        self._pending[key] = expectation
+
+    def observe(self, device: str, attribute: str, value: Any) -> bool:
+        """Feed a reported value; return True if it acknowledged a pending write."""
+        key = (device, attribute)
+        expectation = self._pending.get(key)
+        if (
+            expectation is None
+            or expectation.acked
+            or not _matches(expectation.value, value)
+        ):
+            return False
+        self._cancel(expectation)
+        expectation.acked = True
+        self._device_stats(device).record(self._wheel.time() - expectation.since)
+        expectation.timer = self._wheel.call_later(
+            self.settle_s, self._finish, key, expectation, True
+        )
+        return True
+
+    def _timeout(self, key: tuple[str, str], expectation: _Expectation) -> None:
+        _LOGGER.debug(
+            "better_thermostat: %s did not acknowledge %s=%s within %.0fs",
+            key[0],
+            key[1],
+            expectation.value,
+            self.timeout_s,
+        )
+        self._device_stats(key[0]).timeouts += 1
+        self._finish(key, expectation, False)
+
+    def _finish(
+        self, key: tuple[str, str], expectation: _Expectation, acked: bool
+    ) -> None:
+        expectation.timer = None
+        if self._pending.get(key) is expectation:
+            del self._pending[key]
+        expectation.on_done(acked)
+
+    @staticmethod
+    def _cancel(expectation: _Expectation) -> None:
+        if expectation.timer is not None:
+            expectation.timer.cancel()
+            expectation.timer = None
+
+    def _device_stats(self, device: str) -> _DeviceStats:
+        stats = self._stats.get(device)
+        if stats is None:
+            stats = self._stats[device] = _DeviceStats()
+        return stats
+
+    def close(self) -> None:
+        """Drop all pending expectations without running their callbacks."""
+        for expectation in self._pending.values():
+            self._cancel(expectation)
+        self._pending.clear()
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        """Return per-device acknowledgement latency for diagnostics."""
+
+        def _r(value: float | None) -> float | None:
+            return round(value, 3) if value is not None else None
+
+        result = {
+            device: {
+                "acks": stats.acks,
+                "timeouts": stats.timeouts,
+                "superseded": stats.superseded,
+                "latency_last_s": _r(stats.last_s),
+                "latency_avg_s": _r(stats.avg_s),
+                "latency_max_s": round(stats.max_s, 3),
+                "pending": [],
+            }
+            for device, stats in self._stats.items()
+        }
+        for (device, attribute), expectation in self._pending.items():
+            if not expectation.acked:
+                result[device]["pending"].append(attribute)
+        return result
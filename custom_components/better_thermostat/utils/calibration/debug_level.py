@@ -0,0 +1,38 @@
+"""Debug payload levels shared by the calibration controllers.
+
+Controllers return a ``debug`` mapping with every output. Building the full
+payload costs dozens of rounding calls per cycle, although only a few fields
+are read by sensors. The level selects what is built and returned:
+
+- ``off``: no payload
+- ``summary``: only the fields sensors consume
+- ``full``: everything (also built whenever DEBUG logging is enabled)
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+import logging
+from typing import Any
+
+DEBUG_LEVEL_OFF = "off"
+DEBUG_LEVEL_SUMMARY = "summary"
+DEBUG_LEVEL_FULL = "full"
+
+
+def wants_full_debug(level: str, logger: logging.Logger) -> bool:
+    """Return True if the full payload has to be built for this call."""
+
+    return level == DEBUG_LEVEL_FULL or logger.isEnabledFor(logging.DEBUG)
+
+
+def shape_debug(
+    debug: Mapping[str, Any], level: str, summary_keys: Iterable[str]
+) -> dict[str, Any]:
+    """Reduce a debug payload to what the requested level returns."""
+
+    if level == DEBUG_LEVEL_FULL:
+        return debug if isinstance(debug, dict) else dict(debug)
+    if level == DEBUG_LEVEL_OFF:
+        return {}
+    return {key: debug[key] for key in summary_keys if key in debug}
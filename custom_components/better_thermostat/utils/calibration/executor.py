@@ -0,0 +1,265 @@
+"""Execution strategy for controller solves (inline or off the event loop).
+
+Calibration runs inside ``convert_outbound_states`` on the Home Assistant
+event loop. Cheap controller calls stay inline; heavy ones (long MPC
+horizons, room-level solves) are moved to HA's executor thread pool by
+solving them ahead of time in ``control_trv``:
+
+1. ``capture`` runs a synchronous ``_compute_*_balance`` path until it
+   reaches its controller call and returns that call as a
+   ``ControllerRequest`` instead of executing it.
+2. ``async_run`` executes the request inline or in a worker thread and
+   returns a time-stamped ``ControllerResult``.
+3. The synchronous path then runs again and ``take_or_run`` hands it the
+   prefetched result instead of computing.
+
+Requests for a key whose solve is still in flight share that solve: the lanes
+of a room all ask for the same room solve, which runs once and hands each
+lane the same result. Every solve bumps a per-key sequence number and a
+prefetched result is only used while no newer solve of its key has started.
+While a solve is in flight the synchronous path of its key neither solves
+again nor falls back to an older result. Controller states live in
+module-level maps under ``{unique_id}:...`` keys and a solve only touches the
+states of its own Better Thermostat entity, so controller work is serialised
+per unique_id by one lock each. Worker threads wait for it; the event loop
+never blocks on it: an inline solve finding its entity's lock held reuses
+the last result of its key. Exports, imports and resets of an entity's
+states go through ``async_locked`` so they never interleave with a solve.
+
+A process pool is not offered: the controller states are in-process maps and
+would have to be shipped to and from the worker on every call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, MutableMapping
+from dataclasses import dataclass, field
+from functools import partial
+import logging
+import threading
+from time import monotonic
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+EXECUTION_INLINE = "inline"
+EXECUTION_THREAD = "thread"
+EXECUTION_AUTO = "auto"
+
+# Slot in ``real_trvs[entity_id]`` holding a prefetched result.
+PREFETCH_SLOT = "controller_prefetch"
+# Prefetched results older than this are recomputed instead of used.
+PREFETCH_MAX_AGE_S = 30.0
+
+
+@dataclass(slots=True)
+class ControllerRequest:
+    """One controller call, captured for deferred execution."""
+
+    key: str
+    func: Callable[..., Any]
+    args: tuple[Any, ...] = ()
+    kwargs: dict[str, Any] = field(default_factory=dict)
+    # Heavy requests run in a worker thread under the "auto" strategy.
+    heavy: bool = False
+
+    def run(self) -> Any:
+        """Execute the controller call."""
+        return self.func(*self.args, **self.kwargs)
+
+
+@dataclass(slots=True)
+class ControllerResult:
+    """Output of a request with its sequence number and timestamps."""
+
+    key: str
+    seq: int
+    value: Any
+    requested_ts: float
+    finished_ts: float
+    threaded: bool = False
+
+
+class _CaptureRequest(Exception):
+    """Unwinds a balance path in capture mode once its request is known."""
+
+    def __init__(self, request: ControllerRequest | None) -> None:
+        super().__init__(request.key if request is not None else "no request")
+        self.request = request
+
+
+class ControllerExecutor:
+    """Run controller requests inline or in HA's executor pool."""
+
+    def __init__(self, strategy: str = EXECUTION_AUTO) -> None:
+        """Initialise the executor with an execution strategy."""
+        self.strategy = strategy
+        self._seq: dict[str, int] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._last: dict[str, Any] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._capturing = False
+
+    @property
+    def capturing(self) -> bool:
+        """Return True while a balance path is being captured."""
+        return self._capturing
+
+    def lock_for(self, key: str) -> threading.Lock:
+        """Return the lock of the Better Thermostat entity owning key.
+
+        Accepts a state key, a controller key or a ``"{unique_id}:"`` prefix.
+        """
+        scope = key.split(":", 1)[0]
+        lock = self._locks.get(scope)
+        if lock is None:
+            lock = self._locks.setdefault(scope, threading.Lock())
+        return lock
+
+    def _next_seq(self, key: str) -> int:
+        seq = self._seq.get(key, 0) + 1
+        self._seq[key] = seq
+        return seq
+
+    def capture(self, func: Callable[..., Any], *args: Any) -> ControllerRequest | None:
+        """Run func until it issues a controller request and return it.
+
+        Returns None if func finished (or bailed out) without one.
+        """
+
+        self._capturing = True
+        try:
+            func(*args)
+        except _CaptureRequest as capture:
+            return capture.request
+        finally:
+            self._capturing = False
+        return None
+
+    def abort_capture(self) -> None:
+        """End a capture without a request (the path needs no solve)."""
+        if self._capturing:
+            raise _CaptureRequest(None)
+
+    def _run_locked(self, request: ControllerRequest) -> Any:
+        with self.lock_for(request.key):
+            return request.run()
+
+    @staticmethod
+    def _call_locked(lock: threading.Lock, func: Callable[..., Any], *args: Any) -> Any:
+        with lock:
+            return func(*args)
+
+    async def async_locked(
+        self, hass, scope: str, func: Callable[..., Any], *args: Any
+    ) -> Any:
+        """Run func(*args) under the lock of scope and return its result.
+
+        Runs inline when the lock is free, otherwise waits for it in a
+        worker thread. Used for registry exports, imports and resets.
+        """
+
+        lock = self.lock_for(scope)
+        if lock.acquire(blocking=False):
+            try:
+                return func(*args)
+            finally:
+                lock.release()
+        return await hass.async_add_executor_job(self._call_locked, lock, func, *args)
+
+    async def async_run(self, hass, request: ControllerRequest) -> ControllerResult:
+        """Return the result of a request, sharing the solve of its key in flight."""
+
+        task = self._inflight.get(request.key)
+        if task is None:
+            task = asyncio.ensure_future(self._solve(hass, request))
+            self._inflight[request.key] = task
+            task.add_done_callback(partial(self._solved, request.key))
+        # A cancelled caller must not cancel the solve the other callers share
+        return await asyncio.shield(task)
+
+    def _solved(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Retrieved here so an error nobody waits for any more is not logged
+            task.exception()
+
+    async def _solve(self, hass, request: ControllerRequest) -> ControllerResult:
+        seq = self._next_seq(request.key)
+        requested_ts = monotonic()
+        threaded = self.strategy == EXECUTION_THREAD or (
+            self.strategy == EXECUTION_AUTO and request.heavy
+        )
+        lock = self.lock_for(request.key)
+        if not threaded and lock.acquire(blocking=False):
+            try:
+                value = request.run()
+            finally:
+                lock.release()
+        else:
+            # Either heavy, or a worker holds the lock: wait in a thread.
+            threaded = True
+            value = await hass.async_add_executor_job(self._run_locked, request)
+
+        self._last[request.key] = value
+        return ControllerResult(
+            key=request.key,
+            seq=seq,
+            value=value,
+            requested_ts=requested_ts,
+            finished_ts=monotonic(),
+            threaded=threaded,
+        )
+
+    def take_or_run(
+        self,
+        slot: MutableMapping[str, Any],
+        request: ControllerRequest,
+        reuse_last: bool = True,
+    ) -> Any:
+        """Return the prefetched result for the request, else run it inline.
+
+        In capture mode the request is handed to ``capture`` instead. Returns
+        None while a solve of the key is in flight: its result reaches the
+        lanes waiting for it. If a worker thread holds the lock of the
+        request's entity, the inline call is skipped and the last result of
+        the key is returned (None if there is none, or with reuse_last off)
+        rather than stalling the event loop.
+        """
+
+        if self._capturing:
+            raise _CaptureRequest(request)
+
+        result = slot.pop(PREFETCH_SLOT, None)
+        if (
+            isinstance(result, ControllerResult)
+            and result.key == request.key
+            and result.seq == self._seq.get(request.key)
+            and monotonic() - result.finished_ts <= PREFETCH_MAX_AGE_S
+        ):
+            return result.value
+
+        if request.key in self._inflight:
+            _LOGGER.debug(
+                "better_thermostat: controller solve in flight for %s, not solving again",
+                request.key,
+            )
+            return None
+        lock = self.lock_for(request.key)
+        if not lock.acquire(blocking=False):
+            _LOGGER.debug(
+                "better_thermostat: controller busy in a worker, reusing the last result for %s",
+                request.key,
+            )
+            return self._last.get(request.key) if reuse_last else None
+        try:
+            self._next_seq(request.key)
+            value = self._last[request.key] = request.run()
+        finally:
+            lock.release()
+        return value
+
+
+CONTROLLER_EXECUTOR = ControllerExecutor()
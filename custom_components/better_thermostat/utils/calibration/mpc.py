@@ -2,21 +2,33 @@
 
 from __future__ import annotations
 
-from collections.abc import Mapping
-from dataclasses import dataclass, field
+from array import array
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass, field, replace
 import logging
 import math
 import random
 from time import monotonic, time
 from typing import Any
 
+from .debug_level import DEBUG_LEVEL_FULL, shape_debug, wants_full_debug
+from .state_registry import BucketEvictionPolicy, StateRegistry, last_used_stamps
+
 _LOGGER = logging.getLogger(__name__)
 
 
-# MPC operates on fixed 5-minute steps and a 6-step horizon.
+# MPC operates on fixed 5-minute steps and a 6-step horizon by default.
 MPC_STEP_SECONDS = 300.0
 MPC_HORIZON_STEPS = 6
 
+# Entity part of the state key of a room-level model.
+MPC_ROOM_ENTITY = "room"
+
+# Prediction errors kept for regime-change detection.
+RECENT_ERRORS_CAPACITY = 20
+# Default number of newest errors the regime-change t-test looks at.
+REGIME_WINDOW = 10
+
 
 @dataclass
 class MpcParams:
@@ -30,6 +42,35 @@ class MpcParams:
     mpc_control_penalty: float = 0.05
     mpc_change_penalty: float = 1.0
     mpc_eco_penalty: float = 1.0
+    # Horizon search: "grid" (coarse/fine whole-percent sweep) or "analytic"
+    # (exact continuous minimiser of the piecewise-quadratic cost).
+    mpc_solver: str = "grid"
+    # Warm start for the grid solver: search a trust region around the previous
+    # optimum and widen it only while the best candidate sits on its boundary.
+    # Setpoint changes, recent window events and regions wider than the max
+    # radius fall back to the full sweep.
+    mpc_warm_start: bool = False
+    mpc_warm_start_radius_pct: int = 3
+    mpc_warm_start_max_radius_pct: int = 24
+    # Horizon length in MPC_STEP_SECONDS steps. Slow radiators and underfloor
+    # loops want 24-72 steps, which should be paired with move blocking.
+    mpc_horizon_steps: int = MPC_HORIZON_STEPS
+    # Move blocking: 0 rolls a single held opening forward step by step.
+    # n >= 1 splits the horizon into n blocks (lengths doubling towards the
+    # end) with one opening each, and costs candidates from a step response
+    # precomputed once per solve, independent of the horizon length.
+    mpc_move_blocks: int = 0
+    # Reuse the last horizon solution of a key while its solver inputs are
+    # unchanged (temperatures quantised to 0.01 K) for up to
+    # min_update_interval_s.
+    mpc_solution_cache: bool = True
+    # Discretise dT/dt = gain*u + q - ka*(T - T_out) exactly (one exp() per
+    # step of any length) instead of with explicit Euler steps. Applies to the
+    # horizon rollouts and to the virtual temperature between sensor updates.
+    mpc_exact_discretization: bool = False
+    # Solve one model per BT entity (room) instead of one per TRV and split
+    # the room demand across the TRVs by their perf curves and dead zones.
+    mpc_room_solve: bool = False
     mpc_adapt: bool = True
     mpc_gain_min: float = 0.01
     mpc_gain_max: float = 0.2
@@ -40,6 +81,18 @@ class MpcParams:
     )
     mpc_solar_gain_max: float = 0.05
     mpc_adapt_alpha: float = 0.1
+    # Prediction errors in the regime-change t-test window.
+    mpc_regime_window: int = REGIME_WINDOW
+    # Model identification: "ema" (heuristic per-case EMA steps) or "rls"
+    # (recursive least squares on [gain, loss] or [gain, ka] with forgetting).
+    mpc_estimator: str = "ema"
+    mpc_rls_forgetting: float = 0.995
+    # Variance of a rate sample (°C/min)^2; sets how far one sample moves.
+    mpc_rls_noise_var: float = 1e-4
+    # An RLS sample ends at the next sensor change, but spans at least the
+    # min and at most the max interval.
+    mpc_rls_min_sample_s: float = 120.0
+    mpc_rls_max_sample_s: float = 1800.0
     mpc_adapt_window_block_s: float = 900.0
     deadzone_threshold_pct: float = 20.0
     deadzone_temp_delta_K: float = 0.1
@@ -79,6 +132,9 @@ class MpcParams:
     perf_curve_min_window_s: float = 300.0
     perf_curve_bin_pct: float = 2.0
 
+    # Target buckets kept per TRV; evicted buckets are merged into the TRV prior.
+    bucket_eviction: BucketEvictionPolicy = field(default_factory=BucketEvictionPolicy)
+
 
 @dataclass
 class MpcInput:
@@ -99,6 +155,13 @@ class MpcInput:
     is_day: bool = True
     other_heat_power: float = 0.0
     solar_intensity: float = 0.0  # 0.0 to 1.0 (cloud coverage, etc.)
+    # Optional per-step forecasts over the horizon (MPC_STEP_SECONDS apart,
+    # starting with the first predicted step). Shorter vectors hold their
+    # last value; without them the scalar values apply to every step.
+    outdoor_temp_forecast_C: Sequence[float] | None = None
+    solar_intensity_forecast: Sequence[float] | None = None
+    # "off" / "summary" / "full": how much of the debug payload is returned
+    debug_level: str = DEBUG_LEVEL_FULL
 
 
 @dataclass
@@ -109,8 +172,276 @@ class MpcOutput:
     debug: dict[str, Any] = field(default_factory=dict)
 
 
-@dataclass
+class _ErrorRing:
+    """Fixed-capacity ring buffer of floats (oldest sample dropped first).
+
+    The ring also keeps the mean and M2 of its newest ``window`` samples with
+    a windowed Welford update: each append adds the new sample and removes
+    the one leaving the window in O(1), so the t-statistic needs no pass over
+    the samples. The stored samples are the sufficient statistics; the
+    moments are rebuilt from them on load or when the window changes.
+    """
+
+    __slots__ = ("_buf", "_head", "_size", "_window", "_count", "_mean", "_m2")
+
+    def __init__(
+        self,
+        values: Iterable[float] = (),
+        capacity: int = RECENT_ERRORS_CAPACITY,
+        window: int = REGIME_WINDOW,
+    ) -> None:
+        self._window = max(2, int(window))
+        capacity = max(int(capacity), self._window)
+        self._buf = array("d", bytes(8 * capacity))
+        self._head = 0
+        self._size = 0
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        for value in values:
+            self.append(value)
+
+    def append(self, value: float) -> None:
+        capacity = len(self._buf)
+        window = self._window
+        # Read the sample leaving the window before its slot can be reused.
+        leaving = (
+            self._buf[(self._head + self._size - window) % capacity]
+            if self._size >= window
+            else None
+        )
+        self._buf[(self._head + self._size) % capacity] = value
+        if self._size < capacity:
+            self._size += 1
+        else:
+            self._head = (self._head + 1) % capacity
+
+        if leaving is None:
+            self._count += 1
+            delta = value - self._mean
+            self._mean += delta / self._count
+            self._m2 += delta * (value - self._mean)
+        else:
+            old_mean = self._mean
+            self._mean += (value - leaving) / window
+            self._m2 += (value - leaving) * (value - self._mean + leaving - old_mean)
+            self._m2 = max(self._m2, 0.0)
+
+    def set_window(self, window: int) -> None:
+        """Change the statistics window, growing the ring if needed."""
+        window = max(2, int(window))
+        if window == self._window:
+            return
+        values = self.tail(self._size)
+        capacity = max(len(self._buf), window)
+        if capacity != len(self._buf):
+            self._buf = array("d", bytes(8 * capacity))
+            self._head = 0
+            self._size = 0
+            for i, value in enumerate(values):
+                self._buf[i] = value
+            self._size = len(values)
+        self._window = window
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        for value in values[-window:]:
+            self._count += 1
+            delta = value - self._mean
+            self._mean += delta / self._count
+            self._m2 += delta * (value - self._mean)
+
+    def t_statistic(self) -> float | None:
+        """Return |mean| / standard error over a full window, else None.
+
+        A variance at rounding-noise level relative to the mean counts as
+        zero, so a constant error stream does not read as infinitely
+        significant.
+        """
+        window = self._window
+        if self._count < window:
+            return None
+        variance = self._m2 / window
+        if variance <= 1e-18 * max(self._mean * self._mean, 1e-18):
+            return None
+        return abs(self._mean) / math.sqrt(variance / window)
+
+    def tail(self, n: int) -> list[float]:
+        """Return the newest n samples, oldest first."""
+        n = max(0, min(n, self._size))
+        capacity = len(self._buf)
+        start = self._head + self._size - n
+        return [self._buf[(start + i) % capacity] for i in range(n)]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.tail(self._size))
+
+    def __repr__(self) -> str:
+        return f"_ErrorRing({list(self)!r})"
+
+
+class _PerfCurve:
+    """Per-bin valve response statistics backed by fixed numeric arrays.
+
+    Bin ``i`` covers valve openings ``[i * bin_pct, (i + 1) * bin_pct)``; the
+    last bin holds exactly 100 %. Each bin keeps a sample count, the running
+    mean and M2 (Welford) of the room temperature rate and running means of
+    the TRV rate, valve opening and temperature error.
+    """
+
+    __slots__ = (
+        "bin_pct",
+        "count",
+        "room_rate",
+        "room_rate_m2",
+        "trv_rate",
+        "percent",
+        "temp_error",
+    )
+
+    def __init__(self, bin_pct: float) -> None:
+        self.bin_pct = max(1.0, float(bin_pct))
+        n_bins = math.floor(100.0 / self.bin_pct) + 1
+        self.count = array("q", bytes(8 * n_bins))
+        self.room_rate = array("d", bytes(8 * n_bins))
+        self.room_rate_m2 = array("d", bytes(8 * n_bins))
+        self.trv_rate = array("d", bytes(8 * n_bins))
+        self.percent = array("d", bytes(8 * n_bins))
+        self.temp_error = array("d", bytes(8 * n_bins))
+
+    def bin_index(self, percent: float) -> int:
+        p = max(0.0, min(100.0, float(percent)))
+        return min(len(self.count) - 1, math.floor(p / self.bin_pct))
+
+    def update(
+        self,
+        idx: int,
+        room_rate: float,
+        trv_rate: float | None,
+        percent: float,
+        temp_error: float,
+    ) -> None:
+        count = self.count[idx] + 1
+        self.count[idx] = count
+        delta = room_rate - self.room_rate[idx]
+        self.room_rate[idx] += delta / count
+        self.room_rate_m2[idx] += delta * (room_rate - self.room_rate[idx])
+        if trv_rate is not None:
+            self.trv_rate[idx] += (trv_rate - self.trv_rate[idx]) / count
+        self.percent[idx] += (percent - self.percent[idx]) / count
+        self.temp_error[idx] += (temp_error - self.temp_error[idx]) / count
+
+    def response_slope(self, min_count: int = 2) -> float | None:
+        """Return the room warming rate per valve percent, or None.
+
+        Count-weighted least-squares slope of the bin mean room rate over the
+        bin mean opening, using bins with at least ``min_count`` samples.
+        """
+        rows = [
+            (self.count[i], self.percent[i], self.room_rate[i])
+            for i in range(len(self.count))
+            if self.count[i] >= min_count
+        ]
+        total = sum(n for n, _, _ in rows)
+        if len(rows) < 2 or total <= 0:
+            return None
+        mean_pct = sum(n * p for n, p, _ in rows) / total
+        mean_rate = sum(n * r for n, _, r in rows) / total
+        spread = sum(n * (p - mean_pct) ** 2 for n, p, _ in rows)
+        if spread <= 0.0:
+            return None
+        slope = sum(n * (p - mean_pct) * (r - mean_rate) for n, p, r in rows) / spread
+        return slope if slope > 0.0 else None
+
+    def room_rate_variance(self, idx: int) -> float | None:
+        count = self.count[idx]
+        if count < 2:
+            return None
+        return self.room_rate_m2[idx] / (count - 1)
+
+    def to_payload(self) -> dict[str, Any]:
+        """Return the compact JSON form: bin size plus one row per used bin."""
+        return {
+            "bin_pct": self.bin_pct,
+            "bins": [
+                [
+                    idx,
+                    self.count[idx],
+                    self.room_rate[idx],
+                    self.room_rate_m2[idx],
+                    self.trv_rate[idx],
+                    self.percent[idx],
+                    self.temp_error[idx],
+                ]
+                for idx in range(len(self.count))
+                if self.count[idx] > 0
+            ],
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Mapping[str, Any]) -> _PerfCurve | None:
+        """Rebuild a curve from ``to_payload`` output or legacy label-keyed data."""
+        if "bins" in payload:
+            curve = cls(float(payload.get("bin_pct", 2.0)))
+            for row in payload["bins"]:
+                idx, count, room, room_m2, trv, percent, error = row
+                idx = int(idx)
+                if not 0 <= idx < len(curve.count):
+                    continue
+                curve.count[idx] = int(count)
+                curve.room_rate[idx] = float(room)
+                curve.room_rate_m2[idx] = float(room_m2)
+                curve.trv_rate[idx] = float(trv)
+                curve.percent[idx] = float(percent)
+                curve.temp_error[idx] = float(error)
+            return curve
+        return cls._from_labels(payload)
+
+    @classmethod
+    def _from_labels(cls, payload: Mapping[str, Any]) -> _PerfCurve | None:
+        # Legacy format: {"p10_12": {"count": .., "avg_room_rate": .., ...}}
+        bins: list[tuple[float, Mapping[str, Any]]] = []
+        bin_pct: float | None = None
+        for label, stats in payload.items():
+            if not isinstance(label, str) or not isinstance(stats, Mapping):
+                continue
+            try:
+                lo_str, hi_str = label[1:].split("_", 1)
+                lo, hi = float(lo_str), float(hi_str)
+            except ValueError:
+                continue
+            if hi > lo and bin_pct is None:
+                bin_pct = hi - lo
+            bins.append((lo, stats))
+        if not bins:
+            return None
+        curve = cls(bin_pct or 2.0)
+        for lo, stats in bins:
+            idx = curve.bin_index(lo)
+            curve.count[idx] = int(stats.get("count", 0))
+            curve.room_rate[idx] = float(stats.get("avg_room_rate", 0.0))
+            curve.trv_rate[idx] = float(stats.get("avg_trv_rate", 0.0))
+            curve.percent[idx] = float(stats.get("avg_percent", 0.0))
+            curve.temp_error[idx] = float(stats.get("avg_temp_error", 0.0))
+        return curve
+
+
+@dataclass(slots=True)
 class _MpcState:
+    """Learned model and bookkeeping of one MPC target bucket.
+
+    Memory budget: the slotted record itself is about 0.3 KiB on 64-bit
+    CPython (no per-instance ``__dict__``), boxed float values add up to
+    roughly 0.7 KiB, and ``recent_errors`` is a fixed 20-sample ring of
+    C doubles (about 0.3 KiB), so a state stays around 1.3 KiB regardless
+    of how long it has been learning. Once the first perf-curve sample
+    arrives, the curve adds six fixed arrays (about 2.8 KiB at 2 % bins).
+    The RLS estimator adds a three-double covariance array.
+    """
+
     last_percent: float | None = None
     last_update_ts: float = 0.0
     last_target_C: float | None = None
@@ -134,7 +465,7 @@ class _MpcState:
     last_sensor_temp_C: float | None = None
     last_room_temp_C: float | None = None
     last_room_temp_ts: float = 0.0
-    perf_curve: dict[str, dict[str, float | int]] = field(default_factory=dict)
+    perf_curve: _PerfCurve | None = None
     trv_profile: str = "unknown"
     profile_confidence: float = 0.0
     profile_samples: int = 0
@@ -144,12 +475,29 @@ class _MpcState:
     created_ts: float = 0.0
     loss_learn_count: int = 0
     is_calibration_active: bool = False
-    recent_errors: list[float] = field(default_factory=list)
+    recent_errors: _ErrorRing = field(default_factory=_ErrorRing)
     regime_boost_active: bool = False
     consecutive_insufficient_heat: int = 0
-
-
-_MPC_STATES: dict[str, _MpcState] = {}
+    # RLS covariance of [gain, loss|ka] as (p00, p01, p11); None until used.
+    rls_cov: array | None = None
+    rls_uses_ka: bool = False
+    rls_samples: int = 0
+    # Last horizon solution (runtime only, not exported).
+    solution_memo: _SolutionMemo | None = None
+
+
+_MPC_STATES: StateRegistry[_MpcState] = StateRegistry()
+
+# Debug fields returned in "summary" mode (read by the MPC sensors).
+_SUMMARY_DEBUG_KEYS = (
+    "mpc_virtual_temp",
+    "mpc_gain",
+    "mpc_loss",
+    "mpc_ka",
+    "mpc_created_ts",
+    "trv_profile_conf",
+    "mpc_model_conf",
+)
 
 _STATE_EXPORT_FIELDS = (
     "last_percent",
@@ -184,6 +532,29 @@ _STATE_EXPORT_FIELDS = (
     "recent_errors",
     "regime_boost_active",
     "consecutive_insufficient_heat",
+    "rls_cov",
+    "rls_uses_ka",
+    "rls_samples",
+)
+
+# Learned model values blended into the per-TRV prior when a bucket is evicted.
+_PRIOR_MERGE_FIELDS = (
+    "gain_est",
+    "loss_est",
+    "ka_est",
+    "solar_gain_est",
+    "min_effective_percent",
+)
+# Values copied from the prior into a newly created bucket. The min-effective
+# floor is left to the sibling seeding, which honours its feature switch.
+_PRIOR_SEED_FIELDS = (
+    "gain_est",
+    "loss_est",
+    "ka_est",
+    "solar_gain_est",
+    "trv_profile",
+    "profile_confidence",
+    "profile_samples",
 )
 
 
@@ -193,6 +564,10 @@ def _serialize_state(state: _MpcState) -> dict[str, Any]:
         value = getattr(state, attr, None)
         if value is None:
             continue
+        if isinstance(value, (_ErrorRing, array)):
+            value = list(value)
+        elif isinstance(value, _PerfCurve):
+            value = value.to_payload()
         payload[attr] = value
     return payload
 
@@ -201,22 +576,38 @@ def export_mpc_state_map(prefix: str | None = None) -> dict[str, dict[str, Any]]
     """Return a serializable mapping of MPC states, optionally filtered by key prefix."""
 
     exported: dict[str, dict[str, Any]] = {}
-    for key, state in _MPC_STATES.items():
-        if prefix is not None and not key.startswith(prefix):
-            continue
+    for key, state in _MPC_STATES.items_with_prefix(prefix):
         payload = _serialize_state(state)
         if payload:
+            last_used = _MPC_STATES.last_used(key)
+            if last_used is not None:
+                payload["last_used_ts"] = last_used
             exported[key] = payload
     return exported
 
 
-def import_mpc_state_map(state_map: Mapping[str, Mapping[str, Any]]) -> None:
-    """Hydrate MPC states from a previously exported mapping."""
+def import_mpc_state_map(
+    state_map: Mapping[str, Mapping[str, Any]],
+    policies: Mapping[str, BucketEvictionPolicy] | None = None,
+) -> None:
+    """Hydrate MPC states from a previously exported mapping.
+
+    Stale and surplus target buckets are evicted into the TRV priors once
+    the mapping is loaded, using the eviction policy of each TRV from
+    ``policies`` (entity_id -> policy; the default policy otherwise).
+    """
 
+    now = time()
+    stamps = last_used_stamps(state_map, now)
+    uids: set[str] = set()
     for key, payload in state_map.items():
         if not isinstance(payload, Mapping):
             continue
         state = _MPC_STATES.setdefault(key, _MpcState())
+        _MPC_STATES.touch(key, stamps[key])
+        parsed = _MPC_STATES.parse_key(key)
+        if parsed is not None:
+            uids.add(parsed[0])
         for attr in _STATE_EXPORT_FIELDS:
             if attr not in payload:
                 continue
@@ -224,14 +615,35 @@ def import_mpc_state_map(state_map: Mapping[str, Mapping[str, Any]]) -> None:
             if value is None:
                 setattr(state, attr, None)
                 continue
-            if attr == "perf_curve" and isinstance(value, Mapping):
-                setattr(state, attr, dict(value))
+            if attr == "perf_curve":
+                if isinstance(value, Mapping):
+                    try:
+                        state.perf_curve = _PerfCurve.from_payload(value)
+                    except (TypeError, ValueError):
+                        pass
+                continue
+            if attr == "recent_errors":
+                try:
+                    samples = [float(v) for v in value]
+                    state.recent_errors = _ErrorRing(
+                        samples, capacity=max(RECENT_ERRORS_CAPACITY, len(samples))
+                    )
+                except (TypeError, ValueError):
+                    pass
+                continue
+            if attr == "rls_cov":
+                try:
+                    cov = array("d", (float(v) for v in value))
+                except (TypeError, ValueError):
+                    continue
+                if len(cov) == 3:
+                    state.rls_cov = cov
                 continue
             try:
                 coerced: int | float | bool
-                if attr in ("dead_zone_hits", "loss_learn_count"):
+                if attr in ("dead_zone_hits", "loss_learn_count", "rls_samples"):
                     coerced = int(value)
-                elif attr == "is_calibration_active":
+                elif attr in ("is_calibration_active", "rls_uses_ka"):
                     coerced = bool(value)
                 else:
                     coerced = float(value)
@@ -239,15 +651,75 @@ def import_mpc_state_map(state_map: Mapping[str, Mapping[str, Any]]) -> None:
                 continue
             setattr(state, attr, coerced)
 
+    policy = MpcParams().bucket_eviction
+    for uid in uids:
+        _MPC_STATES.evict_all(
+            policy,
+            now,
+            uid=uid,
+            factory=_MpcState,
+            merge=_merge_into_prior,
+            policies=policies,
+        )
 
-def _curve_bin_label(percent: float, bin_pct: float) -> str:
-    bin_pct = max(1.0, float(bin_pct))
-    p = max(0.0, min(100.0, float(percent)))
-    lo = math.floor(p / bin_pct) * bin_pct
-    hi = min(100.0, lo + bin_pct)
-    if bin_pct.is_integer():
-        return f"p{int(lo):02d}_{int(hi):02d}"
-    return f"p{lo:.1f}_{hi:.1f}"
+
+def _merge_into_prior(prior: _MpcState, evicted: _MpcState) -> None:
+    """Fold the learned model of an evicted bucket into the TRV prior.
+
+    Each eviction moves the prior halfway towards the evicted bucket (an
+    exponential average with weight 0.5), so the prior follows the most
+    recently evicted buckets while older ones fade out.
+    """
+
+    for attr in _PRIOR_MERGE_FIELDS:
+        value = getattr(evicted, attr)
+        if value is None:
+            continue
+        current = getattr(prior, attr)
+        merged = float(value) if current is None else 0.5 * (current + float(value))
+        setattr(prior, attr, merged)
+    if evicted.profile_confidence > prior.profile_confidence:
+        prior.trv_profile = evicted.trv_profile
+        prior.profile_confidence = evicted.profile_confidence
+        prior.profile_samples = evicted.profile_samples
+
+
+def _new_mpc_bucket(key: str, params: MpcParams, now: float) -> _MpcState:
+    """Create the state of a new target bucket and evict old buckets.
+
+    The new state starts from the TRV prior (if any) instead of the
+    defaults, so a bucket that was evicted earlier does not relearn from
+    scratch when the room returns to that target.
+    """
+
+    state = _MpcState()
+    prior_key = _MPC_STATES.prior_key(key)
+    prior = _MPC_STATES.get(prior_key) if prior_key is not None else None
+    if prior is not None:
+        for attr in _PRIOR_SEED_FIELDS:
+            setattr(state, attr, getattr(prior, attr))
+    _MPC_STATES[key] = state
+    _MPC_STATES.touch(key, now)
+
+    parsed = _MPC_STATES.parse_key(key)
+    if parsed is not None:
+        policy = getattr(params, "bucket_eviction", None) or BucketEvictionPolicy()
+        evicted = _MPC_STATES.evict(
+            parsed[0],
+            parsed[1],
+            policy,
+            now,
+            keep=key,
+            factory=_MpcState,
+            merge=_merge_into_prior,
+        )
+        if evicted:
+            _LOGGER.debug(
+                "better_thermostat: MPC evicted %d bucket(s) into prior %s",
+                len(evicted),
+                prior_key,
+            )
+    return state
 
 
 def _update_perf_curve(
@@ -286,8 +758,13 @@ def _update_perf_curve(
     else:
         u_avg_pct = float(state.last_percent) if state.last_percent is not None else 0.0
 
-    bin_pct = float(getattr(params, "perf_curve_bin_pct", 5.0))
-    label = _curve_bin_label(u_avg_pct, bin_pct)
+    # The bin size is fixed when the curve is first allocated.
+    curve = state.perf_curve
+    if curve is None:
+        curve = state.perf_curve = _PerfCurve(
+            float(getattr(params, "perf_curve_bin_pct", 5.0))
+        )
+    idx = curve.bin_index(u_avg_pct)
 
     trv_rate = None
     if inp.trv_temp_C is not None and state.last_trv_temp is not None:
@@ -296,68 +773,32 @@ def _update_perf_curve(
 
     temp_error = float(inp.target_temp_C) - float(inp.current_temp_C)
 
-    stats = state.perf_curve.setdefault(
-        label,
-        {
-            "count": 0,
-            "avg_room_rate": 0.0,
-            "avg_trv_rate": 0.0,
-            "avg_percent": 0.0,
-            "avg_temp_error": 0.0,
-        },
-    )
-
-    count = int(stats.get("count", 0)) + 1
-    stats["count"] = count
-    stats["avg_room_rate"] = (
-        stats.get("avg_room_rate", 0.0)
-        + (room_rate - stats.get("avg_room_rate", 0.0)) / count
-    )
-    if trv_rate is not None:
-        stats["avg_trv_rate"] = (
-            stats.get("avg_trv_rate", 0.0)
-            + (trv_rate - stats.get("avg_trv_rate", 0.0)) / count
-        )
-    stats["avg_percent"] = (
-        stats.get("avg_percent", 0.0)
-        + (float(u_avg_pct) - stats.get("avg_percent", 0.0)) / count
-    )
-    stats["avg_temp_error"] = (
-        stats.get("avg_temp_error", 0.0)
-        + (temp_error - stats.get("avg_temp_error", 0.0)) / count
-    )
+    curve.update(idx, room_rate, trv_rate, float(u_avg_pct), temp_error)
 
-    extra_debug["perf_curve_bin"] = label
+    extra_debug["perf_curve_bin"] = idx
     extra_debug["perf_room_rate"] = _round_for_debug(room_rate, 4)
 
     state.last_room_temp_C = float(inp.current_temp_C)
     state.last_room_temp_ts = now
 
 
-def _split_mpc_key(key: str) -> tuple[str | None, str | None, str | None]:
-    try:
-        uid, entity, bucket = key.split(":", 2)
-        return uid, entity, bucket
-    except ValueError:
-        return None, None, None
-
-
 def _seed_state_from_siblings(key: str, state: _MpcState, params: MpcParams) -> None:
     if not bool(getattr(params, "enable_min_effective_percent", True)):
         return
     if state.min_effective_percent is not None:
         return
-    uid, entity, _ = _split_mpc_key(key)
+    parsed = _MPC_STATES.parse_key(key)
+    if parsed is None:
+        return
+    uid, entity, _ = parsed
     if not uid or not entity:
         return
-    for other_key, other_state in _MPC_STATES.items():
+    for other_key, other_state in _MPC_STATES.items_for_entity(uid, entity):
         if other_key == key:
             continue
-        ouid, oentity, _ = _split_mpc_key(other_key)
-        if ouid == uid and oentity == entity:
-            if other_state.min_effective_percent is not None:
-                state.min_effective_percent = other_state.min_effective_percent
-                return
+        if other_state.min_effective_percent is not None:
+            state.min_effective_percent = other_state.min_effective_percent
+            return
 
 
 def build_mpc_key(bt, entity_id: str) -> str:
@@ -377,36 +818,192 @@ def build_mpc_key(bt, entity_id: str) -> str:
     return f"{uid}:{entity_id}:{bucket}"
 
 
-def _detect_regime_change(recent_errors: list[float]) -> bool:
+def build_mpc_room_key(bt) -> str:
+    """Return the MPC state key of the room-level model of a BT entity."""
+
+    return build_mpc_key(bt, MPC_ROOM_ENTITY)
+
+
+def _detect_regime_change(recent_errors: _ErrorRing) -> bool:
     """Detect systematic bias in prediction errors using Student's t-test.
 
     If the mean error deviates significantly from 0 relative to standard deviation,
     it indicates a regime change (e.g. window opened, weather change).
-    Adaptation should be boosted.
+    Adaptation should be boosted. The ring maintains the window moments, so
+    this is O(1).
     """
-    N = 10
-    if len(recent_errors) < N:
+    t_stat = recent_errors.t_statistic()
+    if t_stat is None:
         return False
 
-    # Check last N errors
-    errors_to_check = recent_errors[-N:]
-    mean_error = sum(errors_to_check) / N
+    # Threshold > 2.0 is significant (approx 95% confidence)
+    return t_stat > 2.0
 
-    # Std deviation
-    try:
-        variance = sum((e - mean_error) ** 2 for e in errors_to_check) / N
-        std_error = variance**0.5
-    except Exception:
-        return False
 
-    if std_error == 0:
-        return False
+def _exact_first_order_delta(
+    temp_C: float, heat_rate: float, ka: float, outdoor_C: float, dt_min: float
+) -> float:
+    """Return the exact temperature change of dT/dt = heat_rate - ka*(T - T_out).
 
-    # t-statistic: how many std-devs is the mean away from 0?
-    t_stat = abs(mean_error) / (std_error / (N**0.5))
+    The input is held over ``dt_min`` minutes. ``expm1`` keeps the result
+    accurate for tiny ``ka * dt_min``; ka <= 0 reduces to a linear ramp.
+    """
 
-    # Threshold > 2.0 is significant (approx 95% confidence)
-    return t_stat > 2.0
+    drift = heat_rate - ka * (temp_C - outdoor_C)
+    if ka <= 0.0:
+        return drift * dt_min
+    return drift * (-math.expm1(-ka * dt_min) / ka)
+
+
+def _rls_initial_cov(params: MpcParams, uses_ka: bool) -> tuple[float, float]:
+    """Return the prior variances of gain and loss (or ka).
+
+    The prior standard deviation is half the allowed parameter range; ka is
+    scaled by a typical 10 K indoor/outdoor difference.
+    """
+
+    sd_gain = 0.5 * (params.mpc_gain_max - params.mpc_gain_min)
+    sd_loss = 0.5 * (params.mpc_loss_max - params.mpc_loss_min)
+    if uses_ka:
+        sd_loss /= 10.0
+    return sd_gain * sd_gain, sd_loss * sd_loss
+
+
+def _rls_confidence(state: _MpcState, params: MpcParams) -> float | None:
+    """Return 0..1 model confidence from the RLS covariance.
+
+    It is the share of the prior standard deviation removed for the least
+    certain parameter.
+    """
+
+    if state.rls_cov is None:
+        return None
+    p00_0, p11_0 = _rls_initial_cov(params, state.rls_uses_ka)
+    ratio = max(
+        math.sqrt(max(0.0, state.rls_cov[0]) / p00_0),
+        math.sqrt(max(0.0, state.rls_cov[2]) / p11_0),
+    )
+    return max(0.0, min(1.0, 1.0 - ratio))
+
+
+def _rls_adapt(
+    inp: MpcInput,
+    params: MpcParams,
+    state: _MpcState,
+    now: float,
+    current_temp_C: float,
+    target_temp_C: float,
+    dt_last: float,
+) -> dict[str, Any]:
+    """Update gain and loss (or ka) with one recursive least-squares step.
+
+    Model: dT/dt = gain * u - loss, or gain * u - ka * (T - T_out) when an
+    outdoor temperature is known. A sample spans from the learning anchor to
+    the next sensor change (bounded by ``mpc_rls_min_sample_s`` and
+    ``mpc_rls_max_sample_s``) and uses the time-weighted valve opening over
+    that span. The 2x2 covariance is updated in O(p^2) with exponential
+    forgetting and clipped to the prior so it cannot wind up while the
+    valve input does not excite the model.
+    """
+
+    if state.last_learn_temp is None or dt_last <= 0:
+        return {}
+    delta_T = float(current_temp_C) - float(state.last_learn_temp)
+    temp_changed = abs(delta_T) >= float(
+        getattr(params, "mpc_temp_change_threshold_C", 0.05)
+    )
+    if dt_last < float(getattr(params, "mpc_rls_min_sample_s", 120.0)) or (
+        not temp_changed
+        and dt_last < float(getattr(params, "mpc_rls_max_sample_s", 1800.0))
+    ):
+        return {}
+
+    def reset_anchor() -> None:
+        state.last_learn_time = now
+        state.last_learn_temp = current_temp_C
+        state.u_integral = 0.0
+        state.time_integral = 0.0
+
+    target_changed = (
+        state.last_target_C is not None
+        and abs(float(target_temp_C) - float(state.last_target_C)) >= 0.05
+    )
+    dt_min = dt_last / 60.0
+    observed_rate = delta_T / dt_min
+    max_abs_rate = float(getattr(params, "mpc_max_abs_rate_C_per_min", 0.35))
+    if target_changed or abs(observed_rate) > max_abs_rate:
+        reset_anchor()
+        return {"id_estimator": "rls", "id_rls_skipped": True}
+
+    if state.time_integral > 0:
+        u_avg_pct = state.u_integral / state.time_integral
+    else:
+        u_avg_pct = state.last_percent if state.last_percent is not None else 0.0
+    u = max(0.0, min(100.0, float(u_avg_pct))) / 100.0
+
+    uses_ka = inp.outdoor_temp_C is not None
+    p00_0, p11_0 = _rls_initial_cov(params, uses_ka)
+    gain = float(
+        state.gain_est if state.gain_est is not None else params.mpc_thermal_gain
+    )
+    loss = float(
+        state.loss_est if state.loss_est is not None else params.mpc_loss_coeff
+    )
+    mean_temp = 0.5 * (float(current_temp_C) + float(state.last_learn_temp))
+    if uses_ka:
+        delta_out = max(5.0, mean_temp - float(inp.outdoor_temp_C))
+        second = float(state.ka_est) if state.ka_est is not None else loss / delta_out
+        phi = (u, -(mean_temp - float(inp.outdoor_temp_C)))
+    else:
+        second = loss
+        phi = (u, -1.0)
+
+    cov = state.rls_cov
+    if cov is None:
+        cov = state.rls_cov = array("d", (p00_0, 0.0, p11_0))
+    elif state.rls_uses_ka != uses_ka:
+        # The second parameter changed meaning: restart its uncertainty.
+        cov[1] = 0.0
+        cov[2] = p11_0
+    state.rls_uses_ka = uses_ka
+
+    lam = max(0.9, min(1.0, float(getattr(params, "mpc_rls_forgetting", 0.995))))
+    noise = max(1e-12, float(getattr(params, "mpc_rls_noise_var", 1e-4)))
+    p00, p01, p11 = cov
+    p_phi0 = p00 * phi[0] + p01 * phi[1]
+    p_phi1 = p01 * phi[0] + p11 * phi[1]
+    denom = lam * noise + phi[0] * p_phi0 + phi[1] * p_phi1
+    k0, k1 = p_phi0 / denom, p_phi1 / denom
+    err = observed_rate - (gain * phi[0] + second * phi[1])
+    gain += k0 * err
+    second += k1 * err
+    p00 = min(p00_0, (p00 - k0 * p_phi0) / lam)
+    p11 = min(p11_0, (p11 - k1 * p_phi1) / lam)
+    p01 = (p01 - k0 * p_phi1) / lam
+    bound = math.sqrt(max(0.0, p00 * p11))
+    cov[0], cov[1], cov[2] = p00, max(-bound, min(bound, p01)), p11
+
+    state.gain_est = max(params.mpc_gain_min, min(params.mpc_gain_max, gain))
+    if uses_ka:
+        state.ka_est = max(0.0, min(params.mpc_loss_max / 5.0, second))
+        state.loss_est = max(
+            params.mpc_loss_min, min(params.mpc_loss_max, state.ka_est * delta_out)
+        )
+    else:
+        state.loss_est = max(params.mpc_loss_min, min(params.mpc_loss_max, second))
+    state.rls_samples += 1
+    state.recent_errors.append(err)
+    reset_anchor()
+
+    return {
+        "id_estimator": "rls",
+        "id_rate": _round_for_debug(observed_rate, 4),
+        "id_u_last": _round_for_debug(u, 3),
+        "id_dt_min": _round_for_debug(dt_min, 3),
+        "id_rls_err": _round_for_debug(err, 5),
+        "id_rls_uses_ka": uses_ka,
+        "id_rls_samples": state.rls_samples,
+    }
 
 
 def _round_for_debug(value: Any, digits: int = 3) -> Any:
@@ -416,28 +1013,326 @@ def _round_for_debug(value: Any, digits: int = 3) -> Any:
         return value
 
 
+@dataclass
+class _PredictiveSetup:
+    """Adapted model and horizon problem for one key, awaiting a solve."""
+
+    problem: _HorizonProblem
+    gain: float
+    loss: float
+    current_temp_cost_C: float
+    temp_cost_source: str
+    use_virtual_temp: bool
+    last_percent: float | None
+    adapt_debug: dict[str, Any]
+    # RLS model confidence 0..1, None with the EMA estimator
+    model_conf: float | None = None
+
+
+@dataclass
+class _HorizonSolution:
+    """Best du move found for a horizon problem."""
+
+    du_percent: float
+    cost: float
+    eval_count: int
+    solver: str
+
+
+@dataclass(slots=True)
+class _SolutionMemo:
+    """Last horizon solution of one key and its hit/miss counters."""
+
+    key: tuple[Any, ...] | None = None
+    solution: _HorizonSolution | None = None
+    stored_ts: float = 0.0
+    hits: int = 0
+    misses: int = 0
+
+
+@dataclass
+class _MpcCall:
+    """Working set of one input carried between the batch phases."""
+
+    inp: MpcInput
+    state: _MpcState
+    extra_debug: dict[str, Any]
+    percent: float
+    delta_t: float | None
+    initial_delta_t: float | None
+    full_debug: bool = True
+    setup: _PredictiveSetup | None = None
+    solution: _HorizonSolution | None = None
+
+
 def compute_mpc(inp: MpcInput, params: MpcParams) -> MpcOutput | None:
     """Run the predictive controller and emit a valve recommendation."""
 
+    return compute_mpc_batch([inp], params)[0]
+
+
+def compute_mpc_batch(
+    inputs: Sequence[MpcInput], params: MpcParams
+) -> list[MpcOutput | None]:
+    """Run the predictive controller for many keys in one call.
+
+    Valve integration, virtual temperature and model adaptation run per key
+    first, then the horizon searches of all keys are solved together and the
+    results are scattered back in input order. Inputs sharing a key are
+    handled in successive rounds so each sees the state left by the previous.
+    """
+
     now = monotonic()
-    state = _MPC_STATES.setdefault(inp.key, _MpcState())
+    outputs: list[MpcOutput | None] = []
+    pending: list[_MpcCall] = []
+    pending_keys: set[str] = set()
+
+    def flush() -> None:
+        solving = [
+            call
+            for call in pending
+            if call.setup is not None and not _reuse_cached_solution(call, params, now)
+        ]
+        solutions = _solve_horizon_problems(
+            [call.setup.problem for call in solving if call.setup is not None], params
+        )
+        for call, solution in zip(solving, solutions):
+            call.solution = solution
+            _store_cached_solution(call, now)
+        outputs.extend(_finish_mpc(call, params, now) for call in pending)
+        pending.clear()
+        pending_keys.clear()
+
+    for inp in inputs:
+        if inp.key in pending_keys:
+            flush()
+        pending.append(_begin_mpc(inp, params, now))
+        pending_keys.add(inp.key)
+    flush()
+    return outputs
+
+
+def compute_mpc_room(
+    room_inp: MpcInput, trv_inputs: Sequence[MpcInput], params: MpcParams
+) -> list[MpcOutput | None]:
+    """Solve one room model and split its demand across the room's TRVs.
+
+    ``room_inp`` carries the shared room inputs under the room key (see
+    ``build_mpc_room_key``); adaptation and the horizon search run once for
+    it. Each TRV input then only goes through the allocation, its own
+    post-processing (hold time, min-effective clamp, dead-zone detection)
+    and perf-curve update, so a room with N radiators costs one solve.
+    Outputs follow ``trv_inputs`` order and carry the room model debug.
+    """
+
+    room_out = compute_mpc(
+        room_inp, replace(params, enable_min_effective_percent=False)
+    )
+    if room_out is None:
+        return [None] * len(trv_inputs)
+
+    now = monotonic()
+    states = [_get_mpc_state(inp.key, params) for inp in trv_inputs]
+    use_min_eff = bool(getattr(params, "enable_min_effective_percent", True))
+    slopes = [
+        state.perf_curve.response_slope() if state.perf_curve is not None else None
+        for state in states
+    ]
+    known = [slope for slope in slopes if slope is not None]
+    mean_slope = sum(known) / len(known) if known else 1.0
+    weights = [
+        max(0.25, min(4.0, slope / mean_slope)) if slope is not None else 1.0
+        for slope in slopes
+    ]
+    shares = _allocate_room_demand(
+        float(room_out.valve_percent),
+        weights,
+        [
+            float(state.min_effective_percent or 0.0) if use_min_eff else 0.0
+            for state in states
+        ],
+    )
+
+    # The room output is already rate-limited; only TRV-specific rules apply.
+    trv_params = replace(params, percent_hysteresis_pts=0.0, mpc_du_max_pct=0.0)
+    outputs: list[MpcOutput | None] = []
+    for inp, state, weight, allocated in zip(trv_inputs, states, weights, shares):
+        full_debug = wants_full_debug(inp.debug_level, _LOGGER)
+        _integrate_valve_usage(state, now)
+        share = 0.0 if not inp.heating_allowed or inp.window_open else allocated
+        percent_out, debug, _ = _post_process_percent(
+            inp=inp,
+            params=trv_params,
+            state=state,
+            now=now,
+            raw_percent=share,
+            delta_t=None,
+            full_debug=full_debug,
+        )
+        _update_perf_curve(
+            state=state, inp=inp, params=params, now=now, extra_debug=debug
+        )
+        if state.last_room_temp_ts == now:
+            # A perf-curve window was consumed; start the next average.
+            state.u_integral = 0.0
+            state.time_integral = 0.0
+        merged = dict(room_out.debug)
+        merged.update(debug)
+        merged.update(
+            {
+                "mpc_room_demand_pct": room_out.valve_percent,
+                "mpc_room_share_pct": _round_for_debug(share, 2),
+                "mpc_room_weight": _round_for_debug(weight, 3),
+                "percent_out": percent_out,
+            }
+        )
+        outputs.append(
+            MpcOutput(
+                valve_percent=percent_out,
+                debug=shape_debug(merged, inp.debug_level, _SUMMARY_DEBUG_KEYS),
+            )
+        )
+    return outputs
+
+
+def _allocate_room_demand(
+    demand_pct: float, weights: Sequence[float], min_effective: Sequence[float]
+) -> list[float]:
+    """Split a room opening demand into per-TRV openings.
+
+    The demand is the opening that all TRVs together would need at unit
+    weight, i.e. ``demand_pct * sum(weights)`` weighted percent of heat.
+    TRVs are filled strongest first: the largest set of TRVs whose common
+    opening clears all their dead zones runs; the others stay closed. With
+    equal weights and no dead zones every TRV gets ``demand_pct``.
+    """
+
+    shares = [0.0] * len(weights)
+    heat = max(0.0, demand_pct) * sum(weights)
+    if heat <= 0.0 or not weights:
+        return shares
+    order = sorted(range(len(weights)), key=lambda i: weights[i], reverse=True)
+    for count in range(len(order), 0, -1):
+        active = order[:count]
+        opening = heat / sum(weights[i] for i in active)
+        floor = max(min_effective[i] for i in active)
+        if count == 1 or opening >= floor:
+            # A single TRV below its dead zone still opens to it, as the
+            # min-effective clamp of the per-TRV path would.
+            opening = min(100.0, max(opening, floor))
+            for i in active:
+                shares[i] = opening
+            break
+    return shares
+
+
+def _solution_cache_key(problem: _HorizonProblem, params: MpcParams) -> tuple[Any, ...]:
+    """Return the quantised solver inputs that determine a horizon solution.
+
+    Temperatures are rounded to 0.01 K; model estimates, the previous
+    opening and the penalties are compared exactly since they only change
+    on adaptation or a new command.
+    """
+
+    def q(value: float | None) -> float | None:
+        return None if value is None else round(value, 2)
+
+    return (
+        q(problem.start_temp_C),
+        q(problem.target_temp_C),
+        q(problem.outdoor_temp_C),
+        problem.horizon,
+        problem.step_minutes,
+        problem.gain_step,
+        problem.heat_offset_step,
+        problem.loss_step,
+        problem.ka_loss,
+        problem.u0_frac,
+        problem.last_du,
+        problem.control_pen,
+        problem.change_pen,
+        problem.eco_pen,
+        problem.warm_du_pct,
+        problem.move_blocks,
+        problem.exact,
+        None
+        if problem.outdoor_traj is None
+        else tuple(round(v, 2) for v in problem.outdoor_traj),
+        problem.solar_traj,
+        str(getattr(params, "mpc_solver", "grid")).lower(),
+        bool(getattr(params, "mpc_warm_start", False)),
+        int(getattr(params, "mpc_warm_start_radius_pct", 3)),
+        int(getattr(params, "mpc_warm_start_max_radius_pct", 24)),
+    )
+
+
+def _reuse_cached_solution(call: _MpcCall, params: MpcParams, now: float) -> bool:
+    """Attach the memoised solution of the call's key if it is still valid.
+
+    Returns True on a hit; the horizon search is skipped then, while the
+    valve integration, virtual temperature and adaptation already ran in
+    ``_begin_mpc``.
+    """
+
+    if call.setup is None or not bool(getattr(params, "mpc_solution_cache", True)):
+        return False
+    memo = call.state.solution_memo
+    if memo is None:
+        memo = call.state.solution_memo = _SolutionMemo()
+    key = _solution_cache_key(call.setup.problem, params)
+    if (
+        memo.solution is not None
+        and memo.key == key
+        and now - memo.stored_ts < float(params.min_update_interval_s)
+    ):
+        memo.hits += 1
+        call.solution = _HorizonSolution(
+            memo.solution.du_percent, memo.solution.cost, 0, "cache"
+        )
+        return True
+    memo.misses += 1
+    memo.key = key
+    return False
+
+
+def _store_cached_solution(call: _MpcCall, now: float) -> None:
+    """Remember a freshly solved horizon solution for its key."""
+
+    memo = call.state.solution_memo
+    if memo is None or call.solution is None:
+        return
+    memo.solution = call.solution
+    memo.stored_ts = now
+
+
+def _get_mpc_state(key: str, params: MpcParams) -> _MpcState:
+    """Return the state of a key, creating its bucket on first use."""
+
+    wall_now = time()
+    state = _MPC_STATES.get(key)
+    if state is None:
+        state = _new_mpc_bucket(key, params, wall_now)
+    _MPC_STATES.touch(key, wall_now)
     if state.created_ts == 0.0:
         # For existing trained models, backdate the creation timestamp
         # to avoid "Training" status if we already have confidence.
         if state.profile_confidence > 0.5:
-            state.created_ts = time() - 90000.0
+            state.created_ts = wall_now - 90000.0
         else:
-            state.created_ts = time()
+            state.created_ts = wall_now
 
-    _seed_state_from_siblings(inp.key, state, params)
+    _seed_state_from_siblings(key, state, params)
+    return state
 
-    if inp.window_open:
-        state.last_window_open_ts = now
 
-    # --- INTEGRATE VALVE USAGE ---
-    # We track the time-weighted average of the valve position since the last learning step.
-    # This ensures that if the valve moved during the learning interval (e.g. due to manual changes
-    # or frequent updates), we learn from the average power applied, not just the last value.
+def _integrate_valve_usage(state: _MpcState, now: float) -> None:
+    """Accumulate the time-weighted valve opening since the last learning step.
+
+    If the valve moved during the learning interval (e.g. due to manual
+    changes or frequent updates), learning uses the average power applied,
+    not just the last value.
+    """
+
     if state.last_integration_ts > 0.0:
         dt_int = now - state.last_integration_ts
         if dt_int > 0 and state.last_percent is not None:
@@ -445,25 +1340,38 @@ def compute_mpc(inp: MpcInput, params: MpcParams) -> MpcOutput | None:
             state.time_integral += dt_int
     state.last_integration_ts = now
 
+
+def _begin_mpc(inp: MpcInput, params: MpcParams, now: float) -> _MpcCall:
+    """Update per-key state and prepare the horizon problem for one input."""
+
+    state = _get_mpc_state(inp.key, params)
+
+    if inp.window_open:
+        state.last_window_open_ts = now
+
+    _integrate_valve_usage(state, now)
+
     extra_debug: dict[str, Any] = {}
     name = inp.bt_name or "BT"
     entity = inp.entity_id or "unknown"
 
-    _LOGGER.debug(
-        "better_thermostat %s: MPC input (%s) target=%s current=%s trv=%s slope=%s window_open=%s allowed=%s last_percent=%s key=%s",
-        name,
-        entity,
-        _round_for_debug(inp.target_temp_C, 3),
-        _round_for_debug(inp.current_temp_C, 3),
-        _round_for_debug(inp.trv_temp_C, 3),
-        _round_for_debug(inp.temp_slope_K_per_min, 4),
-        inp.window_open,
-        inp.heating_allowed,
-        _round_for_debug(state.last_percent, 2),
-        inp.key,
-    )
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug(
+            "better_thermostat %s: MPC input (%s) target=%s current=%s trv=%s slope=%s window_open=%s allowed=%s last_percent=%s key=%s",
+            name,
+            entity,
+            _round_for_debug(inp.target_temp_C, 3),
+            _round_for_debug(inp.current_temp_C, 3),
+            _round_for_debug(inp.trv_temp_C, 3),
+            _round_for_debug(inp.temp_slope_K_per_min, 4),
+            inp.window_open,
+            inp.heating_allowed,
+            _round_for_debug(state.last_percent, 2),
+            inp.key,
+        )
 
     initial_delta_t: float | None = None
+    setup: _PredictiveSetup | None = None
 
     if not inp.heating_allowed or inp.window_open:
         percent = 0.0
@@ -589,8 +1497,24 @@ def compute_mpc(inp: MpcInput, params: MpcParams) -> MpcOutput | None:
                     gain = max(params.mpc_gain_min, min(params.mpc_gain_max, gain_est))
                     loss = max(params.mpc_loss_min, min(params.mpc_loss_max, loss_est))
 
-                    predicted_dT = gain * u * dt_min - loss * dt_min
-                    extra_debug["virtual_temp_predict"] = "model"
+                    if (
+                        bool(getattr(params, "mpc_exact_discretization", False))
+                        and state.ka_est is not None
+                        and inp.outdoor_temp_C is not None
+                    ):
+                        # Closed-form step across the whole gap, so long
+                        # sensor silences cost a single exp().
+                        predicted_dT = _exact_first_order_delta(
+                            float(state.virtual_temp),
+                            gain * u + float(inp.other_heat_power),
+                            float(state.ka_est),
+                            float(inp.outdoor_temp_C),
+                            dt_min,
+                        )
+                        extra_debug["virtual_temp_predict"] = "model_exact"
+                    else:
+                        predicted_dT = gain * u * dt_min - loss * dt_min
+                        extra_debug["virtual_temp_predict"] = "model"
 
                     gain_dbg = gain
                     loss_dbg = loss
@@ -749,8 +1673,36 @@ def compute_mpc(inp: MpcInput, params: MpcParams) -> MpcOutput | None:
         elif inp.target_temp_C is not None and inp.current_temp_C is not None:
             delta_t = inp.target_temp_C - inp.current_temp_C
         initial_delta_t = delta_t
-        percent, mpc_debug = _compute_predictive_percent(
-            inp, params, state, now, float(delta_t) if delta_t is not None else 0.0
+        percent = 0.0
+        setup = _prepare_predictive_problem(inp, params, state, now)
+
+    return _MpcCall(
+        inp=inp,
+        state=state,
+        extra_debug=extra_debug,
+        percent=percent,
+        delta_t=delta_t,
+        initial_delta_t=initial_delta_t,
+        full_debug=wants_full_debug(inp.debug_level, _LOGGER),
+        setup=setup,
+    )
+
+
+def _finish_mpc(call: _MpcCall, params: MpcParams, now: float) -> MpcOutput:
+    """Apply the horizon solution of one input and post-process the output."""
+
+    inp = call.inp
+    state = call.state
+    extra_debug = call.extra_debug
+    percent = call.percent
+    delta_t = call.delta_t
+    initial_delta_t = call.initial_delta_t
+    name = inp.bt_name or "BT"
+    entity = inp.entity_id or "unknown"
+
+    if call.setup is not None and call.solution is not None:
+        percent, mpc_debug = _finish_predictive_percent(
+            call.setup, call.solution, inp, state, now, full_debug=call.full_debug
         )
         # Keep any virtual-temp debug collected earlier and merge MPC debug on top.
         extra_debug.update(mpc_debug)
@@ -790,14 +1742,15 @@ def compute_mpc(inp: MpcInput, params: MpcParams) -> MpcOutput | None:
                             state.loss_learn_count,
                         )
 
-        _LOGGER.debug(
-            "better_thermostat %s: MPC raw output (%s) percent=%s delta_T=%s debug=%s",
-            name,
-            entity,
-            _round_for_debug(percent, 2),
-            _round_for_debug(delta_t, 3),
-            extra_debug,
-        )
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "better_thermostat %s: MPC raw output (%s) percent=%s delta_T=%s debug=%s",
+                name,
+                entity,
+                _round_for_debug(percent, 2),
+                _round_for_debug(delta_t, 3),
+                extra_debug,
+            )
 
     percent = max(0.0, min(100.0, percent))
     prev_percent = state.last_percent
@@ -809,6 +1762,7 @@ def compute_mpc(inp: MpcInput, params: MpcParams) -> MpcOutput | None:
         now=now,
         raw_percent=percent,
         delta_t=delta_t,
+        full_debug=call.full_debug,
     )
 
     debug.update(extra_debug)
@@ -817,59 +1771,79 @@ def compute_mpc(inp: MpcInput, params: MpcParams) -> MpcOutput | None:
 
     debug.update({"percent_out": percent_out})
 
-    summary_delta = delta_t if delta_t is not None else initial_delta_t
-    min_eff = state.min_effective_percent
-    summary_gain = extra_debug.get("mpc_gain")
-    summary_loss = extra_debug.get("mpc_loss")
-    summary_horizon = extra_debug.get("mpc_horizon")
-    summary_eval = extra_debug.get("mpc_eval_count")
-    summary_cost = extra_debug.get("mpc_cost")
-    summary_profile = debug.get("trv_profile")
-    summary_profile_conf = debug.get("trv_profile_conf")
-    summary_perf_bin = debug.get("perf_curve_bin")
-    summary_perf_rate = debug.get("perf_room_rate")
-
-    _LOGGER.debug(
-        "better_thermostat %s: mpc calibration for %s: e0=%sK gain=%s loss=%s horizon=%s | raw=%s%% out=%s%% min_eff=%s%% last=%s%% dead_hits=%s eval=%s cost=%s | trv_profile=%s conf=%s perf_bin=%s perf_rate=%s",
-        name,
-        entity,
-        _round_for_debug(summary_delta, 3),
-        _round_for_debug(summary_gain, 4),
-        _round_for_debug(summary_loss, 4),
-        summary_horizon,
-        _round_for_debug(percent, 2),
-        percent_out,
-        _round_for_debug(min_eff, 2) if min_eff is not None else None,
-        _round_for_debug(prev_percent, 2),
-        state.dead_zone_hits,
-        summary_eval,
-        _round_for_debug(summary_cost, 6),
-        summary_profile,
-        _round_for_debug(summary_profile_conf, 3),
-        summary_perf_bin,
-        _round_for_debug(summary_perf_rate, 4),
-    )
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        summary_delta = delta_t if delta_t is not None else initial_delta_t
+        min_eff = state.min_effective_percent
+        summary_gain = extra_debug.get("mpc_gain")
+        summary_loss = extra_debug.get("mpc_loss")
+        summary_horizon = extra_debug.get("mpc_horizon")
+        summary_eval = extra_debug.get("mpc_eval_count")
+        summary_cost = extra_debug.get("mpc_cost")
+        summary_profile = debug.get("trv_profile")
+        summary_profile_conf = debug.get("trv_profile_conf")
+        summary_perf_bin = debug.get("perf_curve_bin")
+        summary_perf_rate = debug.get("perf_room_rate")
+
+        _LOGGER.debug(
+            "better_thermostat %s: mpc calibration for %s: e0=%sK gain=%s loss=%s horizon=%s | raw=%s%% out=%s%% min_eff=%s%% last=%s%% dead_hits=%s eval=%s cost=%s | trv_profile=%s conf=%s perf_bin=%s perf_rate=%s",
+            name,
+            entity,
+            _round_for_debug(summary_delta, 3),
+            _round_for_debug(summary_gain, 4),
+            _round_for_debug(summary_loss, 4),
+            summary_horizon,
+            _round_for_debug(percent, 2),
+            percent_out,
+            _round_for_debug(min_eff, 2) if min_eff is not None else None,
+            _round_for_debug(prev_percent, 2),
+            state.dead_zone_hits,
+            summary_eval,
+            _round_for_debug(summary_cost, 6),
+            summary_profile,
+            _round_for_debug(summary_profile_conf, 3),
+            summary_perf_bin,
+            _round_for_debug(summary_perf_rate, 4),
+        )
 
+    debug = shape_debug(debug, inp.debug_level, _SUMMARY_DEBUG_KEYS)
     return MpcOutput(valve_percent=percent_out, debug=debug)
 
 
 def _compute_predictive_percent(
     inp: MpcInput, params: MpcParams, state: _MpcState, now: float, delta_t: float
 ) -> tuple[float, dict[str, Any]]:
-    """Core MPC minimisation routine.
+    """Core MPC minimisation routine for a single key.
+
+    See ``_prepare_predictive_problem`` for the model; batched callers run
+    the prepare, solve and finish phases separately.
+    """
+
+    # Defensive checks
+    if inp.current_temp_C is None or inp.target_temp_C is None:
+        return 0.0, {"error": "missing temps"}
+
+    # delta_t is kept for API/backward compatibility (pre-u0 versions used it)
+    _ = delta_t
+
+    setup = _prepare_predictive_problem(inp, params, state, now)
+    solution = _solve_horizon_problems([setup.problem], params)[0]
+    return _finish_predictive_percent(setup, solution, inp, state, now)
+
+
+def _prepare_predictive_problem(
+    inp: MpcInput, params: MpcParams, state: _MpcState, now: float
+) -> _PredictiveSetup:
+    """Adapt the model of one key and build its horizon problem.
 
     Overhauled to use a physically consistent temperature-forward model:
     - gain and loss are treated as °C/min and converted to °C/step
     - temperature is simulated forward (°C) rather than multiplying the error
     - quadratic cost (sum of squared errors) is used
-    - coarse -> fine candidate search to reduce evals
+    - coarse -> fine candidate search, or the exact analytic minimiser
+      when ``mpc_solver == "analytic"``
     - adaptation uses EMA but in physical units (°C/min)
     """
 
-    # Defensive checks
-    if inp.current_temp_C is None or inp.target_temp_C is None:
-        return 0.0, {"error": "missing temps"}
-
     assert inp.current_temp_C is not None
     assert inp.target_temp_C is not None
 
@@ -891,9 +1865,6 @@ def _compute_predictive_percent(
 
     use_virtual_temp = bool(getattr(params, "use_virtual_temp", True))
 
-    # delta_t is kept for API/backward compatibility (pre-u0 versions used it)
-    _ = delta_t
-
     if state.last_learn_time is None:
         state.last_learn_time = now
         state.last_learn_temp = current_temp_cost_C
@@ -941,7 +1912,12 @@ def _compute_predictive_percent(
     # ---- ADAPTATION (rate-based identification) ----
     # Model: dT/dt ~= gain * u - loss, where gain/loss are in °C/min and u in [0..1]
     adapt_debug: dict[str, Any] = {}
-    if params.mpc_adapt and state.last_learn_temp is not None and dt_last >= 180.0:
+    use_rls = str(getattr(params, "mpc_estimator", "ema")).lower() == "rls"
+    if params.mpc_adapt and use_rls:
+        adapt_debug = _rls_adapt(
+            inp, params, state, now, current_temp_cost_C, target_temp_C, dt_last
+        )
+    elif params.mpc_adapt and state.last_learn_temp is not None and dt_last >= 180.0:
         try:
             if state.last_residual_time is None:
                 state.last_residual_time = state.last_learn_time or now
@@ -1065,13 +2041,14 @@ def _compute_predictive_percent(
             pred_error = observed_rate - predicted_rate
 
             # Only track errors when conditions are stable (common_ok)
+            # The ring keeps the last RECENT_ERRORS_CAPACITY samples.
             if common_ok:
                 state.recent_errors.append(pred_error)
-                # Keep last 20 samples
-                if len(state.recent_errors) > 20:
-                    state.recent_errors.pop(0)
 
             # Check for regime change
+            state.recent_errors.set_window(
+                int(getattr(params, "mpc_regime_window", REGIME_WINDOW))
+            )
             is_regime_change = _detect_regime_change(state.recent_errors)
             if is_regime_change and not state.regime_boost_active:
                 state.regime_boost_active = True
@@ -1377,6 +2354,15 @@ def _compute_predictive_percent(
     # )
     solar_gain_factor = 0.0
 
+    outdoor_traj = _forecast_trajectory(
+        inp.outdoor_temp_forecast_C, horizon, inp.outdoor_temp_C
+    )
+    solar_traj = (
+        _forecast_trajectory(inp.solar_intensity_forecast, horizon, None)
+        if solar_gain_factor > 0.0
+        else None
+    )
+
     gain_step = gain * step_minutes
     loss_step = loss * step_minutes
     # solar_step = (
@@ -1418,86 +2404,130 @@ def _compute_predictive_percent(
     eco_pen = max(0.0, float(getattr(params, "mpc_eco_penalty", 0.0)))
     last_percent = state.last_percent if state.last_percent is not None else None
 
-    # candidate search: coarse -> fine (reduces evals while keeping precision)
-    best_percent = 0.0
-    eval_count = 0
-
     other_heat_step = float(inp.other_heat_power) * step_minutes
 
-    def simulate_cost_for_candidate(u_abs_frac: float) -> float:
-        """Simulate forward temperature for constant u_abs_frac (0..1) over horizon and return cost."""
-        T = (
+    problem = _HorizonProblem(
+        start_temp_C=(
             float(state.virtual_temp)
             if use_virtual_temp and state.virtual_temp is not None
             else current_temp_cost_C
-        )
+        ),
+        target_temp_C=target_temp_C,
+        horizon=horizon,
+        step_minutes=step_minutes,
+        gain_step=gain_step,
+        other_heat_step=other_heat_step,
+        loss_step=loss_step,
+        ka_loss=(
+            float(state.ka_est)
+            if inp.outdoor_temp_C is not None and state.ka_est is not None
+            else None
+        ),
+        outdoor_temp_C=(
+            float(inp.outdoor_temp_C) if inp.outdoor_temp_C is not None else 0.0
+        ),
+        u0_frac=u0_frac,
+        last_du=(last_percent / 100.0) - u0_frac if last_percent is not None else None,
+        control_pen=control_pen,
+        change_pen=change_pen,
+        eco_pen=eco_pen,
+        warm_du_pct=_warm_start_du(
+            params, state, target_temp_C, u0_frac, last_percent, now
+        ),
+        move_blocks=max(0, min(horizon, int(getattr(params, "mpc_move_blocks", 0)))),
+        exact=bool(getattr(params, "mpc_exact_discretization", False)),
+        solar_step=solar_step,
+        outdoor_traj=outdoor_traj,
+        solar_traj=(
+            tuple(solar_gain_factor * s * step_minutes for s in solar_traj)
+            if solar_traj is not None
+            else None
+        ),
+    )
 
-        cost = 0.0
-        for _ in range(horizon):
-            # Physical forward model (°C/step): dT = gain_step * u_abs - loss_step.
-            # u0 is used only as the search center for du; it must not change the plant model.
+    return _PredictiveSetup(
+        problem=problem,
+        gain=gain,
+        loss=loss,
+        current_temp_cost_C=current_temp_cost_C,
+        temp_cost_source=temp_cost_source,
+        use_virtual_temp=use_virtual_temp,
+        last_percent=last_percent,
+        adapt_debug=adapt_debug,
+        model_conf=_rls_confidence(state, params),
+    )
 
-            if inp.outdoor_temp_C is not None and state.ka_est is not None:
-                # Dynamic loss based on outdoor temp
-                _loss_rate = float(state.ka_est) * (T - float(inp.outdoor_temp_C))
-                # _loss_rate = max(params.mpc_loss_min, min(params.mpc_loss_max, _loss_rate))
-                current_loss_step = _loss_rate * step_minutes
-            else:
-                current_loss_step = loss_step
-
-            heating = gain_step * u_abs_frac + other_heat_step + solar_step
-            T = T + heating - current_loss_step
-            e = target_temp_C - T
-            cost += e * e
-            if eco_pen > 0 and T > target_temp_C:
-                cost += eco_pen * u_abs_frac
-        return cost
 
-    # coarse search over du around u0
-    # du_pct is additive on a 0..100% scale and can be negative.
-    coarse_candidates = list(range(-100, 101, 5))
-    best_du_coarse = 0
-    best_cost_coarse = None
-    for cand in coarse_candidates:
-        du_frac = cand / 100.0
-        u_abs_frac = u0_frac + du_frac
-        # solver operates on du; clamp only for simulation validity
-        u_abs_frac = max(0.0, min(1.0, u_abs_frac))
-        cost = simulate_cost_for_candidate(u_abs_frac)
-        eval_count += horizon
-        # penalties
-        cost += control_pen * (du_frac * du_frac)
-        if last_percent is not None:
-            # change penalty should apply to absolute command change
-            last_du = (last_percent / 100.0) - u0_frac
-            cost += change_pen * abs(du_frac - last_du)
-            # cost += change_pen * abs(u_abs_frac - (last_percent / 100.0))
-        if best_cost_coarse is None or cost < best_cost_coarse:
-            best_cost_coarse = cost
-            best_du_coarse = cand
+def _forecast_trajectory(
+    forecast: Sequence[float] | None, horizon: int, anchor: float | None
+) -> tuple[float, ...] | None:
+    """Return a forecast vector stretched to the horizon.
 
-    # fine search around best coarse du ±5% in 1% steps
-    best_du_fine = best_du_coarse if best_du_coarse is not None else 0
-    best_cost_fine = best_cost_coarse if best_cost_coarse is not None else float("inf")
-    fine_lo = max(-100, best_du_coarse - 5)
-    fine_hi = min(100, best_du_coarse + 5)
-    for cand in range(fine_lo, fine_hi + 1, 1):
-        du_frac = cand / 100.0
-        u_abs_frac = u0_frac + du_frac
-        u_abs_frac = max(0.0, min(1.0, u_abs_frac))
-        cost = simulate_cost_for_candidate(u_abs_frac)
-        eval_count += horizon
-        cost += control_pen * (du_frac * du_frac)
-        if last_percent is not None:
-            last_du = (last_percent / 100.0) - u0_frac
-            cost += change_pen * abs(du_frac - last_du)
-            # cost += change_pen * abs(u_abs_frac - (last_percent / 100.0))
-        if cost < best_cost_fine:
-            best_cost_fine = cost
-            best_du_fine = cand
+    With an ``anchor`` (the measured value) the whole vector is shifted so
+    its first step matches it, which removes the offset between a local
+    sensor and the regional forecast.
+    """
+
+    if not forecast:
+        return None
+    try:
+        values = [float(v) for v in forecast[:horizon]]
+    except (TypeError, ValueError):
+        return None
+    values.extend([values[-1]] * (horizon - len(values)))
+    if anchor is not None:
+        bias = float(anchor) - values[0]
+        values = [v + bias for v in values]
+    return tuple(values)
+
+
+def _warm_start_du(
+    params: MpcParams,
+    state: _MpcState,
+    target_temp_C: float,
+    u0_frac: float,
+    last_percent: float | None,
+    now: float,
+) -> float | None:
+    """Return the previous optimum as du (percent) if a warm start is allowed."""
+
+    if not bool(getattr(params, "mpc_warm_start", False)) or last_percent is None:
+        return None
+    if (
+        state.last_target_C is None
+        or abs(target_temp_C - float(state.last_target_C)) >= 0.05
+    ):
+        return None
+    window_block_s = float(getattr(params, "mpc_adapt_window_block_s", 0.0))
+    if (
+        state.last_window_open_ts > 0
+        and now - state.last_window_open_ts < window_block_s
+    ):
+        return None
+    return float(last_percent) - u0_frac * 100.0
+
+
+def _finish_predictive_percent(
+    setup: _PredictiveSetup,
+    solution: _HorizonSolution,
+    inp: MpcInput,
+    state: _MpcState,
+    now: float,
+    full_debug: bool = True,
+) -> tuple[float, dict[str, Any]]:
+    """Turn a horizon solution into an absolute opening and MPC debug.
+
+    Without ``full_debug`` only the fields the sensors read are built.
+    """
+
+    problem = setup.problem
+    u0_frac = problem.u0_frac
+    du_percent = solution.du_percent
+    best_cost = solution.cost
+    last_percent = setup.last_percent
+    use_virtual_temp = setup.use_virtual_temp
 
     # result before postprocessing: convert du back to absolute percent around u0
-    du_percent = float(best_du_fine)
     u_abs_percent = (u0_frac * 100.0) + du_percent
     best_percent = u_abs_percent
 
@@ -1509,32 +2539,56 @@ def _compute_predictive_percent(
     )
     state.last_time = now
 
+    model_conf = _round_for_debug(setup.model_conf, 3)
+
+    if not full_debug:
+        return best_percent, {
+            "mpc_model_conf": model_conf,
+            "mpc_gain": _round_for_debug(setup.gain, 4),
+            "mpc_loss": _round_for_debug(setup.loss, 4),
+            "mpc_ka": _round_for_debug(state.ka_est, 5)
+            if state.ka_est is not None
+            else None,
+            "mpc_virtual_temp": (
+                f"{state.virtual_temp:.3f}" if state.virtual_temp is not None else None
+            ),
+        }
+
     # build debug
     mpc_debug = {
-        "mpc_gain": _round_for_debug(gain, 4),
-        "mpc_loss": _round_for_debug(loss, 4),
+        "mpc_model_conf": model_conf,
+        "mpc_gain": _round_for_debug(setup.gain, 4),
+        "mpc_loss": _round_for_debug(setup.loss, 4),
         "mpc_ka": _round_for_debug(state.ka_est, 5)
         if state.ka_est is not None
         else None,
         "mpc_u0_pct": _round_for_debug(u0_frac * 100.0, 3),
         "mpc_du_pct": _round_for_debug(du_percent, 3),
         "mpc_u_abs_pct": _round_for_debug(u_abs_percent, 3),
-        "mpc_horizon": horizon,
-        "mpc_eval_count": eval_count,
-        "mpc_step_minutes": _round_for_debug(step_minutes, 3),
-        "mpc_temp_cost_C": _round_for_debug(current_temp_cost_C, 3),
+        "mpc_horizon": problem.horizon,
+        "mpc_move_blocks": problem.move_blocks,
+        "mpc_solver": solution.solver,
+        "mpc_eval_count": solution.eval_count,
+        "mpc_cache_hits": state.solution_memo.hits
+        if state.solution_memo is not None
+        else None,
+        "mpc_cache_misses": state.solution_memo.misses
+        if state.solution_memo is not None
+        else None,
+        "mpc_step_minutes": _round_for_debug(problem.step_minutes, 3),
+        "mpc_temp_cost_C": _round_for_debug(setup.current_temp_cost_C, 3),
         "mpc_sensor_temp_C": _round_for_debug(inp.current_temp_C, 3),
-        "mpc_temp_cost_source": temp_cost_source,
+        "mpc_temp_cost_source": setup.temp_cost_source,
         "mpc_virtual_temp": (
             f"{state.virtual_temp:.3f}" if state.virtual_temp is not None else None
         ),
     }
 
-    if adapt_debug:
-        mpc_debug.update(adapt_debug)
+    if setup.adapt_debug:
+        mpc_debug.update(setup.adapt_debug)
 
-    if best_cost_fine is not None:
-        mpc_debug["mpc_cost"] = _round_for_debug(best_cost_fine, 6)
+    if best_cost is not None:
+        mpc_debug["mpc_cost"] = _round_for_debug(best_cost, 6)
 
     if last_percent is not None:
         mpc_debug["mpc_last_percent"] = _round_for_debug(last_percent, 2)
@@ -1542,6 +2596,637 @@ def _compute_predictive_percent(
     return best_percent, mpc_debug
 
 
+@dataclass
+class _HorizonProblem:
+    """Horizon search problem for one MPC call (all per-step quantities)."""
+
+    start_temp_C: float
+    target_temp_C: float
+    horizon: int
+    step_minutes: float
+    gain_step: float
+    other_heat_step: float
+    loss_step: float
+    ka_loss: float | None
+    outdoor_temp_C: float
+    u0_frac: float
+    last_du: float | None
+    control_pen: float
+    change_pen: float
+    eco_pen: float
+    # Centre of the warm-start trust region (du percent); None: full sweep.
+    warm_du_pct: float | None = None
+    # Number of blocked control moves; 0 keeps the step-by-step rollout.
+    move_blocks: int = 0
+    # Exact exponential discretisation of the ka model instead of Euler.
+    exact: bool = False
+    # Solar heat input per step; kept apart from other_heat_step so the
+    # rollout adds the terms in the same order as the original loop.
+    solar_step: float = 0.0
+    # Per-step outdoor temperature and solar input from forecasts; None holds
+    # outdoor_temp_C / solar_step for the whole horizon.
+    outdoor_traj: tuple[float, ...] | None = None
+    solar_traj: tuple[float, ...] | None = None
+    response: _StepResponse | None = field(default=None, repr=False, compare=False)
+
+    def horizon_costs(self, u_fracs: Sequence[float]) -> list[float]:
+        """Return the tracking + eco cost of each first opening over the horizon."""
+        return _rollout_costs([self] * len(u_fracs), u_fracs)
+
+    def outdoor_at(self, step: int) -> float:
+        """Return the outdoor temperature used for a horizon step."""
+        if self.outdoor_traj is None:
+            return self.outdoor_temp_C
+        return self.outdoor_traj[step]
+
+    @property
+    def heat_offset_step(self) -> float:
+        """Return the non-valve heat input per step without forecasts."""
+        return self.other_heat_step + self.solar_step
+
+    def heat_offset_at(self, step: int) -> float:
+        """Return the non-valve heat input of a horizon step."""
+        if self.solar_traj is None:
+            return self.heat_offset_step
+        return self.other_heat_step + self.solar_traj[step]
+
+    def ka_terms(self) -> tuple[float, float]:
+        """Return (decay rate per minute, input scale) of one horizon step.
+
+        With ``ka_loss`` set a step maps T to ``T + scale * h - rate *
+        step_minutes * (T - T_out)``, h being the per-step heat input. Euler
+        uses ``(ka, 1)``. The exact solution of the linear ODE with a held
+        input uses ``rate * step_minutes = 1 - exp(-ka * step_minutes)`` and
+        ``scale = (1 - exp(-ka * step_minutes)) / (ka * step_minutes)``.
+        """
+        ka = self.ka_loss
+        if ka is None:
+            return 0.0, 1.0
+        if not self.exact or ka <= 0.0:
+            return ka, 1.0
+        decay = ka * self.step_minutes
+        settled = -math.expm1(-decay)
+        return settled / self.step_minutes, settled / decay
+
+    def step_response(self) -> _StepResponse:
+        """Return the block step response, building it on first use."""
+        if self.response is None:
+            self.response = _StepResponse.from_problem(self, max(1, self.move_blocks))
+        return self.response
+
+    def move_penalty(self, du_frac: float) -> float:
+        """Return control and change penalties for a du (fraction) move."""
+        cost = self.control_pen * (du_frac * du_frac)
+        if self.last_du is not None:
+            # change penalty should apply to absolute command change
+            cost += self.change_pen * abs(du_frac - self.last_du)
+        return cost
+
+
+def _block_bounds(horizon: int, blocks: int) -> list[tuple[int, int]]:
+    """Split a horizon into move blocks whose lengths double towards the end.
+
+    The first block is the shortest so the applied move reacts fast, while
+    the later blocks only shape the long-range plan.
+    """
+
+    blocks = max(1, min(blocks, horizon))
+    total = 2**blocks - 1
+    bounds: list[tuple[int, int]] = []
+    start = 0
+    for j in range(blocks):
+        remaining = blocks - j - 1
+        if remaining == 0:
+            end = horizon
+        else:
+            end = round(horizon * (2 ** (j + 1) - 1) / total)
+            end = max(start + 1, min(horizon - remaining, end))
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+@dataclass(slots=True)
+class _StepResponse:
+    """Block step response of a horizon problem.
+
+    The forward model is affine in the openings, so the temperature after
+    step k is ``free[k] + sum_j columns[j][k] * u_j`` with one held opening
+    ``u_j`` per block. The tracking cost is the quadratic form
+    ``rr - 2 g.u + u.H.u`` whose terms are precomputed here, so costing a
+    candidate takes O(blocks^2) work instead of a rollout over the horizon.
+    """
+
+    target_temp_C: float
+    free: list[float]
+    columns: list[list[float]]
+    bounds: list[tuple[int, int]]
+    # Per block: free response, decay of the carried-in heat and own step
+    # response over the block's steps, plus earlier columns at its start.
+    segments: list[tuple[list[float], list[float], list[float], list[float]]]
+    rr: float
+    g: list[float]
+    hess: list[list[float]]
+
+    @classmethod
+    def from_problem(cls, problem: _HorizonProblem, blocks: int) -> _StepResponse:
+        """Precompute free response, block columns and quadratic terms."""
+
+        horizon = problem.horizon
+        bounds = _block_bounds(horizon, blocks)
+        ka_rate, scale = problem.ka_terms()
+        gain_step = problem.gain_step * scale
+        if problem.ka_loss is not None:
+            decay = ka_rate * problem.step_minutes
+            drift = [
+                problem.heat_offset_at(k) * scale + decay * problem.outdoor_at(k)
+                for k in range(horizon)
+            ]
+        else:
+            decay = 0.0
+            drift = [
+                problem.heat_offset_at(k) - problem.loss_step for k in range(horizon)
+            ]
+
+        free: list[float] = []
+        temp = problem.start_temp_C
+        for step_drift in drift:
+            temp = temp - decay * temp + step_drift
+            free.append(temp)
+
+        columns: list[list[float]] = []
+        for start, end in bounds:
+            column: list[float] = []
+            resp = 0.0
+            for k in range(horizon):
+                resp = resp - decay * resp
+                if start <= k < end:
+                    resp += gain_step
+                column.append(resp)
+            columns.append(column)
+
+        resid = [problem.target_temp_C - a for a in free]
+        return cls(
+            target_temp_C=problem.target_temp_C,
+            free=free,
+            columns=columns,
+            bounds=bounds,
+            segments=[
+                (
+                    free[start:end],
+                    [(1.0 - decay) ** m for m in range(1, end - start + 1)],
+                    columns[j][start:end],
+                    [col[start - 1] for col in columns[:j]],
+                )
+                for j, (start, end) in enumerate(bounds)
+            ],
+            rr=sum(r * r for r in resid),
+            g=[sum(r * b for r, b in zip(resid, col)) for col in columns],
+            hess=[
+                [sum(a * b for a, b in zip(col_i, col_j)) for col_j in columns]
+                for col_i in columns
+            ],
+        )
+
+    def plan(self, u_first: float, u0: float, control_pen: float) -> list[float]:
+        """Return block openings with the first one fixed to u_first.
+
+        The later blocks minimise tracking plus control cost within [0, 1]
+        by a few projected coordinate-descent sweeps. The eco penalty is left
+        out of the plan and only charged when the plan is costed.
+        """
+
+        moves = [u_first] * len(self.columns)
+        for _ in range(_PLAN_SWEEPS):
+            for j in range(1, len(moves)):
+                row = self.hess[j]
+                denom = row[j] + control_pen
+                if denom <= 0:
+                    continue
+                coupling = sum(h * u for h, u in zip(row, moves)) - row[j] * moves[j]
+                moves[j] = max(
+                    0.0, min(1.0, (self.g[j] - coupling + control_pen * u0) / denom)
+                )
+        return moves
+
+    def cost(self, moves: Sequence[float], eco_pen: float) -> float:
+        """Return the tracking + eco cost of a block plan."""
+
+        quad = sum(
+            u_i * sum(h * u_j for h, u_j in zip(row, moves))
+            for u_i, row in zip(moves, self.hess)
+        )
+        cost = max(
+            0.0, self.rr - 2.0 * sum(g * u for g, u in zip(self.g, moves)) + quad
+        )
+        if eco_pen > 0:
+            # Eco needs the actual crossings. Inside block j the earlier blocks
+            # only contribute their heat at the block start, decaying further.
+            target = self.target_temp_C
+            for u_block, (free, carry_decay, resp, entry) in zip(moves, self.segments):
+                carry = sum(c * u for c, u in zip(entry, moves))
+                hits = sum(
+                    1
+                    for f, q, r in zip(free, carry_decay, resp)
+                    if f + carry * q + u_block * r > target
+                )
+                cost += eco_pen * u_block * hits
+        return cost
+
+    def horizon_cost(
+        self, u_first: float, u0: float, control_pen: float, eco_pen: float
+    ) -> float:
+        """Return the cost of the best plan starting with opening u_first."""
+
+        moves = self.plan(u_first, u0, control_pen)
+        later = sum((u - u0) * (u - u0) for u in moves[1:])
+        return self.cost(moves, eco_pen) + control_pen * later
+
+
+# Coordinate-descent sweeps used to plan the later move blocks.
+_PLAN_SWEEPS = 4
+
+
+def _solve_horizon_problems(
+    problems: Sequence[_HorizonProblem], params: MpcParams
+) -> list[_HorizonSolution]:
+    """Solve the horizon problems of several keys with the configured solver.
+
+    The analytic solver handles a single held move only; with more than one
+    move block the grid (or warm-start) search is used instead.
+    """
+
+    solver = str(getattr(params, "mpc_solver", "grid")).lower()
+    if solver == "analytic" and int(getattr(params, "mpc_move_blocks", 0)) <= 1:
+        return [
+            _HorizonSolution(*_solve_du_analytic(problem), solver="analytic")
+            for problem in problems
+        ]
+    if not bool(getattr(params, "mpc_warm_start", False)):
+        return [
+            _HorizonSolution(*result, solver="grid")
+            for result in _solve_du_grid_batch(problems)
+        ]
+
+    warm, warm_evals = _solve_du_warm_batch(
+        problems,
+        int(getattr(params, "mpc_warm_start_radius_pct", 3)),
+        int(getattr(params, "mpc_warm_start_max_radius_pct", 24)),
+    )
+    fallback = [idx for idx, result in enumerate(warm) if result is None]
+    swept = dict(
+        zip(fallback, _solve_du_grid_batch([problems[idx] for idx in fallback]))
+    )
+    solutions: list[_HorizonSolution] = []
+    for idx, result in enumerate(warm):
+        if result is not None:
+            solutions.append(_HorizonSolution(*result, solver="warm"))
+            continue
+        du, cost, evals = swept[idx]
+        solutions.append(_HorizonSolution(du, cost, evals + warm_evals[idx], "grid"))
+    return solutions
+
+
+def _solve_du_grid(problem: _HorizonProblem) -> tuple[float, float, int]:
+    """Coarse -> fine whole-percent search over du.
+
+    Returns (du_percent, cost, eval_count).
+    """
+
+    return _solve_du_grid_batch([problem])[0]
+
+
+def _solve_du_grid_batch(
+    problems: Sequence[_HorizonProblem],
+) -> list[tuple[float, float, int]]:
+    """Run the coarse -> fine du search for several problems side by side.
+
+    Each pass rolls the missing candidates of every problem forward as one
+    batch, so N keys cost two batched rollouts instead of 2 * N.
+    """
+
+    horizon_costs: list[dict[float, float]] = [{} for _ in problems]
+    eval_counts = [0] * len(problems)
+
+    def evaluate_candidates(candidates: Sequence[Sequence[int]]) -> list[list[float]]:
+        return _evaluate_du_candidates(problems, candidates, horizon_costs, eval_counts)
+
+    # coarse search over du around u0
+    # du_pct is additive on a 0..100% scale and can be negative.
+    coarse_candidates = list(range(-100, 101, 5))
+    coarse_costs = evaluate_candidates([coarse_candidates] * len(problems))
+    best_coarse: list[tuple[int, float]] = []
+    for costs in coarse_costs:
+        best_du_coarse = 0
+        best_cost_coarse: float | None = None
+        for cand, cost in zip(coarse_candidates, costs):
+            if best_cost_coarse is None or cost < best_cost_coarse:
+                best_cost_coarse = cost
+                best_du_coarse = cand
+        best_coarse.append(
+            (
+                best_du_coarse,
+                best_cost_coarse if best_cost_coarse is not None else float("inf"),
+            )
+        )
+
+    # fine search around best coarse du ±5% in 1% steps
+    fine_candidates = [
+        list(range(max(-100, du - 5), min(100, du + 5) + 1, 1)) for du, _ in best_coarse
+    ]
+    results: list[tuple[float, float, int]] = []
+    for coarse, cands, costs, eval_count in zip(
+        best_coarse, fine_candidates, evaluate_candidates(fine_candidates), eval_counts
+    ):
+        best_du_fine, best_cost_fine = coarse
+        for cand, cost in zip(cands, costs):
+            if cost < best_cost_fine:
+                best_cost_fine = cost
+                best_du_fine = cand
+        results.append((float(best_du_fine), best_cost_fine, eval_count))
+    return results
+
+
+def _solve_du_warm_batch(
+    problems: Sequence[_HorizonProblem], radius_pct: int, max_radius_pct: int
+) -> tuple[list[tuple[float, float, int] | None], list[int]]:
+    """Trust-region du search around each problem's previous optimum.
+
+    The region starts at ``warm_du_pct ± radius_pct`` in 1 % steps. While
+    the best candidate lies on a boundary that is not the ±100 % limit,
+    the cost still falls towards that boundary, so the region is doubled in
+    that direction. Problems without ``warm_du_pct``, or whose region would
+    grow beyond ``± max_radius_pct``, get None and need the full sweep.
+    All active problems are evaluated together in each round.
+
+    Returns the per-problem (du_percent, cost, eval_count) or None, and the
+    eval count spent on every problem.
+    """
+
+    results: list[tuple[float, float, int] | None] = [None] * len(problems)
+    horizon_costs: list[dict[float, float]] = [{} for _ in problems]
+    eval_counts = [0] * len(problems)
+    costs: list[dict[int, float]] = [{} for _ in problems]
+    bounds: dict[int, tuple[int, int]] = {}
+    pending: dict[int, list[int]] = {}
+    radius = max(1, int(radius_pct))
+    for idx, problem in enumerate(problems):
+        if problem.warm_du_pct is None:
+            continue
+        centre = max(-100, min(100, round(problem.warm_du_pct)))
+        lo, hi = max(-100, centre - radius), min(100, centre + radius)
+        bounds[idx] = (lo, hi)
+        pending[idx] = list(range(lo, hi + 1))
+
+    max_width = 2 * max(radius, int(max_radius_pct))
+    while pending:
+        active = list(pending)
+        counts = [eval_counts[idx] for idx in active]
+        evaluated = _evaluate_du_candidates(
+            [problems[idx] for idx in active],
+            [pending[idx] for idx in active],
+            [horizon_costs[idx] for idx in active],
+            counts,
+        )
+        next_pending: dict[int, list[int]] = {}
+        for idx, count, cand_costs in zip(active, counts, evaluated):
+            eval_counts[idx] = count
+            costs[idx].update(zip(pending[idx], cand_costs))
+            lo, hi = bounds[idx]
+            # Lowest cost wins, ties go to the smaller du like the full sweep.
+            best = min(range(lo, hi + 1), key=lambda cand, c=costs[idx]: c[cand])
+            width = hi - lo
+            if best == hi and hi < 100:
+                new_lo, new_hi = lo, min(100, hi + width)
+                new_cands = list(range(hi + 1, new_hi + 1))
+            elif best == lo and lo > -100:
+                new_lo, new_hi = max(-100, lo - width), hi
+                new_cands = list(range(new_lo, lo))
+            else:
+                results[idx] = (float(best), costs[idx][best], eval_counts[idx])
+                continue
+            if new_hi - new_lo > max_width:
+                continue
+            bounds[idx] = (new_lo, new_hi)
+            next_pending[idx] = new_cands
+        pending = next_pending
+    return results, eval_counts
+
+
+def _evaluate_du_candidates(
+    problems: Sequence[_HorizonProblem],
+    candidates: Sequence[Sequence[int]],
+    horizon_costs: Sequence[dict[float, float]],
+    eval_counts: list[int],
+) -> list[list[float]]:
+    """Return the total cost of each du candidate (whole percent) per problem.
+
+    Horizon costs are cached per problem, keyed by the clamped absolute
+    opening. Many du candidates clamp to the same u_abs (0% or 100%) and
+    later passes revisit earlier points, so every distinct trajectory is
+    simulated only once. The missing trajectories of all problems are rolled
+    out as one batch and ``eval_counts`` grows by one horizon per rollout.
+    """
+
+    u_abs_rows: list[list[float]] = []
+    rows: list[_HorizonProblem] = []
+    row_u: list[float] = []
+    row_owner: list[int] = []
+    for idx, (problem, cands) in enumerate(zip(problems, candidates)):
+        u_abs = [max(0.0, min(1.0, problem.u0_frac + cand / 100.0)) for cand in cands]
+        u_abs_rows.append(u_abs)
+        for u in dict.fromkeys(u_abs):
+            if u not in horizon_costs[idx]:
+                rows.append(problem)
+                row_u.append(u)
+                row_owner.append(idx)
+    if rows:
+        for idx, u, cost in zip(row_owner, row_u, _rollout_costs(rows, row_u)):
+            horizon_costs[idx][u] = cost
+            # A step-response evaluation is a blocks x blocks product.
+            eval_counts[idx] += problems[idx].move_blocks or problems[idx].horizon
+    return [
+        [
+            horizon_costs[idx][u] + problem.move_penalty(cand / 100.0)
+            for cand, u in zip(cands, u_abs)
+        ]
+        for idx, (problem, cands, u_abs) in enumerate(
+            zip(problems, candidates, u_abs_rows)
+        )
+    ]
+
+
+def _solve_du_analytic(problem: _HorizonProblem) -> tuple[float, float, int]:
+    """Exact continuous minimiser of the horizon cost over u in [0, 1].
+
+    The forward model is affine in the held opening u, so every predicted
+    temperature is T_k(u) = a_k + b_k * u and the tracking cost is quadratic
+    in u. The change penalty adds a kink at the previous opening and the eco
+    penalty adds a linear term whose slope steps up wherever a trajectory
+    crosses the target. Between those breakpoints the cost is a plain
+    quadratic, so each segment's stationary point is solved in closed form
+    and the best one wins.
+
+    Returns (du_percent, cost, eval_count).
+    """
+
+    target = problem.target_temp_C
+    # Free response a_k (u = 0) and input sensitivity b_k = dT_k/du.
+    free: list[float] = []
+    sens: list[float] = []
+    temp_free = problem.start_temp_C
+    temp_sens = 0.0
+    ka_rate, scale = problem.ka_terms()
+    for step in range(problem.horizon):
+        if problem.ka_loss is not None:
+            decay = ka_rate * problem.step_minutes
+            temp_free = (
+                temp_free
+                + problem.heat_offset_at(step) * scale
+                - decay * (temp_free - problem.outdoor_at(step))
+            )
+            temp_sens = temp_sens + problem.gain_step * scale - decay * temp_sens
+        else:
+            temp_free = temp_free + problem.heat_offset_at(step) - problem.loss_step
+            temp_sens = temp_sens + problem.gain_step
+        free.append(temp_free)
+        sens.append(temp_sens)
+    eval_count = 2 * problem.horizon
+
+    u0 = problem.u0_frac
+    u_last = u0 + problem.last_du if problem.last_du is not None else None
+
+    # cost(u) = sum((r_k - b_k u)^2) + quad terms; expand the tracking part once.
+    sum_bb = sum(b * b for b in sens)
+    sum_rb = sum((target - a) * b for a, b in zip(free, sens))
+    sum_rr = sum((target - a) * (target - a) for a in free)
+
+    def eco_count(u: float) -> int:
+        return sum(1 for a, b in zip(free, sens) if a + b * u > target)
+
+    def total_cost(u: float) -> float:
+        du = u - u0
+        cost = sum_rr - 2.0 * sum_rb * u + sum_bb * u * u
+        if problem.eco_pen > 0:
+            cost += problem.eco_pen * u * eco_count(u)
+        return max(0.0, cost) + problem.move_penalty(du)
+
+    breakpoints = {0.0, 1.0}
+    if u_last is not None and 0.0 < u_last < 1.0:
+        breakpoints.add(u_last)
+    if problem.eco_pen > 0:
+        for a, b in zip(free, sens):
+            if b > 0:
+                # Sit just below the crossing: the eco term uses a strict
+                # T > target, so the cost jumps right after this point.
+                u_cross = (target - a) / b - 1e-9
+                if 0.0 < u_cross < 1.0:
+                    breakpoints.add(u_cross)
+    edges = sorted(breakpoints)
+
+    candidates = list(edges)
+    quad = sum_bb + problem.control_pen
+    for lo, hi in zip(edges, edges[1:]):
+        mid = 0.5 * (lo + hi)
+        slope = -2.0 * sum_rb - 2.0 * problem.control_pen * u0
+        if problem.eco_pen > 0:
+            slope += problem.eco_pen * eco_count(mid)
+        if u_last is not None:
+            slope += problem.change_pen if mid > u_last else -problem.change_pen
+        if quad > 0:
+            candidates.append(max(lo, min(hi, -slope / (2.0 * quad))))
+
+    best_u = min(candidates, key=total_cost)
+    return (best_u - u0) * 100.0, total_cost(best_u), eval_count
+
+
+def _rollout_costs(
+    problems: Sequence[_HorizonProblem], u_fracs: Sequence[float]
+) -> list[float]:
+    """Roll constant-input trajectories forward together over the horizon.
+
+    Row ``i`` holds opening ``u_fracs[i]`` under the model of
+    ``problems[i]``; rows may belong to different keys. The per-row model
+    terms are gathered into flat lists and advanced step by step as one batch.
+    The arithmetic matches a per-candidate loop operation for operation, so
+    costs are identical. Rows of move-blocked problems are costed from their
+    step response instead, with ``u_fracs[i]`` as the first block's opening.
+    """
+
+    costs = [0.0] * len(u_fracs)
+    by_horizon: dict[int, list[int]] = {}
+    for row, problem in enumerate(problems):
+        if problem.move_blocks > 0:
+            costs[row] = problem.step_response().horizon_cost(
+                u_fracs[row], problem.u0_frac, problem.control_pen, problem.eco_pen
+            )
+            continue
+        by_horizon.setdefault(problem.horizon, []).append(row)
+
+    for horizon, rows in by_horizon.items():
+        temps = [problems[row].start_temp_C for row in rows]
+        # (decay rate, input scale) per row; Euler rows use (ka, 1.0).
+        ka_terms = [problems[row].ka_terms() for row in rows]
+        # Same association as the original loop: gain * u + other + solar
+        heating = [
+            (
+                problems[row].gain_step * u_fracs[row]
+                + problems[row].other_heat_step
+                + problems[row].solar_step
+            )
+            * kt[1]
+            for row, kt in zip(rows, ka_terms)
+        ]
+        decay = [
+            (kt[0], problems[row].outdoor_temp_C)
+            if problems[row].ka_loss is not None
+            else None
+            for row, kt in zip(rows, ka_terms)
+        ]
+        step_minutes = [problems[row].step_minutes for row in rows]
+        loss_step = [problems[row].loss_step for row in rows]
+        targets = [problems[row].target_temp_C for row in rows]
+        eco = [problems[row].eco_pen * u_fracs[row] for row in rows]
+        eco_pen = [problems[row].eco_pen for row in rows]
+        row_costs = [0.0] * len(rows)
+        # Rows driven by forecasts get their per-step terms refreshed below.
+        forecast_rows = [
+            i
+            for i, row in enumerate(rows)
+            if problems[row].outdoor_traj is not None
+            or problems[row].solar_traj is not None
+        ]
+
+        for step in range(horizon):
+            for i in forecast_rows:
+                problem = problems[rows[i]]
+                if problem.solar_traj is not None:
+                    heating[i] = (
+                        problem.gain_step * u_fracs[rows[i]]
+                        + problem.other_heat_step
+                        + problem.solar_traj[step]
+                    ) * ka_terms[i][1]
+                if decay[i] is not None and problem.outdoor_traj is not None:
+                    decay[i] = (ka_terms[i][0], problem.outdoor_traj[step])
+            # Rows with an outdoor-coupled ka use dynamic loss, others a fixed loss
+            temps = [
+                t + h - (d[0] * (t - d[1])) * sm if d is not None else t + h - ls
+                for t, h, d, sm, ls in zip(
+                    temps, heating, decay, step_minutes, loss_step
+                )
+            ]
+            for i, t in enumerate(temps):
+                e = targets[i] - t
+                cost = row_costs[i] + e * e
+                if eco_pen[i] > 0 and t > targets[i]:
+                    cost += eco[i]
+                row_costs[i] = cost
+
+        for row, cost in zip(rows, row_costs):
+            costs[row] = cost
+    return costs
+
+
 def _detect_trv_profile(
     state: _MpcState,
     percent_out: float,
@@ -1629,6 +3314,7 @@ def _post_process_percent(
     now: float,
     raw_percent: float,
     delta_t: float | None,
+    full_debug: bool = True,
 ) -> tuple[int, dict[str, Any], float | None]:
     """Apply smoothing, hysteresis, min-effective, du_max, dead-zone detection and produce debug info."""
 
@@ -1868,25 +3554,33 @@ def _post_process_percent(
         state.last_trv_temp_ts = now
     # 7) DEBUG INFO
     # ============================================================
-    debug: dict[str, Any] = {
-        "raw_percent": _round_for_debug(raw_percent, 2),
-        "smooth_percent": _round_for_debug(smooth, 2),
-        "too_soon": too_soon,
-        "target_changed": target_changed,
-        "delta_T": _round_for_debug(delta_t, 3),
-        "min_effective_percent": (
-            _round_for_debug(state.min_effective_percent, 2)
-            if state.min_effective_percent is not None
-            else None
-        ),
-        "dead_zone_hits": state.dead_zone_hits,
-        "trv_profile": state.trv_profile,
-        "trv_profile_conf": _round_for_debug(state.profile_confidence, 3),
-        "trv_profile_samples": state.profile_samples,
-        "trv_temp_delta": _round_for_debug(temp_delta, 3),
-        "trv_time_delta_s": _round_for_debug(time_delta, 1),
-        "mpc_created_ts": state.created_ts,
-    }
+    debug: dict[str, Any]
+    if full_debug:
+        debug = {
+            "raw_percent": _round_for_debug(raw_percent, 2),
+            "smooth_percent": _round_for_debug(smooth, 2),
+            "too_soon": too_soon,
+            "target_changed": target_changed,
+            "delta_T": _round_for_debug(delta_t, 3),
+            "min_effective_percent": (
+                _round_for_debug(state.min_effective_percent, 2)
+                if state.min_effective_percent is not None
+                else None
+            ),
+            "dead_zone_hits": state.dead_zone_hits,
+            "trv_profile": state.trv_profile,
+            "trv_profile_conf": _round_for_debug(state.profile_confidence, 3),
+            "trv_profile_samples": state.profile_samples,
+            "trv_temp_delta": _round_for_debug(temp_delta, 3),
+            "trv_time_delta_s": _round_for_debug(time_delta, 1),
+            "mpc_created_ts": state.created_ts,
+        }
+
+    else:
+        debug = {
+            "trv_profile_conf": _round_for_debug(state.profile_confidence, 3),
+            "mpc_created_ts": state.created_ts,
+        }
 
     # slope EMA unchanged
     if inp.temp_slope_K_per_min is not None:
@@ -1894,7 +3588,8 @@ def _post_process_percent(
             state.ema_slope = inp.temp_slope_K_per_min
         else:
             state.ema_slope = 0.6 * state.ema_slope + 0.4 * inp.temp_slope_K_per_min
-        debug["slope_ema"] = _round_for_debug(state.ema_slope, 4)
+        if full_debug:
+            debug["slope_ema"] = _round_for_debug(state.ema_slope, 4)
 
     # ===========================================
     # MINIMUM HOLD TIME – ANTI-CHATTERING
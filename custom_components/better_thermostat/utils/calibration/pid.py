@@ -9,24 +9,216 @@ Notes
 -----
 - This module only computes recommendations; writing to the device stays in adapters/controlling.
 - Lightweight per-room state by a `key` (e.g., entity_id): EMA, hysteresis, rate limit.
+- Gains are kept once per TRV in a gain schedule interpolated over the target
+  temperature (or the target-outdoor delta); the integrator and filters are a
+  single runtime state per TRV. The target bucket in the key only tells where
+  on the schedule the controller operates. Anchors are evicted like the
+  target buckets of the other controllers and averaged into the schedule base
+  (the TRV prior).
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+from bisect import bisect_left
+from dataclasses import dataclass, field
 import logging
-from time import monotonic
+import math
+from time import monotonic, time
 from typing import Any
 
+from .debug_level import DEBUG_LEVEL_FULL, shape_debug, wants_full_debug
+from .state_registry import (
+    PRIOR_BUCKET,
+    BucketEvictionPolicy,
+    StateRegistry,
+    last_used_stamps,
+    parse_state_key,
+)
+
 _LOGGER = logging.getLogger(__name__)
 
 
+# --- Gain Schedule -----------------------------------------------
+
+# Scheduling variables
+GAIN_SCHEDULE_TARGET = "target"
+GAIN_SCHEDULE_OUTDOOR_DELTA = "target_outdoor_delta"
+
+# Bucket name of the single per-TRV state in ``{unique_id}:{entity_id}:{bucket}``
+SCHEDULE_BUCKET = "schedule"
+
+Gains = tuple[float, float, float]
+
+
+@dataclass(slots=True)
+class PIDGainSchedule:
+    """kp/ki/kd table over a scheduling variable, linearly interpolated.
+
+    Anchors sit on a grid of ``step`` (anchor i at x = i * step) and are
+    created when the controller first operates next to them. Outside the
+    visited range the nearest anchor is held; without anchors ``base``
+    applies. An update shifts both anchors around x, so learning at one
+    target also moves the neighbouring targets. ``used`` holds the
+    wall-clock time each anchor was last operated at, for eviction.
+    """
+
+    var: str = GAIN_SCHEDULE_TARGET
+    step: float = 1.0
+    base: Gains | None = None
+    anchors: dict[int, Gains] = field(default_factory=dict)
+    used: dict[int, float] = field(default_factory=dict)
+
+    def _anchor(self, idx: int, order: list[int]) -> Gains | None:
+        gains = self.anchors.get(idx)
+        if gains is not None or not order:
+            return gains if gains is not None else self.base
+        pos = bisect_left(order, idx)
+        if pos == 0:
+            return self.anchors[order[0]]
+        if pos == len(order):
+            return self.anchors[order[-1]]
+        below, above = order[pos - 1], order[pos]
+        return self.anchors[below if idx - below <= above - idx else above]
+
+    def _bracket(self, x: float) -> tuple[int, float]:
+        pos = x / self.step
+        lower = math.floor(pos)
+        return lower, pos - lower
+
+    def _around(self, x: float) -> tuple[int, ...]:
+        lower, frac = self._bracket(x)
+        return (lower, lower + 1) if frac > 0.0 else (lower,)
+
+    def gains_at(self, x: float) -> Gains | None:
+        """Return the interpolated gains at x, or None if nothing is known."""
+        order = sorted(self.anchors)
+        lower, frac = self._bracket(x)
+        g0 = self._anchor(lower, order)
+        if g0 is None:
+            return None
+        if frac <= 0.0:
+            return g0
+        g1 = self._anchor(lower + 1, order) or g0
+        return (
+            g0[0] + frac * (g1[0] - g0[0]),
+            g0[1] + frac * (g1[1] - g0[1]),
+            g0[2] + frac * (g1[2] - g0[2]),
+        )
+
+    def update_at(self, x: float, gains: Gains) -> None:
+        """Move the anchors around x so that ``gains_at(x)`` equals gains.
+
+        Both bracketing anchors (one if x sits on an anchor) move by the
+        same delta; as the interpolation weights sum to one this reproduces
+        the new gains exactly at x without overshooting at the anchors.
+        """
+        current = self.gains_at(x) or gains
+        order = sorted(self.anchors)
+        delta = (gains[0] - current[0], gains[1] - current[1], gains[2] - current[2])
+        for idx in self._around(x):
+            anchor = self._anchor(idx, order) or current
+            self.anchors[idx] = (
+                max(0.0, anchor[0] + delta[0]),
+                max(0.0, anchor[1] + delta[1]),
+                max(0.0, anchor[2] + delta[2]),
+            )
+
+    def fill(self, gains: Gains) -> None:
+        """Replace the whole schedule by constant gains."""
+        self.anchors.clear()
+        self.used.clear()
+        self.base = gains
+
+    def touch(self, x: float, now: float) -> None:
+        """Record that the anchors around x were operated at wall-clock time now."""
+        for idx in self._around(x):
+            if idx in self.anchors:
+                self.used[idx] = now
+
+    def evict(
+        self, policy: BucketEvictionPolicy, now: float, keep: float | None = None
+    ) -> list[int]:
+        """Evict stale and least recently used anchors into ``base``.
+
+        Works like ``StateRegistry.evict`` with anchors as the buckets: the
+        anchors around ``keep`` (the operating point) are never evicted, and
+        anchors without a recorded use count as used now. Returns the
+        evicted anchor indexes.
+        """
+        kept = set(self._around(keep)) if keep is not None else set()
+        candidates = sorted(
+            (idx for idx in self.anchors if idx not in kept),
+            key=lambda idx: self.used.get(idx, now),
+        )
+        evicted: list[int] = []
+        if policy.max_age_s > 0:
+            evicted = [
+                idx
+                for idx in candidates
+                if now - self.used.get(idx, now) > policy.max_age_s
+            ]
+            candidates = candidates[len(evicted) :]
+        if policy.max_buckets_per_trv > 0:
+            limit = policy.max_buckets_per_trv - len(kept & self.anchors.keys())
+            excess = len(candidates) - max(0, limit)
+            if excess > 0:
+                evicted.extend(candidates[:excess])
+        for idx in evicted:
+            self.base = _merge_into_prior(self.base, self.anchors.pop(idx))
+            self.used.pop(idx, None)
+        return evicted
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return a JSON-serialisable representation."""
+        return {
+            "var": self.var,
+            "step": self.step,
+            "base": list(self.base) if self.base is not None else None,
+            "anchors": {str(i): list(g) for i, g in sorted(self.anchors.items())},
+            "used": {str(i): ts for i, ts in sorted(self.used.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> PIDGainSchedule:
+        """Rebuild a schedule from ``to_dict`` output."""
+        base = data.get("base")
+        return cls(
+            var=str(data.get("var", GAIN_SCHEDULE_TARGET)),
+            step=float(data.get("step", 1.0)),
+            base=tuple(float(v) for v in base) if base is not None else None,
+            anchors={
+                int(i): tuple(float(v) for v in g)
+                for i, g in (data.get("anchors") or {}).items()
+            },
+            used={int(i): float(ts) for i, ts in (data.get("used") or {}).items()},
+        )
+
+
+def _merge_into_prior(prior: Gains | None, evicted: Gains) -> Gains:
+    """Average the gains of an evicted anchor into the TRV prior.
+
+    Each eviction moves the prior halfway towards the evicted gains (an
+    exponential average with weight 0.5), so recent evictions weigh most.
+    """
+    if prior is None:
+        return evicted
+    return (
+        0.5 * (prior[0] + evicted[0]),
+        0.5 * (prior[1] + evicted[1]),
+        0.5 * (prior[2] + evicted[2]),
+    )
+
+
 # --- PID State -----------------------------------------------
 
 
-@dataclass
+@dataclass(slots=True)
 class PIDState:
-    """State for PID controller per room."""
+    """Runtime state of the PID controller of one TRV.
+
+    ``pid_kp``/``pid_ki``/``pid_kd`` are the gains in effect at the last
+    operating point ``schedule_x``; the learned gains live in ``schedule``.
+    """
 
     # PID-State
     pid_integral: float = 0.0
@@ -49,6 +241,9 @@ class PIDState:
     # Hold-time
     last_output_change_ts: float = 0.0
     last_target_temp: float | None = None
+    # Gain schedule (learned gains) and the last operating point on it
+    schedule: PIDGainSchedule | None = None
+    schedule_x: float | None = None
 
 
 # --- PID Parameters -----------------------------------------------
@@ -96,11 +291,19 @@ class PIDParams:
     # Hold-time
     min_hold_time_s: float = 300.0
     big_change_threshold_pct: float = 33.0
+    # Gain schedule: variable ("target" or "target_outdoor_delta") and anchor spacing in K
+    gain_schedule_var: str = GAIN_SCHEDULE_TARGET
+    gain_schedule_step_K: float = 1.0
+    # Schedule anchors kept per TRV; evicted gains are merged into the schedule base
+    bucket_eviction: BucketEvictionPolicy = field(default_factory=BucketEvictionPolicy)
 
 
 # --- Global State Storage -----------------------------------------------
 
-_PID_STATES: dict[str, PIDState] = {}
+_PID_STATES: StateRegistry[PIDState] = StateRegistry()
+
+# Debug fields returned in "summary" mode.
+_SUMMARY_DEBUG_KEYS = ("mode", "e_K", "p", "i", "d", "u", "kp", "ki", "kd")
 
 
 # --- Helper Functions -----------------------------------------------
@@ -111,6 +314,69 @@ def _r(val: float | None, decimals: int = 2) -> float | None:
     return round(val, decimals) if val is not None else None
 
 
+def _trv_key(key: str) -> str:
+    """Map a (bucketed) PID key to the key of its TRV state.
+
+    Keys outside the ``{unique_id}:{entity_id}:{bucket}`` layout are used as-is.
+    """
+    parsed = parse_state_key(key)
+    if parsed is None:
+        return key
+    return f"{parsed[0]}:{parsed[1]}:{SCHEDULE_BUCKET}"
+
+
+def _schedule_x(
+    var: str, target_temp_C: float, outdoor_temp_C: float | None
+) -> float | None:
+    """Return the operating point on the gain schedule.
+
+    None if the schedule runs over the target-outdoor delta and no outdoor
+    temperature is known.
+    """
+    if var == GAIN_SCHEDULE_OUTDOOR_DELTA:
+        if outdoor_temp_C is None:
+            return None
+        return target_temp_C - outdoor_temp_C
+    return target_temp_C
+
+
+def _get_trv_state(key: str) -> PIDState:
+    """Return the TRV state for key, creating it if missing."""
+    trv_key = _trv_key(key)
+    st = _PID_STATES.get(trv_key)
+    if st is None:
+        st = PIDState()
+        _PID_STATES[trv_key] = st
+    return st
+
+
+def _schedule_for(st: PIDState, params: PIDParams | None) -> PIDGainSchedule:
+    """Return the state's gain schedule, creating it from params if missing.
+
+    If params schedule over another variable than the stored schedule, its
+    anchors lie on the wrong axis: a new schedule starts with the gains in
+    effect as its base. Without params the stored schedule is kept as is.
+    """
+    if params is None:
+        if st.schedule is None:
+            st.schedule = PIDGainSchedule()
+        return st.schedule
+    var = getattr(params, "gain_schedule_var", GAIN_SCHEDULE_TARGET)
+    base: Gains | None = None
+    if st.schedule is not None and st.schedule.var != var:
+        current = (st.pid_kp, st.pid_ki, st.pid_kd)
+        base = current if None not in current else st.schedule.base
+        st.schedule = None
+        st.schedule_x = None
+    if st.schedule is None:
+        st.schedule = PIDGainSchedule(
+            var=var,
+            step=max(0.1, float(getattr(params, "gain_schedule_step_K", 1.0))),
+            base=base,
+        )
+    return st.schedule
+
+
 # --- PID Computation -----------------------------------------------
 
 
@@ -122,6 +388,8 @@ def compute_pid(
     inp_temp_slope_K_per_min: float | None,
     key: str,
     inp_current_temp_ema_C: float | None = None,
+    debug_level: str = DEBUG_LEVEL_FULL,
+    inp_outdoor_temp_C: float | None = None,
 ) -> tuple[float, dict[str, Any]]:
     """Compute PID-based valve opening percentage.
 
@@ -133,25 +401,30 @@ def compute_pid(
         inp_temp_slope_K_per_min: Temperature slope
         key: Unique key for state storage
         inp_current_temp_ema_C: Optional EMA-filtered external temperature for learning
+        debug_level: "off", "summary" or "full" debug payload
+        inp_outdoor_temp_C: Outdoor temperature for the target-outdoor gain schedule
 
     Returns
     -------
         Tuple of (percent_open, debug_info)
     """
     now = monotonic()
-    st = _PID_STATES.setdefault(key, PIDState())
-
-    _LOGGER.debug(
-        "better_thermostat PID: input for %s: target=%.1f current=%.1f trv=%.1f slope=%.3f kp=%.1f ki=%.3f kd=%.1f",
-        key,
-        inp_target_temp_C or 0.0,
-        inp_current_temp_C or 0.0,
-        inp_trv_temp_C or 0.0,
-        inp_temp_slope_K_per_min or 0.0,
-        st.pid_kp or 0.0,
-        st.pid_ki or 0.0,
-        st.pid_kd or 0.0,
-    )
+    wall_now = time()
+    st = _get_trv_state(key)
+    _PID_STATES.touch(_trv_key(key), wall_now)
+
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug(
+            "better_thermostat PID: input for %s: target=%.1f current=%.1f trv=%.1f slope=%.3f kp=%.1f ki=%.3f kd=%.1f",
+            key,
+            inp_target_temp_C or 0.0,
+            inp_current_temp_C or 0.0,
+            inp_trv_temp_C or 0.0,
+            inp_temp_slope_K_per_min or 0.0,
+            st.pid_kp or 0.0,
+            st.pid_ki or 0.0,
+            st.pid_kd or 0.0,
+        )
 
     # Determine effective current temperature (prefer EMA)
     current_temp = inp_current_temp_C
@@ -178,13 +451,22 @@ def compute_pid(
     if dt <= 0 or dt < 1.0:
         dt = 1.0
 
-    # Initialisiere lernende Gains (einmalig) mit übergebenen Params
-    if st.pid_kp is None:
-        st.pid_kp = params.kp
-    if st.pid_ki is None:
-        st.pid_ki = params.ki
-    if st.pid_kd is None:
-        st.pid_kd = params.kd
+    # Gains from the TRV's schedule at the current operating point; an empty
+    # schedule starts from the passed params
+    schedule = _schedule_for(st, params)
+    x = _schedule_x(schedule.var, inp_target_temp_C, inp_outdoor_temp_C)
+    if x is None:
+        # No outdoor temperature for the delta schedule: hold the last
+        # operating point instead of reading the target off the delta axis
+        x = st.schedule_x
+    gains = schedule.gains_at(x) if x is not None else schedule.base
+    if gains is None:
+        gains = (float(params.kp), float(params.ki), float(params.kd))
+        schedule.base = gains
+    st.pid_kp, st.pid_ki, st.pid_kd = gains
+    st.schedule_x = x
+    if x is not None:
+        schedule.touch(x, wall_now)
 
     # Remove duplicate integrator update - only use conditional anti-windup below
 
@@ -353,8 +635,31 @@ def compute_pid(
         _auto_tune_pid(
             params, st, percent, delta_T, inp_temp_slope_K_per_min or 0.0, now
         )
+        tuned = (st.pid_kp, st.pid_ki, st.pid_kd)
+        if tuned != gains and x is not None:
+            schedule.update_at(x, tuned)
+            schedule.touch(x, wall_now)
+            schedule.evict(params.bucket_eviction, wall_now, keep=x)
 
     # Debug-Werte ablegen
+    if not wants_full_debug(debug_level, _LOGGER):
+        pid_dbg = shape_debug(
+            {
+                "mode": "pid",
+                "e_K": _r(e, 2),
+                "p": _r(p_term, 2),
+                "i": _r(i_term, 2),
+                "d": _r(d_term, 2),
+                "u": _r(u, 2),
+                "kp": float(st.pid_kp) if st.pid_kp is not None else None,
+                "ki": float(st.pid_ki) if st.pid_ki is not None else None,
+                "kd": float(st.pid_kd) if st.pid_kd is not None else None,
+            },
+            debug_level,
+            _SUMMARY_DEBUG_KEYS,
+        )
+        return percent, pid_dbg
+
     try:
         # Basale Debug-Infos (auch für Graphen)
         pid_dbg = {
@@ -389,17 +694,18 @@ def compute_pid(
     except Exception:
         pid_dbg = {"mode": "pid", "error": "debug_failed"}
 
-    _LOGGER.debug(
-        "better_thermostat PID: output for %s: percent=%.1f%%, p_term=%.2f, i_term=%.2f, d_term=%.2f, integral=%.2f",
-        key,
-        percent,
-        p_term or 0.0,
-        i_term or 0.0,
-        d_term,
-        st.pid_integral,
-    )
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug(
+            "better_thermostat PID: output for %s: percent=%.1f%%, p_term=%.2f, i_term=%.2f, d_term=%.2f, integral=%.2f",
+            key,
+            percent,
+            p_term or 0.0,
+            i_term or 0.0,
+            d_term,
+            st.pid_integral,
+        )
 
-    return percent, pid_dbg
+    return percent, shape_debug(pid_dbg, debug_level, _SUMMARY_DEBUG_KEYS)
 
 
 def _auto_tune_pid(
@@ -475,41 +781,87 @@ def _auto_tune_pid(
 
 
 def reset_pid_state(key: str) -> None:
-    """Reset learned/smoothing values for a given room key."""
-    if key in _PID_STATES:
+    """Reset the learned schedule and runtime state of the TRV owning key."""
+    _PID_STATES.pop(_trv_key(key), None)
+
+
+def reset_pid_states(prefix: str) -> int:
+    """Reset all PID states whose key starts with prefix; return the count."""
+    keys = [key for key, _ in _PID_STATES.items_with_prefix(prefix)]
+    for key in keys:
         del _PID_STATES[key]
+    return len(keys)
 
 
 def get_pid_state(key: str) -> PIDState | None:
-    """Return the PIDState for key or None if missing.
+    """Return the PIDState of the TRV owning key or None if missing.
 
     This is a small helper used externally to read persisted/learned gains.
     """
-    return _PID_STATES.get(key)
+    return _PID_STATES.get(_trv_key(key))
 
 
-def seed_pid_gains(key: str, kp: float, ki: float, kd: float) -> bool:
-    """Seed PID gains for a given key, creating state if missing.
+def seed_pid_gains(
+    key: str,
+    kp: float,
+    ki: float,
+    kd: float,
+    at: float | None = None,
+    params: PIDParams | None = None,
+    keep_anchors: bool = False,
+) -> bool:
+    """Seed PID gains for the TRV owning key, creating state if missing.
 
     Args:
         key: PID state key (format: {unique_id}:{entity_id}:{bucket})
         kp: Proportional gain
         ki: Integral gain
         kd: Derivative gain
+        at: Operating point to set the gains at; None replaces the whole
+            schedule by these gains
+        params: PID params of the TRV (schedule variable, spacing and
+            eviction); None keeps the stored schedule layout
+        keep_anchors: With at None, set only the base gains (used while
+            there is no operating point) and keep the learned anchors
 
     Returns
     -------
         True if gains were successfully seeded
     """
-    if key not in _PID_STATES:
-        _PID_STATES[key] = PIDState()
-    state = _PID_STATES[key]
-    state.pid_kp = kp
-    state.pid_ki = ki
-    state.pid_kd = kd
+    state = _get_trv_state(key)
+    gains = (float(kp), float(ki), float(kd))
+    schedule = _schedule_for(state, params)
+    if at is None and keep_anchors:
+        schedule.base = gains
+    elif at is None:
+        schedule.fill(gains)
+    else:
+        now = time()
+        schedule.update_at(float(at), gains)
+        schedule.touch(float(at), now)
+        policy = params.bucket_eviction if params is not None else None
+        schedule.evict(policy or BucketEvictionPolicy(), now, keep=float(at))
+    state.pid_kp, state.pid_ki, state.pid_kd = gains
     return True
 
 
+def seed_pid_gains_for_trv(
+    uid: str,
+    entity_id: str,
+    kp: float,
+    ki: float,
+    kd: float,
+    params: PIDParams | None = None,
+) -> int:
+    """Seed gains into the whole gain schedule of one TRV and its prior.
+
+    Seeding the prior makes operating points visited later start from the
+    same gains. Returns the number of seeded states.
+    """
+    key = f"{uid}:{entity_id}:{SCHEDULE_BUCKET}"
+    return 1 if seed_pid_gains(key, kp, ki, kd, params=params) else 0
+
+
 # --- Key Builder Helper -----------------------------------------------
 
 
@@ -551,9 +903,7 @@ def export_pid_states(prefix: str | None = None) -> dict[str, dict[str, Any]]:
     prefix: if provided, only include keys starting with this prefix.
     """
     out: dict[str, dict[str, Any]] = {}
-    for k, st in _PID_STATES.items():
-        if prefix is not None and not k.startswith(prefix):
-            continue
+    for k, st in _PID_STATES.items_with_prefix(prefix):
         out[k] = {
             "pid_integral": st.pid_integral,
             "pid_last_meas": st.pid_last_meas,
@@ -571,25 +921,85 @@ def export_pid_states(prefix: str | None = None) -> dict[str, dict[str, Any]]:
             "last_percent": st.last_percent,
             "last_output_change_ts": st.last_output_change_ts,
             "last_target_temp": st.last_target_temp,
+            "schedule_x": st.schedule_x,
+            "gain_schedule": (
+                st.schedule.to_dict() if st.schedule is not None else None
+            ),
         }
+        last_used = _PID_STATES.last_used(k)
+        if last_used is not None:
+            out[k]["last_used_ts"] = last_used
     return out
 
 
+def _legacy_bucket_target(bucket: str) -> float | None:
+    """Return the target of a legacy ``t{target}`` bucket name, if any."""
+    if not bucket.startswith("t"):
+        return None
+    try:
+        return float(bucket[1:])
+    except ValueError:
+        return None
+
+
+def _fold_legacy_buckets(legacy: list[tuple[str, str, float, dict[str, Any]]]) -> None:
+    """Fold per-target-bucket states of older versions into TRV schedules.
+
+    The prior bucket becomes the schedule base; each target bucket's gains
+    are applied at its target, oldest first, so recent learning wins.
+    """
+    params = PIDParams()
+    for key, bucket, ts, v in sorted(legacy, key=lambda item: item[2]):
+        gains = (v.get("pid_kp"), v.get("pid_ki"), v.get("pid_kd"))
+        if None in gains:
+            continue
+        st = _get_trv_state(key)
+        _PID_STATES.touch(_trv_key(key), ts)
+        schedule = _schedule_for(st, params)
+        gains = (float(gains[0]), float(gains[1]), float(gains[2]))
+        if bucket == PRIOR_BUCKET:
+            schedule.base = gains
+        else:
+            target = _legacy_bucket_target(bucket)
+            if target is None:
+                continue
+            schedule.update_at(target, gains)
+            schedule.touch(target, ts)
+        if st.auto_tune is None and v.get("auto_tune") is not None:
+            st.auto_tune = v.get("auto_tune")
+
+
 def import_pid_states(
-    data: dict[str, dict[str, Any]], prefix_filter: str | None = None
+    data: dict[str, dict[str, Any]],
+    prefix_filter: str | None = None,
+    policies: dict[str, BucketEvictionPolicy] | None = None,
 ) -> int:
     """Import previously saved PID states into the module-local cache.
 
     Returns the number of imported entries. If prefix_filter is provided,
-    only keys starting with that prefix will be imported.
+    only keys starting with that prefix will be imported. Per-target-bucket
+    entries written by older versions are folded into the TRV's gain
+    schedule; the next save then stores one entry per TRV. Stale and
+    surplus schedule anchors are then evicted into the schedule base, using
+    the eviction policy of each TRV from ``policies`` (entity_id -> policy,
+    defaults for TRVs not listed).
     """
     if not isinstance(data, dict):
         return 0
+    if prefix_filter is not None:
+        data = {k: v for k, v in data.items() if str(k).startswith(prefix_filter)}
+    now = time()
+    stamps = last_used_stamps(data, now)
+    legacy: list[tuple[str, str, float, dict[str, Any]]] = []
     count = 0
     for k, v in data.items():
-        if prefix_filter is not None and not str(k).startswith(prefix_filter):
-            continue
         try:
+            parsed = parse_state_key(str(k))
+            if parsed is not None and parsed[2] != SCHEDULE_BUCKET:
+                legacy.append((str(k), parsed[2], stamps[str(k)], v))
+                count += 1
+                continue
+            schedule = v.get("gain_schedule")
             st = PIDState(
                 pid_integral=v.get("pid_integral", 0.0),
                 pid_last_meas=v.get("pid_last_meas"),
@@ -607,10 +1017,31 @@ def import_pid_states(
                 last_percent=v.get("last_percent", 0.0),
                 last_output_change_ts=v.get("last_output_change_ts", 0.0),
                 last_target_temp=v.get("last_target_temp"),
+                schedule_x=v.get("schedule_x"),
+                schedule=(
+                    PIDGainSchedule.from_dict(schedule)
+                    if isinstance(schedule, dict)
+                    else None
+                ),
             )
+            if st.schedule is not None:
+                # Anchors saved before their use was tracked date from the entry
+                for idx in st.schedule.anchors:
+                    st.schedule.used.setdefault(idx, stamps[str(k)])
             _PID_STATES[str(k)] = st
+            _PID_STATES.touch(str(k), stamps[str(k)])
             count += 1
-        except (KeyError, TypeError, ValueError):
+        except (AttributeError, KeyError, TypeError, ValueError):
             # Ignore malformed entries
             continue
+    _fold_legacy_buckets(legacy)
+
+    default_policy = PIDParams().bucket_eviction
+    for k in {_trv_key(str(key)) for key in data}:
+        st = _PID_STATES.get(k)
+        parsed = parse_state_key(k)
+        if st is None or st.schedule is None or parsed is None:
+            continue
+        policy = (policies or {}).get(parsed[1], default_policy)
+        st.schedule.evict(policy, now, keep=st.schedule_x)
     return count
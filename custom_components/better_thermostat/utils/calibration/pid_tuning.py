@@ -0,0 +1,557 @@
+"""Offline PID tuning by replaying recorded room history.
+
+The online auto-tuner in ``pid.py`` nudges the gains by small factors at most
+every ``tune_min_interval_s``. This module instead:
+
+1. resamples the recorded room temperature, valve opening, target and
+   outdoor temperature onto a fixed grid (``resample_history``),
+2. fits a first-order plant with transport lag to that trace
+   (``fit_plant``),
+3. replays the recorded target schedule through the plant in closed loop with
+   the same PID law as ``compute_pid`` and searches kp/ki/kd for the lowest
+   tracking cost (``tune_pid_gains``).
+
+The search is a coarse log-spaced grid followed by a compass (pattern)
+search. By default it is scored inline (the caller runs it in an executor
+thread); with ``max_workers`` > 1 each batch of candidates is scored in a
+process pool. A worker receives the trace and plant once (pool initializer)
+and then only candidate gains, never controller state. Note that a spawned
+worker imports this module by its package path, so every worker process
+loads the integration package and with it Home Assistant core: expect around
+100 MB of memory and a few seconds of start-up per worker.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+import logging
+import math
+import multiprocessing
+from typing import Any
+
+from .pid import PIDParams
+
+_LOGGER = logging.getLogger(__name__)
+
+# Series names accepted by ``resample_history``.
+SERIES_TEMP = "temp"
+SERIES_VALVE = "valve"
+SERIES_TARGET = "target"
+SERIES_OUTDOOR = "outdoor"
+
+# Integrator relief applied by ``compute_pid`` on an error sign change.
+_I_RELIEF_DECAY = 0.8
+
+
+@dataclass
+class PidTuningParams:
+    """Configuration of the offline tuning job."""
+
+    # Replay grid
+    step_s: float = 300.0
+    min_samples: int = 48
+    # Plant fit: transport lag candidates 0..max_lag_steps grid steps
+    max_lag_steps: int = 6
+    # Cost: mean squared error (K^2) plus penalties
+    overshoot_weight: float = 1.0
+    move_weight: float = 0.02
+    # Search
+    grid_points: int = 4
+    max_iter: int = 40
+    initial_step_log: float = 0.5
+    min_step_log: float = 0.02
+    # 1 scores inline; more spawns worker processes (see module docstring).
+    max_workers: int = 1
+
+
+@dataclass(slots=True)
+class ReplayTrace:
+    """Recorded history on a fixed time grid."""
+
+    step_s: float
+    temp: list[float]
+    valve: list[float]
+    target: list[float]
+    outdoor: list[float] | None = None
+
+    def __len__(self) -> int:
+        """Return the number of grid samples."""
+        return len(self.temp)
+
+
+@dataclass(slots=True)
+class PlantModel:
+    """First-order room model fitted to a replay trace.
+
+    dT/dt [K/min] = gain * u(t - lag) / 100 + loss * (ref - T) + bias, where
+    ref is the outdoor temperature if recorded and 0 otherwise (the bias then
+    absorbs loss * ambient).
+    """
+
+    gain_K_min: float
+    loss_per_min: float
+    bias_K_min: float
+    lag_steps: int
+    uses_outdoor: bool
+    rmse_K_min: float
+    samples: int
+
+
+@dataclass(slots=True)
+class PidTuningResult:
+    """Outcome of ``tune_pid_gains``."""
+
+    kp: float
+    ki: float
+    kd: float
+    cost: float
+    baseline_cost: float
+    evaluations: int
+    plant: PlantModel
+
+
+# --- History -------------------------------------------------------------
+
+
+def _hold_series(
+    points: Iterable[tuple[float, float]], grid: Sequence[float]
+) -> list[float] | None:
+    """Sample a step series on grid timestamps (zero-order hold).
+
+    Grid points before the first sample take the first value.
+    """
+
+    ordered = sorted(
+        (float(ts), float(val))
+        for ts, val in points
+        if val is not None and math.isfinite(float(val))
+    )
+    if not ordered:
+        return None
+    out: list[float] = []
+    idx = 0
+    current = ordered[0][1]
+    for ts in grid:
+        while idx < len(ordered) and ordered[idx][0] <= ts:
+            current = ordered[idx][1]
+            idx += 1
+        out.append(current)
+    return out
+
+
+def mean_series(
+    series: Iterable[Iterable[tuple[float, float]]],
+) -> list[tuple[float, float]]:
+    """Merge step series into their mean (e.g. the valves of one room).
+
+    At every change timestamp the mean covers the series that have reported
+    at least once.
+    """
+
+    events = sorted(
+        (float(ts), idx, float(val))
+        for idx, points in enumerate(series)
+        for ts, val in points
+        if val is not None and math.isfinite(float(val))
+    )
+    current: dict[int, float] = {}
+    merged: list[tuple[float, float]] = []
+    for ts, idx, val in events:
+        current[idx] = val
+        mean = sum(current.values()) / len(current)
+        if merged and merged[-1][0] == ts:
+            merged[-1] = (ts, mean)
+        else:
+            merged.append((ts, mean))
+    return merged
+
+
+def resample_history(
+    series: Mapping[str, Iterable[tuple[float, float]]],
+    start_ts: float,
+    end_ts: float,
+    step_s: float,
+) -> ReplayTrace | None:
+    """Resample recorded (timestamp, value) series onto a fixed grid.
+
+    ``temp``, ``valve`` (0..100 %) and ``target`` are required; ``outdoor``
+    is optional. Returns None if a required series has no samples.
+    """
+
+    if step_s <= 0 or end_ts <= start_ts:
+        return None
+    count = int((end_ts - start_ts) // step_s) + 1
+    grid = [start_ts + i * step_s for i in range(count)]
+    temp = _hold_series(series.get(SERIES_TEMP, ()), grid)
+    valve = _hold_series(series.get(SERIES_VALVE, ()), grid)
+    target = _hold_series(series.get(SERIES_TARGET, ()), grid)
+    if temp is None or valve is None or target is None:
+        return None
+    outdoor = _hold_series(series.get(SERIES_OUTDOOR, ()), grid)
+    return ReplayTrace(
+        step_s=step_s,
+        temp=temp,
+        valve=[max(0.0, min(100.0, v)) for v in valve],
+        target=target,
+        outdoor=outdoor,
+    )
+
+
+# --- Plant fit -----------------------------------------------------------
+
+
+def _solve_linear(a: list[list[float]], b: list[float]) -> list[float] | None:
+    """Solve a small dense system by Gaussian elimination (None if singular)."""
+
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(col + 1, n):
+            f = m[r][col] / m[col][col]
+            for c in range(col, n + 1):
+                m[r][c] -= f * m[col][c]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        x[r] = (m[r][n] - sum(m[r][c] * x[c] for c in range(r + 1, n))) / m[r][r]
+    return x
+
+
+def _fit_with_lag(
+    trace: ReplayTrace, lag: int
+) -> tuple[list[float], float, int] | None:
+    """Least-squares fit of the plant for one transport lag."""
+
+    dt_min = trace.step_s / 60.0
+    xtx = [[0.0] * 3 for _ in range(3)]
+    xty = [0.0] * 3
+    rows: list[tuple[tuple[float, float, float], float]] = []
+    for i in range(lag, len(trace) - 1):
+        ref = trace.outdoor[i] if trace.outdoor is not None else 0.0
+        x = (trace.valve[i - lag] / 100.0, ref - trace.temp[i], 1.0)
+        y = (trace.temp[i + 1] - trace.temp[i]) / dt_min
+        rows.append((x, y))
+        for r in range(3):
+            xty[r] += x[r] * y
+            for c in range(3):
+                xtx[r][c] += x[r] * x[c]
+    if len(rows) < 3:
+        return None
+    coef = _solve_linear(xtx, xty)
+    if coef is None:
+        return None
+    sse = sum((y - sum(c * v for c, v in zip(coef, x))) ** 2 for x, y in rows)
+    return coef, sse, len(rows)
+
+
+def fit_plant(
+    trace: ReplayTrace, params: PidTuningParams | None = None
+) -> PlantModel | None:
+    """Fit the first-order plant, choosing the lag with the lowest residual.
+
+    Returns None if the history carries too little excitation (no valve
+    movement) or the fit is not physical (non-positive heating gain or
+    negative loss).
+    """
+
+    params = params or PidTuningParams()
+    if len(trace) < max(3, int(getattr(params, "min_samples", 48))):
+        return None
+    best: tuple[float, int, list[float], int] | None = None
+    for lag in range(max(0, int(getattr(params, "max_lag_steps", 6))) + 1):
+        fit = _fit_with_lag(trace, lag)
+        if fit is None:
+            continue
+        coef, sse, n = fit
+        if coef[0] <= 0.0 or coef[1] < 0.0:
+            continue
+        mse = sse / n
+        if best is None or mse < best[0]:
+            best = (mse, lag, coef, n)
+    if best is None:
+        return None
+    mse, lag, coef, n = best
+    return PlantModel(
+        gain_K_min=coef[0],
+        loss_per_min=coef[1],
+        bias_K_min=coef[2],
+        lag_steps=lag,
+        uses_outdoor=trace.outdoor is not None,
+        rmse_K_min=math.sqrt(mse),
+        samples=n,
+    )
+
+
+# --- Closed-loop replay --------------------------------------------------
+
+
+def simulate_pid_cost(
+    gains: tuple[float, float, float],
+    plant: PlantModel,
+    trace: ReplayTrace,
+    pid_params: PIDParams,
+    tuning: PidTuningParams,
+) -> float:
+    """Replay the recorded targets through plant + PID and return the cost.
+
+    The PID law mirrors ``compute_pid`` (P on error, clamped integrator with
+    conditional anti-windup and relief on sign change, smoothed D on
+    measurement, integer percent). Hold time and online auto-tuning are not
+    simulated.
+    """
+
+    kp, ki, kd = gains
+    dt_s = trace.step_s
+    dt_min = dt_s / 60.0
+    a = max(0.0, min(1.0, float(pid_params.d_smoothing_alpha)))
+    band = pid_params.steady_state_band_K
+
+    temp = trace.temp[0]
+    integral = 0.0
+    last_meas: float | None = None
+    last_sign: int | None = None
+    last_pct = trace.valve[0]
+    in_transit = deque([trace.valve[0]] * plant.lag_steps)
+    err_cost = 0.0
+    move_cost = 0.0
+    n = len(trace)
+
+    for i in range(n):
+        target = trace.target[i]
+        e = target - temp
+
+        d_term = 0.0
+        if pid_params.d_on_measurement:
+            smoothed = temp if last_meas is None else (1.0 - a) * last_meas + a * temp
+            if last_meas is not None:
+                d_term = -kd * (smoothed - last_meas) / dt_s
+        else:
+            smoothed = temp
+            if last_meas is not None:
+                d_term = kd * (e - (target - last_meas)) / dt_s
+
+        p_term = kp * e
+        i_prop = max(pid_params.i_min, min(pid_params.i_max, integral + ki * e * dt_s))
+        u_prop = p_term + i_prop + d_term
+        u_sat = max(0.0, min(100.0, u_prop))
+        blocked = (u_prop > u_sat and e > 0) or (u_prop < u_sat and e < 0)
+        i_term = integral if blocked else i_prop
+
+        sign = 1 if e > 0 else (-1 if e < 0 else 0)
+        if last_sign is not None and sign not in (0, last_sign) and abs(e) <= band:
+            i_term *= _I_RELIEF_DECAY
+        if not blocked:
+            integral = i_term
+        last_sign = sign
+        last_meas = smoothed
+
+        pct = float(round(max(0.0, min(100.0, p_term + i_term + d_term))))
+        move_cost += abs(pct - last_pct) / 100.0
+        last_pct = pct
+
+        in_transit.append(pct)
+        applied = in_transit.popleft()
+        ref = trace.outdoor[i] if plant.uses_outdoor and trace.outdoor else 0.0
+        temp += dt_min * (
+            plant.gain_K_min * applied / 100.0
+            + plant.loss_per_min * (ref - temp)
+            + plant.bias_K_min
+        )
+
+        err = target - temp
+        err_cost += err * err
+        if err < 0:
+            err_cost += tuning.overshoot_weight * err * err
+
+    return err_cost / n + tuning.move_weight * move_cost / n
+
+
+# --- Search --------------------------------------------------------------
+
+# Per-process replay context, installed once by the pool initializer so each
+# task only ships a gains tuple.
+_WORKER_CONTEXT: tuple[PlantModel, ReplayTrace, PIDParams, PidTuningParams] | None = (
+    None
+)
+
+
+def _init_worker(
+    plant: PlantModel,
+    trace: ReplayTrace,
+    pid_params: PIDParams,
+    tuning: PidTuningParams,
+) -> None:
+    global _WORKER_CONTEXT  # noqa: PLW0603
+    _WORKER_CONTEXT = (plant, trace, pid_params, tuning)
+
+
+def _score(gains: tuple[float, float, float]) -> float:
+    if _WORKER_CONTEXT is None:
+        raise RuntimeError("PID tuning worker not initialised")
+    try:
+        cost = simulate_pid_cost(gains, *_WORKER_CONTEXT)
+    except (ArithmeticError, ValueError):
+        return math.inf
+    return cost if math.isfinite(cost) else math.inf
+
+
+def _gain_bounds(pid_params: PIDParams) -> list[tuple[float, float]]:
+    """Log10 bounds of kp, ki, kd from the online tuner's clamps."""
+
+    return [
+        (math.log10(pid_params.kp_min), math.log10(pid_params.kp_max)),
+        (math.log10(pid_params.ki_min), math.log10(pid_params.ki_max)),
+        (math.log10(pid_params.kd_min), math.log10(pid_params.kd_max)),
+    ]
+
+
+def _to_gains(point: Sequence[float]) -> tuple[float, float, float]:
+    return (10.0 ** point[0], 10.0 ** point[1], 10.0 ** point[2])
+
+
+def _clip(
+    point: Sequence[float], bounds: list[tuple[float, float]]
+) -> tuple[float, ...]:
+    return tuple(max(lo, min(hi, v)) for v, (lo, hi) in zip(point, bounds))
+
+
+def tune_pid_gains(
+    trace: ReplayTrace,
+    plant: PlantModel,
+    pid_params: PIDParams | None = None,
+    tuning: PidTuningParams | None = None,
+    initial: tuple[float, float, float] | None = None,
+    progress: Callable[[float, float], None] | None = None,
+) -> PidTuningResult:
+    """Search kp/ki/kd minimising the replay cost.
+
+    A log-spaced grid over the online tuner's gain bounds seeds a compass
+    search in log10 space that polls +/- step on every axis per iteration and
+    halves the step when no poll point improves. Batches are scored in a
+    process pool when ``max_workers`` > 1, inline otherwise. ``progress`` is
+    called with (fraction done, best cost) after every batch; the search may
+    converge before the iteration budget, so the last report jumps to 1.0.
+    """
+
+    pid_params = pid_params or PIDParams()
+    tuning = tuning or PidTuningParams()
+    bounds = _gain_bounds(pid_params)
+    if initial is None:
+        initial = (pid_params.kp, pid_params.ki, pid_params.kd)
+    start = _clip([math.log10(max(g, 1e-12)) for g in initial], bounds)
+
+    points = max(2, int(tuning.grid_points))
+    axes = [
+        [lo + (hi - lo) * k / (points - 1) for k in range(points)] for lo, hi in bounds
+    ]
+    grid = [(x, y, z) for x in axes[0] for y in axes[1] for z in axes[2]]
+
+    step = float(tuning.initial_step_log)
+    min_step = max(1e-6, float(tuning.min_step_log))
+    max_iter = max(1, int(tuning.max_iter))
+    evaluations = 0
+
+    workers = max(1, int(tuning.max_workers))
+    pool: Executor | None = None
+    if workers > 1:
+        # "spawn": forking the threaded Home Assistant process is unsafe.
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(plant, trace, pid_params, tuning),
+        )
+    else:
+        _init_worker(plant, trace, pid_params, tuning)
+
+    def _evaluate(batch: list[tuple[float, ...]]) -> list[float]:
+        nonlocal evaluations
+        evaluations += len(batch)
+        gains = [_to_gains(p) for p in batch]
+        if pool is None:
+            return [_score(g) for g in gains]
+        chunk = max(1, len(gains) // (workers * 2))
+        return list(pool.map(_score, gains, chunksize=chunk))
+
+    try:
+        costs = _evaluate([start, *grid])
+        baseline = costs[0]
+        best_idx = min(range(len(costs)), key=costs.__getitem__)
+        best = ([start, *grid])[best_idx]
+        best_cost = costs[best_idx]
+        done = 1
+        total = 1 + max_iter
+        if progress is not None:
+            progress(done / total, best_cost)
+
+        for _ in range(max_iter):
+            if step < min_step:
+                break
+            polls = []
+            for axis in range(3):
+                for sign in (1.0, -1.0):
+                    moved = list(best)
+                    moved[axis] += sign * step
+                    candidate = _clip(moved, bounds)
+                    if candidate != best:
+                        polls.append(candidate)
+            if not polls:
+                break
+            poll_costs = _evaluate(polls)
+            idx = min(range(len(polls)), key=poll_costs.__getitem__)
+            if poll_costs[idx] < best_cost:
+                best, best_cost = polls[idx], poll_costs[idx]
+            else:
+                step *= 0.5
+            done += 1
+            if progress is not None:
+                progress(done / total, best_cost)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    kp, ki, kd = _to_gains(best)
+    if progress is not None:
+        progress(1.0, best_cost)
+    _LOGGER.debug(
+        "better_thermostat PID tuning: kp=%.3f ki=%.5f kd=%.1f cost=%.4f (baseline %.4f, %d evaluations, lag %d steps)",
+        kp,
+        ki,
+        kd,
+        best_cost,
+        baseline,
+        evaluations,
+        plant.lag_steps,
+    )
+    return PidTuningResult(
+        kp=kp,
+        ki=ki,
+        kd=kd,
+        cost=best_cost,
+        baseline_cost=baseline,
+        evaluations=evaluations,
+        plant=plant,
+    )
+
+
+def tuning_summary(result: PidTuningResult) -> dict[str, Any]:
+    """Flatten a tuning result for state attributes."""
+
+    return {
+        "kp": round(result.kp, 3),
+        "ki": round(result.ki, 5),
+        "kd": round(result.kd, 1),
+        "cost": round(result.cost, 4),
+        "baseline_cost": round(result.baseline_cost, 4),
+        "evaluations": result.evaluations,
+        "plant_gain_K_min": round(result.plant.gain_K_min, 4),
+        "plant_loss_per_min": round(result.plant.loss_per_min, 5),
+        "plant_lag_steps": result.plant.lag_steps,
+        "plant_rmse_K_min": round(result.plant.rmse_K_min, 4),
+    }
@@ -0,0 +1,311 @@
+"""Keyed controller state registry with per-room and per-TRV indexes.
+
+Controller states (MPC, TPI, PID) are stored under keys of the form
+``{unique_id}:{entity_id}:{bucket}``. The registry behaves like the plain
+dict it replaces, but additionally indexes every key by unique_id and by
+(unique_id, entity_id) so that per-room and per-TRV lookups only touch the
+buckets of that room or TRV instead of scanning every stored state.
+
+Every 0.5 °C target bucket a room visits gets its own state, so the registry
+also tracks when each key was last used and can evict old buckets per TRV
+(see ``BucketEvictionPolicy``). Evicted buckets are folded into a per-TRV
+prior stored under the ``prior`` bucket, from which new buckets are seeded.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator, Mapping, MutableMapping
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+S = TypeVar("S")
+
+ParsedKey = tuple[str, str, str]
+
+PRIOR_BUCKET = "prior"
+
+
+@dataclass
+class BucketEvictionPolicy:
+    """Limits for the target buckets kept per TRV.
+
+    The prior bucket is never evicted and does not count towards the limit.
+    A value <= 0 disables the respective limit.
+    """
+
+    max_buckets_per_trv: int = 8
+    max_age_s: float = 180.0 * 86400.0
+
+
+def parse_state_key(key: str) -> ParsedKey | None:
+    """Split a ``{unique_id}:{entity_id}:{bucket}`` key, or None if malformed."""
+
+    parts = key.split(":", 2)
+    if len(parts) != 3:
+        return None
+    return parts[0], parts[1], parts[2]
+
+
+def last_used_stamps(state_map: Mapping[Any, Any], now: float) -> dict[str, float]:
+    """Return the last use of every entry of an exported state mapping.
+
+    Entries written before last use was tracked carry no ``last_used_ts``.
+    They count as one second older than the oldest dated entry (or ``now``),
+    so on the first load they are evicted before any dated bucket, in
+    mapping order, without being treated as stale on that account alone.
+    """
+
+    stamps: dict[str, float] = {}
+    missing: list[str] = []
+    for key, payload in state_map.items():
+        try:
+            stamps[str(key)] = float(payload["last_used_ts"])
+        except (KeyError, TypeError, ValueError):
+            missing.append(str(key))
+    undated = min(stamps.values(), default=now) - 1.0
+    for key in missing:
+        stamps[key] = undated
+    return stamps
+
+
+class StateRegistry(MutableMapping[str, S]):
+    """Dict of controller states with unique_id and (unique_id, entity_id) indexes."""
+
+    def __init__(self) -> None:
+        """Initialise an empty registry."""
+        self._states: dict[str, S] = {}
+        self._parsed: dict[str, ParsedKey | None] = {}
+        # Index values are insertion-ordered dicts used as ordered sets.
+        self._by_uid: dict[str, dict[str, None]] = {}
+        self._by_entity: dict[tuple[str, str], dict[str, None]] = {}
+        # Keys that do not follow the uid:entity:bucket layout.
+        self._unparsed: dict[str, None] = {}
+        # Wall-clock time of the last use of each key (LRU order for eviction).
+        self._last_used: dict[str, float] = {}
+
+    def __getitem__(self, key: str) -> S:
+        """Return the state stored under key."""
+        return self._states[key]
+
+    def __setitem__(self, key: str, state: S) -> None:
+        """Store a state and index its key on first insert."""
+        if key not in self._states:
+            self._index(key)
+        self._states[key] = state
+
+    def __delitem__(self, key: str) -> None:
+        """Remove a state and drop its key from the indexes."""
+        del self._states[key]
+        self._unindex(key)
+
+    def __contains__(self, key: object) -> bool:
+        """Return True if a state is stored under key."""
+        return key in self._states
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate keys in insertion order."""
+        return iter(self._states)
+
+    def __len__(self) -> int:
+        """Return the number of stored states."""
+        return len(self._states)
+
+    def __repr__(self) -> str:
+        """Return a dict-like representation."""
+        return f"{type(self).__name__}({self._states!r})"
+
+    def clear(self) -> None:
+        """Drop all states and indexes."""
+        self._states.clear()
+        self._parsed.clear()
+        self._by_uid.clear()
+        self._by_entity.clear()
+        self._unparsed.clear()
+        self._last_used.clear()
+
+    def parse_key(self, key: str) -> ParsedKey | None:
+        """Return the cached (uid, entity_id, bucket) split of a stored key."""
+        if key in self._parsed:
+            return self._parsed[key]
+        return parse_state_key(key)
+
+    def keys_for_uid(self, uid: str) -> list[str]:
+        """Return all keys of one Better Thermostat entity."""
+        return list(self._by_uid.get(uid, ()))
+
+    def keys_for_entity(self, uid: str, entity_id: str) -> list[str]:
+        """Return all bucket keys of one TRV."""
+        return list(self._by_entity.get((uid, entity_id), ()))
+
+    def items_for_entity(self, uid: str, entity_id: str) -> list[tuple[str, S]]:
+        """Return (key, state) pairs of all buckets of one TRV."""
+        return [
+            (key, self._states[key])
+            for key in self._by_entity.get((uid, entity_id), ())
+        ]
+
+    def items_with_prefix(self, prefix: str | None) -> list[tuple[str, S]]:
+        """Return (key, state) pairs whose key starts with prefix.
+
+        ``"{uid}:"`` and ``"{uid}:{entity_id}:"`` prefixes are served from the
+        indexes; any other prefix falls back to a full scan.
+        """
+
+        if prefix is None:
+            return list(self._states.items())
+        keys: list[str]
+        head = prefix[:-1] if prefix.endswith(":") else None
+        if head is not None and ":" not in head:
+            keys = self.keys_for_uid(head)
+        elif head is not None and head.count(":") == 1:
+            uid, entity_id = head.split(":", 1)
+            keys = self.keys_for_entity(uid, entity_id)
+        else:
+            return [
+                (key, state)
+                for key, state in list(self._states.items())
+                if key.startswith(prefix)
+            ]
+        keys.extend(key for key in self._unparsed if key.startswith(prefix))
+        return [(key, self._states[key]) for key in keys]
+
+    def touch(self, key: str, ts: float) -> None:
+        """Record that key was used at wall-clock time ts."""
+        if key in self._states:
+            self._last_used[key] = ts
+
+    def last_used(self, key: str) -> float | None:
+        """Return the wall-clock time key was last used, if known."""
+        return self._last_used.get(key)
+
+    def prior_key(self, key: str) -> str | None:
+        """Return the prior key of the TRV owning key, or None if malformed."""
+        parsed = self.parse_key(key)
+        if parsed is None:
+            return None
+        return f"{parsed[0]}:{parsed[1]}:{PRIOR_BUCKET}"
+
+    def evict(
+        self,
+        uid: str,
+        entity_id: str,
+        policy: BucketEvictionPolicy,
+        now: float,
+        *,
+        keep: str | None = None,
+        factory: Callable[[], S] | None = None,
+        merge: Callable[[S, S], None] | None = None,
+    ) -> list[str]:
+        """Evict stale and least recently used buckets of one TRV.
+
+        Buckets unused for longer than ``policy.max_age_s`` are dropped first,
+        then the oldest ones beyond ``policy.max_buckets_per_trv``. ``keep``
+        (usually the bucket in use) is never evicted. When ``factory`` and
+        ``merge`` are given, each evicted state is merged into the TRV prior,
+        which is created on demand. Returns the evicted keys.
+        """
+
+        prior_key = f"{uid}:{entity_id}:{PRIOR_BUCKET}"
+        candidates = [
+            key
+            for key in self._by_entity.get((uid, entity_id), ())
+            if key not in (prior_key, keep)
+        ]
+        # Keys with an unknown last use count as used now.
+        candidates.sort(key=lambda k: self._last_used.get(k, now))
+        evicted: list[str] = []
+        if policy.max_age_s > 0:
+            evicted = [
+                key
+                for key in candidates
+                if now - self._last_used.get(key, now) > policy.max_age_s
+            ]
+            candidates = candidates[len(evicted) :]
+        if policy.max_buckets_per_trv > 0:
+            limit = policy.max_buckets_per_trv - (1 if keep in self else 0)
+            excess = len(candidates) - max(0, limit)
+            if excess > 0:
+                evicted.extend(candidates[:excess])
+
+        if evicted and factory is not None and merge is not None:
+            prior = self.get(prior_key)
+            if prior is None:
+                prior = factory()
+                self[prior_key] = prior
+            for key in evicted:
+                merge(prior, self._states[key])
+            self._last_used[prior_key] = now
+        for key in evicted:
+            del self[key]
+        return evicted
+
+    def evict_all(
+        self,
+        policy: BucketEvictionPolicy,
+        now: float,
+        *,
+        uid: str | None = None,
+        factory: Callable[[], S] | None = None,
+        merge: Callable[[S, S], None] | None = None,
+        policies: Mapping[str, BucketEvictionPolicy] | None = None,
+    ) -> list[str]:
+        """Apply ``evict`` to every TRV, optionally limited to one unique_id.
+
+        ``policies`` maps entity_ids to their own policy; other TRVs use
+        ``policy``.
+        """
+
+        entities = [
+            entity
+            for entity in list(self._by_entity)
+            if uid is None or entity[0] == uid
+        ]
+        evicted: list[str] = []
+        for entity_uid, entity_id in entities:
+            entity_policy = (policies or {}).get(entity_id, policy)
+            evicted.extend(
+                self.evict(
+                    entity_uid,
+                    entity_id,
+                    entity_policy,
+                    now,
+                    factory=factory,
+                    merge=merge,
+                )
+            )
+        return evicted
+
+    def remove_entity(self, uid: str, entity_id: str) -> int:
+        """Drop every bucket of one TRV and return how many were removed."""
+        keys = self.keys_for_entity(uid, entity_id)
+        for key in keys:
+            del self[key]
+        return len(keys)
+
+    def _index(self, key: str) -> None:
+        parsed = parse_state_key(key)
+        self._parsed[key] = parsed
+        if parsed is None:
+            self._unparsed[key] = None
+            return
+        uid, entity_id, _ = parsed
+        self._by_uid.setdefault(uid, {})[key] = None
+        self._by_entity.setdefault((uid, entity_id), {})[key] = None
+
+    def _unindex(self, key: str) -> None:
+        self._last_used.pop(key, None)
+        parsed = self._parsed.pop(key, None)
+        if parsed is None:
+            self._unparsed.pop(key, None)
+            return
+        uid, entity_id, _ = parsed
+        uid_keys = self._by_uid.get(uid)
+        if uid_keys is not None:
+            uid_keys.pop(key, None)
+            if not uid_keys:
+                del self._by_uid[uid]
+        entity_keys = self._by_entity.get((uid, entity_id))
+        if entity_keys is not None:
+            entity_keys.pop(key, None)
+            if not entity_keys:
+                del self._by_entity[(uid, entity_id)]
@@ -8,11 +8,19 @@ cycle duration and exposes rich debug logs for diagnostics.
 from __future__ import annotations
 
 from collections.abc import Mapping
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 import logging
-from time import monotonic
+from time import monotonic, time
 from typing import Any
 
+from .debug_level import (
+    DEBUG_LEVEL_FULL,
+    DEBUG_LEVEL_OFF,
+    shape_debug,
+    wants_full_debug,
+)
+from .state_registry import BucketEvictionPolicy, StateRegistry, last_used_stamps
+
 _LOGGER = logging.getLogger(__name__)
 
 
@@ -28,6 +36,11 @@ class TpiParams:
     # Thresholds to disable/enable algorithm based on error
     threshold_low: float = 0.0  # re-enable when error < threshold_low
     threshold_high: float = 0.3  # disable when error > threshold_high
+    # Time-proportional actuation: cycle length and shortest on/off pulse
+    cycle_s: float = 600.0
+    min_switch_s: float = 60.0
+    # Target buckets kept per TRV (TPI holds no learned model to merge)
+    bucket_eviction: BucketEvictionPolicy = field(default_factory=BucketEvictionPolicy)
 
 
 @dataclass
@@ -42,6 +55,8 @@ class TpiInput:
     heating_allowed: bool = True
     bt_name: str | None = None
     entity_id: str | None = None
+    # "off" / "summary" / "full": how much of the debug payload is returned
+    debug_level: str = DEBUG_LEVEL_FULL
 
 
 @dataclass
@@ -52,24 +67,74 @@ class TpiOutput:
     debug: dict[str, Any] = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(slots=True)
 class _TpiState:
     last_percent: float | None = None
     last_update_ts: float = 0.0
 
 
-_TPI_STATES: dict[str, _TpiState] = {}
+_TPI_STATES: StateRegistry[_TpiState] = StateRegistry()
+
+# Debug fields returned in "summary" mode.
+_SUMMARY_DEBUG_KEYS = ("duty_cycle_pct", "reason")
 
 _STATE_EXPORT_FIELDS = ("last_percent",)
 
+# Learned coefficients are per room and stored as ``{unique_id}:{suffix}``
+# next to the TRV states.
+COEFFICIENTS_KEY_SUFFIX = "tpi_coefficients"
+_TPI_COEFFICIENTS: dict[str, dict[str, Any]] = {}
+
+
+def _coefficients_uid(key: str) -> str | None:
+    uid, sep, suffix = key.partition(":")
+    if sep and suffix == COEFFICIENTS_KEY_SUFFIX:
+        return uid
+    return None
+
+
+def set_tpi_coefficients(
+    uid: str,
+    coef_int: float,
+    coef_ext: float,
+    meta: Mapping[str, Any] | None = None,
+    updated_ts: float | None = None,
+) -> None:
+    """Store learned coefficients for a room; meta is kept for diagnostics."""
+
+    _TPI_COEFFICIENTS[uid] = {
+        **(meta or {}),
+        "coef_int": float(coef_int),
+        "coef_ext": float(coef_ext),
+        "updated_ts": time() if updated_ts is None else float(updated_ts),
+    }
+
+
+def get_tpi_coefficients(uid: str) -> dict[str, Any] | None:
+    """Return the learned coefficients of a room, if any."""
+
+    return _TPI_COEFFICIENTS.get(uid)
+
+
+def tpi_params_for(uid: str, base: TpiParams | None = None) -> TpiParams:
+    """Return TPI params with the learned coefficients of a room applied."""
+
+    params = base or TpiParams()
+    learned = _TPI_COEFFICIENTS.get(uid)
+    if not learned:
+        return params
+    return replace(params, coef_int=learned["coef_int"], coef_ext=learned["coef_ext"])
+
 
 def export_tpi_state_map(prefix: str | None = None) -> dict[str, dict[str, Any]]:
     """Return a serializable mapping of TPI states, optionally filtered by key prefix."""
 
     exported: dict[str, dict[str, Any]] = {}
-    for key, state in _TPI_STATES.items():
-        if prefix is not None and not key.startswith(prefix):
-            continue
+    for uid, learned in list(_TPI_COEFFICIENTS.items()):
+        key = f"{uid}:{COEFFICIENTS_KEY_SUFFIX}"
+        if prefix is None or key.startswith(prefix):
+            exported[key] = dict(learned)
+    for key, state in _TPI_STATES.items_with_prefix(prefix):
         payload: dict[str, Any] = {}
         for attr in _STATE_EXPORT_FIELDS:
             value = getattr(state, attr, None)
@@ -77,17 +142,48 @@ def export_tpi_state_map(prefix: str | None = None) -> dict[str, dict[str, Any]]
                 continue
             payload[attr] = value
         if payload:
+            last_used = _TPI_STATES.last_used(key)
+            if last_used is not None:
+                payload["last_used_ts"] = last_used
             exported[key] = payload
     return exported
 
 
-def import_tpi_state_map(state_map: Mapping[str, Mapping[str, Any]]) -> None:
-    """Hydrate TPI states from a previously exported mapping."""
+def import_tpi_state_map(
+    state_map: Mapping[str, Mapping[str, Any]],
+    policies: Mapping[str, BucketEvictionPolicy] | None = None,
+) -> None:
+    """Hydrate TPI states from a previously exported mapping.
 
+    Stale and surplus target buckets are evicted once the mapping is loaded,
+    using the eviction policy of each TRV from ``policies`` (entity_id ->
+    policy; the default policy otherwise).
+    """
+
+    now = time()
+    stamps = last_used_stamps(state_map, now)
+    uids: set[str] = set()
     for key, payload in state_map.items():
         if not isinstance(payload, Mapping):
             continue
+        coefficients_uid = _coefficients_uid(key)
+        if coefficients_uid is not None:
+            try:
+                set_tpi_coefficients(
+                    coefficients_uid,
+                    payload["coef_int"],
+                    payload["coef_ext"],
+                    payload,
+                    payload.get("updated_ts", now),
+                )
+            except (KeyError, TypeError, ValueError):
+                pass
+            continue
         state = _TPI_STATES.setdefault(key, _TpiState())
+        _TPI_STATES.touch(key, stamps[key])
+        parsed = _TPI_STATES.parse_key(key)
+        if parsed is not None:
+            uids.add(parsed[0])
         for attr in _STATE_EXPORT_FIELDS:
             if attr not in payload:
                 continue
@@ -105,6 +201,10 @@ def import_tpi_state_map(state_map: Mapping[str, Mapping[str, Any]]) -> None:
                 continue
             setattr(state, attr, coerced)
 
+    policy = TpiParams().bucket_eviction
+    for uid in uids:
+        _TPI_STATES.evict_all(policy, now, uid=uid, policies=policies)
+
 
 def _round_dbg(v: Any, d: int = 3) -> Any:
     try:
@@ -120,22 +220,33 @@ def compute_tpi(inp: TpiInput, params: TpiParams) -> TpiOutput | None:
     """
 
     now = monotonic()
-    state = _TPI_STATES.setdefault(inp.key, _TpiState())
+    wall_now = time()
+    state = _TPI_STATES.get(inp.key)
+    if state is None:
+        state = _TPI_STATES[inp.key] = _TpiState()
+        _TPI_STATES.touch(inp.key, wall_now)
+        parsed = _TPI_STATES.parse_key(inp.key)
+        if parsed is not None:
+            _TPI_STATES.evict(
+                parsed[0], parsed[1], params.bucket_eviction, wall_now, keep=inp.key
+            )
+    _TPI_STATES.touch(inp.key, wall_now)
 
     name = inp.bt_name or "BT"
     entity = inp.entity_id or "unknown"
 
-    _LOGGER.debug(
-        "better_thermostat %s: TPI input (%s) target=%s current=%s outdoor=%s window_open=%s allowed=%s last_percent=%s",
-        name,
-        entity,
-        _round_dbg(inp.target_temp_C),
-        _round_dbg(inp.current_temp_C),
-        _round_dbg(inp.outdoor_temp_C),
-        inp.window_open,
-        inp.heating_allowed,
-        _round_dbg(state.last_percent, 2),
-    )
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug(
+            "better_thermostat %s: TPI input (%s) target=%s current=%s outdoor=%s window_open=%s allowed=%s last_percent=%s",
+            name,
+            entity,
+            _round_dbg(inp.target_temp_C),
+            _round_dbg(inp.current_temp_C),
+            _round_dbg(inp.outdoor_temp_C),
+            inp.window_open,
+            inp.heating_allowed,
+            _round_dbg(state.last_percent, 2),
+        )
 
     if not inp.heating_allowed or inp.window_open:
         duty_pct = 0.0
@@ -168,12 +279,14 @@ def compute_tpi(inp: TpiInput, params: TpiParams) -> TpiOutput | None:
 
     # If error < threshold_low, re-enable calculation (but since we already calculated, maybe no change)
 
-    debug = {
-        "error_K": _round_dbg(error_K),
-        "coef_int": _round_dbg(params.coef_int, 3),
-        "coef_ext": _round_dbg(params.coef_ext, 3),
-        "raw_pct": _round_dbg(duty_pct, 2),
-    }
+    debug = {}
+    if wants_full_debug(inp.debug_level, _LOGGER):
+        debug = {
+            "error_K": _round_dbg(error_K),
+            "coef_int": _round_dbg(params.coef_int, 3),
+            "coef_ext": _round_dbg(params.coef_ext, 3),
+            "raw_pct": _round_dbg(duty_pct, 2),
+        }
 
     return _finalize_output(inp, params, state, now, duty_pct, error_K, debug)
 
@@ -193,6 +306,9 @@ def _finalize_output(
     state.last_percent = duty_pct
     state.last_update_ts = now
 
+    if inp.debug_level == DEBUG_LEVEL_OFF and not _LOGGER.isEnabledFor(logging.DEBUG):
+        return TpiOutput(duty_cycle_pct=duty_pct, debug={})
+
     debug.update(
         {
             "duty_cycle_pct": _round_dbg(duty_pct, 2),
@@ -200,17 +316,19 @@ def _finalize_output(
         }
     )
 
-    name = inp.bt_name or "BT"
-    entity = inp.entity_id or "unknown"
-    _LOGGER.debug(
-        "better_thermostat %s: TPI output (%s) duty=%s%% debug=%s",
-        name,
-        entity,
-        _round_dbg(duty_pct, 2),
-        debug,
-    )
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        _LOGGER.debug(
+            "better_thermostat %s: TPI output (%s) duty=%s%% debug=%s",
+            inp.bt_name or "BT",
+            inp.entity_id or "unknown",
+            _round_dbg(duty_pct, 2),
+            debug,
+        )
 
-    return TpiOutput(duty_cycle_pct=duty_pct, debug=debug)
+    return TpiOutput(
+        duty_cycle_pct=duty_pct,
+        debug=shape_debug(debug, inp.debug_level, _SUMMARY_DEBUG_KEYS),
+    )
 
 
 def build_tpi_key(bt, entity_id: str) -> str:
@@ -226,5 +344,10 @@ def build_tpi_key(bt, entity_id: str) -> str:
     except (TypeError, ValueError):
         bucket = "tunknown"
 
-    uid = getattr(bt, "unique_id", None) or getattr(bt, "_unique_id", "bt")
-    return f"{uid}:{entity_id}:{bucket}"
+    return f"{tpi_uid(bt)}:{entity_id}:{bucket}"
+
+
+def tpi_uid(bt) -> str:
+    """Return the room part of TPI keys for a Better Thermostat entity."""
+
+    return getattr(bt, "unique_id", None) or getattr(bt, "_unique_id", "bt")
@@ -0,0 +1,340 @@
+"""Learn TPI coefficients from completed heating and cooling cycles.
+
+``calculate_heating_power`` and ``calculate_heat_loss`` record every finished
+heating cycle (``heating_cycles``) and idle cooling cycle (``loss_cycles``)
+of a room. This module turns those records into TPI coefficients:
+
+1. ``fit_tpi_plant`` derives a first-order room model from the cycles:
+   the heat-up rate at full output from the heating cycles and the loss
+   rate (per K above outdoor, if known) from the cooling cycles,
+2. ``simulate_tpi`` closes the loop with the TPI law of ``compute_tpi``
+   around that model after a setpoint step and measures overshoot and
+   settling time,
+3. ``learn_tpi_coefficients`` searches coef_int/coef_ext for the lowest
+   combined cost and moves the current coefficients halfway towards the
+   result (all the way if the halfway point is no better).
+
+Cycle records are coarse (one rate per cycle), so the model is only used to
+rank coefficient pairs; the result is accepted only if it beats the current
+pair on the same model.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+import logging
+import math
+from statistics import median
+from typing import Any
+
+from .tpi import TpiParams
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class TpiLearningParams:
+    """Configuration of the coefficient learner."""
+
+    min_heating_cycles: int = 3
+    min_loss_cycles: int = 3
+    # Delay between valve and room sensor (emitter warm-up, air mixing)
+    lag_min: float = 10.0
+    # Closed-loop simulation
+    step_min: float = 1.0
+    horizon_min: float = 360.0
+    setpoint_steps_K: tuple[float, ...] = (1.5, 0.5)
+    settle_band_K: float = 0.2
+    # Cost: settling time as a fraction of the horizon plus overshoot in K
+    overshoot_weight: float = 2.0
+    # Search bounds and effort
+    coef_int_min: float = 0.05
+    coef_int_max: float = 3.0
+    coef_ext_min: float = 0.0
+    coef_ext_max: float = 0.1
+    grid_points: int = 8
+    max_iter: int = 30
+    initial_step_log: float = 0.4
+    min_step_log: float = 0.02
+    # Fraction of the way from the current coefficients to the fitted ones
+    blend: float = 0.5
+
+
+@dataclass(slots=True)
+class TpiPlant:
+    """Room model derived from cycle records.
+
+    dT/dt [K/min] = gain * u(t - lag) - loss * (T - outdoor) if the outdoor
+    temperature is known, else gain * u(t - lag) - loss (a constant drift).
+    """
+
+    gain_K_min: float
+    loss: float
+    outdoor_C: float | None
+    target_C: float
+    heating_cycles: int
+    loss_cycles: int
+
+
+@dataclass(slots=True)
+class TpiLearningResult:
+    """Outcome of ``learn_tpi_coefficients``."""
+
+    coef_int: float
+    coef_ext: float
+    overshoot_K: float
+    settling_min: float
+    cost: float
+    baseline_cost: float
+    improved: bool
+    plant: TpiPlant
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a JSON-serialisable summary."""
+        return {
+            "coef_int": round(self.coef_int, 4),
+            "coef_ext": round(self.coef_ext, 5),
+            "overshoot_K": round(self.overshoot_K, 3),
+            "settling_min": round(self.settling_min, 1),
+            "cost": round(self.cost, 4),
+            "baseline_cost": round(self.baseline_cost, 4),
+            "heating_cycles": self.plant.heating_cycles,
+            "loss_cycles": self.plant.loss_cycles,
+        }
+
+
+def _num(record: Mapping[str, Any], key: str) -> float | None:
+    try:
+        value = float(record[key])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def fit_tpi_plant(
+    heating_cycles: Iterable[Mapping[str, Any]],
+    loss_cycles: Iterable[Mapping[str, Any]],
+    learning: TpiLearningParams | None = None,
+) -> TpiPlant | None:
+    """Derive a room model from cycle records, or None if there are too few."""
+
+    learning = learning or TpiLearningParams()
+    heating = [c for c in heating_cycles if isinstance(c, Mapping)]
+    losses = [c for c in loss_cycles if isinstance(c, Mapping)]
+
+    outdoors = [v for c in heating if (v := _num(c, "outdoor")) is not None]
+    targets = [v for c in heating if (v := _num(c, "target")) is not None]
+    outdoor = median(outdoors) if outdoors else None
+    target = median(targets) if targets else 21.0
+
+    # Loss: K/min per K above outdoor, or a plain drift without outdoor data
+    loss_samples: list[float] = []
+    for cycle in losses:
+        rate = _num(cycle, "rate")
+        start = _num(cycle, "temp_start")
+        end = _num(cycle, "temp_min")
+        if rate is None or rate <= 0.0:
+            continue
+        if outdoor is None:
+            loss_samples.append(rate)
+        elif start is not None and end is not None:
+            above = 0.5 * (start + end) - outdoor
+            if above > 1.0:
+                loss_samples.append(rate / above)
+    if len(loss_samples) < learning.min_loss_cycles:
+        return None
+    loss = median(loss_samples)
+
+    # Gain: observed heat-up rate plus the loss it had to overcome
+    gain_samples: list[float] = []
+    for cycle in heating:
+        rate = _num(cycle, "rate_c_min")
+        start = _num(cycle, "temp_start")
+        peak = _num(cycle, "temp_peak")
+        if rate is None or rate <= 0.0:
+            continue
+        if outdoor is None:
+            gain_samples.append(rate + loss)
+        elif start is not None and peak is not None:
+            gain_samples.append(rate + loss * max(0.0, 0.5 * (start + peak) - outdoor))
+    if len(gain_samples) < learning.min_heating_cycles:
+        return None
+
+    return TpiPlant(
+        gain_K_min=median(gain_samples),
+        loss=loss,
+        outdoor_C=outdoor,
+        target_C=target,
+        heating_cycles=len(gain_samples),
+        loss_cycles=len(loss_samples),
+    )
+
+
+def simulate_tpi(
+    coef_int: float,
+    coef_ext: float,
+    plant: TpiPlant,
+    tpi_params: TpiParams | None = None,
+    learning: TpiLearningParams | None = None,
+) -> tuple[float, float, float]:
+    """Return (cost, overshoot_K, settling_min) of a coefficient pair.
+
+    Each setpoint step starts the room below target with the valve closed;
+    the worst overshoot and the mean settling time over all steps count.
+    """
+
+    tpi_params = tpi_params or TpiParams()
+    learning = learning or TpiLearningParams()
+    dt = learning.step_min
+    steps = max(1, int(learning.horizon_min / dt))
+    lag = max(0, int(round(learning.lag_min / dt)))
+    target = plant.target_C
+    ext_pct = 0.0
+    if plant.outdoor_C is not None:
+        ext_pct = coef_ext * (target - plant.outdoor_C) * 100.0
+
+    overshoot = 0.0
+    settling_total = 0.0
+    for offset in learning.setpoint_steps_K:
+        temp = target - offset
+        pipeline = deque([0.0] * lag)
+        settled_at = 0
+        for k in range(steps):
+            error = target - temp
+            if tpi_params.threshold_high > 0.0 and error < -tpi_params.threshold_high:
+                duty = 0.0
+            else:
+                duty = coef_int * error * 100.0 + ext_pct
+            duty = max(tpi_params.clamp_min_pct, min(tpi_params.clamp_max_pct, duty))
+            pipeline.append(duty)
+            applied = pipeline.popleft() / 100.0
+            if plant.outdoor_C is not None:
+                drift = plant.loss * (temp - plant.outdoor_C)
+            else:
+                drift = plant.loss
+            temp += dt * (plant.gain_K_min * applied - drift)
+            overshoot = max(overshoot, temp - target)
+            if abs(temp - target) > learning.settle_band_K:
+                settled_at = k + 1
+        settling_total += settled_at * dt
+
+    settling = settling_total / max(1, len(learning.setpoint_steps_K))
+    cost = settling / learning.horizon_min + learning.overshoot_weight * overshoot
+    return cost, overshoot, settling
+
+
+def learn_tpi_coefficients(
+    heating_cycles: Iterable[Mapping[str, Any]],
+    loss_cycles: Iterable[Mapping[str, Any]],
+    current: TpiParams | None = None,
+    learning: TpiLearningParams | None = None,
+) -> TpiLearningResult | None:
+    """Fit coef_int/coef_ext to the recorded cycles.
+
+    Returns None if there are not enough cycles. Otherwise ``improved`` tells
+    whether the (blended) coefficients beat ``current`` on the fitted model;
+    if not, the returned coefficients are the current ones.
+    """
+
+    current = current or TpiParams()
+    learning = learning or TpiLearningParams()
+    plant = fit_tpi_plant(heating_cycles, loss_cycles, learning)
+    if plant is None or plant.gain_K_min <= 0.0:
+        return None
+    use_ext = plant.outdoor_C is not None
+
+    lo_int = math.log(learning.coef_int_min)
+    hi_int = math.log(learning.coef_int_max)
+
+    def clamp(ci: float, ce: float) -> tuple[float, float]:
+        ci = max(learning.coef_int_min, min(learning.coef_int_max, ci))
+        ce = max(learning.coef_ext_min, min(learning.coef_ext_max, ce))
+        return ci, (ce if use_ext else current.coef_ext)
+
+    def score(ci: float, ce: float) -> float:
+        return simulate_tpi(ci, ce, plant, current, learning)[0]
+
+    baseline = score(current.coef_int, current.coef_ext)
+
+    # Steady state needs gain * duty = loss * (target - outdoor): that duty
+    # is the natural feed-forward, so coef_ext = loss / gain.
+    ext_guess = plant.loss / plant.gain_K_min if use_ext else current.coef_ext
+    n = max(2, learning.grid_points)
+    candidates = [
+        clamp(math.exp(lo_int + (hi_int - lo_int) * i / (n - 1)), ce)
+        for i in range(n)
+        for ce in (
+            {ext_guess * f for f in (0.5, 1.0, 1.5)} | {current.coef_ext}
+            if use_ext
+            else {current.coef_ext}
+        )
+    ]
+    candidates.append(clamp(current.coef_int, current.coef_ext))
+    best_cost, best = min((score(ci, ce), (ci, ce)) for ci, ce in candidates)
+
+    # Compass search in (log coef_int, coef_ext)
+    step = learning.initial_step_log
+    ext_step = max(1e-4, 0.5 * best[1]) if use_ext else 0.0
+    for _ in range(learning.max_iter):
+        if step < learning.min_step_log:
+            break
+        moves = [
+            (best[0] * math.exp(step), best[1]),
+            (best[0] * math.exp(-step), best[1]),
+        ]
+        if use_ext:
+            moves += [(best[0], best[1] + ext_step), (best[0], best[1] - ext_step)]
+        trials = {clamp(*m) for m in moves} - {best}
+        if not trials:
+            break
+        trial_cost, trial = min((score(*t), t) for t in trials)
+        if trial_cost < best_cost:
+            best_cost, best = trial_cost, trial
+        else:
+            step *= 0.5
+            ext_step *= 0.5
+
+    blend = max(0.0, min(1.0, learning.blend))
+    coef_int = math.exp(
+        (1.0 - blend) * math.log(current.coef_int) + blend * math.log(best[0])
+    )
+    coef_ext = (1.0 - blend) * current.coef_ext + blend * best[1]
+    coef_int, coef_ext = clamp(coef_int, coef_ext)
+    cost, overshoot, settling = simulate_tpi(
+        coef_int, coef_ext, plant, current, learning
+    )
+    if cost >= baseline and best_cost < baseline:
+        # The halfway point can sit on a plateau as bad as the current pair
+        coef_int, coef_ext = best
+        cost, overshoot, settling = simulate_tpi(
+            coef_int, coef_ext, plant, current, learning
+        )
+    improved = cost < baseline
+    if not improved:
+        coef_int, coef_ext = current.coef_int, current.coef_ext
+        cost, overshoot, settling = simulate_tpi(
+            coef_int, coef_ext, plant, current, learning
+        )
+
+    _LOGGER.debug(
+        "better_thermostat: TPI learner plant gain=%.4f loss=%.5f outdoor=%s -> coef_int=%.3f coef_ext=%.4f cost=%.4f (baseline %.4f)",
+        plant.gain_K_min,
+        plant.loss,
+        plant.outdoor_C,
+        coef_int,
+        coef_ext,
+        cost,
+        baseline,
+    )
+    return TpiLearningResult(
+        coef_int=coef_int,
+        coef_ext=coef_ext,
+        overshoot_K=overshoot,
+        settling_min=settling,
+        cost=cost,
+        baseline_cost=baseline,
+        improved=improved,
+        plant=plant,
+    )
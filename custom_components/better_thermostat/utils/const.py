@@ -51,6 +51,19 @@ CONF_HOMEMATICIP = "homematicip"
 CONF_PRESETS = "presets"
 CONF_INTEGRATION = "integration"
 CONF_NO_SYSTEM_MODE_OFF = "no_off_system_mode"
+CONF_TPI_TIME_PROPORTIONAL = "tpi_time_proportional"
+CONF_TPI_CYCLE = "tpi_cycle_s"
+CONF_TPI_MIN_SWITCH = "tpi_min_switch_s"
+CONF_MPC_SOLVER = "mpc_solver"
+CONF_MPC_WARM_START = "mpc_warm_start"
+CONF_MPC_WARM_START_RADIUS = "mpc_warm_start_radius_pct"
+CONF_MPC_WARM_START_MAX_RADIUS = "mpc_warm_start_max_radius_pct"
+CONF_MPC_HORIZON_STEPS = "mpc_horizon_steps"
+CONF_MPC_MOVE_BLOCKS = "mpc_move_blocks"
+CONF_MPC_ESTIMATOR = "mpc_estimator"
+CONF_MPC_EXACT_DISCRETIZATION = "mpc_exact_discretization"
+CONF_MPC_ROOM_SOLVE = "mpc_room_solve"
+CONF_PID_GAIN_SCHEDULE = "pid_gain_schedule"
 CONF_TOLERANCE = "tolerance"
 CONF_TARGET_TEMP_STEP = "target_temp_step"
 
@@ -75,6 +88,11 @@ ATTR_STATE_HEATING_STATS = "heating_stats"
 ATTR_STATE_ERRORS = "errors"
 ATTR_STATE_BATTERIES = "batteries"
 ATTR_STATE_OFF_TEMPERATURE = "off_temperature"
+ATTR_STATE_CALIBRATION_DEBUG_LEVEL = "calibration_debug_level"
+ATTR_STATE_PID_TUNING = "pid_tuning"
+ATTR_STATE_CONTROL_QUEUE = "control_queue"
+ATTR_STATE_CONTROL_LANES = "control_lanes"
+ATTR_STATE_ACK_LATENCY = "ack_latency"
 # ECO mode logic removed; keep eco temperature for preset support
 
 SERVICE_RESTORE_SAVED_TARGET_TEMPERATURE = "restore_saved_target_temperature"
@@ -82,6 +100,8 @@ SERVICE_SET_TEMP_TARGET_TEMPERATURE = "set_temp_target_temperature"
 # set_eco_mode service removed; ECO preset still supported via PRESET_ECO
 SERVICE_RESET_HEATING_POWER = "reset_heating_power"
 SERVICE_RESET_PID_LEARNINGS = "reset_pid_learnings"
+SERVICE_SET_CALIBRATION_DEBUG_LEVEL = "set_calibration_debug_level"
+SERVICE_TUNE_PID_FROM_HISTORY = "tune_pid_from_history"
 
 BETTERTHERMOSTAT_SET_TEMPERATURE_SCHEMA = vol.All(
     cv.has_at_least_one_key(ATTR_TEMPERATURE),
@@ -100,6 +120,32 @@ BETTERTHERMOSTAT_RESET_PID_SCHEMA = make_entity_service_schema(
     }
 )
 
+# Offline PID tuning from recorded history
+BETTERTHERMOSTAT_TUNE_PID_SCHEMA = make_entity_service_schema(
+    {
+        vol.Optional("hours", default=72): vol.All(
+            vol.Coerce(int), vol.Range(min=6, max=336)
+        ),
+        vol.Optional("max_workers", default=1): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=8)
+        ),
+        vol.Optional("apply_gains", default=True): cv.boolean,
+    }
+)
+
+
+class CalibrationDebugLevel(StrEnum):
+    """How much controller debug data is built and exposed."""
+
+    OFF = "off"
+    SUMMARY = "summary"
+    FULL = "full"
+
+
+BETTERTHERMOSTAT_SET_DEBUG_LEVEL_SCHEMA = make_entity_service_schema(
+    {vol.Required("level"): vol.In([level.value for level in CalibrationDebugLevel])}
+)
+
 
 class BetterThermostatEntityFeature(IntEnum):
     """Supported features of the climate entity."""
@@ -128,6 +174,27 @@ class CalibrationMode(StrEnum):
     PID_CALIBRATION = "pid_calibration"
 
 
+class MpcSolver(StrEnum):
+    """Horizon search of the MPC controller."""
+
+    GRID = "grid"
+    ANALYTIC = "analytic"
+
+
+class MpcEstimator(StrEnum):
+    """Model identification of the MPC controller."""
+
+    EMA = "ema"
+    RLS = "rls"
+
+
+class PidGainSchedule(StrEnum):
+    """Variable the PID gain schedule is interpolated over."""
+
+    TARGET = "target"
+    OUTDOOR_DELTA = "target_outdoor_delta"
+
+
 # Heating power calibration constants
 # These bounds represent realistic heating rates for residential heating systems
 MIN_HEATING_POWER = 0.005  # °C/min - Very slow heating (poor insulation, cold climate)
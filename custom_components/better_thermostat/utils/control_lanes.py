@@ -0,0 +1,212 @@
+"""Independent per-TRV control lanes.
+
+Awaiting ``control_trv`` for all TRVs of a room together would let the
+slowest TRV (fixed settle sleeps, slow or offline adapters) hold back the
+next cycle for every TRV. Instead each TRV has a lane with a single
+latest-desired-state slot and its own worker:
+
+- ``dispatch`` writes the new cycle into every lane's slot and returns at
+  once. A slot that still holds a cycle the lane has not started yet is
+  overwritten (that cycle is superseded, never pushed).
+- Each worker pushes to its device at its own pace: it takes the slot,
+  runs ``control_trv`` (which reads the latest room state), and repeats
+  while the slot is refilled.
+
+A cycle is complete once every lane has pushed it or been superseded; its
+outcome is reported through ``on_cycle_done`` (the mailbox records latency
+and schedules retries from it).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+import logging
+from time import monotonic
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+# Smoothing factor of the latency average
+_LATENCY_ALPHA = 0.2
+
+
+@dataclass(slots=True)
+class _Desired:
+    cycle: Any
+    ts: float
+
+
+@dataclass(slots=True)
+class _CycleProgress:
+    cycle: Any
+    remaining: int
+    ok: bool = True
+
+
+class ControlLane:
+    """Latest-desired-state slot and worker of one TRV."""
+
+    def __init__(
+        self,
+        key: str,
+        push: Callable[[str], Awaitable[Any]],
+        on_pushed: Callable[[Any, bool], None],
+    ) -> None:
+        """Initialise an idle lane."""
+        self.key = key
+        self._push = push
+        self._on_pushed = on_pushed
+        self._slot: _Desired | None = None
+        self._task: asyncio.Task | None = None
+        self._busy_since: float | None = None
+        # Metrics
+        self.pushes = 0
+        self.superseded = 0
+        self.failures = 0
+        self.last_latency_s: float | None = None
+        self.latency_avg_s: float | None = None
+        self.latency_max_s = 0.0
+        self.last_push_s: float | None = None
+
+    @property
+    def busy(self) -> bool:
+        """Return True while the lane pushes to its device."""
+        return self._busy_since is not None
+
+    def offer(self, cycle: Any) -> Any | None:
+        """Set the desired state; return the cycle it supersedes, if any."""
+        previous = self._slot
+        self._slot = _Desired(cycle, monotonic())
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._work())
+        if previous is None:
+            return None
+        self.superseded += 1
+        return previous.cycle
+
+    def cancel(self) -> None:
+        """Stop the worker and drop the desired state."""
+        self._slot = None
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def _work(self) -> None:
+        while self._slot is not None:
+            desired, self._slot = self._slot, None
+            self._busy_since = monotonic()
+            try:
+                result = await self._push(self.key)
+                ok = result is not False
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                _LOGGER.error(
+                    "better_thermostat: ERROR controlling TRV %s: %s", self.key, err
+                )
+                ok = False
+            finally:
+                finished = monotonic()
+                self.last_push_s = finished - self._busy_since
+                self._busy_since = None
+            self._record(finished - desired.ts, ok)
+            self._on_pushed(desired.cycle, ok)
+
+    def _record(self, latency: float, ok: bool) -> None:
+        self.pushes += 1
+        if not ok:
+            self.failures += 1
+        self.last_latency_s = latency
+        self.latency_max_s = max(self.latency_max_s, latency)
+        self.latency_avg_s = (
+            latency
+            if self.latency_avg_s is None
+            else self.latency_avg_s + _LATENCY_ALPHA * (latency - self.latency_avg_s)
+        )
+
+    def metrics(self) -> dict[str, Any]:
+        """Return lane metrics for diagnostics."""
+
+        def _r(value: float | None) -> float | None:
+            return round(value, 3) if value is not None else None
+
+        return {
+            "busy": self.busy,
+            "pending": self._slot is not None,
+            "pushes": self.pushes,
+            "superseded": self.superseded,
+            "failures": self.failures,
+            "latency_last_s": _r(self.last_latency_s),
+            "latency_avg_s": _r(self.latency_avg_s),
+            "latency_max_s": round(self.latency_max_s, 3),
+            "push_last_s": _r(self.last_push_s),
+        }
+
+
+class ControlLanes:
+    """The control lanes of one Better Thermostat entity."""
+
+    def __init__(
+        self,
+        push: Callable[[str], Awaitable[Any]],
+        on_cycle_done: Callable[[Any, bool], None] | None = None,
+    ) -> None:
+        """Initialise without lanes; they are created on first dispatch."""
+        self._push = push
+        self._on_cycle_done = on_cycle_done
+        self._lanes: dict[str, ControlLane] = {}
+        self._cycles: dict[int, _CycleProgress] = {}
+
+    def __getitem__(self, key: str) -> ControlLane:
+        """Return the lane of a TRV."""
+        return self._lanes[key]
+
+    def dispatch(self, keys: Iterable[str], cycle: Any) -> None:
+        """Make cycle the desired state of the lanes of keys."""
+        keys = list(keys)
+        if not keys:
+            if self._on_cycle_done is not None:
+                self._on_cycle_done(cycle, True)
+            return
+        self._cycles[id(cycle)] = _CycleProgress(cycle, len(keys))
+        for key in keys:
+            lane = self._lanes.get(key)
+            if lane is None:
+                lane = self._lanes[key] = ControlLane(key, self._push, self._settle)
+            superseded = lane.offer(cycle)
+            if superseded is not None:
+                # The newer cycle carries this lane's outcome
+                self._settle(superseded, True)
+
+    def _settle(self, cycle: Any, ok: bool) -> None:
+        progress = self._cycles.get(id(cycle))
+        if progress is None:
+            return
+        progress.remaining -= 1
+        progress.ok = progress.ok and ok
+        if progress.remaining > 0:
+            return
+        del self._cycles[id(cycle)]
+        if self._on_cycle_done is not None:
+            self._on_cycle_done(cycle, progress.ok)
+
+    def busy(self, key: str) -> bool:
+        """Return True while the lane of key pushes to its device."""
+        lane = self._lanes.get(key)
+        return lane is not None and lane.busy
+
+    def idle(self) -> bool:
+        """Return True if no lane is busy or has a pending desired state."""
+        return not self._cycles
+
+    def close(self) -> None:
+        """Cancel all lane workers."""
+        for lane in self._lanes.values():
+            lane.cancel()
+        self._cycles.clear()
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        """Return the metrics of every lane."""
+        return {key: lane.metrics() for key, lane in self._lanes.items()}
@@ -0,0 +1,192 @@
+"""Coalescing mailbox for control requests.
+
+Producers (sensor, TRV, window and cooler events, services, the periodic
+tick) ``submit`` a reason instead of queueing the entity itself. Requests
+that arrive while a cycle is pending or running are merged into one batch:
+its reasons form a dirty set, its priority is the highest submitted, and it
+remembers when the first of its requests arrived. ``control_queue`` takes one
+batch and runs one cycle over the latest state, however many requests were
+merged into it.
+
+A failed cycle is retried after an exponential backoff on the shared timer
+wheel. While a retry is pending, batches below setpoint priority wait for it
+(they would hit the same failure); window and setpoint requests still run
+at once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import logging
+from time import monotonic
+from typing import Any
+
+from .timer_wheel import TIMER_WHEEL, TimerWheel, WheelTimer
+
+_LOGGER = logging.getLogger(__name__)
+
+REASON_WINDOW = "window"
+REASON_SETPOINT = "setpoint"
+REASON_SENSOR = "sensor"
+REASON_PERIODIC = "periodic"
+REASON_RETRY = "retry"
+
+PRIORITY_PERIODIC = 0
+PRIORITY_SENSOR = 1
+PRIORITY_SETPOINT = 2
+PRIORITY_WINDOW = 3
+
+REASON_PRIORITY = {
+    REASON_WINDOW: PRIORITY_WINDOW,
+    REASON_SETPOINT: PRIORITY_SETPOINT,
+    REASON_SENSOR: PRIORITY_SENSOR,
+    REASON_PERIODIC: PRIORITY_PERIODIC,
+    REASON_RETRY: PRIORITY_PERIODIC,
+}
+
+# Smoothing factor of the latency average
+_LATENCY_ALPHA = 0.2
+
+
+@dataclass(slots=True)
+class ControlBatch:
+    """Requests merged into one control cycle."""
+
+    first_ts: float
+    priority: int = PRIORITY_PERIODIC
+    reasons: set[str] = field(default_factory=set)
+    requests: int = 0
+
+    @property
+    def merged(self) -> int:
+        """Number of requests absorbed beyond the first."""
+        return max(0, self.requests - 1)
+
+
+class ControlMailbox:
+    """Single-slot, coalescing control request mailbox."""
+
+    def __init__(
+        self,
+        retry_base_s: float = 5.0,
+        retry_max_s: float = 300.0,
+        wheel: TimerWheel = TIMER_WHEEL,
+    ) -> None:
+        """Initialise an empty mailbox."""
+        self.retry_base_s = retry_base_s
+        self.retry_max_s = retry_max_s
+        self._wheel = wheel
+        self._pending: ControlBatch | None = None
+        self._wakeup = asyncio.Event()
+        self._retry_timer: WheelTimer | None = None
+        self._retry_attempt = 0
+        # Metrics
+        self._submitted = 0
+        self._merged_total = 0
+        self._cycles = 0
+        self._failures = 0
+        self._by_reason: dict[str, int] = {}
+        self._last: dict[str, Any] = {}
+        self._latency_avg_s: float | None = None
+        self._latency_max_s = 0.0
+
+    def empty(self) -> bool:
+        """Return True if no request is pending."""
+        return self._pending is None
+
+    def submit(self, reason: str = REASON_SENSOR, priority: int | None = None) -> None:
+        """Request a control cycle; merges into the pending batch if there is one."""
+        if priority is None:
+            priority = REASON_PRIORITY.get(reason, PRIORITY_SENSOR)
+        batch = self._pending
+        if batch is None:
+            batch = self._pending = ControlBatch(first_ts=monotonic())
+        else:
+            self._merged_total += 1
+        batch.requests += 1
+        batch.reasons.add(reason)
+        batch.priority = max(batch.priority, priority)
+        self._submitted += 1
+        self._by_reason[reason] = self._by_reason.get(reason, 0) + 1
+        self._wakeup.set()
+
+    def _held(self, batch: ControlBatch) -> bool:
+        return self._retry_timer is not None and batch.priority < PRIORITY_SETPOINT
+
+    async def get(self) -> ControlBatch:
+        """Wait for a runnable batch and take it."""
+        while True:
+            batch = self._pending
+            if batch is not None and not self._held(batch):
+                self._pending = None
+                self._wakeup.clear()
+                return batch
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def complete(self, batch: ControlBatch, ok: bool) -> None:
+        """Record a finished cycle and schedule a retry if it failed."""
+        latency = monotonic() - batch.first_ts
+        self._cycles += 1
+        self._latency_max_s = max(self._latency_max_s, latency)
+        self._latency_avg_s = (
+            latency
+            if self._latency_avg_s is None
+            else self._latency_avg_s + _LATENCY_ALPHA * (latency - self._latency_avg_s)
+        )
+        self._last = {
+            "reasons": sorted(batch.reasons),
+            "priority": batch.priority,
+            "merged": batch.merged,
+            "latency_s": round(latency, 3),
+            "ok": ok,
+        }
+        if ok:
+            self._retry_attempt = 0
+            self._cancel_retry()
+            return
+        self._failures += 1
+        if self._retry_timer is not None:
+            return
+        delay = min(self.retry_max_s, self.retry_base_s * 2**self._retry_attempt)
+        self._retry_attempt += 1
+        _LOGGER.debug(
+            "better_thermostat: control cycle failed, retry %s in %.0fs",
+            self._retry_attempt,
+            delay,
+        )
+        self._retry_timer = self._wheel.call_later(delay, self._fire_retry)
+
+    def _fire_retry(self) -> None:
+        self._retry_timer = None
+        self.submit(REASON_RETRY)
+
+    def _cancel_retry(self) -> None:
+        if self._retry_timer is not None:
+            self._retry_timer.cancel()
+            self._retry_timer = None
+
+    def close(self) -> None:
+        """Drop pending work and any scheduled retry."""
+        self._cancel_retry()
+        self._pending = None
+
+    def metrics(self) -> dict[str, Any]:
+        """Return queue metrics for diagnostics."""
+        return {
+            "submitted": self._submitted,
+            "cycles": self._cycles,
+            "merged": self._merged_total,
+            "failures": self._failures,
+            "retry_attempt": self._retry_attempt,
+            "retry_pending": self._retry_timer is not None,
+            "latency_avg_s": (
+                round(self._latency_avg_s, 3)
+                if self._latency_avg_s is not None
+                else None
+            ),
+            "latency_max_s": round(self._latency_max_s, 3),
+            "by_reason": dict(self._by_reason),
+            "last": dict(self._last),
+        }
@@ -5,6 +5,7 @@ import logging
 
 from homeassistant.components.climate.const import PRESET_BOOST, HVACMode
 from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import State
 
 from custom_components.better_thermostat.adapters.delegate import (
     get_current_offset,
@@ -13,15 +14,26 @@ from custom_components.better_thermostat.adapters.delegate import (
     set_temperature,
     set_valve,
 )
-from custom_components.better_thermostat.events.trv import convert_outbound_states
+from custom_components.better_thermostat.calibration import async_prefetch_calibration
+from custom_components.better_thermostat.events.trv import (
+    convert_outbound_states,
+    observe_trv_acks,
+)
 from custom_components.better_thermostat.model_fixes.model_quirks import (
     override_set_hvac_mode,
 )
+from custom_components.better_thermostat.utils.ack_tracker import (
+    ACK_HVAC_MODE,
+    ACK_TEMPERATURE,
+    AckTracker,
+)
 from custom_components.better_thermostat.utils.const import (
+    CONF_TPI_TIME_PROPORTIONAL,
     CalibrationMode,
     CalibrationType,
 )
 from custom_components.better_thermostat.utils.helpers import convert_to_float
+from custom_components.better_thermostat.utils.tpi_actuation import TPI_CYCLES
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -41,6 +53,59 @@ class TaskManager:
         return task
 
 
+class ControlGate:
+    """Open while no flag holds back the control queue.
+
+    Replaces polling the flags once per second: the flags are ``GateFlag``
+    attributes, so every write re-evaluates the gate and a waiting consumer
+    resumes the moment the last flag clears.
+    """
+
+    FLAGS = ("in_maintenance", "ignore_states", "startup_running")
+
+    def __init__(self):
+        """Initialize a closed gate."""
+        self._open = asyncio.Event()
+
+    @property
+    def is_open(self) -> bool:
+        """Return True if the control queue may run."""
+        return self._open.is_set()
+
+    def update(self, owner) -> None:
+        """Open or close the gate from the flags of owner."""
+        if any(getattr(owner, flag, False) for flag in self.FLAGS):
+            self._open.clear()
+        else:
+            self._open.set()
+
+    async def wait_open(self) -> None:
+        """Wait until the gate is open."""
+        while not self._open.is_set():
+            await self._open.wait()
+
+
+class GateFlag:
+    """Boolean instance attribute that updates the owner's ``control_gate``."""
+
+    def __set_name__(self, owner, name):
+        """Remember the attribute name."""
+        self._name = name
+
+    def __get__(self, obj, objtype=None):
+        """Return the flag (False until first set)."""
+        if obj is None:
+            return self
+        return obj.__dict__.get(self._name, False)
+
+    def __set__(self, obj, value):
+        """Store the flag and re-evaluate the gate."""
+        obj.__dict__[self._name] = value
+        gate = obj.__dict__.get("control_gate")
+        if gate is not None:
+            gate.update(obj)
+
+
 async def control_queue(self):
     """Control the queue.
 
@@ -58,82 +123,58 @@ async def control_queue(self):
 
     try:
         while True:
-            if getattr(self, "in_maintenance", False):
-                await asyncio.sleep(1)
-                continue
+            await self.control_gate.wait_open()
+            batch = await self.control_queue_task.get()
+            # A flag may have been raised while waiting for the request
+            await self.control_gate.wait_open()
+            _LOGGER.debug(
+                "better_thermostat %s: control cycle for %s (priority %s, %s merged)",
+                self.device_name,
+                sorted(batch.reasons),
+                batch.priority,
+                batch.merged,
+            )
+            self.ignore_states = True
+
+            # Calculate heating power once per cycle
+            try:
+                await self.calculate_heating_power()
+            except Exception:
+                _LOGGER.exception(
+                    "better_thermostat %s: ERROR calculating heating power",
+                    self.device_name,
+                )
 
-            if self.ignore_states or self.startup_running:
-                await asyncio.sleep(1)
-                continue
-            else:
-                controls_to_process = await self.control_queue_task.get()
-                if controls_to_process is not None:
-                    self.ignore_states = True
-
-                    # Calculate heating power once per cycle
-                    try:
-                        await self.calculate_heating_power()
-                    except Exception:
-                        _LOGGER.exception(
-                            "better_thermostat %s: ERROR calculating heating power",
-                            self.device_name,
-                        )
+            # Calculate heat loss once per cycle (idle cooling)
+            try:
+                await self.calculate_heat_loss()
+            except Exception:
+                _LOGGER.exception(
+                    "better_thermostat %s: ERROR calculating heat loss",
+                    self.device_name,
+                )
 
-                    # Calculate heat loss once per cycle (idle cooling)
-                    try:
-                        await self.calculate_heat_loss()
-                    except Exception:
-                        _LOGGER.exception(
-                            "better_thermostat %s: ERROR calculating heat loss",
-                            self.device_name,
-                        )
+            # Handle cooler logic once per cycle
+            if self.cooler_entity_id is not None:
+                try:
+                    await control_cooler(self)
+                except Exception:
+                    _LOGGER.exception(
+                        "better_thermostat %s: ERROR controlling cooler",
+                        self.device_name,
+                    )
 
-                    # Handle cooler logic once per cycle
-                    if self.cooler_entity_id is not None:
-                        try:
-                            await control_cooler(self)
-                        except Exception:
-                            _LOGGER.exception(
-                                "better_thermostat %s: ERROR controlling cooler",
-                                self.device_name,
-                            )
-
-                    # Create tasks for all TRVs to run in parallel
-                    tasks = []
-                    for trv in self.real_trvs.keys():
-                        tasks.append(control_trv(self, trv))
-
-                    # Run all TRV controls in parallel
-                    results = await asyncio.gather(*tasks, return_exceptions=True)
-
-                    result = True
-                    for i, res in enumerate(results):
-                        if isinstance(res, Exception):
-                            trv_id = list(self.real_trvs.keys())[i]
-                            _LOGGER.error(
-                                "better_thermostat %s: ERROR controlling TRV %s: %s",
-                                self.device_name,
-                                trv_id,
-                                res,
-                            )
-                            result = False
-                        elif res is False:
-                            result = False
-
-                    # Retry task if some TRVs failed. Discard the task if the queue is full
-                    # to avoid blocking and therefore deadlocking this function.
-                    if result is False:
-                        try:
-                            self.control_queue_task.put_nowait(self)
-                        except asyncio.QueueFull:
-                            _LOGGER.debug(
-                                "better_thermostat %s: control queue is full, discarding task",
-                                self.device_name,
-                            )
-
-                    self.control_queue_task.task_done()
-                    if not getattr(self, "in_maintenance", False):
-                        self.ignore_states = False
+            # Hand the cycle to the per-TRV lanes without waiting for them:
+            # each lane pushes to its TRV at its own pace and the mailbox
+            # gets the outcome (latency, retry) once every lane is done.
+            # ignore_states only covers the computation above; echoes of a
+            # push are suppressed per TRV, by the ignore_trv_states flag that
+            # control_trv holds while its lane pushes. Holding the entity
+            # flag until every lane is idle would close the control gate and
+            # let the slowest TRV hold back the next cycle again.
+            self.control_lanes.dispatch(self.real_trvs.keys(), batch)
+            if not getattr(self, "in_maintenance", False):
+                self.ignore_states = False
     except asyncio.CancelledError:
         _LOGGER.debug(
             "better_thermostat %s: control_queue task cancelled, cleaning up",
@@ -231,6 +272,57 @@ async def control_cooler(self):
         )
 
 
+def _sync_tpi_cycle(self, heater_entity_id, bal, source) -> bool:
+    """Hand a TPI duty cycle to the time-proportional cycle scheduler.
+
+    Returns True if the valve is driven by the scheduler (fully open or
+    closed per cycle) instead of a direct percentage write. A running cycle
+    is stopped as soon as TPI is no longer the valve source.
+    """
+    key = f"{self.unique_id}:{heater_entity_id}"
+    enabled = self.real_trvs[heater_entity_id]["advanced"].get(
+        CONF_TPI_TIME_PROPORTIONAL, False
+    )
+    if not enabled or source != "tpi_calibration" or bal is None:
+        if key in TPI_CYCLES:
+            TPI_CYCLES.stop(key, switch_off=source is None)
+        return False
+
+    async def _switch(on: bool) -> None:
+        # The switch runs off the TRV's lane: suppress the TRV's echo like a
+        # lane push does, and leave releasing it to the lane if one is running
+        trv = self.real_trvs.get(heater_entity_id)
+        if trv is None:
+            return
+        trv["ignore_trv_states"] = True
+        try:
+            if not await set_valve(self, heater_entity_id, 100 if on else 0):
+                _LOGGER.debug(
+                    "better_thermostat %s: TPI cycle valve write failed for %s",
+                    self.device_name,
+                    heater_entity_id,
+                )
+        finally:
+            lanes = getattr(self, "control_lanes", None)
+            if lanes is None or not lanes.busy(heater_entity_id):
+                trv["ignore_trv_states"] = False
+
+    _LOGGER.debug(
+        "better_thermostat %s: TO TRV TPI cycle: %s duty %s%%",
+        self.device_name,
+        heater_entity_id,
+        bal.get("valve_percent"),
+    )
+    TPI_CYCLES.update(
+        key,
+        bal.get("valve_percent", 0.0),
+        _switch,
+        bal.get("cycle_s", 600.0),
+        bal.get("min_switch_s", 0.0),
+    )
+    return True
+
+
 async def control_trv(self, heater_entity_id=None):
     """Control the TRV.
 
@@ -246,8 +338,10 @@ async def control_trv(self, heater_entity_id=None):
     if not hasattr(self, "task_manager"):
         self.task_manager = TaskManager()
 
+    # Suppress the TRV's echoes from the start of the push, also while
+    # waiting for the lock held by another lane
+    self.real_trvs[heater_entity_id]["ignore_trv_states"] = True
     async with self._temp_lock:
-        self.real_trvs[heater_entity_id]["ignore_trv_states"] = True
         # Formerly update_hvac_action(self) (removed / centralized in climate entity)
         try:
             # Preserve old action for change detection if attributes exist
@@ -277,6 +371,7 @@ async def control_trv(self, heater_entity_id=None):
             heater_entity_id,
         )
 
+        await async_prefetch_calibration(self, heater_entity_id)
         _remapped_states = convert_outbound_states(
             self, heater_entity_id, self.bt_hvac_mode
         )
@@ -288,7 +383,6 @@ async def control_trv(self, heater_entity_id=None):
                 _remapped_states,
             )
             await asyncio.sleep(10)
-            self.ignore_states = False
             self.real_trvs[heater_entity_id]["ignore_trv_states"] = False
             return False
 
@@ -371,7 +465,10 @@ async def control_trv(self, heater_entity_id=None):
                     if raw_balance and raw_balance.get("valve_percent") is not None:
                         bal = raw_balance
                         _source = "balance"
-                if bal is not None:
+                if (
+                    not _sync_tpi_cycle(self, heater_entity_id, bal, _source)
+                    and bal is not None
+                ):
                     target_pct = int(round(bal.get("valve_percent", 0)))
                     _LOGGER.debug(
                         "better_thermostat %s: TO TRV set_valve: %s to: %s%% (source=%s)",
@@ -513,9 +610,7 @@ async def control_trv(self, heater_entity_id=None):
             )
             if _tvr_has_quirk is False:
                 await set_hvac_mode(self, heater_entity_id, _new_hvac_mode)
-            if self.real_trvs[heater_entity_id]["system_mode_received"] is True:
-                self.real_trvs[heater_entity_id]["system_mode_received"] = False
-                self.task_manager.create_task(check_system_mode(self, heater_entity_id))
+            _expect_ack(self, heater_entity_id, ACK_HVAC_MODE, _new_hvac_mode)
 
         # set new calibration offset
         if (
@@ -532,7 +627,6 @@ async def control_trv(self, heater_entity_id=None):
                     heater_entity_id,
                 )
                 # this should not be before, set_hvac_mode (because if it fails, the new hvac mode will never be sent)
-                self.ignore_states = False
                 self.real_trvs[heater_entity_id]["ignore_trv_states"] = False
                 return True
 
@@ -577,11 +671,7 @@ async def control_trv(self, heater_entity_id=None):
                 )
                 self.real_trvs[heater_entity_id]["last_temperature"] = _temperature
                 await set_temperature(self, heater_entity_id, _temperature)
-                if self.real_trvs[heater_entity_id]["target_temp_received"] is True:
-                    self.real_trvs[heater_entity_id]["target_temp_received"] = False
-                    self.task_manager.create_task(
-                        check_target_temperature(self, heater_entity_id)
-                    )
+                _expect_ack(self, heater_entity_id, ACK_TEMPERATURE, _temperature)
 
         await asyncio.sleep(3)
         # Don't retry - the TRV state change event will trigger a new control
@@ -594,6 +684,8 @@ async def control_trv(self, heater_entity_id=None):
         str(_trv.attributes.get("temperature", None)), self.device_name, "controlling()"
     )
 
+    # Heavy controller solves run off the event loop before the sync conversion.
+    await async_prefetch_calibration(self, heater_entity_id)
     _remapped_states = convert_outbound_states(
         self, heater_entity_id, self.bt_hvac_mode
     )
@@ -606,7 +698,6 @@ async def control_trv(self, heater_entity_id=None):
         )
         # Reduced sleep time on error to avoid blocking too long
         await asyncio.sleep(2)
-        # self.ignore_states = False # Don't touch global ignore_states here
         self.real_trvs[heater_entity_id]["ignore_trv_states"] = False
         return False
 
@@ -666,7 +757,10 @@ async def control_trv(self, heater_entity_id=None):
                 if raw_balance and raw_balance.get("valve_percent") is not None:
                     bal = raw_balance
                     _source = "balance"
-            if bal is not None:
+            if (
+                not _sync_tpi_cycle(self, heater_entity_id, bal, _source)
+                and bal is not None
+            ):
                 target_pct = int(round(bal.get("valve_percent", 0)))
                 _LOGGER.debug(
                     "better_thermostat %s: TO TRV set_valve: %s to: %s%% (source=%s)",
@@ -748,9 +842,7 @@ async def control_trv(self, heater_entity_id=None):
         )
         if _tvr_has_quirk is False:
             await set_hvac_mode(self, heater_entity_id, _new_hvac_mode)
-        if self.real_trvs[heater_entity_id]["system_mode_received"] is True:
-            self.real_trvs[heater_entity_id]["system_mode_received"] = False
-            self.task_manager.create_task(check_system_mode(self, heater_entity_id))
+        _expect_ack(self, heater_entity_id, ACK_HVAC_MODE, _new_hvac_mode)
 
     # set new calibration offset
     if (
@@ -767,7 +859,6 @@ async def control_trv(self, heater_entity_id=None):
                 heater_entity_id,
             )
             # this should not be before, set_hvac_mode (because if it fails, the new hvac mode will never be sent)
-            # self.ignore_states = False # Don't touch global ignore_states here
             self.real_trvs[heater_entity_id]["ignore_trv_states"] = False
             return True
 
@@ -827,11 +918,7 @@ async def control_trv(self, heater_entity_id=None):
             )
             self.real_trvs[heater_entity_id]["last_temperature"] = _temperature
             await set_temperature(self, heater_entity_id, _temperature)
-            if self.real_trvs[heater_entity_id]["target_temp_received"] is True:
-                self.real_trvs[heater_entity_id]["target_temp_received"] = False
-                self.task_manager.create_task(
-                    check_target_temperature(self, heater_entity_id)
-                )
+            _expect_ack(self, heater_entity_id, ACK_TEMPERATURE, _temperature)
 
     await asyncio.sleep(3)
     self.real_trvs[heater_entity_id]["ignore_trv_states"] = False
@@ -845,65 +932,34 @@ def handle_window_open(self, _remapped_states):
     return _remapped_states.get("system_mode", None)
 
 
-async def check_system_mode(self, heater_entity_id=None):
-    """Check system mode."""
-    _timeout = 0
-    _real_trv = self.real_trvs[heater_entity_id]
-    while _real_trv["hvac_mode"] != _real_trv["last_hvac_mode"]:
-        if _timeout > 360:
-            _LOGGER.debug(
-                "better_thermostat %s: %s the real TRV did not respond to the system mode change",
-                self.device_name,
-                heater_entity_id,
-            )
-            _timeout = 0
-            break
-        await asyncio.sleep(1)
-        _timeout += 1
-    await asyncio.sleep(2)
-    _real_trv["system_mode_received"] = True
-    return True
+# Flag of real_trvs that is False while a write of the attribute is unconfirmed
+_ACK_FLAGS = {
+    ACK_HVAC_MODE: "system_mode_received",
+    ACK_TEMPERATURE: "target_temp_received",
+}
 
 
-async def check_target_temperature(self, heater_entity_id=None):
-    """Check if target temperature is reached."""
-    _timeout = 0
+def _expect_ack(self, heater_entity_id, attribute, value):
+    """Hold back TRV echoes of attribute until the TRV confirms the written value."""
+    tracker = getattr(self, "ack_tracker", None)
+    if not isinstance(tracker, AckTracker):
+        return
     _real_trv = self.real_trvs[heater_entity_id]
-    while True:
-        _current_set_temperature = convert_to_float(
-            str(
-                self.hass.states.get(heater_entity_id).attributes.get(
-                    "temperature", None
-                )
-            ),
-            self.device_name,
-            "check_target_temperature()",
-        )
-        if _timeout == 0:
-            _LOGGER.debug(
-                "better_thermostat %s: %s / check_target_temp / _last: %s - _current: %s",
-                self.device_name,
-                heater_entity_id,
-                _real_trv["last_temperature"],
-                _current_set_temperature,
-            )
-        if (
-            _current_set_temperature is None
-            or _real_trv["last_temperature"] == _current_set_temperature
-        ):
-            _timeout = 0
-            break
-        if _timeout > 360:
+    _flag = _ACK_FLAGS[attribute]
+    _real_trv[_flag] = False
+
+    def _done(acked):
+        if not acked:
             _LOGGER.debug(
-                "better_thermostat %s: %s the real TRV did not respond to the target temperature change",
+                "better_thermostat %s: %s the real TRV did not respond to the %s change",
                 self.device_name,
                 heater_entity_id,
+                attribute,
             )
-            _timeout = 0
-            break
-        await asyncio.sleep(1)
-        _timeout += 1
-    await asyncio.sleep(2)
+        _real_trv[_flag] = True
 
-    _real_trv["target_temp_received"] = True
-    return True
+    tracker.expect(heater_entity_id, attribute, value, _done)
+    # The write may already be reflected in the current state
+    _state = self.hass.states.get(heater_entity_id)
+    if isinstance(_state, State):
+        observe_trv_acks(self, heater_entity_id, _state)
@@ -0,0 +1,159 @@
+"""Shared timer wheel for all Better Thermostat instances.
+
+Time-proportional actuation needs one or two deadlines per device and cycle.
+Instead of one ``async_call_later`` handle per device, every deadline goes
+into a single heap and only the earliest one is armed on the event loop with
+``loop.call_at``. Re-planning a device cancels its entry lazily (it is
+skipped when popped), so the number of loop timers stays at one no matter
+how many zones are driven.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass, field
+import heapq
+import logging
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+# Compact the heap once cancelled entries outnumber live ones by this factor.
+_COMPACT_RATIO = 2
+
+
+@dataclass(slots=True, eq=False)
+class WheelTimer:
+    """Handle of one scheduled callback."""
+
+    when: float
+    callback: Callable[..., Any]
+    args: tuple[Any, ...] = ()
+    cancelled: bool = False
+    _wheel: TimerWheel | None = field(default=None, repr=False)
+
+    def cancel(self) -> None:
+        """Cancel the callback if it has not run yet."""
+        if self.cancelled:
+            return
+        self.cancelled = True
+        if self._wheel is not None:
+            self._wheel._on_cancel()
+            self._wheel = None
+
+
+class TimerWheel:
+    """Heap of deadlines driven by a single armed loop timer."""
+
+    def __init__(self) -> None:
+        """Initialise an empty wheel."""
+        self._heap: list[tuple[float, int, WheelTimer]] = []
+        self._seq = 0
+        self._live = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._armed: asyncio.TimerHandle | None = None
+        self._armed_at: float | None = None
+        # Number of callbacks run, for diagnostics
+        self.fired = 0
+
+    def __len__(self) -> int:
+        """Return the number of pending (not cancelled) callbacks."""
+        return self._live
+
+    @property
+    def armed_at(self) -> float | None:
+        """Loop time the single loop timer is armed for, if any."""
+        return self._armed_at
+
+    def time(self) -> float:
+        """Return the current loop time."""
+        return self._get_loop().time()
+
+    def call_at(
+        self, when: float, callback: Callable[..., Any], *args: Any
+    ) -> WheelTimer:
+        """Run callback(*args) at loop time ``when``; must be called on the loop."""
+        timer = WheelTimer(when=when, callback=callback, args=args, _wheel=self)
+        self._seq += 1
+        heapq.heappush(self._heap, (when, self._seq, timer))
+        self._live += 1
+        if self._armed_at is None or when < self._armed_at:
+            self._arm()
+        return timer
+
+    def call_later(
+        self, delay: float, callback: Callable[..., Any], *args: Any
+    ) -> WheelTimer:
+        """Run callback(*args) after ``delay`` seconds."""
+        return self.call_at(self.time() + max(0.0, delay), callback, *args)
+
+    def clear(self) -> None:
+        """Cancel everything and disarm (used on unload and in tests)."""
+        for _, _, timer in self._heap:
+            timer.cancelled = True
+            timer._wheel = None
+        self._heap.clear()
+        self._live = 0
+        self._disarm()
+        self._loop = None
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A new loop (HA restart in the same process, tests): start over
+            self._disarm()
+            self._loop = loop
+        return loop
+
+    def _on_cancel(self) -> None:
+        self._live -= 1
+        if len(self._heap) > _COMPACT_RATIO * max(1, self._live):
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+        # The armed timer may now point at a cancelled entry; it simply
+        # re-arms for the next live one when it fires.
+
+    def _disarm(self) -> None:
+        if self._armed is not None:
+            self._armed.cancel()
+        self._armed = None
+        self._armed_at = None
+
+    def _arm(self) -> None:
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            self._disarm()
+            return
+        when = self._heap[0][0]
+        if self._armed_at == when:
+            return
+        loop = self._get_loop()
+        self._disarm()
+        self._armed = loop.call_at(when, self._fire)
+        self._armed_at = when
+
+    def _fire(self) -> None:
+        self._armed = None
+        self._armed_at = None
+        loop = self._loop
+        if loop is None:
+            return
+        now = loop.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, timer = heapq.heappop(self._heap)
+            if timer.cancelled:
+                continue
+            self._live -= 1
+            timer._wheel = None
+            timer.cancelled = True
+            self.fired += 1
+            try:
+                timer.callback(*timer.args)
+            except Exception:
+                _LOGGER.exception("better_thermostat: timer wheel callback failed")
+        self._arm()
+
+
+TIMER_WHEEL = TimerWheel()
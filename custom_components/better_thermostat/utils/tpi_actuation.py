@@ -0,0 +1,204 @@
+"""Time-proportional actuation of TPI duty cycles.
+
+``compute_tpi`` yields a duty cycle. For time-proportional control it is
+turned into an on interval at the start of every cycle of ``cycle_s``
+seconds followed by an off interval. The actuator is any async callable
+taking ``on: bool`` (for TRVs a 100 % / 0 % valve write).
+
+All cycles share the module-level ``TIMER_WHEEL``: a device has at most one
+pending deadline (its next switch or the end of its cycle). When the duty
+cycle changes mid-cycle, the current cycle is re-planned from the on time it
+already delivered instead of being restarted.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+import logging
+import math
+from typing import Any
+
+from .timer_wheel import TIMER_WHEEL, TimerWheel, WheelTimer
+
+_LOGGER = logging.getLogger(__name__)
+
+Actuator = Callable[[bool], Awaitable[Any]]
+
+
+@dataclass(slots=True)
+class _Cycle:
+    actuator: Actuator
+    cycle_s: float
+    min_switch_s: float
+    duty: float = 0.0
+    start: float = 0.0
+    # Last commanded output (None until the first command)
+    on: bool | None = None
+    on_since: float | None = None
+    # On time delivered in the current cycle before ``on_since``
+    delivered_s: float = 0.0
+    timer: WheelTimer | None = None
+    switches: int = 0
+
+
+class TpiCycleScheduler:
+    """Drive on/off actuators from TPI duty cycles."""
+
+    def __init__(self, wheel: TimerWheel = TIMER_WHEEL) -> None:
+        """Initialise the scheduler on a timer wheel."""
+        self._wheel = wheel
+        self._cycles: dict[str, _Cycle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def __contains__(self, key: object) -> bool:
+        """Return True if a cycle runs for key."""
+        return key in self._cycles
+
+    def update(
+        self,
+        key: str,
+        duty_pct: float,
+        actuator: Actuator,
+        cycle_s: float,
+        min_switch_s: float = 0.0,
+    ) -> None:
+        """Set the duty cycle of key, starting a cycle or re-planning the current one."""
+        now = self._wheel.time()
+        duty = max(0.0, min(1.0, float(duty_pct) / 100.0))
+        cycle = self._cycles.get(key)
+        if cycle is None:
+            cycle = _Cycle(
+                actuator=actuator,
+                cycle_s=max(1.0, float(cycle_s)),
+                min_switch_s=max(0.0, float(min_switch_s)),
+                start=now,
+            )
+            self._cycles[key] = cycle
+        else:
+            cycle.actuator = actuator
+            cycle.cycle_s = max(1.0, float(cycle_s))
+            cycle.min_switch_s = max(0.0, float(min_switch_s))
+        cycle.duty = duty
+        self._plan(key, cycle, now)
+
+    def stop(self, key: str, switch_off: bool = True) -> None:
+        """End the cycle of key, switching the actuator off unless told not to."""
+        cycle = self._cycles.pop(key, None)
+        if cycle is None:
+            return
+        if cycle.timer is not None:
+            cycle.timer.cancel()
+        if switch_off and cycle.on is not False:
+            self._actuate(key, cycle, False)
+
+    def stop_prefix(self, prefix: str, switch_off: bool = True) -> int:
+        """Stop all cycles whose key starts with prefix; return the count."""
+        keys = [key for key in self._cycles if key.startswith(prefix)]
+        for key in keys:
+            self.stop(key, switch_off)
+        return len(keys)
+
+    def snapshot(self, key: str) -> dict[str, Any] | None:
+        """Return the plan of key for diagnostics."""
+        cycle = self._cycles.get(key)
+        if cycle is None:
+            return None
+        now = self._wheel.time()
+        return {
+            "duty_pct": round(cycle.duty * 100.0, 1),
+            "cycle_s": cycle.cycle_s,
+            "on": cycle.on,
+            "on_target_s": round(self._on_target(cycle), 1),
+            "delivered_s": round(self._delivered(cycle, now), 1),
+            "cycle_elapsed_s": round(now - cycle.start, 1),
+            "next_event_in_s": (
+                round(max(0.0, cycle.timer.when - now), 1)
+                if cycle.timer is not None and not cycle.timer.cancelled
+                else None
+            ),
+            "switches": cycle.switches,
+        }
+
+    @staticmethod
+    def _on_target(cycle: _Cycle) -> float:
+        on_s = cycle.duty * cycle.cycle_s
+        # Skip pulses and gaps shorter than the actuator tolerates
+        if on_s < cycle.min_switch_s:
+            return 0.0
+        if cycle.cycle_s - on_s < cycle.min_switch_s:
+            return cycle.cycle_s
+        return on_s
+
+    @staticmethod
+    def _delivered(cycle: _Cycle, now: float) -> float:
+        if cycle.on and cycle.on_since is not None:
+            return cycle.delivered_s + (now - cycle.on_since)
+        return cycle.delivered_s
+
+    def _plan(self, key: str, cycle: _Cycle, now: float) -> None:
+        # Roll over to the cycle containing now
+        if now >= cycle.start + cycle.cycle_s:
+            elapsed = math.floor((now - cycle.start) / cycle.cycle_s)
+            cycle.start += elapsed * cycle.cycle_s
+            cycle.delivered_s = 0.0
+            if cycle.on:
+                cycle.on_since = cycle.start
+
+        cycle_end = cycle.start + cycle.cycle_s
+        remaining = self._on_target(cycle) - self._delivered(cycle, now)
+        if cycle.on:
+            want_on = remaining > 0.0
+        else:
+            # Do not start a pulse shorter than the minimum switch time
+            want_on = remaining > 0.0 and remaining >= min(
+                cycle.min_switch_s, cycle_end - now
+            )
+        if want_on != cycle.on:
+            self._actuate(key, cycle, want_on, now)
+
+        next_event = min(now + remaining, cycle_end) if want_on else cycle_end
+        if cycle.timer is not None:
+            if not cycle.timer.cancelled and cycle.timer.when == next_event:
+                return
+            cycle.timer.cancel()
+        cycle.timer = self._wheel.call_at(next_event, self._on_timer, key)
+
+    def _on_timer(self, key: str) -> None:
+        cycle = self._cycles.get(key)
+        if cycle is None:
+            return
+        cycle.timer = None
+        self._plan(key, cycle, self._wheel.time())
+
+    def _actuate(
+        self, key: str, cycle: _Cycle, on: bool, now: float | None = None
+    ) -> None:
+        now = self._wheel.time() if now is None else now
+        if on:
+            cycle.on_since = now
+        else:
+            cycle.delivered_s = self._delivered(cycle, now)
+            cycle.on_since = None
+        cycle.on = on
+        cycle.switches += 1
+        _LOGGER.debug(
+            "better_thermostat: TPI cycle %s switching %s (duty %.0f%%)",
+            key,
+            "on" if on else "off",
+            cycle.duty * 100.0,
+        )
+        task = asyncio.get_running_loop().create_task(cycle.actuator(on))
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            _LOGGER.debug(
+                "better_thermostat: TPI actuator failed: %s", task.exception()
+            )
+
+
+TPI_CYCLES = TpiCycleScheduler()
@@ -1,9 +1,13 @@
 """Weather utils."""
 
+import asyncio
 from collections import deque
+from collections.abc import Sequence
 from contextlib import suppress
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import logging
+from time import time
 
 from homeassistant.components.recorder import history
 from homeassistant.components.weather import (
@@ -16,6 +20,8 @@ from homeassistant.exceptions import HomeAssistantError, ServiceNotSupported
 from homeassistant.helpers.recorder import get_instance
 import homeassistant.util.dt as dt_util
 
+from .calibration.mpc import MPC_STEP_SECONDS
+
 # from datetime import datetime, timedelta
 # import homeassistant.util.dt as dt_util
 # from homeassistant.components.recorder.history import state_changes_during_period
@@ -291,6 +297,205 @@ async def check_ambient_air_temperature(self):
     self.last_avg_outdoor_temp = avg_temp
 
 
+# Forecast trajectories are fetched at most once per weather entity and TTL,
+# and shared by every Better Thermostat entity using that weather entity.
+FORECAST_CACHE_TTL_S = 3600.0
+# Resampled forecast length kept per entity (24 h of MPC steps).
+FORECAST_MAX_STEPS = 288
+
+
+@dataclass
+class ForecastTrajectory:
+    """Weather forecast resampled to MPC step resolution.
+
+    ``outdoor_temp_C[i]`` and ``solar_intensity[i]`` describe the time
+    ``start_ts + i * step_s``. Solar intensity uses the same 0..1 estimate
+    as the current-conditions helper (cloud coverage, else UV index).
+    """
+
+    fetched_ts: float
+    start_ts: float
+    step_s: float
+    outdoor_temp_C: list[float] = field(default_factory=list)
+    solar_intensity: list[float] = field(default_factory=list)
+
+    def window(
+        self, steps: int, now_ts: float | None = None
+    ) -> tuple[list[float], list[float]] | None:
+        """Return both vectors for the next ``steps`` steps after now.
+
+        The first value belongs to ``now + step_s``, matching the first
+        predicted MPC step. The last forecast value is held when the forecast
+        ends early. Returns None once that step lies past the forecast.
+        """
+
+        if not self.outdoor_temp_C or steps <= 0:
+            return None
+        now_ts = time() if now_ts is None else now_ts
+        first = max(0, int((now_ts + self.step_s - self.start_ts) // self.step_s))
+        if first >= len(self.outdoor_temp_C):
+            return None
+
+        def _take(values: list[float]) -> list[float]:
+            out = values[first : first + steps]
+            return out + [out[-1]] * (steps - len(out))
+
+        return _take(self.outdoor_temp_C), _take(self.solar_intensity)
+
+
+_FORECAST_CACHE: dict[str, ForecastTrajectory] = {}
+_FORECAST_LOCKS: dict[str, asyncio.Lock] = {}
+
+
+def _resample_linear(
+    times: Sequence[float], values: Sequence[float], start: float, step: float
+) -> list[float]:
+    """Linearly interpolate (times, values) onto start + i * step."""
+
+    count = min(FORECAST_MAX_STEPS, int((times[-1] - start) // step) + 1)
+    out: list[float] = []
+    seg = 0
+    for i in range(max(1, count)):
+        t = start + i * step
+        while seg < len(times) - 2 and times[seg + 1] <= t:
+            seg += 1
+        t0, t1 = times[seg], times[min(seg + 1, len(times) - 1)]
+        v0, v1 = values[seg], values[min(seg + 1, len(values) - 1)]
+        if t1 <= t0:
+            out.append(v0)
+            continue
+        frac = max(0.0, min(1.0, (t - t0) / (t1 - t0)))
+        out.append(v0 + (v1 - v0) * frac)
+    return out
+
+
+def _forecast_solar_intensity(entry: dict) -> float:
+    """Return the 0..1 solar estimate of one forecast entry."""
+
+    cc = entry.get("cloud_coverage")
+    if cc is not None:
+        with suppress(TypeError, ValueError):
+            return max(0.0, min(1.0, (100.0 - float(cc)) / 100.0))
+    uv = entry.get("uv_index")
+    if uv is not None:
+        with suppress(TypeError, ValueError):
+            return max(0.0, min(1.0, float(uv) / 10.0))
+    return 0.0
+
+
+def build_forecast_trajectory(
+    forecast: Sequence[dict],
+    step_s: float = MPC_STEP_SECONDS,
+    now_ts: float | None = None,
+) -> ForecastTrajectory | None:
+    """Resample a ``weather.get_forecasts`` forecast list to MPC steps."""
+
+    samples: list[tuple[float, float, float]] = []
+    for entry in forecast:
+        if not isinstance(entry, dict):
+            continue
+        when = entry.get("datetime")
+        parsed = dt_util.parse_datetime(when) if isinstance(when, str) else when
+        if not isinstance(parsed, datetime):
+            continue
+        temp = convert_to_float(
+            str(entry.get("temperature")), "forecast", "build_forecast_trajectory()"
+        )
+        if not isinstance(temp, (int, float)):
+            continue
+        samples.append(
+            (parsed.timestamp(), float(temp), _forecast_solar_intensity(entry))
+        )
+    if not samples:
+        return None
+
+    samples.sort()
+    times = [t for t, _, _ in samples]
+    start = times[0]
+    return ForecastTrajectory(
+        fetched_ts=time() if now_ts is None else now_ts,
+        start_ts=start,
+        step_s=step_s,
+        outdoor_temp_C=_resample_linear(
+            times, [v for _, v, _ in samples], start, step_s
+        ),
+        solar_intensity=_resample_linear(
+            times, [v for _, _, v in samples], start, step_s
+        ),
+    )
+
+
+async def async_update_forecast_trajectory(
+    hass, weather_entity: str, *, force: bool = False
+) -> ForecastTrajectory | None:
+    """Fetch and cache the forecast trajectory of a weather entity.
+
+    Concurrent callers for the same entity share one ``weather.get_forecasts``
+    call, and a cached trajectory younger than ``FORECAST_CACHE_TTL_S`` is
+    returned without fetching. Hourly forecasts are preferred.
+    """
+
+    lock = _FORECAST_LOCKS.setdefault(weather_entity, asyncio.Lock())
+    async with lock:
+        cached = _FORECAST_CACHE.get(weather_entity)
+        if (
+            cached is not None
+            and not force
+            and time() - cached.fetched_ts < FORECAST_CACHE_TTL_S
+        ):
+            return cached
+
+        state = hass.states.get(weather_entity)
+        features = state.attributes.get("supported_features", 0) if state else 0
+        if features & WeatherEntityFeature.FORECAST_HOURLY:
+            ftype = "hourly"
+        elif features & WeatherEntityFeature.FORECAST_TWICE_DAILY:
+            ftype = "twice_daily"
+        elif features & WeatherEntityFeature.FORECAST_DAILY:
+            ftype = "daily"
+        else:
+            return cached
+
+        try:
+            response = await hass.services.async_call(
+                WEATHER_DOMAIN,
+                "get_forecasts",
+                {"type": ftype, "entity_id": [weather_entity]},
+                blocking=True,
+                return_response=True,
+            )
+        except (ServiceNotSupported, HomeAssistantError) as err:
+            _LOGGER.debug(
+                "better_thermostat: forecast fetch for %s failed: %s",
+                weather_entity,
+                err,
+            )
+            return cached
+
+        container = response.get(weather_entity) if isinstance(response, dict) else None
+        forecast = container.get("forecast") if isinstance(container, dict) else None
+        trajectory = (
+            build_forecast_trajectory(forecast) if isinstance(forecast, list) else None
+        )
+        if trajectory is None:
+            return cached
+        _FORECAST_CACHE[weather_entity] = trajectory
+        return trajectory
+
+
+def get_forecast_window(
+    weather_entity: str | None, steps: int, now_ts: float | None = None
+) -> tuple[list[float], list[float]] | None:
+    """Return cached (outdoor, solar) vectors for the next steps, if any."""
+
+    if weather_entity is None:
+        return None
+    trajectory = _FORECAST_CACHE.get(weather_entity)
+    if trajectory is None:
+        return None
+    return trajectory.window(steps, now_ts)
+
+
 class DailyHistory:
     """Store one measurement per day for a maximum number of days.
 
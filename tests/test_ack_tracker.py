@@ -0,0 +1,99 @@
+"""Tests for the TRV write acknowledgement tracker."""
+
+import asyncio
+from types import SimpleNamespace
+
+from homeassistant.core import State
+import pytest
+
+from custom_components.better_thermostat.events.trv import observe_trv_acks
+from custom_components.better_thermostat.utils.ack_tracker import (
+    ACK_HVAC_MODE,
+    ACK_TEMPERATURE,
+    AckTracker,
+)
+from custom_components.better_thermostat.utils.timer_wheel import TimerWheel
+
+
+@pytest.fixture
+def anyio_backend():
+    """Configure anyio to use asyncio backend for async tests."""
+    return "asyncio"
+
+
+class TestAckTracker:
+    """Test cases for acknowledgement, settle, timeout and supersede."""
+
+    @pytest.mark.anyio
+    async def test_matching_state_acknowledges_after_settle(self):
+        """Only the expected value resolves; the callback runs after settling."""
+        wheel = TimerWheel()
+        tracker = AckTracker(timeout_s=5.0, settle_s=0.02, wheel=wheel)
+        done = []
+        tracker.expect("climate.a", ACK_TEMPERATURE, 21.5, done.append)
+
+        assert not tracker.observe("climate.a", ACK_TEMPERATURE, 20.0)
+        assert not tracker.observe("climate.b", ACK_TEMPERATURE, 21.5)
+        assert tracker.pending("climate.a", ACK_TEMPERATURE)
+        assert tracker.metrics()["climate.a"]["pending"] == [ACK_TEMPERATURE]
+
+        assert tracker.observe("climate.a", ACK_TEMPERATURE, 21.500001)
+        assert not tracker.pending("climate.a", ACK_TEMPERATURE)
+        assert done == [] and len(wheel) == 1
+
+        await asyncio.sleep(0.05)
+        assert done == [True] and len(tracker) == 0 and len(wheel) == 0
+        metrics = tracker.metrics()["climate.a"]
+        assert metrics["acks"] == 1 and metrics["timeouts"] == 0
+        assert metrics["latency_last_s"] is not None and metrics["pending"] == []
+
+    @pytest.mark.anyio
+    async def test_timeout_and_supersede(self):
+        """A newer write replaces the old one; silence ends in a timeout."""
+        wheel = TimerWheel()
+        tracker = AckTracker(timeout_s=0.02, settle_s=0.0, wheel=wheel)
+        done = []
+        tracker.expect("climate.a", ACK_HVAC_MODE, "off", lambda ok: done.append(1))
+        tracker.expect("climate.a", ACK_HVAC_MODE, "heat", lambda ok: done.append(ok))
+        assert len(wheel) == 1
+
+        await asyncio.sleep(0.05)
+        assert done == [False]
+        metrics = tracker.metrics()["climate.a"]
+        assert metrics["timeouts"] == 1 and metrics["superseded"] == 1
+        assert metrics["acks"] == 0
+
+        tracker.expect("climate.a", ACK_HVAC_MODE, "heat", done.append)
+        tracker.close()
+        await asyncio.sleep(0.05)
+        assert done == [False] and len(wheel) == 0
+
+    @pytest.mark.anyio
+    async def test_trv_state_resolves_flags(self):
+        """A TRV state confirms mode and setpoint writes of that TRV."""
+        tracker = AckTracker(timeout_s=5.0, settle_s=0.0, wheel=TimerWheel())
+        real_trv = {"system_mode_received": False, "target_temp_received": False}
+        bt = SimpleNamespace(device_name="fake", ack_tracker=tracker)
+
+        def _flag(name):
+            return lambda ok: real_trv.__setitem__(name, True)
+
+        tracker.expect(
+            "climate.a", ACK_HVAC_MODE, "heat", _flag("system_mode_received")
+        )
+        tracker.expect(
+            "climate.a", ACK_TEMPERATURE, 22.0, _flag("target_temp_received")
+        )
+
+        observe_trv_acks(
+            bt, "climate.a", State("climate.a", "heat", {"temperature": 20})
+        )
+        await asyncio.sleep(0.01)
+        assert real_trv == {"system_mode_received": True, "target_temp_received": False}
+
+        observe_trv_acks(
+            bt, "climate.a", State("climate.a", "heat", {"temperature": 22})
+        )
+        await asyncio.sleep(0.01)
+        assert real_trv["target_temp_received"] is True
+        assert tracker.metrics()["climate.a"]["acks"] == 2
@@ -0,0 +1,133 @@
+"""Tests for the event-driven control queue gate."""
+
+import asyncio
+
+import pytest
+
+from custom_components.better_thermostat.utils.control_lanes import ControlLanes
+from custom_components.better_thermostat.utils.control_mailbox import ControlMailbox
+from custom_components.better_thermostat.utils.controlling import (
+    ControlGate,
+    GateFlag,
+    control_queue,
+)
+
+
+@pytest.fixture
+def anyio_backend():
+    """Configure anyio to use asyncio backend for async tests."""
+    return "asyncio"
+
+
+class _FakeBT:
+    ignore_states = GateFlag()
+    startup_running = GateFlag()
+    in_maintenance = GateFlag()
+
+    def __init__(self):
+        self.device_name = "fake"
+        self.cooler_entity_id = None
+        self.real_trvs = {}
+        self.release = None
+        self.cycles = 0
+        self.control_queue_task = ControlMailbox()
+        self.control_lanes = ControlLanes(self.push, self.control_queue_task.complete)
+        self.control_gate = ControlGate()
+        self.startup_running = True
+
+    async def calculate_heating_power(self):
+        self.cycles += 1
+
+    async def calculate_heat_loss(self):
+        return None
+
+    async def push(self, trv):
+        # Like control_trv: hold the TRV's flag while pushing to it
+        self.real_trvs[trv]["ignore_trv_states"] = True
+        if self.release is not None:
+            await self.release.wait()
+        self.real_trvs[trv]["ignore_trv_states"] = False
+        return True
+
+
+class TestControlGate:
+    """Test cases for gate flags and the control queue consumer."""
+
+    @pytest.mark.anyio
+    async def test_gate_follows_flags(self):
+        """The gate opens only once every flag is cleared."""
+        bt = _FakeBT()
+        assert not bt.control_gate.is_open
+        bt.in_maintenance = True
+        bt.startup_running = False
+        assert not bt.control_gate.is_open
+
+        waiter = asyncio.create_task(bt.control_gate.wait_open())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        bt.in_maintenance = False
+        await asyncio.sleep(0)
+        assert waiter.done() and bt.control_gate.is_open
+
+    @pytest.mark.anyio
+    async def test_queue_resumes_when_gate_opens(self):
+        """Queued control waits for startup and runs as soon as it ends."""
+        bt = _FakeBT()
+        task = asyncio.create_task(control_queue(bt))
+        try:
+            bt.control_queue_task.submit()
+            await asyncio.sleep(0.05)
+            assert bt.cycles == 0
+
+            bt.startup_running = False
+            for _ in range(5):
+                await asyncio.sleep(0)
+            assert bt.cycles == 1
+            assert bt.ignore_states is False and bt.control_gate.is_open
+
+            # Maintenance raised while idle holds back the next request
+            bt.in_maintenance = True
+            bt.control_queue_task.submit()
+            await asyncio.sleep(0.05)
+            assert bt.cycles == 1
+            bt.in_maintenance = False
+            for _ in range(5):
+                await asyncio.sleep(0)
+            assert bt.cycles == 2
+        finally:
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    @pytest.mark.anyio
+    async def test_slow_lane_suppresses_only_its_trv(self):
+        """A pushing lane keeps its TRV's echoes suppressed, not the next cycle."""
+        bt = _FakeBT()
+        bt.real_trvs = {"climate.trv": {"ignore_trv_states": False}}
+        bt.release = asyncio.Event()
+        bt.startup_running = False
+        task = asyncio.create_task(control_queue(bt))
+        try:
+            bt.control_queue_task.submit()
+            for _ in range(5):
+                await asyncio.sleep(0)
+            assert bt.cycles == 1 and bt.control_lanes.busy("climate.trv")
+            assert bt.real_trvs["climate.trv"]["ignore_trv_states"] is True
+            assert bt.ignore_states is False and bt.control_gate.is_open
+
+            # The next cycle is computed while the lane is still pushing
+            bt.control_queue_task.submit()
+            for _ in range(5):
+                await asyncio.sleep(0)
+            assert bt.cycles == 2
+
+            bt.release.set()
+            for _ in range(5):
+                await asyncio.sleep(0)
+            assert bt.control_lanes.idle()
+            assert bt.real_trvs["climate.trv"]["ignore_trv_states"] is False
+        finally:
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
@@ -0,0 +1,80 @@
+"""Tests for the per-TRV control lanes."""
+
+import asyncio
+
+import pytest
+
+from custom_components.better_thermostat.utils.control_lanes import ControlLanes
+
+
+@pytest.fixture
+def anyio_backend():
+    """Configure anyio to use asyncio backend for async tests."""
+    return "asyncio"
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class TestControlLanes:
+    """Test cases for independent lanes with latest-desired-state slots."""
+
+    @pytest.mark.anyio
+    async def test_slow_trv_does_not_hold_back_others(self):
+        """A blocked lane keeps only the latest state while others move on."""
+        release = asyncio.Event()
+        pushed = {"fast": 0, "slow": 0}
+        done = []
+
+        async def push(trv):
+            pushed[trv] += 1
+            if trv == "slow":
+                await release.wait()
+            return True
+
+        lanes = ControlLanes(push, lambda cycle, ok: done.append((cycle, ok)))
+        for cycle in ("c1", "c2", "c3"):
+            lanes.dispatch(["fast", "slow"], cycle)
+            await _settle()
+
+        assert pushed == {"fast": 3, "slow": 1}
+        # c2 never reached the slow TRV: it was superseded by c3
+        assert done == [("c2", True)]
+        assert lanes["slow"].busy and lanes["slow"].metrics()["superseded"] == 1
+        assert not lanes.idle()
+
+        release.set()
+        await _settle()
+        assert pushed == {"fast": 3, "slow": 2}
+        assert done == [("c2", True), ("c1", True), ("c3", True)]
+        assert lanes.idle()
+
+        metrics = lanes.metrics()
+        assert metrics["fast"]["pushes"] == 3 and metrics["slow"]["pushes"] == 2
+        assert metrics["slow"]["latency_max_s"] >= metrics["fast"]["latency_max_s"]
+
+    @pytest.mark.anyio
+    async def test_failures_are_reported_per_cycle(self):
+        """A failing or raising TRV marks the cycle as failed."""
+        done = []
+
+        async def push(trv):
+            if trv == "broken":
+                raise RuntimeError("adapter gone")
+            return trv != "refused"
+
+        lanes = ControlLanes(push, lambda cycle, ok: done.append((cycle, ok)))
+        lanes.dispatch(["ok", "broken"], "a")
+        lanes.dispatch([], "empty")
+        await _settle()
+        lanes.dispatch(["ok", "refused"], "b")
+        await _settle()
+
+        assert done == [("empty", True), ("a", False), ("b", False)]
+        assert lanes["broken"].metrics()["failures"] == 1
+        assert lanes["ok"].metrics()["failures"] == 0
+
+        lanes.close()
+        assert lanes.idle()
@@ -0,0 +1,91 @@
+"""Tests for the coalescing control request mailbox."""
+
+import asyncio
+
+import pytest
+
+from custom_components.better_thermostat.utils.control_mailbox import (
+    PRIORITY_SETPOINT,
+    PRIORITY_WINDOW,
+    REASON_PERIODIC,
+    REASON_RETRY,
+    REASON_SENSOR,
+    REASON_SETPOINT,
+    REASON_WINDOW,
+    ControlMailbox,
+)
+from custom_components.better_thermostat.utils.timer_wheel import TimerWheel
+
+
+@pytest.fixture
+def anyio_backend():
+    """Configure anyio to use asyncio backend for async tests."""
+    return "asyncio"
+
+
+class TestControlMailbox:
+    """Test cases for merging, retry backoff and metrics."""
+
+    @pytest.mark.anyio
+    async def test_burst_merges_into_one_batch(self):
+        """Pending requests merge into one batch with the highest priority."""
+        mailbox = ControlMailbox(wheel=TimerWheel())
+        for reason in (REASON_SENSOR, REASON_SENSOR, REASON_WINDOW, REASON_PERIODIC):
+            mailbox.submit(reason)
+
+        batch = await mailbox.get()
+        assert mailbox.empty()
+        assert batch.reasons == {REASON_SENSOR, REASON_WINDOW, REASON_PERIODIC}
+        assert batch.priority == PRIORITY_WINDOW
+        assert batch.requests == 4 and batch.merged == 3
+
+        mailbox.complete(batch, ok=True)
+        metrics = mailbox.metrics()
+        assert metrics["submitted"] == 4 and metrics["merged"] == 3
+        assert metrics["cycles"] == 1 and metrics["last"]["merged"] == 3
+        assert metrics["latency_avg_s"] is not None
+        assert metrics["by_reason"][REASON_SENSOR] == 2
+
+    @pytest.mark.anyio
+    async def test_get_waits_for_submit(self):
+        """The consumer is idle until a request arrives."""
+        mailbox = ControlMailbox(wheel=TimerWheel())
+        getter = asyncio.create_task(mailbox.get())
+        await asyncio.sleep(0.01)
+        assert not getter.done()
+
+        mailbox.submit(REASON_SETPOINT)
+        batch = await asyncio.wait_for(getter, 1.0)
+        assert batch.priority == PRIORITY_SETPOINT
+
+    @pytest.mark.anyio
+    async def test_failed_cycle_retries_with_backoff(self):
+        """Failures schedule a delayed retry that holds back low-priority requests."""
+        mailbox = ControlMailbox(retry_base_s=0.05, wheel=TimerWheel())
+        mailbox.submit(REASON_SENSOR)
+        mailbox.complete(await mailbox.get(), ok=False)
+        assert mailbox.metrics()["retry_pending"]
+
+        # A sensor request waits for the retry instead of failing again now
+        mailbox.submit(REASON_SENSOR)
+        getter = asyncio.create_task(mailbox.get())
+        await asyncio.sleep(0.01)
+        assert not getter.done()
+
+        batch = await asyncio.wait_for(getter, 1.0)
+        assert batch.reasons == {REASON_SENSOR, REASON_RETRY}
+
+        # Second failure doubles the delay; a setpoint change is not held back
+        mailbox.complete(batch, ok=False)
+        assert mailbox.metrics()["retry_attempt"] == 2
+        mailbox.submit(REASON_SETPOINT)
+        batch = await asyncio.wait_for(mailbox.get(), 0.05)
+        assert batch.reasons == {REASON_SETPOINT}
+
+        # Success cancels the pending retry and resets the backoff
+        mailbox.complete(batch, ok=True)
+        metrics = mailbox.metrics()
+        assert not metrics["retry_pending"] and metrics["retry_attempt"] == 0
+        assert metrics["failures"] == 2
+        await asyncio.sleep(0.15)
+        assert mailbox.empty()
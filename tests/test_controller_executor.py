@@ -0,0 +1,174 @@
+"""Tests for the inline / off-loop controller executor."""
+
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from custom_components.better_thermostat.utils.calibration.executor import (
+    EXECUTION_INLINE,
+    PREFETCH_SLOT,
+    ControllerExecutor,
+    ControllerRequest,
+)
+
+
+@pytest.fixture
+def anyio_backend():
+    """Configure anyio to use asyncio backend for async tests."""
+    return "asyncio"
+
+
+def _hass():
+    hass = MagicMock()
+
+    async def add_executor_job(func, *args):
+        return await asyncio.to_thread(func, *args)
+
+    hass.async_add_executor_job = add_executor_job
+    return hass
+
+
+class TestControllerExecutor:
+    """Test cases for request capture, prefetch handoff and staleness."""
+
+    def test_capture_returns_request_without_running(self):
+        """A captured balance path stops at its controller call."""
+        executor = ControllerExecutor()
+        calls = []
+
+        def controller(value):
+            calls.append(value)
+            return value * 2
+
+        def balance(slot):
+            result = executor.take_or_run(
+                slot, ControllerRequest("k", controller, (21,))
+            )
+            slot["after"] = result
+
+        slot = {}
+        request = executor.capture(balance, slot)
+        assert request is not None and request.key == "k"
+        assert calls == [] and "after" not in slot
+
+        # Outside capture mode the path runs inline.
+        balance(slot)
+        assert slot["after"] == 42 and calls == [21]
+
+    @pytest.mark.anyio
+    async def test_heavy_request_runs_in_worker_and_is_handed_off(self):
+        """Heavy solves leave the loop; the sync path consumes the result."""
+        executor = ControllerExecutor()
+        threads = []
+
+        def controller():
+            threads.append(threading.get_ident())
+            return "solved"
+
+        request = ControllerRequest("k", controller, heavy=True)
+        result = await executor.async_run(_hass(), request)
+        assert result is not None and result.threaded
+        assert result.value == "solved" and result.seq == 1
+        assert result.finished_ts >= result.requested_ts
+        assert threads != [threading.get_ident()]
+
+        slot = {PREFETCH_SLOT: result}
+        assert executor.take_or_run(slot, request) == "solved"
+        assert len(threads) == 1 and PREFETCH_SLOT not in slot
+
+        cheap = await ControllerExecutor(EXECUTION_INLINE).async_run(
+            _hass(), ControllerRequest("k", controller, heavy=True)
+        )
+        assert cheap is not None and not cheap.threaded
+        assert threads[-1] == threading.get_ident()
+
+    @pytest.mark.anyio
+    async def test_requests_share_the_solve_in_flight(self):
+        """Lanes asking for one key share its solve; the sync path never doubles it."""
+        executor = ControllerExecutor()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append("room")
+            release.wait(5.0)
+            return "shares"
+
+        hass = _hass()
+        first = asyncio.ensure_future(
+            executor.async_run(hass, ControllerRequest("k", slow, heavy=True))
+        )
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(
+            executor.async_run(hass, ControllerRequest("k", slow, heavy=True))
+        )
+        await asyncio.sleep(0.05)
+        # A synchronous path neither solves again nor takes an older result
+        assert executor.take_or_run({}, ControllerRequest("k", slow)) is None
+        release.set()
+        results = [await first, await second]
+        assert calls == ["room"]
+        assert results[0] is results[1] and results[0].seq == 1
+
+        # Both lanes take the shared result until a newer solve starts
+        request = ControllerRequest("k", lambda: "fresh")
+        for result in results:
+            assert executor.take_or_run({PREFETCH_SLOT: result}, request) == "shares"
+        executor.take_or_run({}, ControllerRequest("k", lambda: "bump"))
+        assert executor.take_or_run({PREFETCH_SLOT: results[0]}, request) == "fresh"
+
+    def test_busy_entity_reuses_last_result(self):
+        """The event loop never blocks on a solve of its entity in a worker."""
+        executor = ControllerExecutor()
+        assert executor.take_or_run({}, ControllerRequest("a:trv:t21", lambda: 1)) == 1
+        lock = executor.lock_for("a:trv:t21")
+        assert lock is executor.lock_for("a:") and lock is not executor.lock_for("b:")
+        with lock:
+            assert (
+                executor.take_or_run({}, ControllerRequest("a:trv:t21", lambda: 2)) == 1
+            )
+            assert (
+                executor.take_or_run({}, ControllerRequest("a:x:t21", lambda: 3))
+                is None
+            )
+            assert (
+                executor.take_or_run(
+                    {}, ControllerRequest("a:trv:t21", lambda: 2), reuse_last=False
+                )
+                is None
+            )
+            # Other entities keep solving inline.
+            assert (
+                executor.take_or_run({}, ControllerRequest("b:trv:t21", lambda: 4)) == 4
+            )
+        assert executor.take_or_run({}, ControllerRequest("a:trv:t21", lambda: 5)) == 5
+
+    @pytest.mark.anyio
+    async def test_locked_call_waits_for_worker(self):
+        """Registry operations run inline, or after the entity's solve finishes."""
+        executor = ControllerExecutor()
+        hass = _hass()
+        assert await executor.async_locked(hass, "a:", lambda x: x + 1, 1) == 2
+
+        release = threading.Event()
+        order = []
+
+        def slow():
+            release.wait(5.0)
+            order.append("solve")
+
+        solve = asyncio.ensure_future(
+            executor.async_run(hass, ControllerRequest("a:trv:t21", slow, heavy=True))
+        )
+        await asyncio.sleep(0.05)
+        export = asyncio.ensure_future(
+            executor.async_locked(hass, "a:", lambda: order.append("export"))
+        )
+        await asyncio.sleep(0.05)
+        assert order == []
+        release.set()
+        await solve
+        await export
+        assert order == ["solve", "export"]
@@ -1,5 +1,7 @@
 """Tests for the MPC (Model Predictive Control) controller."""
 
+import pytest
+
 from custom_components.better_thermostat.utils.calibration.mpc import (
     MpcInput,
     MpcParams,
@@ -512,3 +514,689 @@ class TestMPCController:
         initial_percent = results[0][1]
         final_percent = results[-1][1]
         assert final_percent < initial_percent  # Should decrease
+
+    def test_batched_candidate_costs_match_sequential_rollout(self):
+        """Batched horizon rollout must reproduce the per-candidate loop exactly."""
+        from custom_components.better_thermostat.utils.calibration.mpc import (
+            _HorizonProblem,
+        )
+
+        step_minutes = 5.0
+        gain_step = 0.08 * step_minutes
+        loss_step = 0.012 * step_minutes
+        target = 21.5
+        candidates = [0.0, 0.05, 0.37, 0.5, 0.99, 1.0]
+        other_step = 0.0137
+        solar_step = 0.0071
+
+        for ka_loss in (None, 0.0009):
+            expected = []
+            for u in candidates:
+                temp = 20.7
+                cost = 0.0
+                for _ in range(6):
+                    if ka_loss is not None:
+                        current_loss = (ka_loss * (temp - 4.0)) * step_minutes
+                    else:
+                        current_loss = loss_step
+                    heating = gain_step * u + other_step + solar_step
+                    temp = temp + heating - current_loss
+                    err = target - temp
+                    cost += err * err
+                    if temp > target:
+                        cost += 1.0 * u
+                expected.append(cost)
+
+            problem = _HorizonProblem(
+                start_temp_C=20.7,
+                target_temp_C=target,
+                horizon=6,
+                step_minutes=step_minutes,
+                gain_step=gain_step,
+                other_heat_step=other_step,
+                loss_step=loss_step,
+                ka_loss=ka_loss,
+                outdoor_temp_C=4.0,
+                u0_frac=0.0,
+                last_du=None,
+                control_pen=0.0,
+                change_pen=0.0,
+                eco_pen=1.0,
+                solar_step=solar_step,
+            )
+            assert problem.horizon_costs(candidates) == expected
+
+    def test_analytic_solver_matches_or_beats_grid(self):
+        """The analytic solver must find a cost no worse than the grid sweep."""
+        from custom_components.better_thermostat.utils.calibration.mpc import (
+            _HorizonProblem,
+            _solve_du_analytic,
+            _solve_du_grid,
+        )
+
+        for ka_loss, last_du, eco_pen in (
+            (None, None, 0.0),
+            (0.0012, 0.1, 1.0),
+            (None, -0.2, 3.0),
+        ):
+            problem = _HorizonProblem(
+                start_temp_C=20.4,
+                target_temp_C=21.0,
+                horizon=6,
+                step_minutes=5.0,
+                gain_step=0.3,
+                other_heat_step=0.0,
+                loss_step=0.05,
+                ka_loss=ka_loss,
+                outdoor_temp_C=3.0,
+                u0_frac=0.17,
+                last_du=last_du,
+                control_pen=0.05,
+                change_pen=1.0,
+                eco_pen=eco_pen,
+            )
+            _, grid_cost, grid_evals = _solve_du_grid(problem)
+            du_pct, cost, evals = _solve_du_analytic(problem)
+
+            u_abs = problem.u0_frac + du_pct / 100.0
+            assert 0.0 <= u_abs <= 1.0
+            assert cost <= grid_cost + 1e-6
+            rollout = problem.horizon_costs([u_abs])[0]
+            assert abs(cost - (rollout + problem.move_penalty(du_pct / 100.0))) < 1e-9
+            assert evals * 10 <= grid_evals
+
+    def test_analytic_solver_mode_reports_continuous_du(self):
+        """compute_mpc with the analytic solver keeps the debug contract."""
+        params = MpcParams(mpc_adapt=False, mpc_solver="analytic")
+        result = compute_mpc(
+            MpcInput(key="test_analytic", target_temp_C=22.0, current_temp_C=21.2),
+            params,
+        )
+        assert result is not None
+        assert result.debug["mpc_solver"] == "analytic"
+        assert result.debug["mpc_eval_count"] == 2 * result.debug["mpc_horizon"]
+        assert "mpc_cost" in result.debug
+        assert 0 <= result.valve_percent <= 100
+
+    def test_batch_matches_single_key_calls(self):
+        """compute_mpc_batch gives the same outputs as one compute_mpc per key."""
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        params = MpcParams(mpc_adapt=False)
+
+        def make_inputs():
+            return [
+                MpcInput(key="room_a:t21.0", target_temp_C=21.0, current_temp_C=19.5),
+                MpcInput(
+                    key="room_b:t22.0",
+                    target_temp_C=22.0,
+                    current_temp_C=21.6,
+                    outdoor_temp_C=3.0,
+                ),
+                MpcInput(
+                    key="room_c:t20.0",
+                    target_temp_C=20.0,
+                    current_temp_C=19.0,
+                    window_open=True,
+                ),
+                MpcInput(key="room_d:t20.0", target_temp_C=None, current_temp_C=19.0),
+            ]
+
+        single = [compute_mpc(inp, params) for inp in make_inputs()]
+        mpc_module._MPC_STATES.clear()
+        batch = mpc_module.compute_mpc_batch(make_inputs(), params)
+
+        assert len(batch) == len(single)
+        for one, many in zip(single, batch):
+            assert one is not None and many is not None
+            assert many.valve_percent == one.valve_percent
+            assert many.debug.get("mpc_cost") == one.debug.get("mpc_cost")
+
+    def test_batch_handles_repeated_key_in_order(self):
+        """A key listed twice is solved in two rounds against updated state."""
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        params = MpcParams(mpc_adapt=False)
+        inp = MpcInput(key="room_a:t21.0", target_temp_C=21.0, current_temp_C=19.5)
+        first, second = mpc_module.compute_mpc_batch([inp, inp], params)
+
+        assert first is not None and second is not None
+        assert second.debug.get("mpc_last_percent") == first.valve_percent
+
+    def test_recent_errors_ring_is_bounded_and_round_trips(self):
+        """recent_errors keeps the newest samples and survives export/import."""
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        state = mpc_module._MpcState()
+        assert not hasattr(state, "__dict__")
+        for i in range(mpc_module.RECENT_ERRORS_CAPACITY + 5):
+            state.recent_errors.append(float(i))
+        assert len(state.recent_errors) == mpc_module.RECENT_ERRORS_CAPACITY
+        assert state.recent_errors.tail(3) == [22.0, 23.0, 24.0]
+
+        mpc_module._MPC_STATES["bt:climate.a:t21.0"] = state
+        exported = mpc_module.export_mpc_state_map("bt:")
+        payload = exported["bt:climate.a:t21.0"]["recent_errors"]
+        assert payload == [float(i) for i in range(5, 25)]
+
+        mpc_module._MPC_STATES.clear()
+        mpc_module.import_mpc_state_map(exported)
+        restored = mpc_module._MPC_STATES["bt:climate.a:t21.0"]
+        assert list(restored.recent_errors) == payload
+
+    def test_error_ring_streaming_t_statistic_matches_direct(self):
+        """Windowed Welford moments track a direct t-test on the newest samples."""
+        import math
+        import random
+
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        def direct_t(values):
+            n = len(values)
+            mean = sum(values) / n
+            std = math.sqrt(sum((v - mean) ** 2 for v in values) / n)
+            return abs(mean) / (std / math.sqrt(n))
+
+        rng = random.Random(3)
+        ring = mpc_module._ErrorRing()
+        samples = []
+        for i in range(200):
+            value = rng.gauss(0.01 if i > 120 else 0.0, 0.02)
+            ring.append(value)
+            samples.append(value)
+            if len(samples) < mpc_module.REGIME_WINDOW:
+                assert ring.t_statistic() is None
+            else:
+                assert ring.t_statistic() == pytest.approx(
+                    direct_t(samples[-mpc_module.REGIME_WINDOW :]), rel=1e-9
+                )
+
+        # A wider window grows the ring and fills up from the kept samples.
+        ring.set_window(30)
+        assert len(ring) == mpc_module.RECENT_ERRORS_CAPACITY
+        assert ring.t_statistic() is None
+        for value in (0.5, -0.1, 0.2, 0.0, 0.3, 0.1, -0.2, 0.4, 0.05, 0.15):
+            ring.append(value)
+            samples.append(value)
+        assert len(ring) == 30
+        assert ring.t_statistic() == pytest.approx(direct_t(samples[-30:]), rel=1e-9)
+
+        constant = mpc_module._ErrorRing([0.1] * 12)
+        assert constant.t_statistic() is None
+        assert not mpc_module._detect_regime_change(constant)
+
+    def test_perf_curve_migrates_label_keys_and_round_trips(self):
+        """Legacy label-keyed perf curves load into the array form."""
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        legacy = {
+            "p10_12": {
+                "count": 3,
+                "avg_room_rate": 0.02,
+                "avg_trv_rate": 0.1,
+                "avg_percent": 11.0,
+                "avg_temp_error": 0.4,
+            },
+            "p100_100": {"count": 1, "avg_room_rate": 0.05},
+        }
+        mpc_module.import_mpc_state_map({"bt:climate.a:t21.0": {"perf_curve": legacy}})
+        curve = mpc_module._MPC_STATES["bt:climate.a:t21.0"].perf_curve
+        assert curve is not None
+        assert curve.bin_pct == 2.0
+        assert curve.count[5] == 3
+        assert curve.room_rate[5] == 0.02
+        assert curve.count[curve.bin_index(100.0)] == 1
+
+        curve.update(5, 0.05, None, 11.5, 0.3)
+        assert curve.count[5] == 4
+        assert curve.room_rate_variance(5) is not None
+
+        exported = mpc_module.export_mpc_state_map("bt:")
+        payload = exported["bt:climate.a:t21.0"]["perf_curve"]
+        assert payload["bin_pct"] == 2.0
+        assert [row[0] for row in payload["bins"]] == [5, 50]
+
+        mpc_module._MPC_STATES.clear()
+        mpc_module.import_mpc_state_map(exported)
+        restored = mpc_module._MPC_STATES["bt:climate.a:t21.0"].perf_curve
+        assert restored is not None
+        assert restored.to_payload() == payload
+
+    def test_debug_level_summary_and_off(self):
+        """Summary keeps only sensor fields, off returns no debug payload."""
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        params = MpcParams()
+
+        def run(level):
+            mpc_module._MPC_STATES.clear()
+            return compute_mpc(
+                MpcInput(
+                    key="bt:climate.a:t21.0",
+                    target_temp_C=21.0,
+                    current_temp_C=19.5,
+                    debug_level=level,
+                ),
+                params,
+            )
+
+        full = run("full")
+        summary = run("summary")
+        off = run("off")
+        assert full is not None and summary is not None and off is not None
+
+        assert set(summary.debug) <= set(mpc_module._SUMMARY_DEBUG_KEYS)
+        assert "mpc_gain" in summary.debug and "mpc_created_ts" in summary.debug
+        for key in summary.debug:
+            if key != "mpc_created_ts":
+                assert summary.debug[key] == full.debug[key]
+        assert off.debug == {}
+        assert summary.valve_percent == full.valve_percent == off.valve_percent
+
+    def test_warm_start_search_matches_sweep_with_fewer_evals(self):
+        """The trust region finds the sweep optimum and widens when needed."""
+        from custom_components.better_thermostat.utils.calibration.mpc import (
+            _HorizonProblem,
+            _solve_du_grid,
+            _solve_du_warm_batch,
+        )
+
+        def make_problem(warm_du_pct):
+            return _HorizonProblem(
+                start_temp_C=20.4,
+                target_temp_C=21.0,
+                horizon=6,
+                step_minutes=5.0,
+                gain_step=0.3,
+                other_heat_step=0.0,
+                loss_step=0.05,
+                ka_loss=None,
+                outdoor_temp_C=3.0,
+                u0_frac=0.17,
+                last_du=None,
+                control_pen=0.05,
+                change_pen=0.0,
+                eco_pen=1.0,
+                warm_du_pct=warm_du_pct,
+            )
+
+        grid_du, grid_cost, grid_evals = _solve_du_grid(make_problem(None))
+        problems = [
+            make_problem(grid_du + 1),
+            make_problem(grid_du - 10),
+            make_problem(None),
+        ]
+        results, evals = _solve_du_warm_batch(problems, 3, 24)
+
+        assert results[2] is None and evals[2] == 0
+        for result in results[:2]:
+            assert result is not None
+            assert result[0] == grid_du
+            assert abs(result[1] - grid_cost) < 1e-12
+        # The near start needs one 7-point window, the far one has to widen.
+        assert evals[0] == 7 * 6
+        assert evals[0] < evals[1] < grid_evals
+
+    def test_warm_start_falls_back_after_setpoint_change(self):
+        """compute_mpc uses the warm search only while the setpoint is unchanged."""
+        params = MpcParams(mpc_adapt=False, mpc_warm_start=True)
+        inp = MpcInput(
+            key="bt:climate.a:t21.0", target_temp_C=21.0, current_temp_C=20.5
+        )
+
+        first = compute_mpc(inp, params)
+        assert first is not None and first.debug["mpc_solver"] == "grid"
+        second = compute_mpc(inp, params)
+        assert second is not None and second.debug["mpc_solver"] == "warm"
+        assert second.debug["mpc_eval_count"] < first.debug["mpc_eval_count"]
+
+        inp.target_temp_C = 21.2
+        third = compute_mpc(inp, params)
+        assert third is not None and third.debug["mpc_solver"] == "grid"
+
+    def test_step_response_matches_rollout_for_single_block(self):
+        """One move block reproduces the held-opening rollout costs."""
+        from dataclasses import replace
+
+        from custom_components.better_thermostat.utils.calibration.mpc import (
+            _block_bounds,
+            _HorizonProblem,
+        )
+
+        assert _block_bounds(48, 3) == [(0, 7), (7, 21), (21, 48)]
+        assert _block_bounds(2, 3) == [(0, 1), (1, 2)]
+
+        for ka_loss in (None, 0.0012):
+            problem = _HorizonProblem(
+                start_temp_C=20.4,
+                target_temp_C=21.0,
+                horizon=36,
+                step_minutes=5.0,
+                gain_step=0.3,
+                other_heat_step=0.01,
+                loss_step=0.05,
+                ka_loss=ka_loss,
+                outdoor_temp_C=3.0,
+                u0_frac=0.17,
+                last_du=None,
+                control_pen=0.05,
+                change_pen=1.0,
+                eco_pen=1.0,
+            )
+            blocked = replace(problem, move_blocks=1)
+            candidates = [0.0, 0.05, 0.17, 0.4, 1.0]
+            for rolled, stepped in zip(
+                problem.horizon_costs(candidates), blocked.horizon_costs(candidates)
+            ):
+                assert abs(rolled - stepped) <= 1e-9 * max(1.0, rolled)
+
+    def test_move_blocking_long_horizon(self):
+        """Later blocks can back off, and long horizons stay cheap to solve."""
+        from dataclasses import replace
+
+        from custom_components.better_thermostat.utils.calibration.mpc import (
+            _HorizonProblem,
+            _solve_du_grid,
+        )
+
+        problem = _HorizonProblem(
+            start_temp_C=19.0,
+            target_temp_C=21.0,
+            horizon=48,
+            step_minutes=5.0,
+            gain_step=0.1,
+            other_heat_step=0.0,
+            loss_step=0.01,
+            ka_loss=None,
+            outdoor_temp_C=3.0,
+            u0_frac=0.1,
+            last_du=None,
+            control_pen=0.05,
+            change_pen=1.0,
+            eco_pen=0.0,
+        )
+        blocked = replace(problem, move_blocks=3)
+        plan = blocked.step_response().plan(1.0, problem.u0_frac, 0.05)
+        assert plan[0] == 1.0
+        assert plan[-1] < 0.5
+        for u in (0.3, 1.0):
+            assert blocked.horizon_costs([u])[0] <= problem.horizon_costs([u])[0]
+
+        du, _, evals = _solve_du_grid(blocked)
+        _, _, rollout_evals = _solve_du_grid(problem)
+        assert du > 50
+        assert evals * 10 < rollout_evals
+
+        result = compute_mpc(
+            MpcInput(key="bt:climate.a:t21.0", target_temp_C=21.0, current_temp_C=19.0),
+            MpcParams(mpc_adapt=False, mpc_horizon_steps=48, mpc_move_blocks=3),
+        )
+        assert result is not None
+        assert result.debug["mpc_horizon"] == 48
+        assert result.debug["mpc_move_blocks"] == 3
+
+    def test_outdoor_forecast_trajectory_drives_preheating(self):
+        """A forecast cold snap raises the opening; a flat one changes nothing."""
+        from dataclasses import replace
+
+        from custom_components.better_thermostat.utils.calibration.mpc import (
+            _forecast_trajectory,
+            _HorizonProblem,
+            _solve_du_grid,
+        )
+
+        problem = _HorizonProblem(
+            start_temp_C=20.8,
+            target_temp_C=21.0,
+            horizon=24,
+            step_minutes=5.0,
+            gain_step=0.1,
+            other_heat_step=0.0,
+            loss_step=0.02,
+            ka_loss=0.0005,
+            outdoor_temp_C=5.0,
+            u0_frac=0.2,
+            last_du=None,
+            control_pen=0.05,
+            change_pen=0.0,
+            eco_pen=0.0,
+        )
+        flat = replace(problem, outdoor_traj=_forecast_trajectory([2.0] * 4, 24, 5.0))
+        assert flat.outdoor_traj == (5.0,) * 24
+        assert flat.horizon_costs([0.3, 0.7]) == problem.horizon_costs([0.3, 0.7])
+
+        cold = replace(
+            problem,
+            outdoor_traj=_forecast_trajectory(
+                [5.0 - 1.5 * k for k in range(24)], 24, None
+            ),
+        )
+        base_du, _, _ = _solve_du_grid(problem)
+        cold_du, _, _ = _solve_du_grid(cold)
+        assert cold_du > base_du
+        for blocks in (0, 1):
+            blocked = replace(cold, move_blocks=blocks)
+            assert blocked.horizon_costs([0.5])[0] == pytest.approx(
+                cold.horizon_costs([0.5])[0]
+            )
+
+    def test_rls_estimator_identifies_gain_and_loss(self):
+        """RLS recovers gain/loss from noisy samples and reports confidence."""
+        import random
+
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        true_gain, true_loss = 0.08, 0.012
+        rng = random.Random(7)
+        inp = MpcInput(
+            key="bt:climate.rls:t21.0", target_temp_C=21.0, current_temp_C=20.0
+        )
+
+        def run(params):
+            state = mpc_module._MpcState()
+            temp, now = 20.0, 0.0
+            state.last_learn_temp, state.last_learn_time = temp, now
+            confidences = []
+            for _ in range(40):
+                u = rng.uniform(0.0, 1.0)
+                dt_s = 1800.0
+                state.u_integral, state.time_integral = u * 100.0 * dt_s, dt_s
+                state.last_percent = u * 100.0
+                rate = true_gain * u - true_loss + rng.gauss(0.0, 0.002)
+                temp += rate * dt_s / 60.0
+                now += dt_s
+                mpc_module._rls_adapt(inp, params, state, now, temp, 21.0, dt_s)
+                confidences.append(mpc_module._rls_confidence(state, params))
+            return state, confidences
+
+        params = MpcParams(mpc_estimator="rls")
+        state, confidences = run(params)
+        assert state.rls_samples == 40
+        assert state.gain_est == pytest.approx(true_gain, abs=0.01)
+        assert state.loss_est == pytest.approx(true_loss, abs=0.003)
+        assert confidences[0] < confidences[-1]
+        assert confidences[-1] >= 0.7
+
+        mpc_module._MPC_STATES[inp.key] = state
+        exported = mpc_module.export_mpc_state_map("bt:")
+        assert len(exported[inp.key]["rls_cov"]) == 3
+        mpc_module._MPC_STATES.clear()
+        mpc_module.import_mpc_state_map(exported)
+        restored = mpc_module._MPC_STATES[inp.key]
+        assert list(restored.rls_cov) == list(state.rls_cov)
+        assert restored.rls_samples == 40
+        assert mpc_module._rls_confidence(restored, params) == confidences[-1]
+
+    def test_rls_estimator_reports_model_confidence(self):
+        """compute_mpc with the RLS estimator exposes mpc_model_conf."""
+        params = MpcParams(mpc_estimator="rls", mpc_rls_min_sample_s=0.0)
+        key = "bt:climate.rls_conf:t21.0"
+        first = compute_mpc(
+            MpcInput(key=key, target_temp_C=21.0, current_temp_C=20.0), params
+        )
+        assert first is not None
+        assert first.debug.get("mpc_model_conf") is None
+
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        state = mpc_module._MPC_STATES[key]
+        state.last_learn_time -= 600.0
+        second = compute_mpc(
+            MpcInput(key=key, target_temp_C=21.0, current_temp_C=20.3), params
+        )
+        assert second is not None
+        assert state.rls_samples == 1
+        assert 0.0 <= second.debug["mpc_model_conf"] <= 1.0
+
+    def test_solution_cache_skips_repeated_solves(self):
+        """Unchanged quantised inputs reuse the last horizon solution."""
+        params = MpcParams(mpc_adapt=False, use_virtual_temp=False)
+        key = "bt:climate.cache:t21.0"
+
+        def run(current, debug_level="full"):
+            return compute_mpc(
+                MpcInput(
+                    key=key,
+                    target_temp_C=21.0,
+                    current_temp_C=current,
+                    debug_level=debug_level,
+                ),
+                params,
+            )
+
+        # The first call has no previous opening yet, so its key differs.
+        run(20.0)
+        first = run(20.0)
+        second = run(20.001)
+        assert first.debug["mpc_solver"] == "grid"
+        assert second.debug["mpc_solver"] == "cache"
+        assert second.debug["mpc_eval_count"] == 0
+        assert second.debug["mpc_cost"] == first.debug["mpc_cost"]
+        assert second.valve_percent == first.valve_percent
+        assert second.debug["mpc_cache_hits"] == 1
+
+        third = run(20.5)
+        assert third.debug["mpc_solver"] == "grid"
+        assert third.debug["mpc_cache_misses"] == 3
+
+        uncached = MpcParams(
+            mpc_adapt=False, use_virtual_temp=False, mpc_solution_cache=False
+        )
+        fourth = compute_mpc(
+            MpcInput(key=key, target_temp_C=21.0, current_temp_C=20.5), uncached
+        )
+        assert fourth.debug["mpc_solver"] == "grid"
+
+    def test_exact_discretization_matches_continuous_solution(self):
+        """Exact steps reproduce the ODE solution for any step length."""
+        from dataclasses import replace
+        import math
+
+        from custom_components.better_thermostat.utils.calibration.mpc import (
+            _exact_first_order_delta,
+            _HorizonProblem,
+            _solve_du_analytic,
+        )
+
+        ka, gain, outdoor, start, u = 0.004, 0.06, 2.0, 19.0, 0.5
+
+        def continuous(minutes):
+            settle = outdoor + gain * u / ka
+            return settle + (start - settle) * math.exp(-ka * minutes)
+
+        # A 12 h sensor gap is bridged by one evaluation.
+        gap = _exact_first_order_delta(start, gain * u, ka, outdoor, 720.0)
+        assert start + gap == pytest.approx(continuous(720.0), abs=1e-9)
+        assert _exact_first_order_delta(start, 0.03, 0.0, outdoor, 10.0) == 0.3
+
+        for step_minutes in (5.0, 60.0):
+            problem = _HorizonProblem(
+                start_temp_C=start,
+                target_temp_C=continuous(6 * step_minutes),
+                horizon=6,
+                step_minutes=step_minutes,
+                gain_step=gain * step_minutes,
+                other_heat_step=0.0,
+                loss_step=0.0,
+                ka_loss=ka,
+                outdoor_temp_C=outdoor,
+                u0_frac=u,
+                last_du=None,
+                control_pen=0.0,
+                change_pen=0.0,
+                eco_pen=0.0,
+                exact=True,
+            )
+            response = replace(problem, move_blocks=1).step_response()
+            for k in range(6):
+                temp = response.free[k] + response.columns[0][k] * u
+                assert temp == pytest.approx(
+                    continuous((k + 1) * step_minutes), abs=1e-9
+                )
+            expected = sum(
+                (problem.target_temp_C - continuous((k + 1) * step_minutes)) ** 2
+                for k in range(6)
+            )
+            assert problem.horizon_costs([u])[0] == pytest.approx(expected, abs=1e-9)
+            du_pct, cost, _ = _solve_du_analytic(problem)
+            best_u = u + du_pct / 100.0
+            assert problem.horizon_costs([best_u])[0] == pytest.approx(cost, abs=1e-9)
+            grid = [i / 100.0 for i in range(101)]
+            assert cost <= min(problem.horizon_costs(grid)) + 1e-9
+
+            # Euler drifts away from the ODE solution on long steps.
+            euler = replace(problem, exact=False).horizon_costs([u])[0]
+            if step_minutes == 60.0:
+                assert abs(euler - expected) > 1e-3
+
+    def test_room_allocation_respects_weights_and_dead_zones(self):
+        """Room demand is split evenly, or concentrated past dead zones."""
+        from custom_components.better_thermostat.utils.calibration.mpc import (
+            _allocate_room_demand,
+        )
+
+        assert _allocate_room_demand(30.0, [1.0, 1.0], [0.0, 0.0]) == [30.0, 30.0]
+        assert _allocate_room_demand(0.0, [1.0, 1.0], [10.0, 10.0]) == [0.0, 0.0]
+        # 2 x 6 % would sit in both dead zones: run the stronger TRV at 12 %.
+        assert _allocate_room_demand(6.0, [1.0, 1.0], [10.0, 10.0]) == [12.0, 0.0]
+        assert _allocate_room_demand(6.0, [0.5, 1.5], [7.0, 7.0]) == [0.0, 8.0]
+        assert _allocate_room_demand(90.0, [2.0, 1.0], [0.0, 0.0]) == [90.0, 90.0]
+        assert _allocate_room_demand(3.0, [1.0], [8.0]) == [8.0]
+
+    def test_room_solve_runs_one_model_for_all_trvs(self):
+        """compute_mpc_room adapts one room model and shares its demand."""
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        params = MpcParams(mpc_room_solve=True)
+        shared = {"target_temp_C": 21.0, "current_temp_C": 19.5}
+        room = MpcInput(key="bt:room:t21.0", **shared)
+        trvs = [
+            MpcInput(
+                key=f"bt:climate.trv{i}:t21.0", entity_id=f"climate.trv{i}", **shared
+            )
+            for i in range(3)
+        ]
+
+        curve = mpc_module._PerfCurve(5.0)
+        for pct, rate in ((10.0, 0.01), (50.0, 0.05), (90.0, 0.09)):
+            for _ in range(3):
+                curve.update(curve.bin_index(pct), rate, None, pct, 1.0)
+        assert curve.response_slope() == pytest.approx(0.001)
+        strong = mpc_module._MpcState(perf_curve=curve)
+        mpc_module._MPC_STATES[trvs[0].key] = strong
+
+        outputs = mpc_module.compute_mpc_room(room, trvs, params)
+        demand = outputs[0].debug["mpc_room_demand_pct"]
+        assert demand > 0
+        assert {o.debug["mpc_room_demand_pct"] for o in outputs} == {demand}
+        assert [o.debug["mpc_room_weight"] for o in outputs] == [1.0, 1.0, 1.0]
+        assert all(o.valve_percent == demand for o in outputs)
+        assert "mpc_gain" in outputs[0].debug
+
+        room_state = mpc_module._MPC_STATES[room.key]
+        assert room_state.solution_memo is not None
+        assert room_state.solution_memo.misses == 1
+        for trv in trvs:
+            state = mpc_module._MPC_STATES[trv.key]
+            assert state.solution_memo is None
+            assert state.last_percent == demand
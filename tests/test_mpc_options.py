@@ -0,0 +1,191 @@
+"""Tests for building MPC params from the per-TRV advanced options."""
+
+import asyncio
+from types import SimpleNamespace
+
+from homeassistant.components.climate.const import HVACMode
+import pytest
+
+from custom_components.better_thermostat import calibration
+from custom_components.better_thermostat.calibration import (
+    _compute_mpc_balance,
+    _compute_mpc_room_share,
+    _mpc_room_entities,
+    mpc_params_for,
+)
+from custom_components.better_thermostat.utils.calibration.executor import (
+    CONTROLLER_EXECUTOR,
+    PREFETCH_SLOT,
+)
+from custom_components.better_thermostat.utils.calibration.mpc import MpcParams
+
+
+@pytest.fixture
+def anyio_backend():
+    """Configure anyio to use asyncio backend for async tests."""
+    return "asyncio"
+
+
+def _bt(advanced):
+    return SimpleNamespace(
+        unique_id="bt1",
+        device_name="test",
+        hass=None,
+        outdoor_sensor=None,
+        weather_entity=None,
+        bt_target_temp=21.0,
+        cur_temp=20.0,
+        cur_temp_filtered=None,
+        bt_hvac_mode=HVACMode.HEAT,
+        tolerance=0.3,
+        temp_slope=None,
+        window_open=False,
+        real_trvs={"climate.trv": {"advanced": advanced}},
+    )
+
+
+class TestMpcOptions:
+    """Test cases for the MPC advanced options."""
+
+    def test_defaults_without_options(self):
+        """A TRV without MPC options runs the default params."""
+        assert mpc_params_for(_bt({}), "climate.trv") == MpcParams()
+
+    def test_solver_option(self):
+        """The solver option selects the analytic solver; junk falls back to grid."""
+        params = mpc_params_for(_bt({"mpc_solver": "analytic"}), "climate.trv")
+        assert params.mpc_solver == "analytic"
+        params = mpc_params_for(_bt({"mpc_solver": "simplex"}), "climate.trv")
+        assert params.mpc_solver == "grid"
+
+    def test_warm_start_options(self):
+        """Warm start and its radii come from the options, the max never below the radius."""
+        params = mpc_params_for(
+            _bt(
+                {
+                    "mpc_warm_start": True,
+                    "mpc_warm_start_radius_pct": 6,
+                    "mpc_warm_start_max_radius_pct": 2,
+                }
+            ),
+            "climate.trv",
+        )
+        assert params.mpc_warm_start is True
+        assert params.mpc_warm_start_radius_pct == 6
+        assert params.mpc_warm_start_max_radius_pct == 6
+
+    def test_long_horizon_options(self):
+        """Horizon length and move blocks are read and clamped to their ranges."""
+        params = mpc_params_for(
+            _bt({"mpc_horizon_steps": 48, "mpc_move_blocks": 3}), "climate.trv"
+        )
+        assert params.mpc_horizon_steps == 48 and params.mpc_move_blocks == 3
+        params = mpc_params_for(
+            _bt({"mpc_horizon_steps": 500, "mpc_move_blocks": -1}), "climate.trv"
+        )
+        assert params.mpc_horizon_steps == 72 and params.mpc_move_blocks == 0
+
+    def test_long_horizon_is_solved_off_loop(self):
+        """Only horizons beyond the default are captured as heavy requests."""
+        for steps, heavy in ((6, False), (48, True)):
+            request = CONTROLLER_EXECUTOR.capture(
+                _compute_mpc_balance, _bt({"mpc_horizon_steps": steps}), "climate.trv"
+            )
+            assert request is not None and request.heavy is heavy
+
+    def test_estimator_option(self):
+        """The estimator option selects RLS; junk falls back to the EMA steps."""
+        params = mpc_params_for(_bt({"mpc_estimator": "rls"}), "climate.trv")
+        assert params.mpc_estimator == "rls"
+        params = mpc_params_for(_bt({"mpc_estimator": "kalman"}), "climate.trv")
+        assert params.mpc_estimator == "ema"
+
+    def test_exact_discretization_option(self):
+        """Exact discretization is off by default and follows the option."""
+        assert not mpc_params_for(_bt({}), "climate.trv").mpc_exact_discretization
+        params = mpc_params_for(_bt({"mpc_exact_discretization": True}), "climate.trv")
+        assert params.mpc_exact_discretization is True
+
+    def test_room_solve_option_and_share_expiry(self):
+        """Only opted-in TRVs share the room solve; a pending share expires."""
+        bt = _bt({"mpc_room_solve": True})
+        bt.unique_id = "bt_room_share"
+        bt.real_trvs["climate.b"] = {"advanced": {"mpc_room_solve": True}}
+        bt.real_trvs["climate.c"] = {"advanced": {}}
+        params = mpc_params_for(bt, "climate.trv")
+        assert params.mpc_room_solve is True
+        room = _mpc_room_entities(bt)
+        assert room == ["climate.trv", "climate.b"]
+
+        inputs = {
+            "target_temp_C": 21.0,
+            "current_temp_C": 20.0,
+            "filtered_temp_C": None,
+            "tolerance_K": 0.3,
+            "window_open": False,
+            "heating_allowed": True,
+        }
+        _compute_mpc_room_share(bt, "climate.trv", room, inputs, params)
+        share = bt._mpc_room_shares[1]["climate.b"]
+        assert _compute_mpc_room_share(bt, "climate.b", room, inputs, params) is share
+
+        _compute_mpc_room_share(bt, "climate.trv", room, inputs, params)
+        signature, shares, stamp = bt._mpc_room_shares
+        bt._mpc_room_shares = (signature, shares, stamp - params.min_update_interval_s)
+        _compute_mpc_room_share(bt, "climate.b", room, inputs, params)
+        assert "climate.trv" in bt._mpc_room_shares[1]
+
+    @pytest.mark.anyio
+    async def test_room_solve_is_shared_by_the_lanes(self, monkeypatch):
+        """Lanes solve the room once; a fallback while busy is not stored."""
+        solves = []
+
+        def fake_room(room_input, trv_inputs, params):
+            solves.append(room_input.key)
+            return [f"share:{inp.entity_id}" for inp in trv_inputs]
+
+        async def executor_job(func, *args):
+            return func(*args)
+
+        monkeypatch.setattr(calibration, "compute_mpc_room", fake_room)
+        bt = _bt({"mpc_room_solve": True})
+        bt.unique_id = "bt_room_lanes"
+        bt.hass = SimpleNamespace(async_add_executor_job=executor_job)
+        bt.real_trvs["climate.b"] = {"advanced": {"mpc_room_solve": True}}
+        room = _mpc_room_entities(bt)
+        params = mpc_params_for(bt, "climate.trv")
+        inputs = {
+            "target_temp_C": 21.0,
+            "current_temp_C": 20.0,
+            "filtered_temp_C": None,
+            "tolerance_K": 0.3,
+            "window_open": False,
+            "heating_allowed": True,
+        }
+
+        requests = [
+            CONTROLLER_EXECUTOR.capture(
+                _compute_mpc_room_share, bt, trv, room, inputs, params
+            )
+            for trv in room
+        ]
+        results = await asyncio.gather(
+            *(CONTROLLER_EXECUTOR.async_run(bt.hass, r) for r in requests)
+        )
+        for trv, result in zip(room, results):
+            bt.real_trvs[trv][PREFETCH_SLOT] = result
+        outputs = [
+            _compute_mpc_room_share(bt, trv, room, inputs, params) for trv in room
+        ]
+        assert len(solves) == 1
+        assert outputs == ["share:climate.trv", "share:climate.b"]
+
+        # The shared solve was consumed; with the entity's controller busy in
+        # a worker nothing is reused or stored
+        assert PREFETCH_SLOT not in bt.real_trvs["climate.b"]
+        bt._mpc_room_shares = None
+        with CONTROLLER_EXECUTOR.lock_for(bt.unique_id):
+            assert (
+                _compute_mpc_room_share(bt, "climate.b", room, inputs, params) is None
+            )
+        assert bt._mpc_room_shares is None and len(solves) == 1
@@ -1,14 +1,33 @@
 """Tests for the PID controller."""
 
+from dataclasses import replace
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.better_thermostat.calibration import pid_params_for
+from custom_components.better_thermostat.number import BetterThermostatPIDNumber
 from custom_components.better_thermostat.utils.calibration.pid import (
     PIDParams,
     build_pid_key,
     compute_pid,
+    export_pid_states,
     get_pid_state,
+    import_pid_states,
     seed_pid_gains,
+    seed_pid_gains_for_trv,
+)
+from custom_components.better_thermostat.utils.calibration.state_registry import (
+    BucketEvictionPolicy,
 )
 
 
+@pytest.fixture
+def anyio_backend():
+    """Configure anyio to use asyncio backend for async tests."""
+    return "asyncio"
+
+
 class TestPIDController:
     """Test cases for PID controller."""
 
@@ -611,3 +630,199 @@ class TestPIDController:
         assert state_after.pid_kd == 400.0
         # Integral should be preserved
         assert state_after.pid_integral == integral_before
+
+    def test_gain_schedule_shared_across_target_buckets(self):
+        """All target buckets of a TRV share one state and one gain schedule."""
+        params = PIDParams(auto_tune=False)
+        for target in (21.0, 19.0):
+            compute_pid(
+                params=params,
+                inp_target_temp_C=target,
+                inp_current_temp_C=20.0,
+                inp_trv_temp_C=20.5,
+                inp_temp_slope_K_per_min=0.0,
+                key=f"uid:climate.a:t{target:.1f}",
+            )
+        assert list(export_pid_states("uid:")) == ["uid:climate.a:schedule"]
+        assert get_pid_state("uid:climate.a:t21.0") is get_pid_state(
+            "uid:climate.a:t19.0"
+        )
+
+        # Gains set at 21 °C bend the schedule, the neighbours follow partially
+        seed_pid_gains("uid:climate.a:t21.0", 30.0, 0.02, 900.0, at=21.0)
+        schedule = get_pid_state("uid:climate.a:t21.0").schedule
+        assert schedule.gains_at(21.0) == (30.0, 0.02, 900.0)
+        assert schedule.gains_at(21.5)[0] < params.kp
+        assert schedule.gains_at(23.0) == (30.0, 0.02, 900.0)
+
+        # Seeding without an operating point replaces the whole schedule
+        seed_pid_gains("uid:climate.a:t21.0", 50.0, 0.03, 1000.0)
+        assert (
+            schedule.gains_at(17.0) == schedule.gains_at(24.0) == (50.0, 0.03, 1000.0)
+        )
+
+    def test_auto_tune_improves_neighbouring_targets(self):
+        """Learning at one target moves the interpolated gains next to it."""
+        params = PIDParams(auto_tune=True, tune_min_interval_s=0.0, min_hold_time_s=0.0)
+        key = "uid:climate.a:t21.5"
+        for current in (20.0, 21.55):
+            compute_pid(
+                params=params,
+                inp_target_temp_C=21.5,
+                inp_current_temp_C=current,
+                inp_trv_temp_C=21.0,
+                inp_temp_slope_K_per_min=0.0,
+                key=key,
+            )
+        schedule = get_pid_state(key).schedule
+        assert schedule.gains_at(21.5)[0] < params.kp
+        assert schedule.gains_at(21.0)[0] < params.kp
+        assert schedule.gains_at(22.0)[0] < params.kp
+        assert sorted(schedule.anchors) == [21, 22]
+
+    def test_outdoor_delta_schedule(self):
+        """The schedule can run over target minus outdoor temperature."""
+        params = PIDParams(auto_tune=False, gain_schedule_var="target_outdoor_delta")
+        compute_pid(
+            params=params,
+            inp_target_temp_C=21.0,
+            inp_current_temp_C=20.0,
+            inp_trv_temp_C=20.5,
+            inp_temp_slope_K_per_min=0.0,
+            key="uid:climate.a:t21.0",
+            inp_outdoor_temp_C=5.0,
+        )
+        assert get_pid_state("uid:climate.a:t21.0").schedule_x == 16.0
+
+        # Without an outdoor temperature the last operating point is held
+        seed_pid_gains("uid:climate.a:t21.0", 30.0, 0.02, 900.0, at=16.0, params=params)
+        compute_pid(
+            params=params,
+            inp_target_temp_C=21.0,
+            inp_current_temp_C=20.0,
+            inp_trv_temp_C=20.5,
+            inp_temp_slope_K_per_min=0.0,
+            key="uid:climate.a:t21.0",
+        )
+        state = get_pid_state("uid:climate.a:t21.0")
+        assert state.schedule_x == 16.0 and sorted(state.schedule.anchors) == [16]
+        assert (state.pid_kp, state.pid_ki, state.pid_kd) == (30.0, 0.02, 900.0)
+
+    @pytest.mark.anyio
+    async def test_manual_gain_edit_without_outdoor_temperature(self):
+        """Without an operating point a manual edit sets the base, not every anchor."""
+        bt = SimpleNamespace(
+            unique_id="uid",
+            bt_target_temp=21.0,
+            real_trvs={
+                "climate.a": {"advanced": {"pid_gain_schedule": "target_outdoor_delta"}}
+            },
+            schedule_save_pid_state=lambda: None,
+        )
+        params = pid_params_for(bt, "climate.a")
+        key = build_pid_key(bt, "climate.a")
+        seed_pid_gains(key, 30.0, 0.02, 900.0, at=16.0, params=params)
+        assert get_pid_state(key).schedule_x is None
+
+        number = object.__new__(BetterThermostatPIDNumber)
+        number._bt_climate = bt
+        number._trv_entity_id = "climate.a"
+        number._parameter = "kp"
+        number.hass = None
+        number.async_write_ha_state = lambda: None
+        await number.async_set_native_value(45.0)
+
+        schedule = get_pid_state(key).schedule
+        assert schedule.anchors[16] == (30.0, 0.02, 900.0)
+        assert schedule.base == (45.0, 0.02, 900.0)
+        compute_pid(
+            params=replace(params, auto_tune=False),
+            inp_target_temp_C=21.0,
+            inp_current_temp_C=20.0,
+            inp_trv_temp_C=20.5,
+            inp_temp_slope_K_per_min=0.0,
+            key=key,
+        )
+        assert get_pid_state(key).pid_kp == 45.0
+
+    def test_schedule_anchors_evicted_into_base(self):
+        """Surplus anchors are averaged into the base; the TRV seed fills all."""
+        params = PIDParams(
+            bucket_eviction=BucketEvictionPolicy(max_buckets_per_trv=2, max_age_s=0)
+        )
+        key = "uid:climate.a:t21.0"
+        for at, kp in ((18.0, 40.0), (19.0, 60.0), (20.0, 80.0)):
+            seed_pid_gains(key, kp, 0.01, 1000.0, at=at, params=params)
+        schedule = get_pid_state(key).schedule
+        assert sorted(schedule.anchors) == [19, 20]
+        assert schedule.base == (40.0, 0.01, 1000.0)
+
+        # Stored anchors keep their last use; the import applies the policy
+        exported = export_pid_states("uid:")
+        self.setup_method()
+        import_pid_states(
+            exported,
+            prefix_filter="uid:",
+            policies={
+                "climate.a": BucketEvictionPolicy(max_buckets_per_trv=1, max_age_s=0)
+            },
+        )
+        schedule = get_pid_state(key).schedule
+        assert sorted(schedule.anchors) == [20]
+        assert schedule.base == (0.5 * (40.0 + 60.0), 0.01, 1000.0)
+
+        assert seed_pid_gains_for_trv("uid", "climate.a", 50.0, 0.02, 900.0) == 1
+        schedule = get_pid_state(key).schedule
+        assert schedule.anchors == {} and schedule.base == (50.0, 0.02, 900.0)
+
+    def test_import_folds_legacy_buckets_into_schedule(self):
+        """Per-bucket states of older versions become one schedule per TRV."""
+        imported = import_pid_states(
+            {
+                "uid:climate.a:prior": {
+                    "pid_kp": 40.0,
+                    "pid_ki": 0.01,
+                    "pid_kd": 800.0,
+                },
+                "uid:climate.a:t20.0": {
+                    "pid_kp": 50.0,
+                    "pid_ki": 0.02,
+                    "pid_kd": 900.0,
+                    "auto_tune": False,
+                },
+                "uid:climate.a:t22.0": {
+                    "pid_kp": 70.0,
+                    "pid_ki": 0.04,
+                    "pid_kd": 1100.0,
+                },
+            },
+            prefix_filter="uid:",
+        )
+        assert imported == 3
+        state = get_pid_state("uid:climate.a:t21.0")
+        assert state.auto_tune is False
+        assert state.schedule.gains_at(20.0) == (50.0, 0.02, 900.0)
+        assert state.schedule.gains_at(22.0) == (70.0, 0.04, 1100.0)
+        assert state.schedule.gains_at(21.0) == (50.0, 0.02, 900.0)
+
+        exported = export_pid_states("uid:")
+        assert list(exported) == ["uid:climate.a:schedule"]
+        saved_schedule = exported["uid:climate.a:schedule"]["gain_schedule"]
+        assert saved_schedule["base"] == [40.0, 0.01, 800.0]
+
+    def test_gain_schedule_option(self):
+        """The TRV's advanced option selects the schedule variable."""
+
+        def _bt(advanced):
+            return SimpleNamespace(
+                unique_id="uid",
+                bt_target_temp=21.0,
+                real_trvs={"climate.a": {"advanced": advanced}},
+            )
+
+        params = pid_params_for(_bt({}), "climate.a")
+        assert params.gain_schedule_var == "target"
+        params = pid_params_for(
+            _bt({"pid_gain_schedule": "target_outdoor_delta"}), "climate.a"
+        )
+        assert params.gain_schedule_var == "target_outdoor_delta"
@@ -0,0 +1,149 @@
+"""Tests for offline PID tuning from replayed history."""
+
+import asyncio
+
+import pytest
+
+from custom_components.better_thermostat.climate import BetterThermostat
+from custom_components.better_thermostat.utils.calibration.pid import PIDParams
+from custom_components.better_thermostat.utils.calibration.pid_tuning import (
+    PidTuningParams,
+    ReplayTrace,
+    fit_plant,
+    mean_series,
+    resample_history,
+    simulate_pid_cost,
+    tune_pid_gains,
+)
+
+
+def _synthetic_trace(lag: int = 2, steps: int = 288) -> ReplayTrace:
+    """One day of a 5-minute room trace from a known first-order plant."""
+    gain, loss, outdoor = 0.06, 0.004, 5.0
+    valve = [100.0 if (i // 18) % 2 == 0 else 15.0 * (i % 3) for i in range(steps)]
+    temp = [19.0]
+    for i in range(steps - 1):
+        applied = valve[i - lag] if i >= lag else valve[0]
+        temp.append(
+            temp[-1] + 5.0 * (gain * applied / 100.0 + loss * (outdoor - temp[-1]))
+        )
+    target = [21.0 if (i // 96) % 2 == 0 else 19.5 for i in range(steps)]
+    return ReplayTrace(
+        step_s=300.0, temp=temp, valve=valve, target=target, outdoor=[outdoor] * steps
+    )
+
+
+@pytest.fixture
+def anyio_backend():
+    """Configure anyio to use asyncio backend for async tests."""
+    return "asyncio"
+
+
+class TestPidTuning:
+    """Test cases for history resampling, plant fit and the gain search."""
+
+    def test_resample_history_holds_last_value(self):
+        """Series are sampled on the grid with a zero-order hold."""
+        trace = resample_history(
+            {
+                "temp": [(0.0, 20.0), (650.0, 20.5)],
+                "valve": [(100.0, 40.0), (900.0, 150.0)],
+                "target": [(0.0, 21.0)],
+            },
+            start_ts=0.0,
+            end_ts=1200.0,
+            step_s=300.0,
+        )
+        assert trace is not None and trace.outdoor is None
+        assert trace.temp == [20.0, 20.0, 20.0, 20.5, 20.5]
+        assert trace.valve == [40.0, 40.0, 40.0, 100.0, 100.0]
+        assert resample_history({"temp": [(0.0, 20.0)]}, 0.0, 600.0, 300.0) is None
+
+        merged = mean_series([[(0.0, 100.0), (600.0, 0.0)], [(300.0, 50.0)]])
+        assert merged == [(0.0, 100.0), (300.0, 75.0), (600.0, 25.0)]
+
+    def test_fit_plant_recovers_model(self):
+        """The fitted plant matches the generating model, including its lag."""
+        plant = fit_plant(_synthetic_trace(lag=2))
+        assert plant is not None and plant.uses_outdoor
+        assert plant.lag_steps == 2
+        assert abs(plant.gain_K_min - 0.06) < 1e-6
+        assert abs(plant.loss_per_min - 0.004) < 1e-6
+        assert plant.rmse_K_min < 1e-6
+
+        flat = _synthetic_trace()
+        flat.valve = [50.0] * len(flat)
+        assert fit_plant(flat) is None
+
+    def test_search_improves_on_default_gains(self):
+        """The replay search lowers the tracking cost of the default gains."""
+        trace = _synthetic_trace()
+        plant = fit_plant(trace)
+        assert plant is not None
+        pid_params = PIDParams()
+        tuning = PidTuningParams(max_workers=1)
+        reports = []
+
+        result = tune_pid_gains(
+            trace,
+            plant,
+            pid_params,
+            tuning,
+            progress=lambda frac, cost: reports.append((frac, cost)),
+        )
+
+        baseline = simulate_pid_cost(
+            (pid_params.kp, pid_params.ki, pid_params.kd),
+            plant,
+            trace,
+            pid_params,
+            tuning,
+        )
+        assert result.baseline_cost == baseline
+        assert result.cost < 0.9 * baseline
+        assert pid_params.kp_min <= result.kp <= pid_params.kp_max
+        assert pid_params.ki_min <= result.ki <= pid_params.ki_max
+        assert pid_params.kd_min <= result.kd <= pid_params.kd_max
+        assert reports[-1][0] == 1.0
+        assert [cost for _, cost in reports] == sorted(
+            (cost for _, cost in reports), reverse=True
+        )
+
+    def test_process_pool_matches_inline_search(self):
+        """Scoring in worker processes gives the same result as inline."""
+        trace = _synthetic_trace()
+        plant = fit_plant(trace)
+        assert plant is not None
+        quick = {"grid_points": 2, "max_iter": 3}
+
+        inline = tune_pid_gains(
+            trace, plant, tuning=PidTuningParams(max_workers=1, **quick)
+        )
+        pooled = tune_pid_gains(
+            trace, plant, tuning=PidTuningParams(max_workers=2, **quick)
+        )
+        assert (pooled.kp, pooled.ki, pooled.kd) == (inline.kp, inline.ki, inline.kd)
+        assert pooled.evaluations == inline.evaluations
+
+    @pytest.mark.anyio
+    async def test_cancelled_service_releases_status(self):
+        """A cancelled tuning run does not stay "running" forever."""
+        started = asyncio.Event()
+
+        async def load_trace(hours, step_s):
+            started.set()
+            await asyncio.Event().wait()
+
+        bt = object.__new__(BetterThermostat)
+        bt.device_name = "test"
+        bt.pid_tuning = None
+        bt.async_write_ha_state = lambda: None
+        bt._async_load_pid_replay_trace = load_trace
+
+        task = asyncio.create_task(bt.tune_pid_from_history_service())
+        await started.wait()
+        assert bt.pid_tuning == {"status": "running", "progress": 0}
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert bt.pid_tuning == {"status": "cancelled"}
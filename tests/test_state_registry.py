@@ -0,0 +1,193 @@
+"""Tests for the indexed controller state registry."""
+
+from custom_components.better_thermostat.utils.calibration.mpc import (
+    MpcInput,
+    MpcParams,
+    _MpcState,
+    compute_mpc,
+    export_mpc_state_map,
+)
+from custom_components.better_thermostat.utils.calibration.state_registry import (
+    StateRegistry,
+)
+
+
+class TestStateRegistry:
+    """Test cases for StateRegistry."""
+
+    def test_behaves_like_dict(self):
+        """Basic mapping operations keep their dict semantics."""
+        registry: StateRegistry[int] = StateRegistry()
+        registry["bt1:climate.a:t20.0"] = 1
+        registry.setdefault("bt1:climate.a:t20.5", 2)
+        assert registry.setdefault("bt1:climate.a:t20.0", 9) == 1
+        assert list(registry) == ["bt1:climate.a:t20.0", "bt1:climate.a:t20.5"]
+        assert registry.get("missing") is None
+        del registry["bt1:climate.a:t20.0"]
+        assert len(registry) == 1
+        registry.clear()
+        assert not registry
+        assert registry.keys_for_uid("bt1") == []
+
+    def test_prefix_lookup_matches_startswith_scan(self):
+        """Indexed prefix lookups return the same entries as a full scan."""
+        registry: StateRegistry[str] = StateRegistry()
+        keys = [
+            "bt1:climate.a:t20.0",
+            "bt1:climate.a:t21.0",
+            "bt1:climate.b:t20.0",
+            "bt10:climate.a:t20.0",
+            "bt2:climate.a:t20.0",
+            "bt1:legacy",
+        ]
+        for key in keys:
+            registry[key] = key
+
+        for prefix in ("bt1:", "bt1:climate.a:", "bt1:climate.a", "bt2:", "bt"):
+            expected = sorted(key for key in keys if key.startswith(prefix))
+            assert sorted(k for k, _ in registry.items_with_prefix(prefix)) == expected
+
+    def test_remove_entity_only_drops_its_buckets(self):
+        """Per-TRV reset removes exactly that TRV's buckets and index entries."""
+        registry: StateRegistry[int] = StateRegistry()
+        registry["bt1:climate.a:t20.0"] = 1
+        registry["bt1:climate.a:t21.0"] = 2
+        registry["bt1:climate.b:t20.0"] = 3
+
+        assert registry.remove_entity("bt1", "climate.a") == 2
+        assert list(registry) == ["bt1:climate.b:t20.0"]
+        assert registry.keys_for_entity("bt1", "climate.a") == []
+        assert registry.keys_for_uid("bt1") == ["bt1:climate.b:t20.0"]
+
+
+class TestMpcRegistryIntegration:
+    """MPC helpers that rely on the registry indexes."""
+
+    def setup_method(self):
+        """Reset MPC states before each test."""
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        mpc_module._MPC_STATES.clear()
+
+    def test_new_bucket_seeds_min_effective_from_sibling(self):
+        """A fresh target bucket inherits min_effective_percent of its TRV."""
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        mpc_module._MPC_STATES["bt1:climate.a:t20.0"] = _MpcState(
+            min_effective_percent=17.0
+        )
+        mpc_module._MPC_STATES["bt1:climate.b:t20.0"] = _MpcState(
+            min_effective_percent=40.0
+        )
+
+        compute_mpc(
+            MpcInput(
+                key="bt1:climate.a:t21.0", target_temp_C=21.0, current_temp_C=20.0
+            ),
+            MpcParams(mpc_adapt=False, enable_min_effective_percent=True),
+        )
+        state = mpc_module._MPC_STATES["bt1:climate.a:t21.0"]
+        assert state.min_effective_percent == 17.0
+
+    def test_export_is_scoped_to_prefix(self):
+        """Exporting one BT entity never includes another entity's states."""
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        mpc_module._MPC_STATES["bt1:climate.a:t20.0"] = _MpcState(gain_est=0.1)
+        mpc_module._MPC_STATES["bt10:climate.a:t20.0"] = _MpcState(gain_est=0.2)
+
+        assert list(export_mpc_state_map("bt1:")) == ["bt1:climate.a:t20.0"]
+
+    def test_import_evicts_stale_buckets_into_prior(self):
+        """Loading applies the eviction policy and keeps the learned model."""
+        import time
+
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+
+        now = time.time()
+        mpc_module.import_mpc_state_map(
+            {
+                "bt1:climate.a:t19.0": {
+                    "gain_est": 0.1,
+                    "loss_est": 0.02,
+                    "last_used_ts": now - 400 * 86400.0,
+                },
+                "bt1:climate.a:t21.0": {"gain_est": 0.05, "last_used_ts": now},
+            }
+        )
+
+        assert "bt1:climate.a:t19.0" not in mpc_module._MPC_STATES
+        prior = mpc_module._MPC_STATES["bt1:climate.a:prior"]
+        assert prior.gain_est == 0.1
+        assert prior.loss_est == 0.02
+
+        compute_mpc(
+            MpcInput(
+                key="bt1:climate.a:t19.0", target_temp_C=19.0, current_temp_C=18.5
+            ),
+            MpcParams(mpc_adapt=False),
+        )
+        assert mpc_module._MPC_STATES["bt1:climate.a:t19.0"].gain_est == 0.1
+
+    def test_bucket_limit_evicts_least_recently_used(self):
+        """Creating a bucket beyond the limit evicts the oldest one of that TRV."""
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+        from custom_components.better_thermostat.utils.calibration.state_registry import (
+            BucketEvictionPolicy,
+        )
+
+        params = MpcParams(
+            mpc_adapt=False, bucket_eviction=BucketEvictionPolicy(max_buckets_per_trv=2)
+        )
+        for target in (19.0, 20.0, 21.0):
+            compute_mpc(
+                MpcInput(
+                    key=f"bt1:climate.a:t{target:.1f}",
+                    target_temp_C=target,
+                    current_temp_C=18.0,
+                ),
+                params,
+            )
+        compute_mpc(
+            MpcInput(
+                key="bt1:climate.b:t19.0", target_temp_C=19.0, current_temp_C=18.0
+            ),
+            params,
+        )
+
+        assert sorted(mpc_module._MPC_STATES.keys_for_entity("bt1", "climate.a")) == [
+            "bt1:climate.a:prior",
+            "bt1:climate.a:t20.0",
+            "bt1:climate.a:t21.0",
+        ]
+        assert "bt1:climate.b:t19.0" in mpc_module._MPC_STATES
+        assert "last_used_ts" in export_mpc_state_map("bt1:")["bt1:climate.a:t21.0"]
+
+    def test_import_applies_policy_and_evicts_undated_buckets_first(self):
+        """The TRV's own policy is used; buckets without a timestamp count as oldest."""
+        import time
+
+        import custom_components.better_thermostat.utils.calibration.mpc as mpc_module
+        from custom_components.better_thermostat.utils.calibration.state_registry import (
+            BucketEvictionPolicy,
+        )
+
+        now = time.time()
+        mpc_module.import_mpc_state_map(
+            {
+                "bt1:climate.a:t20.0": {"gain_est": 0.1, "last_used_ts": now - 60},
+                "bt1:climate.a:t19.0": {"gain_est": 0.2},
+                "bt1:climate.a:t21.0": {"gain_est": 0.3, "last_used_ts": now},
+                "bt1:climate.b:t19.0": {"gain_est": 0.4},
+                "bt1:climate.b:t20.0": {"gain_est": 0.5},
+            },
+            policies={"climate.a": BucketEvictionPolicy(max_buckets_per_trv=2)},
+        )
+
+        assert sorted(mpc_module._MPC_STATES.keys_for_entity("bt1", "climate.a")) == [
+            "bt1:climate.a:prior",
+            "bt1:climate.a:t20.0",
+            "bt1:climate.a:t21.0",
+        ]
+        # Undated buckets are not stale: climate.b keeps both under the default
+        assert len(mpc_module._MPC_STATES.keys_for_entity("bt1", "climate.b")) == 2
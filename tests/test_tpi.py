@@ -98,3 +98,21 @@ class TestTpiController:
         bt.bt_target_temp = None
         key = build_tpi_key(bt, "climate.test")
         assert key == "test_bt:climate.test:tunknown"
+
+    def test_debug_level_summary_and_off(self):
+        """Summary keeps duty and reason only, off drops the payload."""
+        params = TpiParams()
+        inp = TpiInput(
+            key="test", current_temp_C=20.0, target_temp_C=22.0, debug_level="summary"
+        )
+        result = compute_tpi(inp, params)
+        assert set(result.debug) == {"duty_cycle_pct"}
+
+        inp.window_open = True
+        result = compute_tpi(inp, params)
+        assert result.debug == {"duty_cycle_pct": 0.0, "reason": "blocked"}
+
+        inp.debug_level = "off"
+        result = compute_tpi(inp, params)
+        assert result.debug == {}
+        assert result.duty_cycle_pct == 0.0
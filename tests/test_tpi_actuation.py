@@ -0,0 +1,197 @@
+"""Tests for time-proportional TPI actuation on the shared timer wheel."""
+
+import asyncio
+from types import SimpleNamespace
+
+from homeassistant.components.climate.const import HVACMode
+import pytest
+
+from custom_components.better_thermostat import calibration
+from custom_components.better_thermostat.utils import controlling
+from custom_components.better_thermostat.utils.timer_wheel import TimerWheel
+from custom_components.better_thermostat.utils.tpi_actuation import TpiCycleScheduler
+
+
+@pytest.fixture
+def anyio_backend():
+    """Configure anyio to use asyncio backend for async tests."""
+    return "asyncio"
+
+
+def _recorder(events):
+    async def actuator(on):
+        events.append(on)
+
+    return actuator
+
+
+class TestTimerWheel:
+    """Test cases for the single-timer deadline heap."""
+
+    @pytest.mark.anyio
+    async def test_fires_in_order_with_one_loop_timer(self):
+        """Deadlines run in order and only the earliest is armed."""
+        wheel = TimerWheel()
+        fired = []
+        now = wheel.time()
+        wheel.call_at(now + 0.06, fired.append, "c")
+        wheel.call_at(now + 0.02, fired.append, "a")
+        dropped = wheel.call_at(now + 0.03, fired.append, "x")
+        wheel.call_at(now + 0.04, fired.append, "b")
+        assert wheel.armed_at == now + 0.02
+
+        dropped.cancel()
+        assert len(wheel) == 3
+
+        await asyncio.sleep(0.1)
+        assert fired == ["a", "b", "c"]
+        assert wheel.fired == 3 and len(wheel) == 0 and wheel.armed_at is None
+
+    @pytest.mark.anyio
+    async def test_failing_callback_does_not_stop_the_wheel(self):
+        """An exception in one callback still lets later ones run."""
+        wheel = TimerWheel()
+        fired = []
+
+        def boom():
+            raise RuntimeError("boom")
+
+        wheel.call_later(0.01, boom)
+        wheel.call_later(0.02, fired.append, "ok")
+        await asyncio.sleep(0.05)
+        assert fired == ["ok"]
+
+
+class TestTpiCycleScheduler:
+    """Test cases for duty-cycle to on/off interval conversion."""
+
+    @pytest.mark.anyio
+    async def test_switches_on_then_off_each_cycle(self):
+        """A 50 % duty cycle is on for the first half of every cycle."""
+        scheduler = TpiCycleScheduler(TimerWheel())
+        events = []
+        scheduler.update("bt:trv", 50.0, _recorder(events), cycle_s=1.0)
+
+        await asyncio.sleep(0.25)
+        assert events == [True]
+        await asyncio.sleep(0.5)
+        assert events == [True, False]
+        await asyncio.sleep(0.5)
+        assert events == [True, False, True]
+
+        scheduler.stop("bt:trv")
+        await asyncio.sleep(0)
+        assert events[-1] is False and "bt:trv" not in scheduler
+
+    @pytest.mark.anyio
+    async def test_duty_change_replans_current_cycle(self):
+        """Changing the duty mid-cycle keeps the cycle and its delivered on time."""
+        wheel = TimerWheel()
+        scheduler = TpiCycleScheduler(wheel)
+        events = []
+        actuator = _recorder(events)
+        scheduler.update("k", 50.0, actuator, cycle_s=10.0)
+        await asyncio.sleep(0.05)
+
+        # More on time than 0.1 % of the cycle was already delivered: off now.
+        scheduler.update("k", 0.1, actuator, cycle_s=10.0)
+        await asyncio.sleep(0)
+        snap = scheduler.snapshot("k")
+        assert events == [True, False]
+        assert snap is not None and snap["cycle_elapsed_s"] < 1.0
+        assert snap["next_event_in_s"] > 9.0
+
+        # Raising the duty again resumes the same cycle for the remainder.
+        scheduler.update("k", 20.0, actuator, cycle_s=10.0)
+        await asyncio.sleep(0)
+        snap = scheduler.snapshot("k")
+        assert events == [True, False, True]
+        assert 1.8 < snap["next_event_in_s"] < 2.0
+        assert len(wheel) == 1
+
+        scheduler.stop_prefix("k", switch_off=False)
+        assert len(wheel) == 0 and events == [True, False, True]
+
+    @pytest.mark.anyio
+    async def test_short_pulses_are_skipped(self):
+        """Pulses and gaps below the minimum switch time are dropped."""
+        scheduler = TpiCycleScheduler(TimerWheel())
+        events = []
+        actuator = _recorder(events)
+
+        scheduler.update("low", 5.0, actuator, cycle_s=600.0, min_switch_s=60.0)
+        await asyncio.sleep(0)
+        assert events == [False]
+
+        events.clear()
+        scheduler.update("high", 95.0, actuator, cycle_s=600.0, min_switch_s=60.0)
+        await asyncio.sleep(0)
+        assert events == [True]
+        assert scheduler.snapshot("high")["on_target_s"] == 600.0
+
+
+class TestTpiCycleWrites:
+    """Test cases for the TPI cycle writes of a Better Thermostat entity."""
+
+    @pytest.mark.anyio
+    async def test_switch_suppresses_trv_echo(self, monkeypatch):
+        """A cycle switch raises ignore_trv_states; a busy lane keeps it raised."""
+        seen = []
+
+        async def fake_set_valve(bt, entity_id, valve):
+            seen.append((valve, bt.real_trvs[entity_id]["ignore_trv_states"]))
+            return True
+
+        monkeypatch.setattr(controlling, "set_valve", fake_set_valve)
+        monkeypatch.setattr(controlling, "TPI_CYCLES", TpiCycleScheduler(TimerWheel()))
+        busy = {"climate.trv": False}
+        bt = SimpleNamespace(
+            unique_id="bt",
+            device_name="test",
+            control_lanes=SimpleNamespace(busy=busy.get),
+            real_trvs={
+                "climate.trv": {
+                    "advanced": {"tpi_time_proportional": True},
+                    "ignore_trv_states": False,
+                }
+            },
+        )
+        bal = {"valve_percent": 100.0, "cycle_s": 600.0, "min_switch_s": 0.0}
+
+        assert controlling._sync_tpi_cycle(bt, "climate.trv", bal, "tpi_calibration")
+        await asyncio.sleep(0)
+        assert seen == [(100, True)]
+        assert bt.real_trvs["climate.trv"]["ignore_trv_states"] is False
+
+        busy["climate.trv"] = True
+        assert not controlling._sync_tpi_cycle(bt, "climate.trv", bal, None)
+        await asyncio.sleep(0)
+        assert seen[-1] == (0, True)
+        assert bt.real_trvs["climate.trv"]["ignore_trv_states"] is True
+
+    def test_cycle_timing_options(self, monkeypatch):
+        """Cycle length and minimum switch time come from the clamped options."""
+        captured = []
+
+        def fake_run(bt, entity_id, key, func, inp, params):
+            captured.append(params)
+
+        monkeypatch.setattr(calibration, "_run_controller", fake_run)
+        bt = SimpleNamespace(
+            unique_id="bt_tpi_options",
+            device_name="test",
+            hass=None,
+            outdoor_sensor=None,
+            weather_entity=None,
+            bt_target_temp=21.0,
+            cur_temp=20.0,
+            bt_hvac_mode=HVACMode.HEAT,
+            window_open=False,
+            real_trvs={
+                "climate.trv": {
+                    "advanced": {"tpi_cycle_s": 900, "tpi_min_switch_s": 5000}
+                }
+            },
+        )
+        calibration._compute_tpi_balance(bt, "climate.trv")
+        assert captured[0].cycle_s == 900.0 and captured[0].min_switch_s == 600.0
@@ -0,0 +1,148 @@
+"""Tests for learning TPI coefficients from heating and cooling cycles."""
+
+import asyncio
+from collections import deque
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.better_thermostat.climate import BetterThermostat
+from custom_components.better_thermostat.utils.calibration.tpi import (
+    _TPI_COEFFICIENTS,
+    TpiParams,
+    export_tpi_state_map,
+    import_tpi_state_map,
+    set_tpi_coefficients,
+    tpi_params_for,
+)
+from custom_components.better_thermostat.utils.calibration.tpi_learning import (
+    fit_tpi_plant,
+    learn_tpi_coefficients,
+    simulate_tpi,
+)
+
+HEATING_CYCLES = [
+    {
+        "temp_start": 19.5,
+        "temp_peak": 21.3,
+        "rate_c_min": rate,
+        "target": 21.0,
+        "outdoor": 5.0,
+    }
+    for rate in (0.028, 0.03, 0.032, 0.03)
+]
+LOSS_CYCLES = [
+    {"temp_start": 21.2, "temp_min": 20.4, "rate": rate}
+    for rate in (0.011, 0.012, 0.013)
+]
+
+
+@pytest.fixture
+def anyio_backend():
+    """Configure anyio to use asyncio backend for async tests."""
+    return "asyncio"
+
+
+class TestTpiLearning:
+    """Test cases for the cycle-based TPI coefficient learner."""
+
+    def setup_method(self):
+        """Clear learned coefficients between tests."""
+        _TPI_COEFFICIENTS.clear()
+
+    def test_fit_plant_from_cycles(self):
+        """Gain and loss are derived from the cycle rates."""
+        plant = fit_tpi_plant(HEATING_CYCLES, LOSS_CYCLES)
+        assert plant is not None
+        assert plant.outdoor_C == 5.0 and plant.target_C == 21.0
+        # 0.012 K/min at 15.8 K above outdoor
+        assert abs(plant.loss - 0.012 / 15.8) < 1e-9
+        assert abs(plant.gain_K_min - (0.03 + plant.loss * 15.4)) < 1e-9
+        assert plant.heating_cycles == 4 and plant.loss_cycles == 3
+
+        assert fit_tpi_plant(HEATING_CYCLES[:2], LOSS_CYCLES) is None
+        assert fit_tpi_plant(HEATING_CYCLES, LOSS_CYCLES[:1]) is None
+
+    def test_learner_lowers_overshoot_and_settling_cost(self):
+        """The learned pair settles faster than the defaults on the fitted room."""
+        result = learn_tpi_coefficients(HEATING_CYCLES, LOSS_CYCLES)
+        assert result is not None and result.improved
+        assert result.cost < result.baseline_cost
+        assert result.overshoot_K < 0.3
+
+        plant = result.plant
+        defaults = TpiParams()
+        base_cost, _, base_settling = simulate_tpi(
+            defaults.coef_int, defaults.coef_ext, plant
+        )
+        assert base_cost == result.baseline_cost
+        assert result.settling_min < base_settling
+        # The feed-forward approaches the steady-state duty per K of delta
+        assert result.coef_ext > defaults.coef_ext
+
+        # Re-learning from the learned pair keeps it unless it can improve
+        again = learn_tpi_coefficients(
+            HEATING_CYCLES,
+            LOSS_CYCLES,
+            TpiParams(coef_int=result.coef_int, coef_ext=result.coef_ext),
+        )
+        assert again is not None and again.cost <= result.cost
+
+    def test_coefficients_persist_with_tpi_states(self):
+        """Learned coefficients round-trip through the TPI state export."""
+        set_tpi_coefficients("bt1", 1.2, 0.03, {"cost": 0.1}, updated_ts=100.0)
+        set_tpi_coefficients("bt2", 0.9, 0.02)
+
+        exported = export_tpi_state_map("bt1:")
+        assert exported == {
+            "bt1:tpi_coefficients": {
+                "cost": 0.1,
+                "coef_int": 1.2,
+                "coef_ext": 0.03,
+                "updated_ts": 100.0,
+            }
+        }
+
+        _TPI_COEFFICIENTS.clear()
+        assert tpi_params_for("bt1").coef_int == TpiParams().coef_int
+        import_tpi_state_map(exported)
+        params = tpi_params_for("bt1")
+        assert (params.coef_int, params.coef_ext) == (1.2, 0.03)
+        assert params.threshold_high == TpiParams().threshold_high
+
+    @pytest.mark.anyio
+    async def test_refit_runs_off_loop_once_per_new_cycle(self):
+        """The entity refits in an executor job and only after new cycles."""
+        jobs = []
+
+        async def executor_job(func, *args):
+            jobs.append(func)
+            return func(*args)
+
+        bt = object.__new__(BetterThermostat)
+        bt.hass = SimpleNamespace(
+            async_create_task=asyncio.ensure_future, async_add_executor_job=executor_job
+        )
+        bt._unique_id = "bt_tpi_refit"
+        bt.device_name = "test"
+        bt.real_trvs = {
+            "climate.trv": {"advanced": {"calibration_mode": "tpi_calibration"}}
+        }
+        bt.heating_cycles = deque(HEATING_CYCLES, maxlen=50)
+        bt.loss_cycles = deque(LOSS_CYCLES, maxlen=50)
+        bt._tpi_learn_task = None
+        bt._tpi_learned_cycles = None
+        bt._tpi_store = None
+
+        bt._learn_tpi_coefficients()
+        await bt._tpi_learn_task
+        assert jobs == [learn_tpi_coefficients]
+        assert "bt_tpi_refit" in _TPI_COEFFICIENTS
+
+        bt._learn_tpi_coefficients()
+        assert bt._tpi_learn_task.done() and len(jobs) == 1
+
+        bt.loss_cycles.append(dict(LOSS_CYCLES[0]))
+        bt._learn_tpi_coefficients()
+        await bt._tpi_learn_task
+        assert len(jobs) == 2
@@ -0,0 +1,92 @@
+"""Tests for the shared weather forecast trajectory cache."""
+
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from custom_components.better_thermostat.utils import weather
+from custom_components.better_thermostat.utils.weather import (
+    ForecastTrajectory,
+    async_update_forecast_trajectory,
+    build_forecast_trajectory,
+    get_forecast_window,
+)
+
+
+@pytest.fixture
+def anyio_backend():
+    """Configure anyio to use asyncio backend for async tests."""
+    return "asyncio"
+
+
+def _hourly(start: datetime, temps: list[float]) -> list[dict]:
+    return [
+        {
+            "datetime": (start + timedelta(hours=i)).isoformat(),
+            "temperature": temp,
+            "cloud_coverage": 50,
+        }
+        for i, temp in enumerate(temps)
+    ]
+
+
+class TestForecastTrajectory:
+    """Test cases for forecast resampling and caching."""
+
+    def setup_method(self):
+        """Reset the forecast cache before each test."""
+        weather._FORECAST_CACHE.clear()
+        weather._FORECAST_LOCKS.clear()
+
+    def test_hourly_forecast_is_interpolated_to_mpc_steps(self):
+        """Hourly samples become 5-minute steps with linear interpolation."""
+        start = datetime(2026, 1, 10, 12, tzinfo=UTC)
+        trajectory = build_forecast_trajectory(_hourly(start, [6.0, 0.0, -6.0]))
+
+        assert trajectory is not None
+        assert trajectory.step_s == 300.0
+        assert len(trajectory.outdoor_temp_C) == 25
+        assert trajectory.outdoor_temp_C[0] == 6.0
+        assert trajectory.outdoor_temp_C[6] == pytest.approx(3.0)
+        assert trajectory.outdoor_temp_C[-1] == -6.0
+        assert set(trajectory.solar_intensity) == {0.5}
+
+    def test_window_starts_one_step_ahead_and_holds_last_value(self):
+        """The window is aligned to the first predicted step and padded."""
+        trajectory = ForecastTrajectory(
+            fetched_ts=0.0,
+            start_ts=1000.0,
+            step_s=300.0,
+            outdoor_temp_C=[1.0, 2.0, 3.0],
+            solar_intensity=[0.0, 0.1, 0.2],
+        )
+        assert trajectory.window(4, now_ts=1000.0) == (
+            [2.0, 3.0, 3.0, 3.0],
+            [0.1, 0.2, 0.2, 0.2],
+        )
+        assert trajectory.window(2, now_ts=1000.0 + 900.0) is None
+
+    @pytest.mark.anyio
+    async def test_concurrent_rooms_share_one_fetch(self):
+        """All rooms on one weather entity trigger a single service call."""
+        start = datetime.now(UTC).replace(minute=0, second=0, microsecond=0)
+        hass = MagicMock()
+        hass.states.get.return_value = MagicMock(
+            attributes={"supported_features": 2}  # FORECAST_HOURLY
+        )
+        hass.services.async_call = AsyncMock(
+            return_value={
+                "weather.home": {"forecast": _hourly(start, [5.0, 4.0, 3.0, 2.0])}
+            }
+        )
+
+        first = await async_update_forecast_trajectory(hass, "weather.home")
+        second = await async_update_forecast_trajectory(hass, "weather.home")
+
+        assert first is second
+        assert hass.services.async_call.await_count == 1
+        assert hass.services.async_call.await_args.args[2]["type"] == "hourly"
+        outdoor, solar = get_forecast_window("weather.home", 6)
+        assert len(outdoor) == 6 and len(solar) == 6
+        assert get_forecast_window("weather.other", 6) is None